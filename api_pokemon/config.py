@@ -64,6 +64,20 @@ DERIVED_FEATURES = [
     'effective_power_diff', 'priority_advantage'
 ]
 
+# Drift detection configuration
+
+# Disable production data collection and reference loading (latency-critical replicas)
+DRIFT_DETECTION_ENABLED = os.getenv('DRIFT_DETECTION_ENABLED', 'true').lower() == 'true'
+
+# Reference data loading: 'background' (thread started after startup) or 'lazy' (on first use)
+DRIFT_REFERENCE_LOAD_MODE = os.getenv('DRIFT_REFERENCE_LOAD_MODE', 'background').lower()
+
+# Scheduled compaction of drift_data (0 = disabled, use the CLI or cron instead)
+DRIFT_COMPACTION_INTERVAL_MINUTES = int(os.getenv('DRIFT_COMPACTION_INTERVAL_MINUTES', '0'))
+
+# Delete production data older than this many days during compaction (0 = keep everything)
+DRIFT_RETENTION_DAYS = int(os.getenv('DRIFT_RETENTION_DAYS', '0'))
+
 # API configuration
 
 # API key for authentication
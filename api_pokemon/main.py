@@ -6,7 +6,12 @@ from contextlib import asynccontextmanager
 from fastapi import Depends, FastAPI
 from fastapi.responses import Response
 
-from api_pokemon.middleware.security import verify_api_key
+from api_pokemon.config import (
+    DRIFT_COMPACTION_INTERVAL_MINUTES,
+    DRIFT_DETECTION_ENABLED,
+    DRIFT_RETENTION_DAYS,
+)
+from api_pokemon.middleware.rate_limit import rate_limit_by_api_key, rate_limit_by_client
 from api_pokemon.monitoring.metrics import get_metrics, metrics_middleware
 from api_pokemon.routes import (
     moves_route,
@@ -30,6 +35,20 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"[API] Warning: Failed to preload ML model: {e}")
         print("       Model will be loaded on first prediction request")
+
+    # Drift reference data is read off the startup path (can be hundreds of MB)
+    from api_pokemon.monitoring.drift_detection import drift_detector
+    if drift_detector.start_background_loading():
+        print("[API] Drift reference data loading in background")
+
+    # Optional scheduled compaction of production data files
+    if DRIFT_DETECTION_ENABLED and DRIFT_COMPACTION_INTERVAL_MINUTES > 0:
+        from api_pokemon.monitoring.compaction import start_compaction_scheduler
+        start_compaction_scheduler(
+            DRIFT_COMPACTION_INTERVAL_MINUTES,
+            retention_days=DRIFT_RETENTION_DAYS or None,
+        )
+        print(f"[API] Drift data compaction every {DRIFT_COMPACTION_INTERVAL_MINUTES} min")
     yield
     # Cleanup on shutdown (if needed in the future)
 
@@ -143,8 +162,9 @@ if API_KEY_REQUIRED:
         )
 
 
-# Protected routes requiring API Key (if API_KEY_REQUIRED=true)
-dependencies = [Depends(verify_api_key)] if API_KEY_REQUIRED else []
+# Protected routes requiring API Key (if API_KEY_REQUIRED=true),
+# rate limited per API key (or per client IP without authentication)
+dependencies = [Depends(rate_limit_by_api_key if API_KEY_REQUIRED else rate_limit_by_client)]
 
 app.include_router(pokemon_route.router, dependencies=dependencies)
 app.include_router(moves_route.router, dependencies=dependencies)
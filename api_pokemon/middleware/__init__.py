@@ -1,6 +1,14 @@
 """
 Middleware pour l'API Pokemon
 """
-from .security import api_key_header, verify_api_key
+from .rate_limit import rate_limit_by_api_key, rate_limit_by_client, rate_limiter
+from .security import api_key_header, reload_api_keys, verify_api_key
 
-__all__ = ["verify_api_key", "api_key_header"]
+__all__ = [
+    "verify_api_key",
+    "api_key_header",
+    "reload_api_keys",
+    "rate_limiter",
+    "rate_limit_by_api_key",
+    "rate_limit_by_client",
+]
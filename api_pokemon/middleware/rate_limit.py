@@ -0,0 +1,175 @@
+"""Per-client token-bucket rate limiting for FastAPI."""
+
+import math
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from fastapi import Depends, HTTPException, Request, status
+
+from api_pokemon.config import RATE_LIMIT_PERIOD, RATE_LIMIT_REQUESTS
+from api_pokemon.middleware.security import DEV_MODE_BYPASS, hash_api_key, verify_api_key
+from api_pokemon.monitoring.metrics import track_rate_limit
+
+# Metrics label for clients identified by IP address (unbounded cardinality)
+ANONYMOUS_CLIENT = "anonymous"
+
+
+class TokenBucket:
+    """
+    Token bucket: holds up to `capacity` tokens, refilled continuously.
+
+    Args:
+        capacity: Maximum burst size (tokens)
+        refill_rate: Tokens added per second
+    """
+
+    __slots__ = ("capacity", "refill_rate", "tokens", "updated_at")
+
+    def __init__(self, capacity: float, refill_rate: float, now: float):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = capacity
+        self.updated_at = now
+
+    def refill(self, now: float):
+        """Add the tokens accumulated since the last update."""
+        elapsed = max(0.0, now - self.updated_at)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+        self.updated_at = now
+
+    def consume(self, now: float) -> float:
+        """
+        Take one token if available.
+
+        Returns:
+            float: 0 if the token was taken, else seconds until one is available
+        """
+        self.refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.refill_rate
+
+
+class RateLimiter:
+    """
+    In-memory token-bucket rate limiter, one bucket per client.
+
+    Allows `requests` requests per `period` seconds on average, with bursts
+    up to `requests`. State is per process: with N API workers a client may
+    get up to N times the limit.
+
+    Args:
+        requests: Requests allowed per period (0 disables limiting)
+        period: Period in seconds
+        max_clients: Number of buckets above which idle ones are dropped
+    """
+
+    def __init__(self, requests: int = RATE_LIMIT_REQUESTS, period: int = RATE_LIMIT_PERIOD,
+                 max_clients: int = 10000):
+        self.requests = requests
+        self.period = period
+        self.max_clients = max_clients
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether requests are limited at all."""
+        return self.requests > 0 and self.period > 0
+
+    def check(self, client_id: str, now: Optional[float] = None) -> Tuple[bool, float]:
+        """
+        Consume one request for a client.
+
+        Args:
+            client_id: Stable client identifier (hashed key or IP)
+            now: Monotonic time (default: time.monotonic())
+
+        Returns:
+            Tuple (allowed, retry_after_seconds)
+        """
+        if not self.enabled:
+            return True, 0.0
+
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(client_id)
+            if bucket is None:
+                if len(self._buckets) >= self.max_clients:
+                    self._prune(now)
+                bucket = TokenBucket(self.requests, self.requests / self.period, now)
+                self._buckets[client_id] = bucket
+            wait = bucket.consume(now)
+
+        return wait == 0.0, wait
+
+    def _prune(self, now: float):
+        """Drop buckets that are full again (idle clients). Caller holds the lock."""
+        for client_id in list(self._buckets):
+            bucket = self._buckets[client_id]
+            bucket.refill(now)
+            if bucket.tokens >= bucket.capacity:
+                del self._buckets[client_id]
+
+    def reset(self):
+        """Forget every client (tests, configuration reload)."""
+        with self._lock:
+            self._buckets.clear()
+
+
+# Singleton instance shared by all routes of a process
+rate_limiter = RateLimiter()
+
+
+def _enforce(client_id: str, label: str):
+    """Consume a token for the client or raise 429."""
+    allowed, retry_after = rate_limiter.check(client_id)
+    track_rate_limit(label, allowed)
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded. Retry later.",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+
+def _client_host(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+def rate_limit_by_api_key(request: Request, api_key: str = Depends(verify_api_key)) -> str:
+    """
+    Rate limit authenticated requests, one bucket per API key.
+
+    Runs after verify_api_key (FastAPI evaluates it once per request).
+    In DEV bypass mode clients are identified by IP address instead.
+
+    Args:
+        request: Incoming request
+        api_key: Key validated by verify_api_key
+
+    Returns:
+        str: The validated API key
+
+    Raises:
+        HTTPException: 429 with Retry-After if the client exceeded its quota
+    """
+    if api_key == DEV_MODE_BYPASS:
+        _enforce(f"ip:{_client_host(request)}", ANONYMOUS_CLIENT)
+    else:
+        # Short hash: identifies the key in metrics without exposing it
+        key_id = hash_api_key(api_key)[:12]
+        _enforce(f"key:{key_id}", key_id)
+    return api_key
+
+
+def rate_limit_by_client(request: Request):
+    """
+    Rate limit unauthenticated requests, one bucket per client IP.
+
+    Raises:
+        HTTPException: 429 with Retry-After if the client exceeded its quota
+    """
+    _enforce(f"ip:{_client_host(request)}", ANONYMOUS_CLIENT)
@@ -3,7 +3,8 @@
 import hashlib
 import os
 import secrets
-from typing import Optional
+import threading
+from typing import FrozenSet, Optional
 
 from fastapi import HTTPException, Security, status
 from fastapi.security import APIKeyHeader
@@ -11,6 +12,14 @@ from fastapi.security import APIKeyHeader
 # API Key header configuration
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 
+# Identity returned when validation is skipped (DEV mode without API_KEYS)
+DEV_MODE_BYPASS = "dev-mode-bypass"
+
+# Hashed key set, computed once (see reload_api_keys)
+_key_lock = threading.Lock()
+_valid_key_hashes: Optional[FrozenSet[str]] = None
+_dev_bypass = False
+
 
 def get_api_keys() -> set:
     """
@@ -42,6 +51,36 @@ def get_api_keys() -> set:
             for key in keys_str.split(",") if key.strip()}
 
 
+def reload_api_keys() -> int:
+    """
+    Re-read API_KEYS and DEV_MODE from the environment and rehash the keys.
+
+    verify_api_key works on this cached set; call this function after
+    changing the environment (key rotation, tests).
+
+    Returns:
+        int: Number of valid keys loaded (0 in DEV bypass mode)
+
+    Raises:
+        RuntimeError: If API_KEYS not configured in production mode
+    """
+    global _valid_key_hashes, _dev_bypass
+
+    with _key_lock:
+        dev_mode = os.getenv("DEV_MODE", "false").lower() == "true"
+        keys = get_api_keys()
+        _dev_bypass = dev_mode and not os.getenv("API_KEYS", "")
+        _valid_key_hashes = frozenset(keys)
+        return len(_valid_key_hashes)
+
+
+def _get_valid_key_hashes() -> FrozenSet[str]:
+    """Return the cached hashed keys, loading them on first use."""
+    if _valid_key_hashes is None:
+        reload_api_keys()
+    return _valid_key_hashes
+
+
 def verify_api_key(api_key: Optional[str] = Security(api_key_header)) -> str:
     """
     Verify that provided API key is valid.
@@ -57,15 +96,15 @@ def verify_api_key(api_key: Optional[str] = Security(api_key_header)) -> str:
 
     Notes:
         - In DEV mode without configured keys, bypasses validation
+        - Keys are hashed once at first use, see reload_api_keys()
         - Uses constant-time comparison to prevent timing attacks
         - Returns clear error messages for better DX
     """
-    # DEV mode: bypass if DEV_MODE=true and no API_KEYS configured
-    dev_mode = os.getenv("DEV_MODE", "false").lower() == "true"
-    keys_str = os.getenv("API_KEYS", "")
+    valid_keys = _get_valid_key_hashes()
 
-    if dev_mode and not keys_str:
-        return "dev-mode-bypass"
+    # DEV mode: bypass if DEV_MODE=true and no API_KEYS configured
+    if _dev_bypass:
+        return DEV_MODE_BYPASS
 
     # Check if API key is present
     if not api_key:
@@ -76,8 +115,7 @@ def verify_api_key(api_key: Optional[str] = Security(api_key_header)) -> str:
         )
 
     # Validate key (constant-time comparison to prevent timing attacks)
-    valid_keys = get_api_keys()
-    api_key_hash = hashlib.sha256(api_key.encode()).hexdigest()
+    api_key_hash = hash_api_key(api_key)
 
     if not any(secrets.compare_digest(api_key_hash, valid) for valid in valid_keys):
         raise HTTPException(
@@ -0,0 +1,434 @@
+"""
+Production Data Compaction
+==========================
+
+Merges the small production_data_<timestamp>.parquet files written by
+DriftDetector (one per 100 predictions) into date-partitioned Parquet
+datasets with large row groups and zstd compression. Each run merges the
+previous part of a date with its new raw files into one replacement part,
+so scheduled compactions keep one file per day.
+
+Layout:
+    drift_data/
+        production_data_20260118_101500_<pid>_<suffix>.parquet  (raw, written by the API)
+        compacted/date=2026-01-18/part-<stamp>.parquet          (written by this module)
+
+Safety:
+- The merged file is written to a temporary name, its row count is verified
+  against the sources, then it is renamed into place (atomic on POSIX).
+- A journal listing the sources (raw files and replaced parts) is written
+  before the rename, so a crash between the rename and the deletion of the
+  originals is finished on the next run instead of producing duplicated rows.
+- A lock file prevents concurrent runs (several API workers, cron + API).
+
+Usage:
+    python -m api_pokemon.monitoring.compaction
+    python -m api_pokemon.monitoring.compaction --retention-days 30
+    python -m api_pokemon.monitoring.compaction --every 60
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DEFAULT_DRIFT_DATA_DIR = Path(__file__).parent / "drift_data"
+COMPACTED_DIRNAME = "compacted"
+
+# Raw files written by DriftDetector.save_production_data(): production_data_<date>_<time>_<pid>_<suffix>
+# (files written before the pid and suffix were added have none)
+RAW_FILE_PATTERN = re.compile(r"^production_data_(\d{8})_(\d{6})(?:_\d+_[0-9a-f]+)?\.parquet$")
+PARTITION_PATTERN = re.compile(r"^date=(\d{4}-\d{2}-\d{2})$")
+
+DEFAULT_ROW_GROUP_SIZE = 500_000
+DEFAULT_COMPRESSION = "zstd"
+
+# Files younger than this may still be being written by the API
+DEFAULT_MIN_FILE_AGE_SECONDS = 60
+
+LOCK_FILENAME = ".compaction.lock"
+LOCK_STALE_SECONDS = 3600
+JOURNAL_SUFFIX = ".journal.json"
+
+logger = logging.getLogger(__name__)
+
+
+class CompactionError(RuntimeError):
+    """Raised when a merged file does not match its sources."""
+
+
+@contextmanager
+def _compaction_lock(drift_data_dir: Path):
+    """
+    Exclusive lock file for a compaction run.
+
+    Yields True if the lock was acquired, False if another run holds it.
+    Locks older than LOCK_STALE_SECONDS are considered abandoned.
+    """
+    lock_path = drift_data_dir / LOCK_FILENAME
+    try:
+        if lock_path.exists() and time.time() - lock_path.stat().st_mtime > LOCK_STALE_SECONDS:
+            logger.warning("Removing stale compaction lock: %s", lock_path)
+            lock_path.unlink(missing_ok=True)
+        fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        yield False
+        return
+
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        yield True
+    finally:
+        lock_path.unlink(missing_ok=True)
+
+
+def _partition_date(raw_file: Path) -> Optional[str]:
+    """Return the ISO date (YYYY-MM-DD) encoded in a raw file name."""
+    match = RAW_FILE_PATTERN.match(raw_file.name)
+    if not match:
+        return None
+    return datetime.strptime(match.group(1), "%Y%m%d").strftime("%Y-%m-%d")
+
+
+def list_raw_files(
+    drift_data_dir: Path,
+    min_age_seconds: int = DEFAULT_MIN_FILE_AGE_SECONDS
+) -> Dict[str, List[Path]]:
+    """
+    Group raw production files by date.
+
+    Args:
+        drift_data_dir: Directory written by DriftDetector
+        min_age_seconds: Skip files modified more recently than this
+
+    Returns:
+        Dictionary mapping ISO date to the sorted list of raw files
+    """
+    now = time.time()
+    by_date: Dict[str, List[Path]] = {}
+
+    for raw_file in sorted(drift_data_dir.glob("production_data_*.parquet")):
+        date = _partition_date(raw_file)
+        if date is None:
+            continue
+        if now - raw_file.stat().st_mtime < min_age_seconds:
+            continue
+        by_date.setdefault(date, []).append(raw_file)
+
+    return by_date
+
+
+def recover_interrupted_compactions(drift_data_dir: Path) -> int:
+    """
+    Finish or roll back compactions interrupted by a crash.
+
+    If the merged file of a journal exists, its sources are deleted;
+    otherwise the temporary file is removed and the sources are kept.
+
+    Returns:
+        Number of journals processed
+    """
+    compacted_dir = drift_data_dir / COMPACTED_DIRNAME
+    if not compacted_dir.exists():
+        return 0
+
+    recovered = 0
+    for journal_path in compacted_dir.glob(f"date=*/*{JOURNAL_SUFFIX}"):
+        journal = json.loads(journal_path.read_text(encoding="utf-8"))
+        output = Path(journal["output"])
+        temp_output = Path(journal["temp_output"])
+
+        if output.exists():
+            for source in journal["sources"]:
+                Path(source).unlink(missing_ok=True)
+            logger.info("Completed interrupted compaction: %s", output)
+        else:
+            temp_output.unlink(missing_ok=True)
+            logger.info("Rolled back interrupted compaction: %s", output)
+
+        journal_path.unlink()
+        recovered += 1
+
+    return recovered
+
+
+def compact_partition(
+    date: str,
+    raw_files: List[Path],
+    compacted_dir: Path,
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+    compression: str = DEFAULT_COMPRESSION
+) -> Dict:
+    """
+    Merge the raw files of one date and the existing parts of its partition into a single Parquet part.
+
+    Each run replaces the partition's parts instead of adding one, so a
+    scheduled compaction keeps one file per day.
+
+    Args:
+        date: ISO date of the partition
+        raw_files: Raw files to merge
+        compacted_dir: Root of the date-partitioned dataset
+        row_group_size: Rows per Parquet row group
+        compression: Parquet compression codec
+
+    Returns:
+        Dictionary with the output path, the raw files and rows merged ('files', 'rows'),
+        the previous parts replaced ('parts') and the rows of the new part ('part_rows')
+
+    Raises:
+        CompactionError: If the merged row count does not match the sources
+    """
+    partition_dir = compacted_dir / f"date={date}"
+    # Previous parts first: rows stay in capture order
+    existing_parts = sorted(partition_dir.glob("part-*.parquet")) if partition_dir.exists() else []
+
+    tables = []
+    sources = []
+    expected_rows = 0
+    raw_count = 0
+    raw_rows = 0
+
+    for source in existing_parts + list(raw_files):
+        try:
+            table = pq.read_table(source)
+        except (OSError, pa.ArrowInvalid) as e:
+            # Unreadable (e.g. partially written) files are left in place
+            logger.warning("Skipping unreadable file %s: %s", source, e)
+            continue
+        tables.append(table)
+        sources.append(source)
+        expected_rows += table.num_rows
+        if source not in existing_parts:
+            raw_count += 1
+            raw_rows += table.num_rows
+
+    if not raw_count:
+        return {'date': date, 'output': None, 'files': 0, 'parts': 0, 'rows': 0, 'part_rows': 0}
+
+    # Feature sets may differ between model versions: missing columns become null
+    merged = pa.concat_tables(tables, promote_options="permissive")
+
+    partition_dir.mkdir(parents=True, exist_ok=True)
+
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+    output = partition_dir / f"part-{stamp}-{uuid.uuid4().hex[:8]}.parquet"
+    temp_output = output.with_name(f".{output.name}.tmp")
+    journal_path = output.with_name(output.name + JOURNAL_SUFFIX)
+
+    pq.write_table(merged, temp_output, row_group_size=row_group_size, compression=compression)
+
+    written_rows = pq.read_metadata(temp_output).num_rows
+    if written_rows != expected_rows:
+        temp_output.unlink(missing_ok=True)
+        raise CompactionError(
+            f"Row count mismatch for {date}: wrote {written_rows}, expected {expected_rows}"
+        )
+
+    journal_path.write_text(json.dumps({
+        'output': str(output),
+        'temp_output': str(temp_output),
+        'sources': [str(s) for s in sources],
+    }), encoding="utf-8")
+
+    os.replace(temp_output, output)
+
+    for source in sources:
+        source.unlink(missing_ok=True)
+    journal_path.unlink()
+
+    parts_count = len(sources) - raw_count
+    logger.info("Compacted %d files (%d rows) and %d previous parts into %s (%d rows)",
+                raw_count, raw_rows, parts_count, output, written_rows)
+    return {'date': date, 'output': str(output), 'files': raw_count, 'parts': parts_count,
+            'rows': raw_rows, 'part_rows': written_rows}
+
+
+def apply_retention(drift_data_dir: Path, retention_days: int, now: Optional[datetime] = None) -> int:
+    """
+    Delete raw files and compacted partitions older than retention_days.
+
+    Args:
+        drift_data_dir: Directory written by DriftDetector
+        retention_days: Number of days to keep
+        now: Reference time (defaults to datetime.now())
+
+    Returns:
+        Number of raw files and partitions deleted
+    """
+    cutoff = ((now or datetime.now()) - timedelta(days=retention_days)).strftime("%Y-%m-%d")
+    deleted = 0
+
+    for raw_file in drift_data_dir.glob("production_data_*.parquet"):
+        date = _partition_date(raw_file)
+        if date is not None and date < cutoff:
+            raw_file.unlink(missing_ok=True)
+            deleted += 1
+
+    compacted_dir = drift_data_dir / COMPACTED_DIRNAME
+    if compacted_dir.exists():
+        for partition_dir in compacted_dir.iterdir():
+            match = PARTITION_PATTERN.match(partition_dir.name)
+            if match and match.group(1) < cutoff:
+                shutil.rmtree(partition_dir)
+                deleted += 1
+
+    if deleted:
+        logger.info("Retention (%d days): deleted %d files/partitions", retention_days, deleted)
+    return deleted
+
+
+def compact_drift_data(
+    drift_data_dir: Path = DEFAULT_DRIFT_DATA_DIR,
+    retention_days: Optional[int] = None,
+    min_age_seconds: int = DEFAULT_MIN_FILE_AGE_SECONDS,
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+    compression: str = DEFAULT_COMPRESSION
+) -> Dict:
+    """
+    Compact all raw production files and apply the retention policy.
+
+    Args:
+        drift_data_dir: Directory written by DriftDetector
+        retention_days: Delete data older than this many days (None keeps everything)
+        min_age_seconds: Skip raw files modified more recently than this
+        row_group_size: Rows per Parquet row group
+        compression: Parquet compression codec
+
+    Returns:
+        Summary dictionary (partitions, files, rows, deleted, skipped)
+    """
+    drift_data_dir = Path(drift_data_dir)
+    summary = {'partitions': [], 'files': 0, 'rows': 0, 'deleted': 0, 'errors': [], 'skipped': False}
+
+    if not drift_data_dir.exists():
+        return summary
+
+    with _compaction_lock(drift_data_dir) as acquired:
+        if not acquired:
+            logger.info("Compaction already running, skipping")
+            summary['skipped'] = True
+            return summary
+
+        recover_interrupted_compactions(drift_data_dir)
+
+        # Expired raw files are not worth compacting
+        if retention_days:
+            summary['deleted'] = apply_retention(drift_data_dir, retention_days)
+
+        compacted_dir = drift_data_dir / COMPACTED_DIRNAME
+        for date, raw_files in list_raw_files(drift_data_dir, min_age_seconds).items():
+            try:
+                result = compact_partition(date, raw_files, compacted_dir, row_group_size, compression)
+            except CompactionError as e:
+                logger.error("%s", e)
+                summary['errors'].append(str(e))
+                continue
+            if result['output']:
+                summary['partitions'].append(result)
+                summary['files'] += result['files']
+                summary['rows'] += result['rows']
+
+    return summary
+
+
+def start_compaction_scheduler(
+    interval_minutes: int,
+    retention_days: Optional[int] = None,
+    drift_data_dir: Path = DEFAULT_DRIFT_DATA_DIR
+) -> threading.Thread:
+    """
+    Run compact_drift_data() every interval_minutes in a daemon thread.
+
+    Args:
+        interval_minutes: Delay between two runs
+        retention_days: Retention policy passed to each run
+        drift_data_dir: Directory written by DriftDetector
+
+    Returns:
+        The scheduler thread
+    """
+    def _loop():
+        while True:
+            time.sleep(interval_minutes * 60)
+            try:
+                compact_drift_data(drift_data_dir, retention_days=retention_days)
+            except Exception as e:
+                logger.error("Scheduled compaction failed: %s", e)
+
+    thread = threading.Thread(target=_loop, name="drift-compaction", daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(
+        description="Compact production drift data into date-partitioned Parquet files"
+    )
+    parser.add_argument(
+        '--drift-data-dir',
+        type=Path,
+        default=DEFAULT_DRIFT_DATA_DIR,
+        help=f"Directory containing production_data_*.parquet (default: {DEFAULT_DRIFT_DATA_DIR})"
+    )
+    parser.add_argument(
+        '--retention-days',
+        type=int,
+        default=None,
+        help='Delete raw files and partitions older than this many days'
+    )
+    parser.add_argument(
+        '--row-group-size',
+        type=int,
+        default=DEFAULT_ROW_GROUP_SIZE,
+        help=f'Rows per Parquet row group (default: {DEFAULT_ROW_GROUP_SIZE})'
+    )
+    parser.add_argument(
+        '--min-age-seconds',
+        type=int,
+        default=DEFAULT_MIN_FILE_AGE_SECONDS,
+        help=f'Skip files modified more recently than this (default: {DEFAULT_MIN_FILE_AGE_SECONDS})'
+    )
+    parser.add_argument(
+        '--every',
+        type=int,
+        default=None,
+        metavar='MINUTES',
+        help='Run continuously, compacting every MINUTES minutes'
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    while True:
+        summary = compact_drift_data(
+            args.drift_data_dir,
+            retention_days=args.retention_days,
+            min_age_seconds=args.min_age_seconds,
+            row_group_size=args.row_group_size,
+        )
+        print(
+            f"[Compaction] {summary['files']} files -> {len(summary['partitions'])} parts "
+            f"({summary['rows']:,} rows), {summary['deleted']} expired, {len(summary['errors'])} errors"
+        )
+        if args.every is None:
+            break
+        time.sleep(args.every * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,15 +4,32 @@ Production Data Collector
 
 Collects ML predictions for future analysis and model retraining.
 Stores prediction features and outcomes in parquet files.
+
+Reference data (X_train.parquet) is never read at import time: it is
+loaded in a background thread started after API startup, or lazily on
+first use, depending on DRIFT_REFERENCE_LOAD_MODE.
 """
 
 import logging
+import os
+import threading
+import uuid
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional
 
 import pandas as pd
 
+from api_pokemon.config import DRIFT_DETECTION_ENABLED, DRIFT_REFERENCE_LOAD_MODE
+
+# Reference data loading states (reported by get_drift_status)
+REFERENCE_STATUS_DISABLED = "disabled"
+REFERENCE_STATUS_NOT_LOADED = "not_loaded"
+REFERENCE_STATUS_LOADING = "loading"
+REFERENCE_STATUS_LOADED = "loaded"
+REFERENCE_STATUS_UNAVAILABLE = "unavailable"
+REFERENCE_STATUS_FAILED = "failed"
+
 
 class DriftDetector:
     """
@@ -25,62 +42,121 @@ class DriftDetector:
 
     _instance = None
 
-    def __new__(cls):
+    def __new__(cls, *args, **kwargs):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
         return cls._instance
 
-    def __init__(self):
+    def __init__(
+        self,
+        enabled: bool = DRIFT_DETECTION_ENABLED,
+        load_mode: str = DRIFT_REFERENCE_LOAD_MODE
+    ):
         if hasattr(self, '_initialized'):
             return
 
         self._initialized = True
         self.logger = logging.getLogger(__name__)
+        self.enabled = enabled
+        self.load_mode = load_mode
 
-        # Directories
+        # Directories (created on first save, not at import)
         self.monitoring_dir = Path(__file__).parent
         self.drift_data_dir = self.monitoring_dir / "drift_data"
 
-        # Create directories
-        self.drift_data_dir.mkdir(parents=True, exist_ok=True)
-
         # Production data buffer
         self.production_buffer: List[Dict] = []
         self.max_buffer_size = 100 # Save every 100 predictions
 
         # Reference data (for future drift detection if needed)
-        self.reference_data: Optional[pd.DataFrame] = None
-        self._load_reference_data()
+        self._reference_data: Optional[pd.DataFrame] = None
+        self._reference_lock = threading.Lock()
+        self._reference_thread: Optional[threading.Thread] = None
+        self.reference_status = (
+            REFERENCE_STATUS_NOT_LOADED if enabled else REFERENCE_STATUS_DISABLED
+        )
+
+    @property
+    def reference_data(self) -> Optional[pd.DataFrame]:
+        """
+        Reference sample from the training set.
 
-    def _load_reference_data(self):
+        In 'lazy' mode the first access loads it synchronously. In
+        'background' mode this never blocks: it returns None until the
+        loading thread has finished.
         """
-        Load reference data from training set.
+        if self.reference_status == REFERENCE_STATUS_NOT_LOADED and self.load_mode == 'lazy':
+            self.load_reference_data()
+        return self._reference_data
+
+    def start_background_loading(self) -> Optional[threading.Thread]:
+        """
+        Load reference data in a daemon thread (called from the API lifespan).
+
+        Returns:
+            The loading thread, or None if nothing needs to be loaded
+        """
+        if not self.enabled or self.load_mode != 'background':
+            return None
+
+        with self._reference_lock:
+            if self.reference_status != REFERENCE_STATUS_NOT_LOADED:
+                return None
+            self.reference_status = REFERENCE_STATUS_LOADING
+
+        self._reference_thread = threading.Thread(
+            target=self.load_reference_data,
+            name="drift-reference-loader",
+            daemon=True,
+        )
+        self._reference_thread.start()
+        return self._reference_thread
+
+    def _find_reference_file(self) -> Optional[Path]:
+        """Locate X_train.parquet locally or at the Docker mount point."""
+        for ref_file in (
+            Path("data/datasets/X_train.parquet"),
+            Path("/app/data/datasets/X_train.parquet"),
+        ):
+            if ref_file.exists():
+                return ref_file
+        return None
+
+    def load_reference_data(self):
+        """
+        Load reference data from training set (synchronous).
 
         Samples 10,000 examples from X_train.parquet for future drift analysis.
+        Called directly by the gunicorn master before forking workers, so the
+        sample is shared copy-on-write instead of loaded once per worker.
         """
-        try:
-            # Try to load from data/datasets/
-            ref_file = Path("data/datasets/X_train.parquet")
-            if not ref_file.exists():
-                # Try from Docker mount point
-                ref_file = Path("/app/data/datasets/X_train.parquet")
-
-            if not ref_file.exists():
-                self.logger.warning(
-                    "Reference data file not found: %s. "
-                    "This is optional for production data collection.",
-                    ref_file
-                )
+        with self._reference_lock:
+            if self.reference_status in (REFERENCE_STATUS_LOADED, REFERENCE_STATUS_DISABLED):
                 return
+            self.reference_status = REFERENCE_STATUS_LOADING
+
+            try:
+                ref_file = self._find_reference_file()
+                if ref_file is None:
+                    self.logger.warning(
+                        "Reference data file not found (X_train.parquet). "
+                        "This is optional for production data collection."
+                    )
+                    self.reference_status = REFERENCE_STATUS_UNAVAILABLE
+                    return
+
+                # Load and sample reference data
+                reference_df = pd.read_parquet(ref_file)
+                self._reference_data = reference_df.sample(
+                    n=min(10000, len(reference_df)), random_state=42
+                )
+                self.reference_status = REFERENCE_STATUS_LOADED
+                self.logger.info("Loaded reference data: %s", self._reference_data.shape)
 
-            # Load and sample reference data
-            reference_df = pd.read_parquet(ref_file)
-            self.reference_data = reference_df.sample(n=min(10000, len(reference_df)), random_state=42)
-            self.logger.info("Loaded reference data: %s", self.reference_data.shape)
-
-        except Exception as e:
-            self.logger.error("Failed to load reference data: %s", e)
-            self.reference_data = None
+            except Exception as e:
+                self.logger.error("Failed to load reference data: %s", e)
+                self._reference_data = None
+                self.reference_status = REFERENCE_STATUS_FAILED
 
     def add_prediction(
         self,
@@ -92,11 +168,13 @@ class DriftDetector:
         Add a new prediction to the production buffer.
 
         Args:
-            features: Dictionary of ML input features (133 features)
+            features: Dictionary of ML input features (133 features), plus the
+                move categories (a_move_category, b_move_category) used to label
+                the row for continual training
             prediction: Predicted class (0 or 1)
             probability: Prediction probability
         """
-        if not features:
+        if not self.enabled or not features:
             return
 
         # Store ML features for future analysis
@@ -110,13 +188,18 @@ class DriftDetector:
 
     def get_drift_status(self) -> Dict:
         """
-        Get current buffer status.
+        Get current buffer and reference data status.
+
+        Never triggers reference loading, so it is safe to call from
+        request handlers.
 
         Returns:
             Dictionary with current buffer metrics
         """
         return {
-            'reference_data_loaded': self.reference_data is not None,
+            'enabled': self.enabled,
+            'reference_data_loaded': self._reference_data is not None,
+            'reference_data_status': self.reference_status,
             'buffer_size': len(self.production_buffer),
             'max_buffer_size': self.max_buffer_size,
         }
@@ -130,8 +213,13 @@ class DriftDetector:
         if len(self.production_buffer) == 0:
             return
 
+        self.drift_data_dir.mkdir(parents=True, exist_ok=True)
+        # Each gunicorn worker flushes its own buffer: the pid and a random suffix keep
+        # files written in the same second apart
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_file = self.drift_data_dir / f"production_data_{timestamp}.parquet"
+        output_file = self.drift_data_dir / f"production_data_{timestamp}_{os.getpid()}_{uuid.uuid4().hex[:8]}.parquet"
+        # Hidden temporary name: neither compaction nor continual training reads partial files
+        temp_file = output_file.with_name(f".{output_file.name}.tmp")
 
         try:
             df = pd.DataFrame(self.production_buffer)
@@ -151,9 +239,11 @@ class DriftDetector:
                     except (ValueError, TypeError):
                         pass # Keep as object if conversion fails
 
-            df.to_parquet(output_file, index=False)
+            df.to_parquet(temp_file, index=False)
+            os.replace(temp_file, output_file)
             self.logger.info("Saved %d production samples to %s", len(df), output_file)
         except Exception as e:
+            temp_file.unlink(missing_ok=True)
             self.logger.error("Failed to save production data: %s", e)
 
 
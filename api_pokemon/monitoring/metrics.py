@@ -8,6 +8,10 @@ Metrics collected:
 - API request count, latency, errors
 - Model prediction count, latency, confidence
 - Resource usage
+
+Multi-worker deployments set PROMETHEUS_MULTIPROC_DIR (see
+api_pokemon/monitoring/multiprocess.py): values are then shared through
+files and /metrics serves the registry aggregated over all workers.
 """
 
 import time
@@ -15,9 +19,19 @@ from typing import Callable
 
 import psutil
 from fastapi import Request, Response
-from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
 from starlette.middleware.base import BaseHTTPMiddleware
 
+from api_pokemon.monitoring.multiprocess import is_multiprocess_mode
+
 # ============================================================================
 # API Metrics
 # ============================================================================
@@ -42,6 +56,19 @@ api_errors_total = Counter(
     ['method', 'endpoint', 'error_type']
 )
 
+# Per-client rate limiting (client = short hash of the API key, or 'anonymous')
+api_client_requests_total = Counter(
+    'api_client_requests_total',
+    'Total number of rate-limited API requests per client',
+    ['client']
+)
+
+api_client_throttled_total = Counter(
+    'api_client_throttled_total',
+    'Total number of API requests rejected with 429 per client',
+    ['client']
+)
+
 # ============================================================================
 # Model Metrics
 # ============================================================================
@@ -77,19 +104,24 @@ model_win_probability = Histogram(
 # System Metrics
 # ============================================================================
 
+# Host-wide values: every worker measures the same thing, so in multiprocess
+# mode only the most recent value of a live worker is exposed.
 system_cpu_usage = Gauge(
     'system_cpu_usage_percent',
-    'Current CPU usage in percent'
+    'Current CPU usage in percent',
+    multiprocess_mode='livemostrecent'
 )
 
 system_memory_usage = Gauge(
     'system_memory_usage_bytes',
-    'Current memory usage in bytes'
+    'Current memory usage in bytes',
+    multiprocess_mode='livemostrecent'
 )
 
 system_memory_available = Gauge(
     'system_memory_available_bytes',
-    'Available memory in bytes'
+    'Available memory in bytes',
+    multiprocess_mode='livemostrecent'
 )
 
 
@@ -139,6 +171,19 @@ def track_error(method: str, endpoint: str, error_type: str):
     api_errors_total.labels(method=method, endpoint=endpoint, error_type=error_type).inc()
 
 
+def track_rate_limit(client: str, allowed: bool):
+    """
+    Track a request checked by the rate limiter.
+
+    Args:
+        client: Client label (API key hash prefix or 'anonymous')
+        allowed: False if the request was throttled
+    """
+    api_client_requests_total.labels(client=client).inc()
+    if not allowed:
+        api_client_throttled_total.labels(client=client).inc()
+
+
 def update_system_metrics():
     """Update system resource metrics."""
     system_cpu_usage.set(psutil.cpu_percent(interval=0.1))
@@ -227,6 +272,23 @@ def metrics_middleware(app):
 # Metrics Endpoint
 # ============================================================================
 
+def get_registry() -> CollectorRegistry:
+    """
+    Return the registry to expose on /metrics.
+
+    In multiprocess mode, a fresh registry aggregating the files of all
+    workers; otherwise the default process-local registry.
+    """
+    if not is_multiprocess_mode():
+        return REGISTRY
+
+    from prometheus_client import multiprocess
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
 def get_metrics() -> Response:
     """
     Generate Prometheus metrics response.
@@ -238,6 +300,6 @@ def get_metrics() -> Response:
     update_system_metrics()
 
     return Response(
-        content=generate_latest(),
+        content=generate_latest(get_registry()),
         media_type=CONTENT_TYPE_LATEST
     )
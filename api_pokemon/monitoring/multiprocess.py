@@ -0,0 +1,73 @@
+"""
+Prometheus Multiprocess Support
+===============================
+
+Helpers for running the API with several worker processes
+(uvicorn --workers, gunicorn) while keeping /metrics consistent.
+
+When PROMETHEUS_MULTIPROC_DIR is set, prometheus_client stores every
+metric value in per-process files inside that directory, and /metrics
+aggregates them with a MultiProcessCollector.
+
+This module deliberately does not define any metric: it is imported by
+the launcher (master process) before the workers are started.
+"""
+
+import os
+import shutil
+from pathlib import Path
+from typing import Optional
+
+
+def get_multiprocess_dir() -> Optional[Path]:
+    """
+    Return the shared metrics directory, or None in single-process mode.
+
+    Environment:
+        PROMETHEUS_MULTIPROC_DIR: Directory shared by all workers
+    """
+    path = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    return Path(path) if path else None
+
+
+def is_multiprocess_mode() -> bool:
+    """Return True if prometheus_client runs in multiprocess mode."""
+    return get_multiprocess_dir() is not None
+
+
+def prepare_multiprocess_dir() -> Optional[Path]:
+    """
+    Create an empty shared metrics directory.
+
+    Must be called once by the master process before any worker starts:
+    files left by a previous run would otherwise be aggregated into the
+    new counters.
+
+    Returns:
+        The cleaned directory, or None in single-process mode
+    """
+    multiproc_dir = get_multiprocess_dir()
+    if multiproc_dir is None:
+        return None
+
+    if multiproc_dir.exists():
+        shutil.rmtree(multiproc_dir)
+    multiproc_dir.mkdir(parents=True, exist_ok=True)
+    return multiproc_dir
+
+
+def mark_worker_dead(pid: int):
+    """
+    Remove the live-gauge files of a worker that exited.
+
+    Called from the process manager (gunicorn child_exit hook) so that
+    'live*' gauges stop reporting values for dead workers.
+
+    Args:
+        pid: Process ID of the dead worker
+    """
+    if not is_multiprocess_mode():
+        return
+
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(pid)
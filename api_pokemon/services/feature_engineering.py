@@ -11,6 +11,7 @@ Functions:
 
 from typing import Dict
 
+import numpy as np
 import pandas as pd
 
 from core.models import Pokemon
@@ -64,7 +65,8 @@ def prepare_features_for_prediction(
 
     # Determine who moves first (priority > speed)
     a_moves_first = 1 if move_a_info['priority'] > move_b_info['priority'] else (
-        1 if (move_a_info['priority'] == move_b_info['priority'] and pokemon_a.stats.speed > pokemon_b.stats.speed) else 0
+        1 if (move_a_info['priority'] == move_b_info['priority']
+              and pokemon_a.stats.speed > pokemon_b.stats.speed) else 0
     )
 
     # Build feature dictionary
@@ -115,24 +117,39 @@ def prepare_features_for_prediction(
 
 
 def apply_feature_engineering(df_raw: pd.DataFrame) -> pd.DataFrame:
-    """Apply the same feature engineering pipeline as training."""
+    """Apply the same feature engineering pipeline as training.
+
+    Features are written by column index into one preallocated block in
+    the training column order: one-hot columns are looked up from the row
+    values, and columns without a value (types unseen in training) stay 0.
+    """
     model_instance = prediction_model
     scalers = model_instance.scalers
 
     # Get feature columns from metadata (v1 uses 'features', v2 uses 'feature_columns')
     feature_columns = model_instance.metadata.get('feature_columns') or model_instance.metadata.get('features')
+    positions = {name: j for j, name in enumerate(feature_columns)}
+    X = np.zeros((len(df_raw), len(feature_columns)), dtype=np.float64)
+
+    def put(name: str, values) -> None:
+        j = positions.get(name)
+        if j is not None:
+            X[:, j] = values
 
-    # One-hot encode categorical features
     categorical_features = ['a_type_1', 'a_type_2', 'b_type_1', 'b_type_2', 'a_move_type', 'b_move_type']
 
-    X_encoded = df_raw.copy()
+    # Raw numerical features
+    for name in df_raw.columns:
+        if name not in categorical_features:
+            put(name, df_raw[name].to_numpy(dtype=np.float64))
 
+    # One-hot encode categorical features by column index
+    rows = np.arange(len(df_raw))
     for feature in categorical_features:
-        if feature in X_encoded.columns:
-            dummies = pd.get_dummies(X_encoded[feature], prefix=feature, drop_first=False)
-            X_encoded = pd.concat([X_encoded, dummies], axis=1)
-
-    X_encoded = X_encoded.drop(columns=categorical_features)
+        if feature in df_raw.columns:
+            columns = np.array([positions.get(f"{feature}_{value}", -1) for value in df_raw[feature]], dtype=np.int64)
+            known = columns >= 0
+            X[rows[known], columns[known]] = 1.0
 
     # Normalize numerical features
     features_to_scale = [
@@ -142,18 +159,21 @@ def apply_feature_engineering(df_raw: pd.DataFrame) -> pd.DataFrame:
         'a_total_stats', 'b_total_stats',
         'speed_diff', 'hp_diff'
     ]
-    features_to_scale = [f for f in features_to_scale if f in X_encoded.columns]
+    features_to_scale = [f for f in features_to_scale if f in df_raw.columns]
 
     scaler = scalers['standard_scaler']
-    X_encoded[features_to_scale] = scaler.transform(X_encoded[features_to_scale])
+    scaled = np.asarray(scaler.transform(df_raw[features_to_scale]), dtype=np.float64)
+    for k, name in enumerate(features_to_scale):
+        put(name, scaled[:, k])
 
     # Create derived features (using original values from df_raw)
-    X_encoded['stat_ratio'] = df_raw['a_total_stats'] / (df_raw['b_total_stats'] + 1)
-    X_encoded['type_advantage_diff'] = df_raw['a_move_type_mult'] - df_raw['b_move_type_mult']
-    X_encoded['effective_power_a'] = df_raw['a_move_power'] * df_raw['a_move_stab'] * df_raw['a_move_type_mult']
-    X_encoded['effective_power_b'] = df_raw['b_move_power'] * df_raw['b_move_stab'] * df_raw['b_move_type_mult']
-    X_encoded['effective_power_diff'] = X_encoded['effective_power_a'] - X_encoded['effective_power_b']
-    X_encoded['priority_advantage'] = df_raw['a_move_priority'] - df_raw['b_move_priority']
+    derived = pd.DataFrame(index=df_raw.index)
+    derived['stat_ratio'] = df_raw['a_total_stats'] / (df_raw['b_total_stats'] + 1)
+    derived['type_advantage_diff'] = df_raw['a_move_type_mult'] - df_raw['b_move_type_mult']
+    derived['effective_power_a'] = df_raw['a_move_power'] * df_raw['a_move_stab'] * df_raw['a_move_type_mult']
+    derived['effective_power_b'] = df_raw['b_move_power'] * df_raw['b_move_stab'] * df_raw['b_move_type_mult']
+    derived['effective_power_diff'] = derived['effective_power_a'] - derived['effective_power_b']
+    derived['priority_advantage'] = df_raw['a_move_priority'] - df_raw['b_move_priority']
 
     # Normalize derived features
     new_features = [
@@ -163,16 +183,8 @@ def apply_feature_engineering(df_raw: pd.DataFrame) -> pd.DataFrame:
     ]
 
     scaler_new = scalers['standard_scaler_new_features']
-    X_encoded[new_features] = scaler_new.transform(X_encoded[new_features])
-
-    # Ensure all expected features are present (add missing columns with 0)
-    missing_cols = [col for col in feature_columns if col not in X_encoded.columns]
-    if missing_cols:
-        # Create a DataFrame with missing columns filled with 0
-        missing_df = pd.DataFrame(0, index=X_encoded.index, columns=missing_cols)
-        X_encoded = pd.concat([X_encoded, missing_df], axis=1)
-
-    # Reorder columns to match training
-    X_encoded = X_encoded[feature_columns]
+    scaled_new = np.asarray(scaler_new.transform(derived[new_features]), dtype=np.float64)
+    for k, name in enumerate(new_features):
+        put(name, scaled_new[:, k])
 
-    return X_encoded
+    return pd.DataFrame(X, index=df_raw.index, columns=feature_columns)
@@ -140,6 +140,11 @@ class PredictionModel:
 
         print("[Model] Loaded from local files")
 
+    @property
+    def is_loaded(self) -> bool:
+        """Whether the model is already in memory (never triggers loading)."""
+        return self._model is not None
+
     @property
     def model(self) -> Any:
         """Get the loaded model, loading it if necessary."""
@@ -151,6 +151,7 @@ def select_best_move_for_matchup(
                 'effective_power': eff_power,
                 'move_accuracy': accuracy,
                 'damage_type': move.damage_type,
+                'move_category': move.category.name,
                 'priority': priority,
                 'stab': stab,
                 'type_multiplier': type_mult,
@@ -257,7 +258,10 @@ def predict_best_move(
             'score': move_a_info['score'],
             'win_probability': float(win_prob),
             'predicted_winner': 'A' if prediction == 1 else 'B',
-            'features': features_final # Store features for drift detection
+            'features': features_final, # Store features for drift detection
+            # Not a model feature: lets continual training label the captured row (attack or sp_attack)
+            'move_categories': {'a_move_category': move_a_info['move_category'],
+                                'b_move_category': move_b_info['move_category']},
         })
 
     if not move_results:
@@ -275,13 +279,14 @@ def predict_best_move(
     # features_final is a DataFrame with 1 row, extract as dict
     import pandas as pd
     if isinstance(best_move_features, pd.DataFrame):
-        features_dict = best_move_features.iloc[0].to_dict()
+        features_dict = {**best_move_features.iloc[0].to_dict(), **best_move['move_categories']}
     else:
         features_dict = {}
 
     # Also remove features from all_moves to keep API response clean
     for move in move_results:
         move.pop('features', None)
+        move.pop('move_categories', None)
 
     return {
         'pokemon_a_id': pokemon_a_id,
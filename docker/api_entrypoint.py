@@ -1,7 +1,10 @@
 # docker/api_entrypoint.py
 """Docker entrypoint for the API container.
 
-Waits for PostgreSQL, then starts the FastAPI server via Uvicorn.
+Waits for PostgreSQL, then starts the FastAPI server:
+- API_SERVER=uvicorn (default): single Uvicorn process
+- API_SERVER=gunicorn: N Uvicorn workers under gunicorn, with the model
+  preloaded in the master before fork (see docker/gunicorn_conf.py)
 """
 
 import subprocess
@@ -13,6 +16,11 @@ import psycopg2
 # Development mode flag
 DEV_MODE = os.getenv("DEV_MODE", "false").lower() == "true"
 
+# Server mode: 'uvicorn' (single process) or 'gunicorn' (multi-worker production)
+API_SERVER = os.getenv("API_SERVER", "uvicorn").lower()
+GUNICORN_CONF = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gunicorn_conf.py")
+DEFAULT_PROMETHEUS_MULTIPROC_DIR = "/tmp/prometheus_multiproc"
+
 # Database connection parameters
 DB_HOST = os.getenv("POSTGRES_HOST", "db")
 DB_PORT = int(os.getenv("POSTGRES_PORT", 5432))
@@ -45,15 +53,34 @@ def wait_for_db(timeout=60):
 
 
 def start_api():
-    """Start the FastAPI application using Uvicorn."""
-    cmd = [
-        "uvicorn",
-        "api_pokemon.main:app",
-        "--host", "0.0.0.0",
-        "--port", "8080",
-    ]
-    if DEV_MODE:
-        cmd.append("--reload")
+    """Start the FastAPI application using Uvicorn or gunicorn."""
+    use_gunicorn = API_SERVER == "gunicorn" and not DEV_MODE
+
+    # Metrics of several workers are aggregated through a shared directory
+    if use_gunicorn:
+        os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", DEFAULT_PROMETHEUS_MULTIPROC_DIR)
+
+    # Shared Prometheus metrics directory must be emptied before workers start
+    from api_pokemon.monitoring.multiprocess import prepare_multiprocess_dir
+    multiproc_dir = prepare_multiprocess_dir()
+    if multiproc_dir:
+        print(f" Prometheus multiprocess mode: {multiproc_dir}")
+
+    if use_gunicorn:
+        cmd = [
+            "gunicorn",
+            "api_pokemon.main:app",
+            "--config", GUNICORN_CONF,
+        ]
+    else:
+        cmd = [
+            "uvicorn",
+            "api_pokemon.main:app",
+            "--host", "0.0.0.0",
+            "--port", "8080",
+        ]
+        if DEV_MODE:
+            cmd.append("--reload")
     subprocess.run(cmd, check=True)
 
 
@@ -0,0 +1,123 @@
+# docker/gunicorn_conf.py
+"""Gunicorn configuration for the multi-worker production API.
+
+Runs N Uvicorn workers behind a gunicorn master. The application, the
+XGBoost model, its scalers and the drift reference data are loaded once in
+the master before forking, so workers share those pages copy-on-write
+instead of each holding its own copy.
+
+Environment:
+    API_WORKERS: Number of workers (default: cgroup CPU quota, else CPU count)
+    API_PORT: Listening port (default: 8080)
+    API_TIMEOUT: Worker timeout in seconds (default: 60)
+"""
+
+import gc
+import math
+import os
+
+# --------------------
+# CPU detection
+# --------------------
+
+
+def get_cgroup_cpu_limit():
+    """
+    Return the container CPU limit from the cgroup quota, or None if unlimited.
+
+    Supports cgroup v2 (cpu.max) and v1 (cpu.cfs_quota_us / cpu.cfs_period_us).
+    """
+    try:
+        with open("/sys/fs/cgroup/cpu.max", "r", encoding="utf-8") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "r", encoding="utf-8") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us", "r", encoding="utf-8") as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+
+    return None
+
+
+def default_worker_count():
+    """Number of workers matching the CPUs actually available to the container."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    limit = get_cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, math.ceil(limit))
+
+    return max(1, cpus)
+
+
+# --------------------
+# Server settings
+# --------------------
+bind = f"0.0.0.0:{os.getenv('API_PORT', '8080')}"
+workers = int(os.getenv("API_WORKERS", "0")) or default_worker_count()
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("API_TIMEOUT", "60"))
+graceful_timeout = 30
+keepalive = 5
+accesslog = "-"
+errorlog = "-"
+
+# Import the application in the master, before fork
+preload_app = True
+
+
+# --------------------
+# Server hooks
+# --------------------
+def when_ready(server):
+    """Load model artifacts and reference data in the master, before forking."""
+    from api_pokemon.services.model_loader import prediction_model
+    from api_pokemon.monitoring.drift_detection import drift_detector
+
+    try:
+        prediction_model.load()
+        server.log.info("ML model preloaded in master (pid %s)", os.getpid())
+    except Exception as e:
+        server.log.warning("Failed to preload ML model: %s (workers will load it)", e)
+
+    if drift_detector.enabled:
+        drift_detector.load_reference_data()
+
+    # Move everything allocated so far out of the GC generations: collections
+    # in workers would otherwise touch these objects and un-share their pages
+    gc.freeze()
+    server.log.info("Starting %d workers", workers)
+
+
+def post_fork(server, worker):
+    """Reset per-process resources inherited from the master."""
+    from core.db.session import engine
+    # Pooled connections must not be shared between processes
+    engine.dispose(close=False)
+
+    # One predictor thread per worker: parallelism comes from the workers
+    from api_pokemon.services.model_loader import prediction_model
+    if workers > 1 and prediction_model.is_loaded and hasattr(prediction_model.model, "set_params"):
+        try:
+            prediction_model.model.set_params(n_jobs=1)
+        except ValueError:
+            pass
+
+
+def child_exit(server, worker):
+    """Drop the live Prometheus gauges of a dead worker."""
+    from api_pokemon.monitoring.multiprocess import mark_worker_dead
+    mark_worker_dead(worker.pid)
@@ -100,6 +100,8 @@ def run_ml_builder():
     grid_type = os.getenv("ML_GRID_TYPE", "fast")
     num_random_samples = int(os.getenv("ML_NUM_RANDOM_SAMPLES", "5"))
     max_combinations = int(os.getenv("ML_MAX_COMBINATIONS", "20"))
+    # A restarted container continues the interrupted run (stages validated by checksum)
+    resume = os.getenv("ML_RESUME", "true").lower() == "true"
 
     cmd = [
         "python", "machine_learning/run_machine_learning.py",
@@ -114,6 +116,8 @@ def run_ml_builder():
 
     if tune_hyperparams:
         cmd.append("--tune-hyperparams")
+    if resume:
+        cmd.append("--resume")
 
     print("[CONFIG] Configuration:", flush=True)
     print(f"   Mode: {mode}", flush=True)
@@ -122,6 +126,7 @@ def run_ml_builder():
     print(f"   Grid type: {grid_type}", flush=True)
     print(f"   Random samples: {num_random_samples}", flush=True)
     print(f"   Max combinations: {max_combinations}", flush=True)
+    print(f"   Resume: {resume}", flush=True)
 
     result = subprocess.run(cmd, check=False)
 
@@ -0,0 +1,848 @@
+"""Vectorised battle simulation engine for dataset generation.
+
+Pokemon and their valid offensive moves are encoded once as NumPy arrays.
+Move scores, damage, turns-to-KO and move order are then computed for many
+battles at once with broadcasting, instead of one dict per battle.
+
+The arithmetic mirrors the scalar reference implementation in
+build_battle_winner_dataset_v2 (get_move_score_and_info, calculate_damage,
+simulate_battle) operation by operation, so both produce identical rows.
+
+Generation is sharded by attacker Pokemon. Random draws are a hash of
+(seed, scenario, attacker ID, defender ID, counter) (MatchupRandom), so
+the rows of a matchup depend only on its two Pokemon: shards can run in
+any process, the output does not depend on the worker count, and a single
+matchup can be regenerated on its own. Shards are produced as Arrow tables
+of bounded size (DATASET_SCHEMA), so memory does not grow with the number
+of samples. Columns use compact types: dictionary-encoded names, int16
+stats, float32 values and uint8 flags; Pokemon names live in a separate
+lookup table (names_table).
+"""
+
+import hashlib
+import json
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Fixed level for all Pokemon
+BATTLE_LEVEL = 50
+
+# Damage types to include (offensive calculable moves only)
+ALLOWED_DAMAGE_TYPES = {
+    "offensif",
+    "multi_coups", # Average x3 hits
+    "double_degats", # x2 power
+    "deux_tours", # /2 power (charge turn)
+    "prioritaire", # +1 priority (but exclude Bluff)
+    "prioritaire_conditionnel", # Coup Bas
+    "prioritaire_critique", # Pika-Sprint
+    "prioritaire_deux", # Ruse (+2 priority)
+    "fixe_niveau", # Damage = level
+    "fixe_degat_20", # Sonicboom = 20
+    "fixe_degat_40", # Draco-Rage = 40
+    "attk_adversaire", # Tricherie (uses opponent's ATK)
+}
+
+# Moves to explicitly exclude
+EXCLUDED_MOVES = {"Bluff"} # Only works on first turn
+
+# Effective power factor per damage_type (others: x1)
+POWER_FACTORS = {
+    "multi_coups": 3.0,
+    "double_degats": 2.0,
+    "deux_tours": 0.5,
+}
+
+STAT_COLUMNS = ['hp', 'attack', 'defense', 'sp_attack', 'sp_defense', 'speed']
+
+# Random stream index per scenario (part of each shard's seed)
+SCENARIO_STREAMS = {
+    "best_move": 0,
+    "random_move": 1,
+    "all_combinations": 2,
+}
+
+# splitmix64 finaliser constants (MatchupRandom)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+# Default number of rows per generated batch
+DEFAULT_BATCH_SIZE = 100_000
+
+
+# Compact column types of the generated dataset
+CATEGORY = pa.dictionary(pa.int32(), pa.string())  # Read by pandas as categorical
+ID_TYPE = pa.int32()
+STAT_TYPE = pa.int16()  # Stats, their sums and differences (< 2^15)
+PRIORITY_TYPE = pa.int8()
+VALUE_TYPE = pa.float32()  # Powers, STAB and type multipliers
+FLAG_TYPE = pa.uint8()
+
+
+def _side_fields(side: str):
+    stats = [pa.field(f'{side}_{col}', STAT_TYPE) for col in STAT_COLUMNS]
+    return stats + [
+        pa.field(f'{side}_type_1', CATEGORY),
+        pa.field(f'{side}_type_2', CATEGORY),
+    ]
+
+
+def _move_fields(side: str):
+    return [
+        pa.field(f'{side}_move_name', CATEGORY),
+        pa.field(f'{side}_move_power', VALUE_TYPE),
+        pa.field(f'{side}_move_type', CATEGORY),
+        pa.field(f'{side}_move_priority', PRIORITY_TYPE),
+        pa.field(f'{side}_move_stab', VALUE_TYPE),
+        pa.field(f'{side}_move_type_mult', VALUE_TYPE),
+    ]
+
+
+# Columns of the generated dataset (same order as build_sample_dict).
+# Pokemon names are not repeated on every row: see POKEMON_NAMES_SCHEMA.
+DATASET_SCHEMA = pa.schema(
+    [
+        pa.field('scenario_type', CATEGORY),
+        pa.field('pokemon_a_id', ID_TYPE),
+        pa.field('pokemon_b_id', ID_TYPE),
+    ]
+    + _side_fields('a') + _side_fields('b')
+    + _move_fields('a') + _move_fields('b')
+    + [
+        pa.field('speed_diff', STAT_TYPE),
+        pa.field('hp_diff', STAT_TYPE),
+        pa.field('a_total_stats', STAT_TYPE),
+        pa.field('b_total_stats', STAT_TYPE),
+        pa.field('a_moves_first', FLAG_TYPE),
+        pa.field('winner', FLAG_TYPE),
+    ]
+)
+
+# Side lookup table of the Pokemon names, keyed by pokemon_id
+POKEMON_NAMES_SCHEMA = pa.schema([
+    pa.field('pokemon_id', ID_TYPE),
+    pa.field('pokemon_name', pa.string()),
+])
+
+
+def _dictionary(*names: np.ndarray) -> Tuple[pa.Array, list]:
+    """
+    Sorted dictionary of string arrays and the dictionary codes of each array.
+
+    Returns:
+        Tuple (dictionary, [int32 codes of each input array])
+    """
+    values, codes = np.unique(np.concatenate(names), return_inverse=True)
+    bounds = np.cumsum([len(array) for array in names])[:-1]
+    return pa.array(values, pa.string()), np.split(codes.astype(np.int32), bounds)
+
+
+class Battles(NamedTuple):
+    """A batch of battles as index arrays (Pokemon rows and move rows)."""
+
+    a: np.ndarray
+    b: np.ndarray
+    move_a: np.ndarray
+    move_b: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.a)
+
+
+class BattleEngine:
+    """
+    Array encoding of Pokemon, moves and type chart.
+
+    Moves are stored in CSR layout: the valid moves of Pokemon p are the
+    rows move_offsets[p]:move_offsets[p + 1], in pokemon_moves_df order.
+    """
+
+    def __init__(
+        self,
+        pokemon_df: pd.DataFrame,
+        pokemon_moves_df: pd.DataFrame,
+        type_eff: Dict,
+        level: int = BATTLE_LEVEL
+    ):
+        """Encode Pokemon, valid moves and type effectiveness as arrays."""
+        self.level = level
+        self.n_pokemon = len(pokemon_df)
+
+        self._encode_pokemon(pokemon_df)
+        self._encode_type_chart(type_eff, pokemon_moves_df)
+        self._encode_moves(pokemon_moves_df)
+
+        # Per (move, defender) scores and best move per (attacker, defender)
+        self.type_mult = self._type_multipliers()
+        self.best_move, self.has_best_move = self._best_moves()
+
+        self._encode_columns()
+
+    # ------------------------------------------------------------------
+    # Encoding
+    # ------------------------------------------------------------------
+
+    def _encode_pokemon(self, pokemon_df: pd.DataFrame):
+        self.pokemon_ids = pokemon_df['pokemon_id'].to_numpy()
+        self.pokemon_names = pokemon_df['pokemon_name'].to_numpy(dtype=object)
+        self.stats = {col: pokemon_df[col].to_numpy() for col in STAT_COLUMNS}
+        self.total_stats = sum(self.stats[col] for col in STAT_COLUMNS)
+
+        self.type_1 = pokemon_df['type_1_id'].to_numpy().astype(np.int64)
+        type_2 = pokemon_df['type_2_id']
+        self.has_type_2 = type_2.notna().to_numpy()
+        # -1 = no second type (mapped to a neutral row/column of the type chart)
+        self.type_2 = type_2.fillna(-1).to_numpy().astype(np.int64)
+
+        self.type_1_names = pokemon_df['type_1_name'].to_numpy(dtype=object)
+        # astype(object): string columns may be categoricals (Arrow extraction)
+        type_2_names = pokemon_df['type_2_name'].astype(object)
+        self.type_2_names = type_2_names.where(type_2_names.notna(), 'none').to_numpy(dtype=object)
+
+    def _encode_type_chart(self, type_eff: Dict, pokemon_moves_df: pd.DataFrame):
+        type_ids = [int(t) for key in type_eff for t in key]
+        type_ids += self.type_1.tolist() + self.type_2.tolist()
+        type_ids += pokemon_moves_df['move_type_id'].astype(int).tolist()
+        size = max(type_ids, default=0) + 2
+
+        # Default multiplier is 1.0; the last column is the "no type" slot
+        # (x * 1.0 == x, same as skipping the second type)
+        self.type_chart = np.ones((size, size), dtype=np.float64)
+        for (attacking, defending), multiplier in type_eff.items():
+            self.type_chart[int(attacking), int(defending)] = float(multiplier)
+        self._no_type = size - 1
+        self.type_2[~self.has_type_2] = self._no_type
+        self.type_chart[:, self._no_type] = 1.0
+
+    def _encode_moves(self, pokemon_moves_df: pd.DataFrame):
+        moves = pokemon_moves_df[
+            (pokemon_moves_df['damage_type'].isin(ALLOWED_DAMAGE_TYPES)) &
+            (~pokemon_moves_df['move_name'].isin(EXCLUDED_MOVES))
+        ]
+
+        # Group by owner (Pokemon row), keeping the original order within a group
+        owner = pd.Index(self.pokemon_ids).get_indexer(moves['pokemon_id'])
+        moves = moves[owner >= 0]
+        owner = owner[owner >= 0]
+        order = np.argsort(owner, kind='stable')
+        moves = moves.iloc[order]
+        self.move_owner = owner[order]
+
+        counts = np.bincount(self.move_owner, minlength=self.n_pokemon)
+        self.move_counts = counts
+        self.move_offsets = np.concatenate([[0], np.cumsum(counts)])
+
+        self.move_names = moves['move_name'].to_numpy(dtype=object)
+        self.move_type_names = moves['move_type_name'].to_numpy(dtype=object)
+        self.move_type = moves['move_type_id'].to_numpy().astype(np.int64)
+        self.move_physical = (moves['move_category'] == 'physique').to_numpy()
+
+        factor = moves['damage_type'].astype(object).map(POWER_FACTORS).fillna(1.0).to_numpy()
+        self.move_power = moves['move_power'].to_numpy().astype(np.float64) * factor
+        self.move_accuracy = moves['move_accuracy'].fillna(100).to_numpy()
+        self.move_priority = moves['priority'].fillna(0).to_numpy().astype(np.int64)
+
+        # STAB only depends on the move owner
+        owner_types = np.stack([self.type_1[self.move_owner], self.type_2[self.move_owner]])
+        self.move_stab = np.where((owner_types == self.move_type).any(axis=0), 1.5, 1.0)
+
+    def _encode_columns(self):
+        """Per-Pokemon and per-move values in their DATASET_SCHEMA types."""
+        self.type_dictionary, (self.type_1_codes, self.type_2_codes, self.move_type_codes) = _dictionary(
+            self.type_1_names, self.type_2_names, self.move_type_names
+        )
+        self.move_dictionary, (self.move_name_codes,) = _dictionary(self.move_names)
+
+        # Simulation keeps the exact values; only the written columns are narrowed
+        self.column_ids = self.pokemon_ids.astype(ID_TYPE.to_pandas_dtype())
+        stat_dtype = STAT_TYPE.to_pandas_dtype()
+        self.column_stats = {col: self.stats[col].astype(stat_dtype) for col in STAT_COLUMNS}
+        self.column_total_stats = self.total_stats.astype(stat_dtype)
+
+        value_dtype = VALUE_TYPE.to_pandas_dtype()
+        self.column_move_power = self.move_power.astype(value_dtype)
+        self.column_move_stab = self.move_stab.astype(value_dtype)
+        self.column_type_mult = self.type_mult.astype(value_dtype)
+        self.column_move_priority = self.move_priority.astype(PRIORITY_TYPE.to_pandas_dtype())
+
+    def _type_multipliers(self) -> np.ndarray:
+        """Type multiplier of every move against every defender (n_moves x n_pokemon)."""
+        return (self.type_chart[self.move_type[:, None], self.type_1[None, :]] *
+                self.type_chart[self.move_type[:, None], self.type_2[None, :]])
+
+    def _best_moves(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Best move row of each attacker against each defender.
+
+        Score = effective power * STAB * type multiplier * accuracy
+        + priority bonus; ties keep the first move, and a move must score
+        above -1 to be selected (as in get_best_move).
+        """
+        scores = ((self.move_power * self.move_stab)[:, None] * self.type_mult
+                  * (self.move_accuracy / 100)[:, None]
+                  + (self.move_priority * 50)[:, None])
+
+        best = np.zeros((self.n_pokemon, self.n_pokemon), dtype=np.int64)
+        has_best = np.zeros((self.n_pokemon, self.n_pokemon), dtype=bool)
+        for p in np.flatnonzero(self.move_counts):
+            start, end = self.move_offsets[p], self.move_offsets[p + 1]
+            segment = scores[start:end]
+            best[p] = start + segment.argmax(axis=0)
+            has_best[p] = segment.max(axis=0) > -1
+        return best, has_best
+
+    def content_hashes(self) -> Dict[int, str]:
+        """
+        Content hash of each Pokemon, keyed by Pokemon ID.
+
+        Covers everything the rows of its matchups depend on besides the
+        type chart: name, stats, types and valid moves. Moves are hashed in
+        encoded order (move ID order from the query), which also decides
+        ties between best moves.
+        """
+        hashes = {}
+        for p in range(self.n_pokemon):
+            moves = slice(self.move_offsets[p], self.move_offsets[p + 1])
+            content = {
+                'name': str(self.pokemon_names[p]),
+                'stats': [int(self.stats[col][p]) for col in STAT_COLUMNS],
+                'types': [
+                    int(self.type_1[p]), str(self.type_1_names[p]),
+                    int(self.type_2[p]) if self.has_type_2[p] else None, str(self.type_2_names[p]),
+                ],
+                'moves': list(zip(
+                    self.move_names[moves].tolist(),
+                    self.move_type[moves].tolist(),
+                    self.move_type_names[moves].tolist(),
+                    self.move_physical[moves].tolist(),
+                    self.move_power[moves].tolist(),
+                    self.move_accuracy[moves].tolist(),
+                    self.move_priority[moves].tolist(),
+                )),
+            }
+            digest = hashlib.sha256(json.dumps(content).encode("utf-8")).hexdigest()
+            hashes[int(self.pokemon_ids[p])] = digest
+        return hashes
+
+    def names_table(self) -> pa.Table:
+        """Pokemon names keyed by ID (POKEMON_NAMES_SCHEMA), kept out of the dataset rows."""
+        return pa.Table.from_pydict(
+            {'pokemon_id': self.column_ids, 'pokemon_name': self.pokemon_names},
+            schema=POKEMON_NAMES_SCHEMA,
+        )
+
+    def type_chart_hash(self) -> str:
+        """Content hash of the encoded type chart."""
+        digest = hashlib.sha256(str(self.type_chart.shape).encode("utf-8"))
+        digest.update(self.type_chart.tobytes())
+        return digest.hexdigest()
+
+    # ------------------------------------------------------------------
+    # Simulation
+    # ------------------------------------------------------------------
+
+    def _damage(self, attacker, defender, move) -> np.ndarray:
+        """Damage of `move` used by `attacker` on `defender` (calculate_damage)."""
+        physical = self.move_physical[move]
+        atk = np.where(physical, self.stats['attack'][attacker], self.stats['sp_attack'][attacker])
+        dfn = np.where(physical, self.stats['defense'][defender], self.stats['sp_defense'][defender])
+        power = self.move_power[move]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            base = ((2 * self.level / 5 + 2) * power * (atk / dfn)) / 50 + 2
+            damage = base * self.move_stab[move] * self.type_mult[move, defender]
+        return np.where((power == 0) | (dfn == 0), 0.0, damage)
+
+    def a_moves_first(self, battles: Battles) -> np.ndarray:
+        """1 if A moves first (priority, then speed, ties to A), else 0."""
+        a_priority = self.move_priority[battles.move_a]
+        b_priority = self.move_priority[battles.move_b]
+        a_speed = self.stats['speed'][battles.a]
+        b_speed = self.stats['speed'][battles.b]
+        return np.where(
+            a_priority != b_priority,
+            a_priority > b_priority,
+            a_speed >= b_speed
+        ).astype(np.int64)
+
+    def simulate(self, battles: Battles) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Simulate a batch of battles.
+
+        Returns:
+            Tuple (winner, a_moves_first): 1 if A wins / moves first, else 0
+        """
+        damage_a = self._damage(battles.a, battles.b, battles.move_a)
+        damage_b = self._damage(battles.b, battles.a, battles.move_b)
+
+        turns_to_ko_b = self.stats['hp'][battles.b] / np.maximum(damage_a, 0.1)
+        turns_to_ko_a = self.stats['hp'][battles.a] / np.maximum(damage_b, 0.1)
+
+        a_first = self.a_moves_first(battles)
+        winner = np.where(
+            a_first == 1,
+            turns_to_ko_b <= turns_to_ko_a,
+            ~(turns_to_ko_a <= turns_to_ko_b)
+        ).astype(np.int64)
+        return winner, a_first
+
+    def _columns(self, battles: Battles, scenario_type: str) -> Dict[str, object]:
+        """Simulate battles and return the dataset columns (DATASET_SCHEMA order and types)."""
+        winner, a_first = self.simulate(battles)
+        a, b, move_a, move_b = battles
+        flag_dtype = FLAG_TYPE.to_pandas_dtype()
+
+        columns = {
+            'scenario_type': pa.DictionaryArray.from_arrays(
+                np.zeros(len(battles), dtype=np.int32), pa.array([scenario_type])
+            ),
+            'pokemon_a_id': self.column_ids[a],
+            'pokemon_b_id': self.column_ids[b],
+        }
+        for side, idx in (('a', a), ('b', b)):
+            for col in STAT_COLUMNS:
+                columns[f'{side}_{col}'] = self.column_stats[col][idx]
+            columns[f'{side}_type_1'] = pa.DictionaryArray.from_arrays(self.type_1_codes[idx], self.type_dictionary)
+            columns[f'{side}_type_2'] = pa.DictionaryArray.from_arrays(self.type_2_codes[idx], self.type_dictionary)
+
+        for side, move, defender in (('a', move_a, b), ('b', move_b, a)):
+            columns[f'{side}_move_name'] = pa.DictionaryArray.from_arrays(
+                self.move_name_codes[move], self.move_dictionary
+            )
+            columns[f'{side}_move_power'] = self.column_move_power[move]
+            columns[f'{side}_move_type'] = pa.DictionaryArray.from_arrays(
+                self.move_type_codes[move], self.type_dictionary
+            )
+            columns[f'{side}_move_priority'] = self.column_move_priority[move]
+            columns[f'{side}_move_stab'] = self.column_move_stab[move]
+            columns[f'{side}_move_type_mult'] = self.column_type_mult[move, defender]
+
+        columns['speed_diff'] = self.column_stats['speed'][a] - self.column_stats['speed'][b]
+        columns['hp_diff'] = self.column_stats['hp'][a] - self.column_stats['hp'][b]
+        columns['a_total_stats'] = self.column_total_stats[a]
+        columns['b_total_stats'] = self.column_total_stats[b]
+        columns['a_moves_first'] = a_first.astype(flag_dtype)
+        columns['winner'] = winner.astype(flag_dtype)
+        return columns
+
+    def build_frame(self, battles: Battles, scenario_type: str) -> pd.DataFrame:
+        """Simulate battles and build dataset rows (categorical string columns)."""
+        return self.build_table(battles, scenario_type).to_pandas()
+
+    def build_table(self, battles: Battles, scenario_type: str) -> pa.Table:
+        """Simulate battles and build dataset rows as an Arrow table (DATASET_SCHEMA)."""
+        return pa.Table.from_pydict(self._columns(battles, scenario_type), schema=DATASET_SCHEMA)
+
+    # ------------------------------------------------------------------
+    # Scenarios
+    # ------------------------------------------------------------------
+
+    def _matchups(
+        self,
+        attackers: Optional[np.ndarray] = None,
+        defenders: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (A, B) Pokemon pairs with different IDs, A-major order.
+
+        Args:
+            attackers: Pokemon rows used as A (default: all)
+            defenders: Pokemon rows used as B (default: all)
+        """
+        if attackers is None:
+            attackers = np.arange(self.n_pokemon)
+        if defenders is None:
+            defenders = np.arange(self.n_pokemon)
+        a = np.repeat(np.asarray(attackers, dtype=np.int64), len(defenders))
+        b = np.tile(np.asarray(defenders, dtype=np.int64), len(attackers))
+        keep = self.pokemon_ids[a] != self.pokemon_ids[b]
+        return a[keep], b[keep]
+
+    def _n_matchups(self, attackers: Optional[np.ndarray], defenders: Optional[np.ndarray]) -> int:
+        n_attackers = self.n_pokemon if attackers is None else len(attackers)
+        n_defenders = self.n_pokemon if defenders is None else len(defenders)
+        return n_attackers * n_defenders
+
+    def best_move_battles(
+        self,
+        attackers: Optional[np.ndarray] = None,
+        defenders: Optional[np.ndarray] = None
+    ) -> Tuple[Battles, int]:
+        """
+        Both Pokemon use their best move against each other.
+
+        Args:
+            attackers: Pokemon rows used as A (default: all)
+            defenders: Pokemon rows used as B (default: all)
+
+        Returns:
+            Tuple (battles, skipped matchups)
+        """
+        a, b = self._matchups(attackers, defenders)
+        keep = self.has_best_move[a, b] & self.has_best_move[b, a]
+        a, b = a[keep], b[keep]
+        skipped = self._n_matchups(attackers, defenders) - len(a)
+        return Battles(a, b, self.best_move[a, b], self.best_move[b, a]), skipped
+
+    def random_move_battles(
+        self,
+        num_samples: int,
+        rng=None,
+        attackers: Optional[np.ndarray] = None,
+        defenders: Optional[np.ndarray] = None
+    ) -> Tuple[Battles, int]:
+        """
+        A uses its best move, B a random valid move (num_samples per matchup).
+
+        One uniform draw per sample in matchup order. With a RandomState
+        (or the global np.random) this is the same stream as calling
+        np.random.choice(valid_moves_b) in a loop.
+
+        Args:
+            num_samples: Random samples per matchup
+            rng: MatchupRandom, numpy Generator or RandomState
+                (default: global np.random)
+            attackers: Pokemon rows used as A (default: all)
+            defenders: Pokemon rows used as B (default: all)
+
+        Returns:
+            Tuple (battles, skipped samples)
+        """
+        rng = np.random if rng is None else rng
+        a, b = self._matchups(attackers, defenders)
+        keep = self.has_best_move[a, b] & (self.move_counts[b] > 0)
+        a, b = a[keep], b[keep]
+        skipped = (self._n_matchups(attackers, defenders) - len(a)) * num_samples
+
+        a = np.repeat(a, num_samples)
+        b = np.repeat(b, num_samples)
+        if isinstance(rng, MatchupRandom):
+            sample = np.tile(np.arange(num_samples), len(b) // max(1, num_samples))
+            draws = rng.integers(self.pokemon_ids[a], self.pokemon_ids[b], sample, self.move_counts[b])
+        elif len(b):
+            draws = _uniform_ints(rng, self.move_counts[b])
+        else:
+            draws = np.zeros(0, dtype=np.int64)
+        move_b = self.move_offsets[b] + draws
+        return Battles(a, b, self.best_move[a, b], move_b), skipped
+
+    def all_combination_battles(
+        self,
+        max_per_matchup: Optional[int],
+        rng=None,
+        attackers: Optional[np.ndarray] = None,
+        defenders: Optional[np.ndarray] = None
+    ) -> Tuple[Battles, int]:
+        """
+        Every move A x move B pair per matchup, subsampled to max_per_matchup.
+
+        Combinations are indexed i -> (i // n_moves_b, i % n_moves_b).
+        Matchups above the limit keep rng.choice(n, max, replace=False),
+        drawn in matchup order.
+
+        Args:
+            max_per_matchup: Combinations kept per matchup
+                (None = every combination, the generator is not used)
+            rng: MatchupRandom, numpy Generator or RandomState
+                (default: global np.random)
+            attackers: Pokemon rows used as A (default: all)
+            defenders: Pokemon rows used as B (default: all)
+
+        Returns:
+            Tuple (battles, skipped matchups)
+        """
+        rng = np.random if rng is None else rng
+        a, b = self._matchups(attackers, defenders)
+        keep = (self.move_counts[a] > 0) & (self.move_counts[b] > 0)
+        a, b = a[keep], b[keep]
+        skipped = self._n_matchups(attackers, defenders) - len(a)
+
+        n_b = self.move_counts[b]
+        n_combinations = self.move_counts[a] * n_b
+        if max_per_matchup is None:
+            per_matchup = n_combinations
+        else:
+            per_matchup = np.minimum(n_combinations, max_per_matchup)
+        starts = np.concatenate([[0], np.cumsum(per_matchup)])
+
+        # Combination index within its matchup (0..n-1 when not subsampled)
+        combination = np.arange(starts[-1]) - np.repeat(starts[:-1], per_matchup)
+        subsampled = [] if max_per_matchup is None else np.flatnonzero(n_combinations > max_per_matchup)
+        for i in subsampled:
+            if isinstance(rng, MatchupRandom):
+                chosen = rng.choice(
+                    self.pokemon_ids[a[i]], self.pokemon_ids[b[i]], n_combinations[i], max_per_matchup
+                )
+            else:
+                chosen = rng.choice(n_combinations[i], size=max_per_matchup, replace=False)
+            combination[starts[i]:starts[i + 1]] = chosen
+
+        a = np.repeat(a, per_matchup)
+        b = np.repeat(b, per_matchup)
+        move_a_local, move_b_local = np.divmod(combination, self.move_counts[b])
+        move_a = self.move_offsets[a] + move_a_local
+        move_b = self.move_offsets[b] + move_b_local
+        return Battles(a, b, move_a, move_b), skipped
+
+
+def _uniform_ints(rng, highs: np.ndarray) -> np.ndarray:
+    """Draw one integer in [0, high) per element, for Generator or RandomState."""
+    if isinstance(rng, np.random.Generator):
+        return rng.integers(0, highs)
+    return rng.randint(0, highs)
+
+
+# ----------------------------------------------------------------------
+# Sharded generation
+# ----------------------------------------------------------------------
+
+def _mix64(x: np.ndarray) -> np.ndarray:
+    """splitmix64 finaliser: bijective mixing of uint64 values."""
+    x = (x ^ (x >> np.uint64(30))) * _MIX_1
+    x = (x ^ (x >> np.uint64(27))) * _MIX_2
+    return x ^ (x >> np.uint64(31))
+
+
+class MatchupRandom:
+    """
+    Counter-based random numbers keyed by matchup.
+
+    Each draw is a hash of (seed, stream, Pokemon A ID, Pokemon B ID,
+    counter) instead of the next value of a sequential generator, so the
+    draws of a matchup do not depend on which other matchups were generated
+    before it, in which process, or in how many batches.
+
+    Args:
+        seed: Global random seed
+        *stream: Stream indices (e.g. the scenario), mixed into the key
+    """
+
+    def __init__(self, seed: int, *stream: int):
+        sequence = np.random.SeedSequence(seed, spawn_key=stream)
+        self.key = sequence.generate_state(1, dtype=np.uint64)[0]
+
+    def _hash(self, a_ids, b_ids, counters) -> np.ndarray:
+        h = _mix64(np.asarray(a_ids).astype(np.uint64) ^ self.key)
+        h = _mix64(h ^ np.asarray(b_ids).astype(np.uint64))
+        return _mix64(h ^ np.asarray(counters).astype(np.uint64))
+
+    def uniform(self, a_ids, b_ids, counters) -> np.ndarray:
+        """One float in [0, 1) per (A ID, B ID, counter)."""
+        return (self._hash(a_ids, b_ids, counters) >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+    def integers(self, a_ids, b_ids, counters, highs) -> np.ndarray:
+        """One integer in [0, high) per (A ID, B ID, counter)."""
+        # 32-bit multiply-shift: highs must stay below 2**32
+        high_bits = self._hash(a_ids, b_ids, counters) >> np.uint64(32)
+        return ((high_bits * np.asarray(highs).astype(np.uint64)) >> np.uint64(32)).astype(np.int64)
+
+    def choice(self, a_id: int, b_id: int, n: int, size: int) -> np.ndarray:
+        """size distinct integers in [0, n) for one matchup (lowest hash keys)."""
+        counters = np.arange(n)
+        keys = self.uniform(np.full(n, a_id), np.full(n, b_id), counters)
+        return np.argsort(keys, kind='stable')[:size]
+
+
+def _defender_groups(rows_per_defender: np.ndarray, batch_size: int) -> Iterator[np.ndarray]:
+    """Split defenders into consecutive groups of at most batch_size rows."""
+    start, rows = 0, 0
+    for defender, n in enumerate(rows_per_defender):
+        if defender > start and rows + n > batch_size:
+            yield np.arange(start, defender)
+            start, rows = defender, 0
+        rows += n
+    if start < len(rows_per_defender):
+        yield np.arange(start, len(rows_per_defender))
+
+
+def iter_shard_batches(
+    engine: BattleEngine,
+    scenario_type: str,
+    attacker: int,
+    seed: int,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    num_samples: int = 5,
+    max_per_matchup: Optional[int] = 20,
+    defenders: Optional[np.ndarray] = None
+) -> Iterator[Tuple[pa.Table, int]]:
+    """
+    Generate the rows of one scenario for one attacker Pokemon, in batches.
+
+    Defenders are processed in groups of at most batch_size rows (a single
+    matchup larger than batch_size gets a batch of its own). A matchup
+    never spans two batches, and its rows do not depend on the grouping.
+
+    Args:
+        engine: Encoded battle data
+        scenario_type: 'best_move', 'random_move' or 'all_combinations'
+        attacker: Pokemon row used as A (the shard)
+        seed: Global random seed
+        batch_size: Approximate maximum rows per batch
+        num_samples: Samples per matchup (random_move)
+        max_per_matchup: Combinations per matchup (all_combinations),
+            None for every combination (exhaustive)
+        defenders: Pokemon rows used as B (default: all)
+
+    Yields:
+        Tuple (rows, skipped count) per batch
+    """
+    if scenario_type not in SCENARIO_STREAMS:
+        raise ValueError(f"Unknown scenario type: {scenario_type}")
+
+    attackers = np.array([attacker])
+    rng = MatchupRandom(seed, SCENARIO_STREAMS[scenario_type])
+    if defenders is None:
+        defenders = np.arange(engine.n_pokemon)
+    defenders = np.asarray(defenders, dtype=np.int64)
+
+    # Rows generated by each matchup of this attacker
+    if scenario_type == "best_move":
+        rows_per_defender = np.ones(len(defenders), dtype=np.int64)
+    elif scenario_type == "random_move":
+        rows_per_defender = np.full(len(defenders), num_samples, dtype=np.int64)
+    else:
+        rows_per_defender = engine.move_counts[attacker] * engine.move_counts[defenders]
+        if max_per_matchup is not None:
+            rows_per_defender = np.minimum(rows_per_defender, max_per_matchup)
+
+    for group in _defender_groups(rows_per_defender, batch_size):
+        group_defenders = defenders[group]
+        if scenario_type == "best_move":
+            battles, skipped = engine.best_move_battles(attackers, group_defenders)
+        elif scenario_type == "random_move":
+            battles, skipped = engine.random_move_battles(
+                num_samples, rng=rng, attackers=attackers, defenders=group_defenders
+            )
+        else:
+            battles, skipped = engine.all_combination_battles(
+                max_per_matchup, rng=rng, attackers=attackers, defenders=group_defenders
+            )
+        yield engine.build_table(battles, scenario_type), skipped
+
+
+# Engine of the current worker process (set once by the pool initializer)
+_worker_engine: Optional[BattleEngine] = None
+
+
+def _init_worker(engine: BattleEngine):
+    global _worker_engine
+    _worker_engine = engine
+
+
+def _write_shard_in_worker(
+    scenario_type: str,
+    attacker: int,
+    seed: int,
+    part_path: str,
+    options: Dict
+) -> Tuple[str, int]:
+    """Write one shard to a Parquet part file (one row group per batch)."""
+    skipped = 0
+    with pq.ParquetWriter(part_path, DATASET_SCHEMA) as writer:
+        for table, batch_skipped in iter_shard_batches(
+            _worker_engine, scenario_type, attacker, seed, **options
+        ):
+            writer.write_table(table)
+            skipped += batch_skipped
+    return part_path, skipped
+
+
+def _read_part(part_path: str, skipped: int) -> Iterator[Tuple[pa.Table, int]]:
+    """Yield the row groups of a part file, then delete it."""
+    part = pq.ParquetFile(part_path)
+    for i in range(part.num_row_groups):
+        yield part.read_row_group(i), 0
+    yield DATASET_SCHEMA.empty_table(), skipped
+    Path(part_path).unlink()
+
+
+def iter_shards(
+    engine: BattleEngine,
+    scenario_type: str,
+    seed: int,
+    workers: int = 1,
+    attackers: Optional[np.ndarray] = None,
+    **options
+) -> Iterator[Tuple[int, Iterator[Tuple[pa.Table, int]]]]:
+    """
+    Generate a scenario shard by shard, in attacker order.
+
+    With workers > 1 the shards run in a process pool (the engine is sent
+    once per worker). Each worker writes its shard to a temporary Parquet
+    part file that is streamed back and deleted, so neither the workers
+    nor this process hold more than a batch. At most 2 x workers shards
+    are in flight, and shards are yielded in attacker order, so the output
+    is identical for any number of workers.
+
+    Each shard's batches must be consumed before the next shard.
+
+    Args:
+        engine: Encoded battle data
+        scenario_type: 'best_move', 'random_move' or 'all_combinations'
+        seed: Global random seed
+        workers: Number of processes (1 = run in this process)
+        attackers: Pokemon rows to generate shards for (default: all)
+        **options: batch_size / num_samples / max_per_matchup / defenders
+            (see iter_shard_batches)
+
+    Yields:
+        Tuple (attacker Pokemon ID, iterator of (rows, skipped count))
+    """
+    shards = range(engine.n_pokemon) if attackers is None else [int(a) for a in attackers]
+
+    if workers <= 1:
+        for attacker in shards:
+            pokemon_id = int(engine.pokemon_ids[attacker])
+            yield pokemon_id, iter_shard_batches(engine, scenario_type, attacker, seed, **options)
+        return
+
+    with tempfile.TemporaryDirectory(prefix="battle_shards_") as tmp_dir, \
+            ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker, initargs=(engine,)
+            ) as executor:
+        pending = deque()
+        for attacker in shards:
+            part_path = str(Path(tmp_dir) / f"{scenario_type}-{attacker:05d}.parquet")
+            future = executor.submit(
+                _write_shard_in_worker, scenario_type, attacker, seed, part_path, options
+            )
+            pending.append((int(engine.pokemon_ids[attacker]), future))
+            if len(pending) >= 2 * workers:
+                pokemon_id, future = pending.popleft()
+                yield pokemon_id, _read_part(*future.result())
+        while pending:
+            pokemon_id, future = pending.popleft()
+            yield pokemon_id, _read_part(*future.result())
+
+
+def iter_batches(
+    engine: BattleEngine,
+    scenario_type: str,
+    seed: int,
+    workers: int = 1,
+    **options
+) -> Iterator[Tuple[pa.Table, int]]:
+    """
+    Generate a scenario as a stream of Arrow batches, in attacker order.
+
+    Args:
+        engine: Encoded battle data
+        scenario_type: 'best_move', 'random_move' or 'all_combinations'
+        seed: Global random seed
+        workers: Number of processes (1 = run in this process)
+        **options: attackers / batch_size / num_samples / max_per_matchup
+            / defenders (see iter_shards)
+
+    Yields:
+        Tuple (rows, skipped count)
+    """
+    for _, batches in iter_shards(engine, scenario_type, seed, workers=workers, **options):
+        yield from batches
@@ -2,21 +2,49 @@
 """Generate ML dataset for Pokemon battle winner prediction with multi-scenario support."""
 
 import argparse
+import contextlib
+import io
 import os
+import shutil
 import sys
 from collections import defaultdict
 from datetime import datetime
 from pathlib import Path
 
-import numpy as np
 import pandas as pd
 import psycopg2
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 from dotenv import load_dotenv
-from sklearn.model_selection import train_test_split
 
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
+from machine_learning.battle_engine import (
+    ALLOWED_DAMAGE_TYPES,
+    BATTLE_LEVEL,
+    CATEGORY,
+    DATASET_SCHEMA,
+    DEFAULT_BATCH_SIZE,
+    EXCLUDED_MOVES,
+    SCENARIO_STREAMS,
+    BattleEngine,
+    iter_batches,
+    iter_shards,
+)
+from machine_learning.config import RANDOM_SEED, FeatureEngineeringConfig
+from machine_learning.dataset_manifest import (
+    build_manifest,
+    iter_rebuild_shards,
+    load_manifest,
+    plan_rebuild,
+    save_manifest,
+    scenario_options,
+)
+from machine_learning.dataset_writer import PARTITION_BLOCK, DatasetWriter
+from machine_learning.features.matrix import FeatureMatrixWriter
+
 # Load environment
 load_dotenv()
 
@@ -31,10 +59,10 @@ DB_NAME = os.getenv("POSTGRES_DB", "letsgo_db")
 OUTPUT_DIR = Path(__file__).resolve().parent.parent / "data" / "ml" / "battle_winner_v2"
 RAW_DIR = OUTPUT_DIR / "raw"
 PROCESSED_DIR = OUTPUT_DIR / "processed"
-
-# Battle parameters
-BATTLE_LEVEL = 50 # Fixed level for all Pokemon
-RANDOM_SEED = 42
+MANIFEST_PATH = OUTPUT_DIR / "manifest.json"
+POKEMON_NAMES_PATH = OUTPUT_DIR / "pokemon_names.parquet"
+MATRIX_DIR = OUTPUT_DIR / "matrix"
+SNAPSHOT_DIR = OUTPUT_DIR / "snapshot"
 
 # Scenario types
 SCENARIO_TYPES = {
@@ -44,25 +72,6 @@ SCENARIO_TYPES = {
     "all": "Generate all scenarios and combine them"
 }
 
-# Damage types to include (offensive calculable moves only)
-ALLOWED_DAMAGE_TYPES = {
-    "offensif",
-    "multi_coups", # Average x3 hits
-    "double_degats", # x2 power
-    "deux_tours", # /2 power (charge turn)
-    "prioritaire", # +1 priority (but exclude Bluff)
-    "prioritaire_conditionnel", # Coup Bas
-    "prioritaire_critique", # Pika-Sprint
-    "prioritaire_deux", # Ruse (+2 priority)
-    "fixe_niveau", # Damage = level
-    "fixe_degat_20", # Sonicboom = 20
-    "fixe_degat_40", # Draco-Rage = 40
-    "attk_adversaire", # Tricherie (uses opponent's ATK)
-}
-
-# Moves to explicitly exclude
-EXCLUDED_MOVES = {"Bluff"} # Only works on first turn
-
 
 def get_db_connection():
     """Create database connection."""
@@ -75,111 +84,216 @@ def get_db_connection():
     )
 
 
-def fetch_pokemon_data():
-    """Fetch all Pokemon with their stats and types."""
-    print("Fetching Pokemon data...")
-
-    conn = get_db_connection()
-
-    query = """
-        SELECT
-            p.id as pokemon_id,
-            COALESCE(ps.name_en, ps.name_fr) as pokemon_name,
-            pstat.hp,
-            pstat.attack,
-            pstat.defense,
-            pstat.sp_attack,
-            pstat.sp_defense,
-            pstat.speed,
-            pt1.type_id as type_1_id,
-            t1.name as type_1_name,
-            pt2.type_id as type_2_id,
-            t2.name as type_2_name
-        FROM pokemon p
-        JOIN pokemon_species ps ON p.species_id = ps.id
-        JOIN pokemon_stat pstat ON p.id = pstat.pokemon_id
-        LEFT JOIN LATERAL (
-            SELECT type_id
-            FROM pokemon_type
-            WHERE pokemon_id = p.id
-            ORDER BY slot
-            LIMIT 1
-        ) pt1 ON true
-        LEFT JOIN LATERAL (
-            SELECT type_id
-            FROM pokemon_type
-            WHERE pokemon_id = p.id
-            ORDER BY slot
-            LIMIT 1 OFFSET 1
-        ) pt2 ON true
-        JOIN type t1 ON pt1.type_id = t1.id
-        LEFT JOIN type t2 ON pt2.type_id = t2.id
-        ORDER BY p.id;
-    """
-
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-
-    print(f" Loaded {len(df)} Pokemon")
-    return df
-
+# ============================================================
+# Extraction (one connection, COPY ... TO STDOUT into Arrow)
+# ============================================================
+
+POKEMON_QUERY = """
+    SELECT
+        p.id as pokemon_id,
+        COALESCE(ps.name_en, ps.name_fr) as pokemon_name,
+        pstat.hp,
+        pstat.attack,
+        pstat.defense,
+        pstat.sp_attack,
+        pstat.sp_defense,
+        pstat.speed,
+        pt1.type_id as type_1_id,
+        t1.name as type_1_name,
+        pt2.type_id as type_2_id,
+        t2.name as type_2_name
+    FROM pokemon p
+    JOIN pokemon_species ps ON p.species_id = ps.id
+    JOIN pokemon_stat pstat ON p.id = pstat.pokemon_id
+    LEFT JOIN LATERAL (
+        SELECT type_id
+        FROM pokemon_type
+        WHERE pokemon_id = p.id
+        ORDER BY slot
+        LIMIT 1
+    ) pt1 ON true
+    LEFT JOIN LATERAL (
+        SELECT type_id
+        FROM pokemon_type
+        WHERE pokemon_id = p.id
+        ORDER BY slot
+        LIMIT 1 OFFSET 1
+    ) pt2 ON true
+    JOIN type t1 ON pt1.type_id = t1.id
+    LEFT JOIN type t2 ON pt2.type_id = t2.id
+    ORDER BY p.id
+"""
+
+POKEMON_MOVES_QUERY = """
+    SELECT
+        pm.pokemon_id,
+        m.id as move_id,
+        m.name as move_name,
+        m.type_id as move_type_id,
+        t.name as move_type_name,
+        mc.name as move_category,
+        m.power as move_power,
+        m.accuracy as move_accuracy,
+        m.damage_type,
+        m.priority
+    FROM pokemon_move pm
+    JOIN move m ON pm.move_id = m.id
+    JOIN type t ON m.type_id = t.id
+    JOIN move_category mc ON m.category_id = mc.id
+    WHERE m.power IS NOT NULL
+    AND mc.name IN ('physique', 'spécial')
+    ORDER BY pm.pokemon_id, m.id
+"""
+
+TYPE_EFFECTIVENESS_QUERY = """
+    SELECT attacking_type_id, defending_type_id, multiplier
+    FROM type_effectiveness
+"""
+
+# Repeated strings are dictionary-encoded (CATEGORY: pandas categoricals once converted)
+EXTRACT_SCHEMAS = {
+    "pokemon": pa.schema([
+        pa.field('pokemon_id', pa.int32(), nullable=False),
+        pa.field('pokemon_name', pa.string()),
+        pa.field('hp', pa.int32()),
+        pa.field('attack', pa.int32()),
+        pa.field('defense', pa.int32()),
+        pa.field('sp_attack', pa.int32()),
+        pa.field('sp_defense', pa.int32()),
+        pa.field('speed', pa.int32()),
+        pa.field('type_1_id', pa.int32()),
+        pa.field('type_1_name', CATEGORY),
+        pa.field('type_2_id', pa.int32()),
+        pa.field('type_2_name', CATEGORY),
+    ]),
+    "pokemon_moves": pa.schema([
+        pa.field('pokemon_id', pa.int32(), nullable=False),
+        pa.field('move_id', pa.int32()),
+        pa.field('move_name', CATEGORY),
+        pa.field('move_type_id', pa.int32()),
+        pa.field('move_type_name', CATEGORY),
+        pa.field('move_category', CATEGORY),
+        pa.field('move_power', pa.int32()),
+        pa.field('move_accuracy', pa.int32()),
+        pa.field('damage_type', CATEGORY),
+        pa.field('priority', pa.int32()),
+    ]),
+    "type_effectiveness": pa.schema([
+        pa.field('attacking_type_id', pa.int32(), nullable=False),
+        pa.field('defending_type_id', pa.int32(), nullable=False),
+        pa.field('multiplier', pa.float64()),
+    ]),
+}
 
-def fetch_pokemon_moves():
-    """Fetch Pokemon -> Move associations with move details."""
-    print("Fetching Pokemon moves...")
+EXTRACT_QUERIES = {
+    "pokemon": POKEMON_QUERY,
+    "pokemon_moves": POKEMON_MOVES_QUERY,
+    "type_effectiveness": TYPE_EFFECTIVENESS_QUERY,
+}
 
-    conn = get_db_connection()
 
-    query = """
-        SELECT
-            pm.pokemon_id,
-            m.id as move_id,
-            m.name as move_name,
-            m.type_id as move_type_id,
-            t.name as move_type_name,
-            mc.name as move_category,
-            m.power as move_power,
-            m.accuracy as move_accuracy,
-            m.damage_type,
-            m.priority
-        FROM pokemon_move pm
-        JOIN move m ON pm.move_id = m.id
-        JOIN type t ON m.type_id = t.id
-        JOIN move_category mc ON m.category_id = mc.id
-        WHERE m.power IS NOT NULL
-        AND mc.name IN ('physique', 'spécial')
-        ORDER BY pm.pokemon_id, m.id;
+def copy_to_arrow(cursor, query, schema):
     """
+    Run a query with COPY ... TO STDOUT (CSV) and parse it into an Arrow table.
 
-    df = pd.read_sql_query(query, conn)
-    conn.close()
+    Args:
+        cursor: psycopg2 cursor
+        query: SELECT statement (without trailing semicolon)
+        schema: Arrow schema of the result columns
 
-    print(f" Loaded {len(df)} Pokemon-Move associations")
-    return df
+    Returns:
+        pa.Table: Typed table following schema
+    """
+    buffer = io.BytesIO()
+    cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)", buffer)
+    buffer.seek(0)
+
+    # PostgreSQL CSV: NULL is an unquoted empty field, '' a quoted one
+    convert_options = pacsv.ConvertOptions(
+        column_types={field.name: field.type for field in schema},
+        null_values=[""],
+        strings_can_be_null=True,
+        quoted_strings_can_be_null=False,
+    )
+    table = pacsv.read_csv(buffer, convert_options=convert_options)
+    return table.select(schema.names).cast(schema)
 
 
-def fetch_type_effectiveness():
-    """Fetch type effectiveness multipliers as a lookup dict."""
-    print("Fetching Type Effectiveness...")
+def extract_battle_data():
+    """
+    Extract Pokemon, their moves and the type chart over a single connection.
 
+    Returns:
+        dict: Arrow tables 'pokemon', 'pokemon_moves' and 'type_effectiveness'
+    """
+    print("Extracting battle data...")
     conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            tables = {
+                name: copy_to_arrow(cursor, query, EXTRACT_SCHEMAS[name])
+                for name, query in EXTRACT_QUERIES.items()
+            }
+    finally:
+        conn.close()
+
+    print(f" Loaded {tables['pokemon'].num_rows} Pokemon, "
+          f"{tables['pokemon_moves'].num_rows} Pokemon-Move associations, "
+          f"{tables['type_effectiveness'].num_rows} type effectiveness rules")
+    return tables
+
+
+def save_snapshot(tables, directory=SNAPSHOT_DIR):
+    """Write extracted tables to <directory>/<name>.parquet."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, table in tables.items():
+        pq.write_table(table, directory / f"{name}.parquet")
+    print(f" Snapshot saved: {directory}")
+
+
+def load_snapshot(directory=SNAPSHOT_DIR):
+    """
+    Read tables saved by save_snapshot (no database needed).
 
-    query = """
-        SELECT attacking_type_id, defending_type_id, multiplier
-        FROM type_effectiveness;
+    Raises:
+        FileNotFoundError: If a table of the snapshot is missing
+    """
+    directory = Path(directory)
+    tables = {}
+    for name, schema in EXTRACT_SCHEMAS.items():
+        path = directory / f"{name}.parquet"
+        if not path.exists():
+            raise FileNotFoundError(f"Snapshot table not found: {path}")
+        tables[name] = pq.read_table(path, schema=schema)
+    print(f"Loaded snapshot {directory}: {tables['pokemon'].num_rows} Pokemon")
+    return tables
+
+
+def engine_inputs(tables):
     """
+    Convert extracted tables to the BattleEngine inputs.
 
-    df = pd.read_sql_query(query, conn)
-    conn.close()
+    Args:
+        tables: Arrow tables from extract_battle_data or load_snapshot
 
-    # Build lookup dict
-    type_eff = defaultdict(lambda: 1.0)
-    for _, row in df.iterrows():
-        type_eff[(row['attacking_type_id'], row['defending_type_id'])] = float(row['multiplier'])
+    Returns:
+        Tuple (pokemon_df, pokemon_moves_df, type_eff lookup dict)
+    """
+    type_chart = tables["type_effectiveness"]
+    keys = zip(
+        type_chart.column('attacking_type_id').to_pylist(),
+        type_chart.column('defending_type_id').to_pylist(),
+    )
+    type_eff = defaultdict(lambda: 1.0, zip(keys, type_chart.column('multiplier').to_pylist()))
+    return tables["pokemon"].to_pandas(), tables["pokemon_moves"].to_pandas(), type_eff
 
-    print(f" Loaded {len(df)} type effectiveness rules")
-    return type_eff
 
+# ----------------------------------------------------------------------
+# Scalar reference implementation (one battle at a time).
+# Dataset generation uses the vectorised BattleEngine; these functions
+# define the expected results and are checked against it by the tests.
+# ----------------------------------------------------------------------
 
 def get_type_multiplier(move_type_id, defender_type_1_id, defender_type_2_id, type_eff):
     """Calculate total type effectiveness multiplier."""
@@ -407,11 +521,9 @@ def build_sample_dict(pokemon_a, pokemon_b, move_a, move_b, winner, scenario_typ
         # Metadata
         'scenario_type': scenario_type,
 
-        # IDs (for reference, not features)
+        # IDs (for reference, not features; names: pokemon_names.parquet)
         'pokemon_a_id': pokemon_a['pokemon_id'],
         'pokemon_b_id': pokemon_b['pokemon_id'],
-        'pokemon_a_name': pokemon_a['pokemon_name'],
-        'pokemon_b_name': pokemon_b['pokemon_name'],
 
         # Pokemon A stats
         'a_hp': pokemon_a['hp'],
@@ -463,251 +575,182 @@ def build_sample_dict(pokemon_a, pokemon_b, move_a, move_b, winner, scenario_typ
     }
 
 
-def generate_best_move_scenario(pokemon_df, pokemon_moves_df, type_eff):
+def collect_shards(batches):
+    """Concatenate (rows, skipped) batches into one DataFrame (small datasets only)."""
+    tables = []
+    skipped = 0
+    for table, batch_skipped in batches:
+        tables.append(table)
+        skipped += batch_skipped
+
+    df = pa.concat_tables(tables).to_pandas() if tables else DATASET_SCHEMA.empty_table().to_pandas()
+    print(f"\n Generated {len(df):,} samples (skipped {skipped:,})")
+    return df
+
+
+def generate_best_move_scenario(engine, workers=1):
     """
     Generate dataset with best_move scenario (original v1 behavior).
 
     For each matchup, both A and B use their best offensive move.
+    Builds the whole scenario in memory; main() streams it to disk instead.
+
+    Args:
+        engine: BattleEngine built from the Pokemon, moves and type chart
+        workers: Number of processes (shards = attacker Pokemon)
     """
     print("\nGenerating BEST_MOVE scenario...")
-    samples = []
-    skipped = 0
-
-    for idx_a, pokemon_a in pokemon_df.iterrows():
-        for _, pokemon_b in pokemon_df.iterrows():
-            if pokemon_a['pokemon_id'] == pokemon_b['pokemon_id']:
-                skipped += 1
-                continue
-
-            # Get best moves
-            move_a = get_best_move(
-                pokemon_a['pokemon_id'], pokemon_moves_df,
-                pokemon_a, pokemon_b, type_eff
-            )
-            move_b = get_best_move(
-                pokemon_b['pokemon_id'], pokemon_moves_df,
-                pokemon_b, pokemon_a, type_eff
-            )
-
-            if move_a is None or move_b is None:
-                skipped += 1
-                continue
-
-            # Simulate battle
-            winner = simulate_battle(pokemon_a, pokemon_b, move_a, move_b, type_eff)
-
-            # Build sample
-            sample = build_sample_dict(pokemon_a, pokemon_b, move_a, move_b, winner, "best_move")
-            samples.append(sample)
-
-        if (idx_a + 1) % 20 == 0:
-            print(f" Progress: {idx_a + 1}/{len(pokemon_df)} Pokemon processed")
-
-    df = pd.DataFrame(samples)
-    print(f"\n Generated {len(df):,} samples (skipped {skipped:,})")
-    return df
+    return collect_shards(iter_batches(engine, "best_move", RANDOM_SEED, workers=workers))
 
 
-def generate_random_move_scenario(pokemon_df, pokemon_moves_df, type_eff, num_samples=5):
+def generate_random_move_scenario(engine, num_samples=5, workers=1):
     """
     Generate dataset with random_move scenario.
 
     For each matchup:
     - A uses its best move
     - B uses a random offensive move (repeated num_samples times)
+
+    Args:
+        engine: BattleEngine built from the Pokemon, moves and type chart
+        num_samples: Random samples per matchup
+        workers: Number of processes (shards = attacker Pokemon)
     """
     print(f"\n Generating RANDOM_MOVE scenario ({num_samples} samples per matchup)...")
-    samples = []
-    skipped = 0
-    np.random.seed(RANDOM_SEED)
-
-    for idx_a, pokemon_a in pokemon_df.iterrows():
-        for idx_b, pokemon_b in pokemon_df.iterrows():
-            if pokemon_a['pokemon_id'] == pokemon_b['pokemon_id']:
-                skipped += num_samples
-                continue
-
-            # Get best move for A
-            move_a = get_best_move(
-                pokemon_a['pokemon_id'], pokemon_moves_df,
-                pokemon_a, pokemon_b, type_eff
-            )
-
-            if move_a is None:
-                skipped += num_samples
-                continue
-
-            # Get all valid moves for B
-            valid_moves_b = get_all_valid_moves(
-                pokemon_b['pokemon_id'], pokemon_moves_df, pokemon_b
-            )
-
-            if not valid_moves_b:
-                skipped += num_samples
-                continue
-
-            # Generate N random samples
-            for _ in range(num_samples):
-                # Pick random move for B
-                random_move = np.random.choice(valid_moves_b)
-                move_b = get_move_score_and_info(random_move, pokemon_b, pokemon_a, type_eff)
-
-                # Simulate battle
-                winner = simulate_battle(pokemon_a, pokemon_b, move_a, move_b, type_eff)
-
-                # Build sample
-                sample = build_sample_dict(pokemon_a, pokemon_b, move_a, move_b, winner, "random_move")
-                samples.append(sample)
-
-        if (idx_a + 1) % 20 == 0:
-            print(f" Progress: {idx_a + 1}/{len(pokemon_df)} Pokemon processed")
-
-    df = pd.DataFrame(samples)
-    print(f"\n Generated {len(df):,} samples (skipped {skipped:,})")
-    return df
+    return collect_shards(iter_batches(
+        engine, "random_move", RANDOM_SEED, workers=workers, num_samples=num_samples
+    ))
 
 
-def generate_all_combinations_scenario(pokemon_df, pokemon_moves_df, type_eff, max_combinations_per_matchup=20):
+def generate_all_combinations_scenario(engine, max_combinations_per_matchup=20, workers=1):
     """
     Generate dataset with all_combinations scenario.
 
     For each matchup, generate all possible moveA × moveB combinations.
     Limited to max_combinations_per_matchup to prevent explosion.
+
+    Args:
+        engine: BattleEngine built from the Pokemon, moves and type chart
+        max_combinations_per_matchup: Combinations kept per matchup
+            (None = every combination)
+        workers: Number of processes (shards = attacker Pokemon)
     """
-    print(f"\nGenerating ALL_COMBINATIONS scenario (max {max_combinations_per_matchup} per matchup)...")
-    samples = []
-    skipped = 0
+    limit = "exhaustive" if max_combinations_per_matchup is None else f"max {max_combinations_per_matchup}"
+    print(f"\nGenerating ALL_COMBINATIONS scenario ({limit} per matchup)...")
+    return collect_shards(iter_batches(
+        engine, "all_combinations", RANDOM_SEED, workers=workers,
+        max_per_matchup=max_combinations_per_matchup
+    ))
 
-    for idx_a, pokemon_a in pokemon_df.iterrows():
-        for _, pokemon_b in pokemon_df.iterrows():
-            if pokemon_a['pokemon_id'] == pokemon_b['pokemon_id']:
-                skipped += 1
-                continue
-
-            # Get all valid moves for both
-            valid_moves_a = get_all_valid_moves(
-                pokemon_a['pokemon_id'], pokemon_moves_df, pokemon_a
-            )
-            valid_moves_b = get_all_valid_moves(
-                pokemon_b['pokemon_id'], pokemon_moves_df, pokemon_b
-            )
-
-            if not valid_moves_a or not valid_moves_b:
-                skipped += 1
-                continue
-
-            # Generate all combinations (with limit)
-            combinations = []
-            for move_a_raw in valid_moves_a:
-                for move_b_raw in valid_moves_b:
-                    combinations.append((move_a_raw, move_b_raw))
-
-            # Limit combinations if too many
-            if len(combinations) > max_combinations_per_matchup:
-                combinations = np.random.choice(
-                    len(combinations),
-                    size=max_combinations_per_matchup,
-                    replace=False
-                )
-                combinations = [
-                    (valid_moves_a[i // len(valid_moves_b)], valid_moves_b[i % len(valid_moves_b)])
-                    for i in combinations
-                ]
-
-            # Generate samples for each combination
-            for move_a_raw, move_b_raw in combinations:
-                move_a = get_move_score_and_info(move_a_raw, pokemon_a, pokemon_b, type_eff)
-                move_b = get_move_score_and_info(move_b_raw, pokemon_b, pokemon_a, type_eff)
-
-                # Simulate battle
-                winner = simulate_battle(pokemon_a, pokemon_b, move_a, move_b, type_eff)
-
-                # Build sample
-                sample = build_sample_dict(pokemon_a, pokemon_b, move_a, move_b, winner, "all_combinations")
-                samples.append(sample)
-
-        if (idx_a + 1) % 20 == 0:
-            print(f" Progress: {idx_a + 1}/{len(pokemon_df)} Pokemon processed")
-
-    df = pd.DataFrame(samples)
-    print(f"\n Generated {len(df):,} samples (skipped {skipped:,})")
-    return df
 
+# ============================================================
+# Scenario generation (full or incremental, see dataset_manifest.py)
+# ============================================================
 
-def split_and_save(df, scenario_type, test_size=0.2):
-    """Split into train/test and save to Parquet."""
-    print(f"\n Saving datasets for scenario: {scenario_type}...")
+def matrix_categories(engine, config=None):
+    """
+    One-hot values of each categorical feature: the declared type vocabulary.
 
-    # Create directories
-    RAW_DIR.mkdir(parents=True, exist_ok=True)
-    PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+    Raises:
+        ValueError: If the engine has type names outside the vocabulary
+    """
+    config = config or FeatureEngineeringConfig()
+    unknown = sorted(set(engine.type_dictionary.to_pylist()) - set(config.type_vocabulary))
+    if unknown:
+        raise ValueError(f"Type names outside the feature vocabulary: {unknown}")
+    return {feature: list(config.type_vocabulary) for feature in config.categorical_features}
 
-    # Save raw
-    raw_path = RAW_DIR / f"matchups_{scenario_type}.parquet"
-    df.to_parquet(raw_path, index=False, engine='pyarrow')
-    print(f" Raw dataset: {raw_path}")
-    print(f" Size: {raw_path.stat().st_size / (1024*1024):.2f} MB")
 
-    # Split train/test (stratified on winner)
-    train_df, test_df = train_test_split(
-        df,
-        test_size=test_size,
-        random_state=RANDOM_SEED,
-        stratify=df['winner']
-    )
+def describe_scenario(scenario_type, options):
+    """Human readable scenario description for the logs."""
+    if scenario_type == "random_move":
+        return f"RANDOM_MOVE scenario ({options['num_samples']} samples per matchup)"
+    if scenario_type == "all_combinations":
+        limit = options["max_per_matchup"]
+        combinations = "exhaustive" if limit is None else f"max {limit}"
+        return f"ALL_COMBINATIONS scenario ({combinations} per matchup)"
+    return "BEST_MOVE scenario"
 
-    return train_df, test_df
 
+def write_scenarios(writer, engine, manifest, scenarios, options, previous=None, workers=1):
+    """
+    Generate scenarios into a DatasetWriter, incrementally when possible.
 
-def combine_and_save_all_scenarios(train_dfs, test_dfs):
-    """Combine all scenarios into single train/test files."""
-    print("\nCombining all scenarios into single train/test files...")
+    A scenario is rebuilt incrementally when the previous manifest was
+    built with the same settings, type chart and scenario options; only
+    the matchups involving changed Pokemon are then regenerated. Files of
+    scenarios not listed are removed. The manifest is completed with the
+    partition statistics of each scenario.
 
-    # Combine
-    train_combined = pd.concat(train_dfs, ignore_index=True)
-    test_combined = pd.concat(test_dfs, ignore_index=True)
+    Args:
+        writer: Open DatasetWriter
+        engine: BattleEngine built from the Pokemon, moves and type chart
+        manifest: Manifest of this build (build_manifest)
+        scenarios: Scenario names to generate
+        options: batch_size / num_samples / max_per_matchup
+        previous: Manifest of the previous build (None = full rebuild)
+        workers: Number of processes
+    """
+    for scenario in scenarios:
+        plan = plan_rebuild(previous, manifest, scenario, scenario_options(scenario, options))
+        description = describe_scenario(scenario, options)
+        if plan is None:
+            print(f"\nGenerating {description}...")
+            shards = iter_shards(engine, scenario, RANDOM_SEED, workers=workers, **options)
+        else:
+            print(f"\nUpdating {description}: "
+                  f"{len(plan.changed)} changed, {len(plan.removed)} removed Pokemon...")
+            shards = iter_rebuild_shards(engine, scenario, plan, workers=workers, **options)
+        writer.write_scenario(scenario, shards, plan)
 
-    # Shuffle
-    train_combined = train_combined.sample(frac=1, random_state=RANDOM_SEED).reset_index(drop=True)
-    test_combined = test_combined.sample(frac=1, random_state=RANDOM_SEED).reset_index(drop=True)
+        skipped = engine.n_pokemon ** 2 - writer.stats[scenario]['matchups']
+        print(f" Skipped {skipped:,} matchups (same Pokemon or no valid move)")
+        manifest['scenarios'][scenario] = {
+            'options': scenario_options(scenario, options),
+            'partitions': writer.partitions[scenario],
+        }
 
-    # Save
-    train_path = PROCESSED_DIR / "train.parquet"
-    test_path = PROCESSED_DIR / "test.parquet"
+    for scenario in SCENARIO_STREAMS:
+        if scenario not in scenarios:
+            writer.drop_scenario(scenario)
 
-    train_combined.to_parquet(train_path, index=False, engine='pyarrow')
-    test_combined.to_parquet(test_path, index=False, engine='pyarrow')
 
-    print(f" Train: {len(train_combined):,} samples ({train_path})")
-    print(f" Test: {len(test_combined):,} samples ({test_path})")
+def get_peak_rss_mb():
+    """
+    Peak resident memory in MB of this process and of its largest worker.
 
-    return train_combined, test_combined
+    Returns:
+        Tuple (main, workers), or None where unsupported (Windows)
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
 
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    main_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    workers_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return main_rss, workers_rss
 
-def print_summary(train_df, test_df, scenario_type):
-    """Print dataset summary."""
+
+def print_summary(stats, scenario_type):
+    """Print dataset summary from the writer statistics."""
     print("\n" + "=" * 70)
     print(f"DATASET SUMMARY - {scenario_type.upper()}")
     print("=" * 70)
 
-    if 'scenario_type' in train_df.columns:
-        print("\nSamples by Scenario:")
-        for scenario in train_df['scenario_type'].unique():
-            train_count = (train_df['scenario_type'] == scenario).sum()
-            test_count = (test_df['scenario_type'] == scenario).sum()
-            print(f" {scenario:20s}: Train {train_count:,} | Test {test_count:,}")
-
-    print(f"\nTotal Samples:")
-    print(f" Train: {len(train_df):,}")
-    print(f" Test: {len(test_df):,}")
-
-    print(f"\nClass Balance (Train):")
-    print(f" A wins: {train_df['winner'].sum():,} ({train_df['winner'].mean()*100:.1f}%)")
-    print(f" B wins: {(train_df['winner'] == 0).sum():,} ({(1-train_df['winner'].mean())*100:.1f}%)")
+    print("\nSamples by Scenario:")
+    for scenario, counts in stats.items():
+        print(f" {scenario:20s}: Train {counts['train']:,} | Test {counts['test']:,}")
 
-    print(f"\nClass Balance (Test):")
-    print(f" A wins: {test_df['winner'].sum():,} ({test_df['winner'].mean()*100:.1f}%)")
-    print(f" B wins: {(test_df['winner'] == 0).sum():,} ({(1-test_df['winner'].mean())*100:.1f}%)")
+    for split in ('train', 'test'):
+        total = sum(counts[split] for counts in stats.values())
+        wins = sum(counts[f'{split}_wins'] for counts in stats.values())
+        share = wins / total * 100 if total else 0.0
+        print(f"\nClass Balance ({split.capitalize()}): {total:,} samples")
+        print(f" A wins: {wins:,} ({share:.1f}%)")
+        print(f" B wins: {total - wins:,} ({100 - share:.1f}%)")
 
 
 def main():
@@ -733,8 +776,56 @@ def main():
         default=20,
         help="Max combinations per matchup for all_combinations scenario"
     )
+    parser.add_argument(
+        "--exhaustive",
+        action="store_true",
+        help="Generate every moveA × moveB combination for all_combinations "
+             "(ignores --max-combinations, streamed in --batch-size chunks)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes, attackers are sharded across them (0 = all CPUs). "
+             "The output does not depend on this value."
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="Rows per batch streamed to Parquet (bounds memory usage)"
+    )
+    parser.add_argument(
+        "--full-rebuild",
+        action="store_true",
+        help="Ignore the manifest of the previous build and regenerate every matchup"
+    )
+    parser.add_argument(
+        "--feature-matrix",
+        action="store_true",
+        help=f"Also write the scaled float32 feature matrix, labels and scalers to {MATRIX_DIR} "
+             "(implies --full-rebuild; without it, the matrix of a previous build is deleted)"
+    )
+    snapshot = parser.add_mutually_exclusive_group()
+    snapshot.add_argument(
+        "--save-snapshot",
+        nargs="?",
+        const=SNAPSHOT_DIR,
+        type=Path,
+        metavar="DIR",
+        help=f"Save the extracted data as Parquet (default: {SNAPSHOT_DIR})"
+    )
+    snapshot.add_argument(
+        "--from-snapshot",
+        nargs="?",
+        const=SNAPSHOT_DIR,
+        type=Path,
+        metavar="DIR",
+        help="Read the data from a Parquet snapshot instead of PostgreSQL"
+    )
 
     args = parser.parse_args()
+    workers = args.workers or os.cpu_count() or 1
 
     print("=" * 70)
     print("BATTLE WINNER PREDICTION DATASET GENERATION v2")
@@ -744,70 +835,69 @@ def main():
     print(f"Battle Level: {BATTLE_LEVEL}")
     print(f"Scenario Type: {args.scenario_type}")
     print(f"Description: {SCENARIO_TYPES[args.scenario_type]}")
+    print(f"Workers: {workers}")
+
+    if args.scenario_type == "all":
+        scenarios = ["best_move", "random_move", "all_combinations"]
+    else:
+        scenarios = [args.scenario_type]
+
+    options = {
+        "batch_size": args.batch_size,
+        "num_samples": args.num_random_samples,
+        "max_per_matchup": None if args.exhaustive else args.max_combinations,
+    }
 
     try:
-        # Fetch data
-        pokemon_df = fetch_pokemon_data()
-        pokemon_moves_df = fetch_pokemon_moves()
-        type_eff = fetch_type_effectiveness()
-
-        train_dfs = []
-        test_dfs = []
-
-        # Generate based on scenario type
-        if args.scenario_type == "best_move":
-            df = generate_best_move_scenario(pokemon_df, pokemon_moves_df, type_eff)
-            train_df, test_df = split_and_save(df, "best_move")
-            train_dfs.append(train_df)
-            test_dfs.append(test_df)
-
-        elif args.scenario_type == "random_move":
-            df = generate_random_move_scenario(
-                pokemon_df, pokemon_moves_df, type_eff,
-                num_samples=args.num_random_samples
-            )
-            train_df, test_df = split_and_save(df, "random_move")
-            train_dfs.append(train_df)
-            test_dfs.append(test_df)
-
-        elif args.scenario_type == "all_combinations":
-            df = generate_all_combinations_scenario(
-                pokemon_df, pokemon_moves_df, type_eff,
-                max_combinations_per_matchup=args.max_combinations
-            )
-            train_df, test_df = split_and_save(df, "all_combinations")
-            train_dfs.append(train_df)
-            test_dfs.append(test_df)
-
-        elif args.scenario_type == "all":
-            # Generate all scenarios
-            df_best = generate_best_move_scenario(pokemon_df, pokemon_moves_df, type_eff)
-            train_best, test_best = split_and_save(df_best, "best_move")
-            train_dfs.append(train_best)
-            test_dfs.append(test_best)
-
-            df_random = generate_random_move_scenario(
-                pokemon_df, pokemon_moves_df, type_eff,
-                num_samples=args.num_random_samples
-            )
-            train_random, test_random = split_and_save(df_random, "random_move")
-            train_dfs.append(train_random)
-            test_dfs.append(test_random)
-
-            df_all_comb = generate_all_combinations_scenario(
-                pokemon_df, pokemon_moves_df, type_eff,
-                max_combinations_per_matchup=args.max_combinations
-            )
-            train_all_comb, test_all_comb = split_and_save(df_all_comb, "all_combinations")
-            train_dfs.append(train_all_comb)
-            test_dfs.append(test_all_comb)
-
-        # Combine if multiple scenarios
-        if len(train_dfs) > 1:
-            train_combined, test_combined = combine_and_save_all_scenarios(train_dfs, test_dfs)
-            print_summary(train_combined, test_combined, args.scenario_type)
+        # Extract data (or read a snapshot: no database needed)
+        if args.from_snapshot:
+            tables = load_snapshot(args.from_snapshot)
         else:
-            print_summary(train_dfs[0], test_dfs[0], args.scenario_type)
+            tables = extract_battle_data()
+            if args.save_snapshot:
+                save_snapshot(tables, args.save_snapshot)
+        pokemon_df, pokemon_moves_df, type_eff = engine_inputs(tables)
+
+        # Encode Pokemon, moves and type chart as arrays once
+        engine = BattleEngine(pokemon_df, pokemon_moves_df, type_eff, level=BATTLE_LEVEL)
+        print(f" Encoded {engine.n_pokemon} Pokemon, {len(engine.move_names):,} valid moves")
+
+        # Content hashes of this build, compared with the previous one
+        settings = {
+            "seed": RANDOM_SEED, "level": BATTLE_LEVEL, "test_size": 0.2, "partition_block": PARTITION_BLOCK,
+        }
+        manifest = build_manifest(engine, settings)
+        # The matrix scalers are fitted on every train row: no incremental rebuild
+        previous = None if args.full_rebuild or args.feature_matrix else load_manifest(MANIFEST_PATH)
+        # Invalid until this build completes (a failed build then forces a full rebuild)
+        MANIFEST_PATH.unlink(missing_ok=True)
+        # A matrix of the previous build would no longer match processed/: rewritten
+        # below with --feature-matrix, removed otherwise
+        shutil.rmtree(MATRIX_DIR, ignore_errors=True)
+
+        # Generate each scenario straight to Parquet partitions (and the feature matrix)
+        with contextlib.ExitStack() as stack:
+            matrix = None
+            if args.feature_matrix:
+                matrix = stack.enter_context(FeatureMatrixWriter(MATRIX_DIR, matrix_categories(engine)))
+            writer = stack.enter_context(DatasetWriter(
+                RAW_DIR, PROCESSED_DIR, test_size=0.2, seed=RANDOM_SEED, matrix=matrix
+            ))
+            write_scenarios(writer, engine, manifest, scenarios, options, previous, workers)
+
+        save_manifest(manifest, MANIFEST_PATH)
+        pq.write_table(engine.names_table(), POKEMON_NAMES_PATH)
+
+        print(f"\n Train: {writer.train_path}")
+        print(f" Pokemon names: {POKEMON_NAMES_PATH}")
+        if args.feature_matrix:
+            print(f" Feature matrix: {MATRIX_DIR} ({len(matrix.feature_columns)} features)")
+        print(f" Test: {writer.test_path}")
+        print_summary(writer.stats, args.scenario_type)
+
+        peak_rss = get_peak_rss_mb()
+        if peak_rss:
+            print(f"\nPeak RSS: {peak_rss[0]:,.0f} MB (main), {peak_rss[1]:,.0f} MB (largest worker)")
 
         print("\n" + "=" * 70)
         print("DATASET GENERATION COMPLETE")
@@ -0,0 +1,330 @@
+"""Checkpoints of the ML pipeline stages and of boosting.
+
+run_machine_learning records each completed stage (see
+machine_learning.pipeline_stages) in a manifest:
+
+    <data_dir>/checkpoints/pipeline.json
+        {"version": 1, "stages": {"<stage>": {"config": ..., "artifacts": [...],
+                                              "checksum": ..., "completed_at": ...}}}
+
+with the SHA-256 of the files the stage produced (processed dataset,
+feature cache entry, pickled model). With --resume, a stage is skipped
+when its entry has the same config and its files still have the
+recorded checksum; otherwise it runs again. The manifest is cleared
+when the pipeline completes: only an interrupted run is resumed.
+
+Search trials are checkpointed by machine_learning.tuning. Inside a
+fit, BoostingCheckpoint saves the booster every N rounds, and
+fit_with_checkpoints resumes an interrupted fit from the saved booster
+(xgb_model=) with the remaining rounds only.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import numpy as np
+import scipy.sparse as sp
+import xgboost as xgb
+
+# Bump when the manifest layout changes
+PIPELINE_CHECKPOINT_VERSION = 1
+
+DEFAULT_CHECKPOINT_ROUNDS = 50
+
+HASH_CHUNK_BYTES = 1 << 20
+HASH_CHUNK_ROWS = 65_536
+
+# Booster attribute tying a boosting checkpoint to its model parameters and data
+FINGERPRINT_ATTR = 'checkpoint_fingerprint'
+
+
+def artifacts_checksum(paths: Iterable) -> str:
+    """
+    SHA-256 of the content of files and directories.
+
+    Directories are hashed file by file in sorted order (hidden
+    temporary files excluded), with their relative path and size.
+
+    Args:
+        paths: Files or directories
+
+    Returns:
+        Hexadecimal checksum
+
+    Raises:
+        FileNotFoundError: If a path does not exist
+    """
+    digest = hashlib.sha256()
+    for root in map(Path, paths):
+        if not root.exists():
+            raise FileNotFoundError(root)
+        files = [root] if root.is_file() else sorted(
+            path for path in root.rglob("*")
+            if path.is_file() and not any(part.startswith(".") for part in path.relative_to(root).parts)
+        )
+        for path in files:
+            name = root.name if path == root else f"{root.name}/{path.relative_to(root).as_posix()}"
+            digest.update(f"\0{name}\0{path.stat().st_size}\0".encode())
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+
+def update_data_digest(digest, X, y) -> None:
+    """Add training features (DataFrame, array or CSR matrix, as float32) and labels to a hash."""
+    if sp.issparse(X):
+        for array in (X.data.astype(np.float32), X.indices, X.indptr):
+            digest.update(np.ascontiguousarray(array).tobytes())
+    else:
+        for start in range(0, X.shape[0], HASH_CHUNK_ROWS):
+            rows = X.iloc[start:start + HASH_CHUNK_ROWS] if hasattr(X, 'iloc') else X[start:start + HASH_CHUNK_ROWS]
+            digest.update(np.asarray(rows, dtype=np.float32).tobytes())
+    digest.update(np.asarray(y, dtype=np.uint8).tobytes())
+
+
+class PipelineCheckpoints:
+    """
+    Manifest of the completed pipeline stages.
+
+    Args:
+        directory: Checkpoint directory (pipeline.json and stage states)
+        resume: Skip the stages whose checkpoint is valid; without it every
+            stage runs and overwrites its checkpoint
+        verbose: Print skipped and invalid stages
+    """
+
+    def __init__(self, directory, resume: bool = False, verbose: bool = True):
+        self.directory = Path(directory)
+        self.manifest_path = self.directory / "pipeline.json"
+        self.resume = resume
+        self.verbose = verbose
+        self.corrupted = set()
+        self.stages = {}
+        if self.manifest_path.exists():
+            with open(self.manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get('version') == PIPELINE_CHECKPOINT_VERSION:
+                self.stages = manifest['stages']
+
+    @staticmethod
+    def _config(config: Dict) -> Dict:
+        """Config as stored in the manifest (JSON round trip)."""
+        return json.loads(json.dumps(config, sort_keys=True, default=str))
+
+    def completed(self, stage: str, config: Dict) -> bool:
+        """
+        Whether a stage can be skipped.
+
+        True with --resume when the stage was recorded with the same config
+        and its artifacts still have the recorded checksum. A stage whose
+        artifacts changed or disappeared is added to self.corrupted.
+
+        Args:
+            stage: Stage name
+            config: Settings the stage output depends on
+
+        Returns:
+            True if the stage output can be reused
+        """
+        entry = self.stages.get(stage)
+        if not self.resume or entry is None or entry['config'] != self._config(config):
+            return False
+        try:
+            valid = artifacts_checksum(entry['artifacts']) == entry['checksum']
+        except FileNotFoundError:
+            valid = False
+        if not valid:
+            self.corrupted.add(stage)
+            if self.verbose:
+                print(f"\n[WARNING] Checkpoint of stage '{stage}' does not match its files: running it again")
+            return False
+        if self.verbose:
+            print(f"\n[OK] Stage '{stage}' resumed from its checkpoint ({entry['completed_at']}, checksum verified)")
+        return True
+
+    def record(self, stage: str, artifacts: Iterable, config: Dict) -> None:
+        """
+        Record a completed stage and the checksum of its artifacts.
+
+        Args:
+            stage: Stage name
+            artifacts: Files or directories produced by the stage
+            config: Settings the stage output depends on
+        """
+        artifacts = [str(Path(path).resolve()) for path in artifacts]
+        self.stages[stage] = {
+            'config': self._config(config),
+            'artifacts': artifacts,
+            'checksum': artifacts_checksum(artifacts),
+            'completed_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        self.corrupted.discard(stage)
+        self._write(self.manifest_path, lambda f: json.dump(
+            {'version': PIPELINE_CHECKPOINT_VERSION, 'stages': self.stages}, f, indent=2), mode="w")
+
+    def load_state(self, stage: str, config: Dict) -> Optional[Any]:
+        """Pickled state of a stage, if completed() (None otherwise)."""
+        if not self.completed(stage, config):
+            return None
+        with open(self.directory / f"{stage}.pkl", "rb") as f:
+            return pickle.load(f)
+
+    def save_state(self, stage: str, state: Any, config: Dict) -> None:
+        """Pickle the state of a completed stage (models, metrics) and record it."""
+        path = self.directory / f"{stage}.pkl"
+        self._write(path, lambda f: pickle.dump(state, f), mode="wb")
+        self.record(stage, [path], config)
+
+    def run_stage(self, stage: str, config: Dict, compute: Callable[[], Any]) -> Any:
+        """
+        State of a stage: loaded from its checkpoint, or computed and saved.
+
+        Args:
+            stage: Stage name
+            config: Settings the stage output depends on
+            compute: Runs the stage and returns its state
+
+        Returns:
+            The stage state
+        """
+        state = self.load_state(stage, config)
+        if state is None:
+            state = compute()
+            self.save_state(stage, state, config)
+        return state
+
+    def clear(self) -> None:
+        """Forget every stage (the run completed: the next run starts over)."""
+        for path in [self.manifest_path, *self.directory.glob("*.pkl")]:
+            path.unlink(missing_ok=True)
+        self.stages = {}
+
+    def _write(self, path: Path, dump, mode: str) -> None:
+        """Write a file atomically (an interruption keeps the previous version)."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(temp, mode, **({} if "b" in mode else {'encoding': "utf-8"})) as f:
+            dump(f)
+        os.replace(temp, path)
+
+
+class BoostingCheckpoint(xgb.callback.TrainingCallback):
+    """
+    Save the booster every N boosting rounds.
+
+    The booster is written atomically with its fingerprint attribute, so
+    a checkpoint is only resumed by the same parameters and data.
+
+    Args:
+        path: Booster file (.ubj)
+        fingerprint: training_fingerprint() of the fit
+        every: Rounds between two checkpoints
+    """
+
+    def __init__(self, path, fingerprint: str, every: int = DEFAULT_CHECKPOINT_ROUNDS):
+        super().__init__()
+        self.path = Path(path)
+        self.fingerprint = fingerprint
+        self.every = every
+
+    def after_iteration(self, model: xgb.Booster, epoch: int, evals_log) -> bool:
+        if model.num_boosted_rounds() % self.every == 0:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp = self.path.with_name(f".{self.path.stem}.{os.getpid()}.tmp{self.path.suffix}")
+            model.set_attr(**{FINGERPRINT_ATTR: self.fingerprint})
+            model.save_model(temp)
+            model.set_attr(**{FINGERPRINT_ATTR: None})
+            os.replace(temp, self.path)
+        return False
+
+
+def training_fingerprint(model: xgb.XGBModel, X, y, data_fingerprint: Optional[str] = None) -> str:
+    """
+    SHA-256 of the model parameters and training data of a fit.
+
+    Args:
+        model: Unfitted XGBoost estimator
+        X: Training features
+        y: Training labels
+        data_fingerprint: Known hash of (X, y), e.g. a search fingerprint (skips hashing the data)
+
+    Returns:
+        Hexadecimal fingerprint
+    """
+    params = {k: v for k, v in model.get_params().items() if k not in ('n_jobs', 'callbacks', 'verbosity')}
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode())
+    digest.update(str(list(X.shape)).encode())
+    if data_fingerprint is not None:
+        digest.update(data_fingerprint.encode())
+    else:
+        update_data_digest(digest, X, y)
+    return digest.hexdigest()
+
+
+def load_boosting_checkpoint(path, fingerprint: str) -> Optional[xgb.Booster]:
+    """Booster saved by BoostingCheckpoint for this fingerprint (None if missing or from another fit)."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    booster = xgb.Booster(model_file=str(path))
+    if booster.attr(FINGERPRINT_ATTR) != fingerprint:
+        return None
+    booster.set_attr(**{FINGERPRINT_ATTR: None})
+    return booster
+
+
+def fit_with_checkpoints(model: xgb.XGBModel, X, y, checkpoint_path=None,
+                         every: int = DEFAULT_CHECKPOINT_ROUNDS, resume: bool = True,
+                         data_fingerprint: Optional[str] = None, fit_params: Optional[Dict] = None,
+                         verbose: bool = False) -> xgb.XGBModel:
+    """
+    Fit an XGBoost estimator, saving the booster every N rounds.
+
+    An interrupted fit leaves its last booster at checkpoint_path; the
+    next call with the same parameters and data continues from it and
+    only trains the remaining rounds. The checkpoint is deleted once the
+    fit completes. Without row or column subsampling the resumed model is
+    the uninterrupted one; with subsampling the remaining rounds draw
+    other samples (same seed, restarted).
+
+    Args:
+        model: Unfitted XGBoost estimator (n_estimators rounds)
+        X: Training features
+        y: Training labels
+        checkpoint_path: Booster file (None: plain fit, no checkpoint)
+        every: Rounds between two checkpoints
+        resume: Continue from a matching checkpoint (False: start over)
+        data_fingerprint: Known hash of (X, y) (see training_fingerprint)
+        fit_params: Passed to model.fit (eval_set, verbose, ...)
+        verbose: Print the resumed rounds
+
+    Returns:
+        The fitted model
+    """
+    fit_params = fit_params or {}
+    if checkpoint_path is None:
+        return model.fit(X, y, **fit_params)
+
+    checkpoint_path = Path(checkpoint_path)
+    total = model.get_num_boosting_rounds()
+    fingerprint = training_fingerprint(model, X, y, data_fingerprint)
+    booster = load_boosting_checkpoint(checkpoint_path, fingerprint) if resume else None
+    done = booster.num_boosted_rounds() if booster is not None else 0
+    if verbose and done:
+        print(f"   Resuming boosting from {checkpoint_path}: {done}/{total} rounds already trained")
+
+    callbacks = model.callbacks
+    model.set_params(n_estimators=total - done,
+                     callbacks=[*(callbacks or []), BoostingCheckpoint(checkpoint_path, fingerprint, every)])
+    try:
+        model.fit(X, y, xgb_model=booster, **fit_params)
+    finally:
+        model.set_params(n_estimators=total, callbacks=callbacks)
+    checkpoint_path.unlink(missing_ok=True)
+    return model
@@ -147,6 +147,13 @@ class FeatureEngineeringConfig:
         'a_move_type', 'b_move_type'
     ])
 
+    # Values of the categorical features: the 18 types, 'none' for a missing second type
+    type_vocabulary: List[str] = field(default_factory=lambda: [
+        'Acier', 'Combat', 'Dragon', 'Eau', 'Feu', 'Fée', 'Glace', 'Insecte', 'Normal',
+        'Plante', 'Poison', 'Psy', 'Roche', 'Sol', 'Spectre', 'Ténèbres', 'Vol', 'Électrik',
+        'none'
+    ])
+
     # Numerical features to normalize
     numerical_features_to_scale: List[str] = field(default_factory=lambda: [
         'a_hp', 'a_attack', 'a_defense', 'a_sp_attack', 'a_sp_defense', 'a_speed',
@@ -14,6 +14,9 @@ PROJECT_ROOT = Path(__file__).resolve().parent.parent
 MODELS_DIR = PROJECT_ROOT / "models"
 REPORTS_DIR = PROJECT_ROOT / "reports" / "ml"
 
+# Production rows captured by the API (api_pokemon/monitoring/drift_detection.py)
+DRIFT_DATA_DIR = PROJECT_ROOT / "api_pokemon" / "monitoring" / "drift_data"
+
 
 def get_data_dir(version: str = 'v1') -> Path:
     """
@@ -44,6 +47,26 @@ def get_features_dir(version: str = 'v1') -> Path:
     return get_data_dir(version) / "features"
 
 
+def get_matrix_dir(version: str = 'v1') -> Path:
+    """Return the feature matrix directory (written by the v2 dataset builder)."""
+    return get_data_dir(version) / "matrix"
+
+
+def get_feature_cache_dir(version: str = 'v1') -> Path:
+    """Return the cache directory of engineered features (features/cache.py)."""
+    return get_data_dir(version) / "feature_cache"
+
+
+def get_tuning_dir(version: str = 'v1') -> Path:
+    """Return the checkpoint directory of hyperparameter searches (tuning.py)."""
+    return get_data_dir(version) / "tuning"
+
+
+def get_checkpoint_dir(version: str = 'v1') -> Path:
+    """Return the checkpoint directory of the pipeline stages (checkpoints.py)."""
+    return get_data_dir(version) / "checkpoints"
+
+
 # Database configuration
 DB_HOST = os.getenv("POSTGRES_HOST", "localhost")
 DB_PORT = int(os.getenv("POSTGRES_PORT", "5432"))
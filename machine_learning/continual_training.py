@@ -0,0 +1,363 @@
+"""Continual training: warm-start the production booster on captured production rows.
+
+The API stores the feature vector of every best-move prediction
+(DriftDetector, api_pokemon/monitoring/drift_data/, raw files and their
+compacted/ partitions). refresh_model():
+
+1. loads the production model, scalers and metadata (load_model_artifacts)
+2. labels the captured rows with the simulator of the dataset builder
+   (build_battle_winner_dataset_v2.simulate_battle): the scaled stats and
+   move powers are recovered with the scalers, the move categories are
+   recorded next to the features by the API (rows captured without them
+   cannot be labelled and are skipped)
+3. appends at most `rounds` trees to the booster (XGBoost xgb_model warm
+   start) on the labelled rows plus a replay sample of the train split,
+   so the refreshed model does not drift away from the original data
+4. evaluates the production and candidate models on the held-out test
+   split and exports the candidate only if its test accuracy and ROC-AUC
+   are within max_degradation of the production model
+
+Usage:
+    python -m machine_learning.continual_training --version v2
+    python -m machine_learning.continual_training --version v2 --output-version v2_refresh --rounds 20
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import xgboost as xgb
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from machine_learning.build_battle_winner_dataset_v2 import simulate_battle
+from machine_learning.config import RANDOM_SEED, FeatureEngineeringConfig
+from machine_learning.constants import DRIFT_DATA_DIR, get_processed_dir
+from machine_learning.datasets import iter_split_batches, model_columns, read_split, scenario_labels
+from machine_learning.evaluation import evaluate_model, type_matchups
+from machine_learning.export import export_model, load_model_artifacts
+from machine_learning.features import PokemonFeatureEngineer
+
+# Trees appended per refresh (default and upper bound)
+DEFAULT_CONTINUAL_ROUNDS = 50
+MAX_CONTINUAL_ROUNDS = 500
+
+# Train split rows trained on with the production rows (0: production rows only)
+DEFAULT_REPLAY_ROWS = 100_000
+
+# Largest test accuracy / ROC-AUC drop accepted for the candidate
+DEFAULT_MAX_DEGRADATION = 0.002
+
+# Recorded by the API next to the features (not model features)
+CATEGORY_COLUMNS = ['a_move_category', 'b_move_category']
+MOVE_CATEGORIES = ['physique', 'spécial']
+
+# Decimals kept when unscaling: the simulator compares damages exactly
+UNSCALE_DECIMALS = 6
+
+
+def read_production_rows(drift_dir=DRIFT_DATA_DIR) -> pd.DataFrame:
+    """
+    Rows captured by DriftDetector, raw files and compacted partitions.
+
+    Hidden files (compaction temporary outputs) are skipped; files with
+    other columns (older model versions) are merged with missing values.
+
+    Args:
+        drift_dir: drift_data directory of the API
+
+    Returns:
+        DataFrame of the captured rows (empty if there are none)
+    """
+    drift_dir = Path(drift_dir)
+    paths = sorted(
+        path for path in drift_dir.rglob("*.parquet")
+        if not any(part.startswith('.') for part in path.relative_to(drift_dir).parts)
+    ) if drift_dir.exists() else []
+    if not paths:
+        return pd.DataFrame()
+    table = pa.concat_tables([pq.read_table(path) for path in paths], promote_options="permissive")
+    return table.to_pandas()
+
+
+def battle_inputs(rows: pd.DataFrame, scalers: Dict,
+                  config: Optional[FeatureEngineeringConfig] = None) -> pd.DataFrame:
+    """
+    Unscaled stats and move powers of engineered rows.
+
+    Args:
+        rows: Engineered features (scaled by scalers['standard_scaler'])
+        scalers: Scalers of the model that produced the rows
+        config: Feature configuration (default: FeatureEngineeringConfig())
+
+    Returns:
+        rows with the scaled columns replaced by their original values
+    """
+    config = config or FeatureEngineeringConfig()
+    scaler = scalers['standard_scaler']
+    names = list(getattr(scaler, 'feature_names_in_', config.numerical_features_to_scale))
+    values = scaler.inverse_transform(rows[names].to_numpy(dtype=np.float64))
+    raw = rows.copy()
+    raw[names] = np.round(values, UNSCALE_DECIMALS)
+    return raw
+
+
+def label_production_rows(rows: pd.DataFrame, scalers: Dict, feature_columns: List[str],
+                          config: Optional[FeatureEngineeringConfig] = None) -> pd.Series:
+    """
+    Winner of each captured row, simulated like the dataset rows.
+
+    Rows missing a model feature (captured by another model) or a move
+    category (captured before the API recorded them) are left out.
+
+    Args:
+        rows: Captured rows (read_production_rows)
+        scalers: Scalers of the model that produced the rows
+        feature_columns: Model features
+        config: Feature configuration (default: FeatureEngineeringConfig())
+
+    Returns:
+        winner (1: A wins) indexed by the labelled rows
+    """
+    rows = rows.reindex(columns=list(feature_columns) + CATEGORY_COLUMNS)
+    usable = rows.notna().all(axis=1) & rows[CATEGORY_COLUMNS].isin(MOVE_CATEGORIES).all(axis=1)
+    if not usable.any():
+        return pd.Series(dtype=np.int64, name='winner')
+    raw = battle_inputs(rows[usable], scalers, config)
+
+    winners = []
+    for row in raw.to_dict('records'):
+        pokemon = {
+            side: {stat: row[f"{side}_{stat}"]
+                   for stat in ('hp', 'attack', 'defense', 'sp_attack', 'sp_defense', 'speed')}
+            for side in ('a', 'b')
+        }
+        moves = {
+            side: {
+                'move_category': row[f"{side}_move_category"],
+                'effective_power': row[f"{side}_move_power"],
+                'stab': row[f"{side}_move_stab"],
+                'type_multiplier': row[f"{side}_move_type_mult"],
+                'priority': row[f"{side}_move_priority"],
+            }
+            for side in ('a', 'b')
+        }
+        winners.append(simulate_battle(pokemon['a'], pokemon['b'], moves['a'], moves['b'], None))
+    return pd.Series(winners, index=raw.index, name='winner', dtype=np.int64)
+
+
+def engineered_split(path, engineer: PokemonFeatureEngineer, scenario_type: str = "all",
+                     max_rows: Optional[int] = None) -> tuple:
+    """
+    Features and labels of a processed split, engineered by batches.
+
+    Args:
+        path: train.parquet or test.parquet
+        engineer: Fitted feature engineer of the production model
+        scenario_type: Scenario to keep; "all" keeps everything
+        max_rows: Random sample of at most max_rows rows (None: all rows)
+
+    Returns:
+        Tuple (X float32 DataFrame, y Series)
+    """
+    columns = model_columns(path, engineer.config)
+    if max_rows is not None:
+        df = read_split(path, scenario_type, columns)
+        batches = [df.sample(n=min(max_rows, len(df)), random_state=RANDOM_SEED).reset_index(drop=True)]
+    else:
+        batches = iter_split_batches(path, scenario_type, columns)
+    X, y = [], []
+    for df in batches:
+        X.append(engineer.transform(df.drop(columns=['winner'])).astype(np.float32))
+        y.append(df['winner'])
+    return pd.concat(X, ignore_index=True), pd.concat(y, ignore_index=True)
+
+
+def warm_start(model: xgb.XGBClassifier, X, y, rounds: int = DEFAULT_CONTINUAL_ROUNDS) -> xgb.XGBClassifier:
+    """
+    Copy of an XGBoost model with `rounds` more trees trained on (X, y).
+
+    The trees of model are kept as they are (xgb_model warm start); model
+    itself is not modified.
+
+    Raises:
+        ValueError: If model is not an XGBClassifier or rounds is outside [1, MAX_CONTINUAL_ROUNDS]
+    """
+    if not isinstance(model, xgb.XGBClassifier):
+        raise ValueError(f"Continual training warm-starts XGBoost models, not {type(model).__name__}")
+    if not 1 <= rounds <= MAX_CONTINUAL_ROUNDS:
+        raise ValueError(f"rounds must be between 1 and {MAX_CONTINUAL_ROUNDS}, got {rounds}")
+
+    params = {**model.get_params(), 'n_estimators': rounds, 'early_stopping_rounds': None, 'callbacks': None}
+    candidate = xgb.XGBClassifier(**params)
+    candidate.fit(X, y, xgb_model=model.get_booster(), verbose=False)
+    candidate.set_params(n_estimators=candidate.get_booster().num_boosted_rounds())
+    return candidate
+
+
+def quality_holds(production: Dict, candidate: Dict, max_degradation: float = DEFAULT_MAX_DEGRADATION) -> bool:
+    """Whether the candidate test accuracy and ROC-AUC are within max_degradation of production."""
+    return all(candidate[name] >= production[name] - max_degradation
+               for name in ('test_accuracy', 'test_roc_auc'))
+
+
+def refresh_model(processed_dir, version: str = "v2", output_version: Optional[str] = None,
+                  drift_dir=DRIFT_DATA_DIR, scenario_type: str = "all",
+                  rounds: int = DEFAULT_CONTINUAL_ROUNDS, replay_rows: int = DEFAULT_REPLAY_ROWS,
+                  max_degradation: float = DEFAULT_MAX_DEGRADATION,
+                  verbose: bool = True) -> Dict:
+    """
+    Warm-start the exported model on the captured production rows and export it if quality holds.
+
+    Args:
+        processed_dir: Directory of train.parquet and test.parquet
+        version: Suffix of the production artifacts
+        output_version: Suffix of the exported candidate (default: version, replacing production)
+        drift_dir: drift_data directory of the API
+        scenario_type: Scenario of the replay sample and test split; "all" keeps everything
+        rounds: Trees appended to the booster
+        replay_rows: Train split rows trained on with the production rows
+        max_degradation: Largest test accuracy / ROC-AUC drop accepted
+        verbose: Print progress and evaluations
+
+    Returns:
+        Dict with 'production' and 'candidate' metrics, 'labelled_rows',
+        'skipped_rows', 'exported' and 'elapsed_seconds'
+
+    Raises:
+        FileNotFoundError: If the production model or the test split is missing
+        ValueError: If no captured row can be labelled, or the model is not XGBoost
+    """
+    start = time.time()
+    processed_dir = Path(processed_dir)
+    output_version = output_version or version
+
+    model, scalers, metadata = load_model_artifacts(version)
+    feature_columns = metadata['feature_columns']
+    engineer = PokemonFeatureEngineer.from_artifacts(scalers, feature_columns, metadata.get('categorical_encoding'))
+
+    rows = read_production_rows(drift_dir)
+    y_new = label_production_rows(rows, scalers, feature_columns, engineer.config)
+    if y_new.empty:
+        raise ValueError(f"No labelled production row in {drift_dir} ({len(rows)} captured)")
+    X_new = rows.loc[y_new.index, feature_columns].astype(np.float32).reset_index(drop=True)
+    y_new = y_new.reset_index(drop=True)
+    if verbose:
+        print(f"\nProduction rows: {len(y_new):,} labelled, {len(rows) - len(y_new):,} skipped "
+              f"(A wins: {y_new.mean() * 100:.1f}%)")
+
+    X_train, y_train = X_new, y_new
+    if replay_rows:
+        X_replay, y_replay = engineered_split(processed_dir / "train.parquet", engineer, scenario_type, replay_rows)
+        X_train = pd.concat([X_new, X_replay], ignore_index=True)
+        y_train = pd.concat([y_new, y_replay], ignore_index=True)
+        if verbose:
+            print(f"Replay sample of the train split: {len(y_replay):,} rows")
+
+    if verbose:
+        print(f"\nAppending {rounds} trees to the {model.get_booster().num_boosted_rounds()} "
+              f"of model {version} ({len(y_train):,} rows)...")
+    candidate = warm_start(model, X_train, y_train, rounds)
+
+    # Held-out test split, with the evaluation breakdown of the training pipeline
+    X_test, y_test = engineered_split(processed_dir / "test.parquet", engineer, scenario_type)
+    groups = {
+        'scenario_type': scenario_labels(processed_dir, scenario_type),
+        'matchup': type_matchups(X_test, feature_columns),
+    }
+    if groups['scenario_type'] is not None and len(groups['scenario_type']) != len(y_test):
+        # load_splits fell back to the full dataset: no row labels for the filtered split
+        groups['scenario_type'] = None
+    production = evaluate_model(model, X_new, X_test, y_new, y_test, model_name=f"production_{version}",
+                                verbose=False, groups=groups)
+    metrics = evaluate_model(candidate, X_new, X_test, y_new, y_test, model_name=f"continual_{output_version}",
+                             verbose=verbose, groups=groups)
+    exported = quality_holds(production, metrics, max_degradation)
+
+    if verbose:
+        print("\n" + "=" * 80)
+        print("CONTINUAL TRAINING - QUALITY GATE")
+        print("=" * 80)
+        print(f"{'':24s} {'production':>12s} {'candidate':>12s}")
+        for name in ('train_accuracy', 'test_accuracy', 'test_roc_auc'):
+            label = 'production_accuracy' if name == 'train_accuracy' else name
+            print(f"{label:24s} {production[name]:12.4f} {metrics[name]:12.4f}")
+        print(f"\nMax degradation: {max_degradation}")
+        print("[OK] Quality holds: exporting the candidate" if exported
+              else "[WARN] Quality does not hold: candidate discarded, production model kept")
+
+    if exported:
+        hyperparams = {
+            **metadata.get('hyperparameters', {}),
+            'n_estimators': candidate.n_estimators,
+            'warm_start_from': version,
+            'warm_start_rounds': rounds,
+        }
+        export_model(candidate, scalers, feature_columns, metrics, hyperparams=hyperparams,
+                     version=output_version, categorical_encoding=metadata.get('categorical_encoding'),
+                     verbose=verbose)
+
+    return {
+        'production': production,
+        'candidate': metrics,
+        'labelled_rows': len(y_new),
+        'skipped_rows': len(rows) - len(y_new),
+        'exported': exported,
+        'elapsed_seconds': time.time() - start,
+    }
+
+
+def main():
+    """Refresh the production model from the command line."""
+    parser = argparse.ArgumentParser(
+        description="Warm-start the production XGBoost model on the captured production rows"
+    )
+    parser.add_argument('--version', type=str, default='v2',
+                        help='Suffix of the production model artifacts (default: v2)')
+    parser.add_argument('--output-version', type=str, default=None,
+                        help='Suffix of the exported candidate (default: --version, replacing production)')
+    parser.add_argument('--dataset-version', type=str, choices=['v1', 'v2'], default='v2',
+                        help='Dataset of the replay sample and held-out test split (default: v2)')
+    parser.add_argument('--scenario-type', type=str, default='all',
+                        help='Scenario of the replay sample and test split (default: all)')
+    parser.add_argument('--drift-dir', type=Path, default=DRIFT_DATA_DIR,
+                        help=f'Captured production rows (default: {DRIFT_DATA_DIR})')
+    parser.add_argument('--rounds', type=int, default=DEFAULT_CONTINUAL_ROUNDS,
+                        help=f'Trees appended to the booster, at most {MAX_CONTINUAL_ROUNDS} '
+                             f'(default: {DEFAULT_CONTINUAL_ROUNDS})')
+    parser.add_argument('--replay-rows', type=int, default=DEFAULT_REPLAY_ROWS,
+                        help=f'Train split rows trained on with the production rows (default: {DEFAULT_REPLAY_ROWS})')
+    parser.add_argument('--max-degradation', type=float, default=DEFAULT_MAX_DEGRADATION,
+                        help=f'Largest test accuracy / ROC-AUC drop accepted (default: {DEFAULT_MAX_DEGRADATION})')
+    parser.add_argument('--quiet', action='store_true', help='Suppress output')
+    args = parser.parse_args()
+
+    if not 1 <= args.rounds <= MAX_CONTINUAL_ROUNDS:
+        parser.error(f"--rounds must be between 1 and {MAX_CONTINUAL_ROUNDS}")
+    if args.replay_rows < 0:
+        parser.error("--replay-rows must be positive")
+
+    try:
+        result = refresh_model(
+            get_processed_dir(args.dataset_version), version=args.version, output_version=args.output_version,
+            drift_dir=args.drift_dir, scenario_type=args.scenario_type, rounds=args.rounds,
+            replay_rows=args.replay_rows, max_degradation=args.max_degradation, verbose=not args.quiet
+        )
+    except (FileNotFoundError, KeyError, ValueError) as e:
+        print(f"\n[ERROR] {e}")
+        sys.exit(1)
+
+    if not args.quiet:
+        print(f"\n[OK] Continual training complete in {result['elapsed_seconds']:.1f}s "
+              f"({'exported' if result['exported'] else 'not exported'})")
+
+
+if __name__ == "__main__":
+    main()
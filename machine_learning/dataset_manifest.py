@@ -0,0 +1,134 @@
+"""Content-hash manifest of a v2 dataset build and incremental rebuild plans.
+
+manifest.json records a hash of each Pokemon (stats, types, valid moves),
+of the type chart and of the generation settings, plus the statistics of
+each written partition. Comparing it with the manifest of the data being
+built tells which Pokemon changed: plan_rebuild() returns the Pokemon
+whose matchups must be regenerated, and iter_rebuild_shards() generates
+only those matchups, spliced into their partitions by DatasetWriter
+(dataset_writer.py). Any other difference forces a full rebuild.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, NamedTuple, Set
+
+import numpy as np
+
+from machine_learning.battle_engine import iter_shards
+from machine_learning.config import RANDOM_SEED
+
+# Bump when generation or the file layout changes: older manifests then trigger a full rebuild
+MANIFEST_VERSION = 5
+
+
+class RebuildPlan(NamedTuple):
+    """Incremental rebuild of one scenario, derived from the previous manifest."""
+
+    changed: Set[int]  # New Pokemon or Pokemon whose content hash changed
+    removed: Set[int]  # Pokemon no longer in the data
+    partitions: Dict[str, Dict[str, int]]  # Previous partition stats by partition key
+
+
+def build_manifest(engine, settings):
+    """
+    Manifest of the data a build is generated from.
+
+    Args:
+        engine: BattleEngine built from the Pokemon, moves and type chart
+        settings: Generation settings (seed, level, split ratio)
+
+    Returns:
+        dict: Settings, type chart hash and content hash per Pokemon ID
+    """
+    return {
+        'version': MANIFEST_VERSION,
+        'settings': settings,
+        'type_chart': engine.type_chart_hash(),
+        'pokemon': {str(pokemon_id): digest for pokemon_id, digest in engine.content_hashes().items()},
+        'scenarios': {},
+    }
+
+
+def load_manifest(path):
+    """Load the manifest of the previous build, or None if missing or unreadable."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_manifest(manifest, path):
+    """Write the manifest of a completed build."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def plan_rebuild(previous, current, scenario_type, options):
+    """
+    Decide how to rebuild a scenario from the previous manifest.
+
+    Args:
+        previous: Manifest of the previous build (or None)
+        current: Manifest of the data being built
+        scenario_type: Scenario name
+        options: Scenario options (samples / combinations per matchup)
+
+    Returns:
+        RebuildPlan, or None when the scenario must be fully rebuilt
+        (no previous build, other settings, options or type chart)
+    """
+    if not previous or previous.get('version') != current['version']:
+        return None
+    if previous.get('settings') != current['settings'] or previous.get('type_chart') != current['type_chart']:
+        return None
+    scenario = previous.get('scenarios', {}).get(scenario_type)
+    if scenario is None or scenario.get('options') != options:
+        return None
+
+    old_hashes = previous.get('pokemon', {})
+    new_hashes = current['pokemon']
+    changed = {int(pokemon_id) for pokemon_id, digest in new_hashes.items() if old_hashes.get(pokemon_id) != digest}
+    removed = {int(pokemon_id) for pokemon_id in old_hashes if pokemon_id not in new_hashes}
+    return RebuildPlan(changed, removed, scenario['partitions'])
+
+
+def scenario_options(scenario_type, options):
+    """Options the rows of a scenario depend on (a change forces its full rebuild)."""
+    if scenario_type == "random_move":
+        return {"num_samples": options["num_samples"]}
+    if scenario_type == "all_combinations":
+        return {"max_per_matchup": options["max_per_matchup"]}
+    return {}
+
+
+def iter_rebuild_shards(engine, scenario_type, plan, workers=1, **options):
+    """
+    Shards to generate for an incremental rebuild.
+
+    Changed attackers are regenerated against every defender; the other
+    attackers only against the changed defenders (spliced by the writer).
+
+    Args:
+        engine: BattleEngine built from the Pokemon, moves and type chart
+        scenario_type: Scenario name
+        plan: RebuildPlan from plan_rebuild
+        workers: Number of processes
+        **options: batch_size / num_samples / max_per_matchup
+
+    Yields:
+        Tuple (attacker Pokemon ID, batches)
+    """
+    is_changed = np.isin(engine.pokemon_ids, list(plan.changed))
+    changed_rows = np.flatnonzero(is_changed)
+
+    yield from iter_shards(
+        engine, scenario_type, RANDOM_SEED, workers=workers, attackers=changed_rows, **options
+    )
+    if plan.changed or plan.removed:
+        yield from iter_shards(
+            engine, scenario_type, RANDOM_SEED, workers=workers,
+            attackers=np.flatnonzero(~is_changed), defenders=changed_rows, **options
+        )
@@ -0,0 +1,405 @@
+"""Partitioned Parquet writer of the v2 dataset (raw, train and test).
+
+DatasetWriter streams generated batches to Parquet partitions of matchup
+blocks, draws the train/test split per matchup, shuffles rows within
+each row group and publishes the files atomically. With a RebuildPlan
+(dataset_manifest.py), only the partitions of changed Pokemon are
+rewritten: their previous rows are spliced with the regenerated ones.
+"""
+
+import os
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from machine_learning.battle_engine import DATASET_SCHEMA, SCENARIO_STREAMS, MatchupRandom
+from machine_learning.config import RANDOM_SEED
+from machine_learning.dataset_manifest import RebuildPlan
+
+# Random streams of the train/test split and of the row group shuffle (distinct from the scenarios)
+SPLIT_STREAM = 100
+SHUFFLE_STREAM = 101
+
+# Pokemon IDs per partition block (see DatasetWriter)
+PARTITION_BLOCK = 16
+
+# Statistics kept per partition
+PARTITION_STATS = ('train', 'test', 'train_wins', 'test_wins', 'matchups')
+
+
+def _new_matchup(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """True on the first row of each matchup (rows of a matchup are contiguous)."""
+    new_matchup = np.ones(len(b), dtype=bool)
+    new_matchup[1:] = (a[1:] != a[:-1]) | (b[1:] != b[:-1])
+    return new_matchup
+
+
+class _Partition:
+    """Raw, train and test writers and statistics of one partition being written."""
+
+    def __init__(self, dataset, scenario_type, key):
+        self.dataset = dataset
+        self.scenario_type = scenario_type
+        self.paths = dataset.partition_paths(scenario_type, key)
+        self.writers = [None, None, None]
+        self.buffer = []
+        self.buffered_rows = 0
+        self.attacker = None
+        self.stats = dict.fromkeys(PARTITION_STATS, 0)
+
+    def add(self, table: pa.Table):
+        """
+        Buffer rows, written as row groups of about row_group_rows.
+
+        Row groups end at an attacker boundary once row_group_rows is
+        reached: their content only depends on the partition rows, whether
+        they arrive batch by batch (full build) or at once (splice).
+        """
+        a = table.column('pokemon_a_id').to_numpy()
+        bounds = np.flatnonzero(a[1:] != a[:-1]) + 1
+        for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(a)]):
+            attacker = int(a[start])
+            if attacker != self.attacker and self.buffered_rows >= self.dataset.row_group_rows:
+                self.flush()
+            self.attacker = attacker
+            self.buffer.append(table.slice(start, end - start))
+            self.buffered_rows += end - start
+
+    def flush(self):
+        if not self.buffered_rows:
+            return
+        table = pa.concat_tables(self.buffer)
+        self.buffer, self.buffered_rows = [], 0
+
+        train, test, matchups = self.dataset.split(table)
+        train = self.dataset.shuffle(train, self.scenario_type)
+        test = self.dataset.shuffle(test, self.scenario_type)
+        for i, part in enumerate((table, train, test)):
+            if part.num_rows == 0:
+                continue
+            if self.writers[i] is None:
+                self.writers[i] = self.dataset.open(self.paths[i])
+            self.writers[i].write_table(part)
+        if self.dataset.matrix is not None:
+            self.dataset.matrix.add('train', train)
+            self.dataset.matrix.add('test', test)
+        self.stats['train'] += train.num_rows
+        self.stats['test'] += test.num_rows
+        self.stats['train_wins'] += int(train.column('winner').to_numpy().sum())
+        self.stats['test_wins'] += int(test.column('winner').to_numpy().sum())
+        self.stats['matchups'] += matchups
+
+    def close(self, success=True):
+        """Write the remaining rows; files without rows replace previous ones by nothing."""
+        try:
+            if success:
+                self.flush()
+        finally:
+            for writer in self.writers:
+                if writer is not None:
+                    writer.close()
+        self.dataset.obsolete += [path for path, writer in zip(self.paths, self.writers) if writer is None]
+        return self.stats
+
+
+class DatasetWriter:
+    """
+    Write the dataset as Parquet partitions of matchup blocks.
+
+    Pokemon IDs are grouped in blocks of block_size; partition "i-j" holds
+    the matchups of attackers of block i against defenders of block j, in
+    (attacker, defender) ID order. A changed Pokemon then only touches the
+    partitions of its row and column of blocks.
+
+    Each dataset is a directory, read as a single table by pd.read_parquet:
+        raw/matchups_<scenario>.parquet/<i>-<j>.parquet
+        processed/train.parquet/scenario_type=<scenario>/<i>-<j>.parquet
+        processed/test.parquet/scenario_type=<scenario>/<i>-<j>.parquet
+
+    The processed splits are hive-partitioned by scenario: a reader
+    filtering on scenario_type (pd.read_parquet filters) only opens the
+    files of that scenario.
+
+    Rows are assigned to train or test by matchup, from a hash of
+    (seed, Pokemon A ID, Pokemon B ID): every row of a matchup (move
+    variants, random samples, every scenario) lands on the same side, and a
+    partition only depends on its own rows, so splicing a partition gives
+    the same rows as a full build. Raw files keep the (A, B) order; train
+    and test rows are shuffled within each row group, in an order keyed
+    by a hash of each row.
+
+    Files are written under a hidden temporary name and published on success.
+    The train and test rows can also be streamed to a FeatureMatrixWriter.
+    """
+
+    def __init__(self, raw_dir, processed_dir, test_size=0.2, seed=RANDOM_SEED,
+                 block_size=PARTITION_BLOCK, row_group_rows=10_000, matrix=None):
+        """Prepare the output directories (matrix: optional FeatureMatrixWriter)."""
+        self.raw_dir = Path(raw_dir)
+        self.processed_dir = Path(processed_dir)
+        self.test_size = test_size
+        self.seed = seed
+        self.block_size = block_size
+        self.row_group_rows = row_group_rows
+        self.matrix = matrix
+        self.stats = {}
+        self.partitions = {}
+
+        self.train_path = self.processed_dir / "train.parquet"
+        self.test_path = self.processed_dir / "test.parquet"
+
+        self.obsolete = []  # Files deleted on success
+        self._pending = []  # (temporary path, final path)
+        self._created_dirs = []
+        self._generated = 0
+        for directory in (self.raw_dir, self.processed_dir, self.train_path, self.test_path):
+            self._make_dir(directory)
+
+    def _make_dir(self, directory: Path) -> Path:
+        if directory.is_file():
+            # Single-file dataset written by older versions
+            directory.unlink()
+        if not directory.exists():
+            directory.mkdir(parents=True)
+            self._created_dirs.append(directory)
+        return directory
+
+    def _raw_dir(self, scenario_type) -> Path:
+        return self.raw_dir / f"matchups_{scenario_type}.parquet"
+
+    def _split_dirs(self, scenario_type) -> List[Path]:
+        """Hive partitions of a scenario in the train and test datasets."""
+        return [directory / f"scenario_type={scenario_type}" for directory in (self.train_path, self.test_path)]
+
+    def partition_paths(self, scenario_type, key):
+        """Raw, train and test files of a partition."""
+        raw_dir = self._make_dir(self._raw_dir(scenario_type))
+        train_dir, test_dir = (self._make_dir(directory) for directory in self._split_dirs(scenario_type))
+        return (
+            raw_dir / f"{key}.parquet",
+            train_dir / f"{key}.parquet",
+            test_dir / f"{key}.parquet",
+        )
+
+    def _scenario_files(self, scenario_type):
+        """Existing files of a scenario."""
+        files = list(self._raw_dir(scenario_type).glob("*.parquet"))
+        for directory in self._split_dirs(scenario_type):
+            files += directory.glob("*.parquet")
+        for directory in (self.train_path, self.test_path):
+            # Flat <scenario>-<i>-<j>.parquet files written by older versions
+            files += directory.glob(f"{scenario_type}-*.parquet")
+        return files
+
+    def open(self, path: Path) -> pq.ParquetWriter:
+        """Parquet writer on the temporary name of path."""
+        # Hidden name: ignored by readers of the directory until published
+        temp_path = path.with_name(f".{path.name}.tmp")
+        self._pending.append((temp_path, path))
+        return pq.ParquetWriter(temp_path, DATASET_SCHEMA)
+
+    def split(self, table: pa.Table):
+        """
+        Split rows between train and test (deterministic per matchup).
+
+        The draw is keyed by (seed, Pokemon A ID, Pokemon B ID) only: a matchup
+        is on the same side in every scenario, so no test matchup is seen in train.
+
+        Returns:
+            Tuple (train, test, number of matchups in table)
+        """
+        a = table.column('pokemon_a_id').to_numpy()
+        b = table.column('pokemon_b_id').to_numpy()
+
+        split_random = MatchupRandom(self.seed, SPLIT_STREAM)
+        is_test = split_random.uniform(a, b, np.zeros(len(a), dtype=np.int64)) < self.test_size
+        return table.filter(pa.array(~is_test)), table.filter(pa.array(is_test)), int(_new_matchup(a, b).sum())
+
+    def shuffle(self, table: pa.Table, scenario_type) -> pa.Table:
+        """Rows of a row group in an order keyed by (seed, scenario, matchup, row index in the matchup)."""
+        a = table.column('pokemon_a_id').to_numpy()
+        b = table.column('pokemon_b_id').to_numpy()
+
+        # Rows of a matchup are contiguous: index of each row within its matchup
+        positions = np.arange(len(b))
+        row_in_matchup = positions - np.maximum.accumulate(np.where(_new_matchup(a, b), positions, 0))
+
+        shuffle_random = MatchupRandom(self.seed, SHUFFLE_STREAM, SCENARIO_STREAMS[scenario_type])
+        return table.take(np.argsort(shuffle_random.uniform(a, b, row_in_matchup), kind='stable'))
+
+    def _key(self, a_block, b_block) -> str:
+        return f"{a_block:03d}-{b_block:03d}"
+
+    def _by_defender_block(self, table: pa.Table):
+        """Split a table by defender block (row order is kept)."""
+        blocks = table.column('pokemon_b_id').to_numpy() // self.block_size
+        if np.all(blocks[1:] >= blocks[:-1]):
+            # Defenders in ID order (as generated): zero-copy slices
+            bounds = np.flatnonzero(np.diff(blocks)) + 1
+            for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(blocks)]):
+                yield int(blocks[start]), table.slice(start, end - start)
+            return
+        for block in np.unique(blocks):
+            yield int(block), table.filter(pa.array(blocks == block))
+
+    def _tables(self, shards):
+        """(attacker block, defender block, rows) of every generated batch."""
+        for pokemon_id, batches in shards:
+            a_block = pokemon_id // self.block_size
+            for table, _ in batches:
+                if table.num_rows == 0:
+                    continue
+                self._generated += table.num_rows
+                for b_block, part in self._by_defender_block(table):
+                    yield a_block, b_block, part
+
+    def _write_full(self, scenario_type, shards):
+        """Stream shards (in Pokemon ID order) to the partitions of a scenario."""
+        self.obsolete += self._scenario_files(scenario_type)
+        partitions = {}
+        open_partitions = {}  # Partitions of the current attacker block
+        current_block, closed_blocks = None, set()
+        try:
+            for a_block, b_block, table in self._tables(shards):
+                if a_block != current_block:
+                    for key, partition in open_partitions.items():
+                        partitions[key] = partition.close()
+                    open_partitions = {}
+                    closed_blocks.add(current_block)
+                    if a_block in closed_blocks:
+                        raise ValueError("Shards must be generated in Pokemon ID order")
+                    current_block = a_block
+
+                key = self._key(a_block, b_block)
+                if key not in open_partitions:
+                    open_partitions[key] = _Partition(self, scenario_type, key)
+                open_partitions[key].add(table)
+        except BaseException:
+            for partition in open_partitions.values():
+                partition.close(success=False)
+            raise
+
+        for key, partition in open_partitions.items():
+            partitions[key] = partition.close()
+        return partitions
+
+    def _write_incremental(self, scenario_type, shards, plan):
+        """Splice regenerated matchups into the partitions they belong to."""
+        partitions = dict(plan.partitions)
+
+        # Regenerated rows only involve changed Pokemon: small enough to hold
+        new_rows = defaultdict(list)
+        for a_block, b_block, table in self._tables(shards):
+            new_rows[self._key(a_block, b_block)].append(table)
+
+        replaced = plan.changed | plan.removed
+        replaced_blocks = {pokemon_id // self.block_size for pokemon_id in replaced}
+        touched = sorted(
+            key for key in set(partitions) | set(new_rows)
+            if int(key[:3]) in replaced_blocks or int(key[4:]) in replaced_blocks
+        )
+        for key in touched:
+            table = self._splice(scenario_type, key, new_rows.get(key, []), replaced)
+            partition = _Partition(self, scenario_type, key)
+            try:
+                partition.add(table)
+            finally:
+                stats = partition.close()
+            if stats['train'] + stats['test']:
+                partitions[key] = stats
+            else:
+                partitions.pop(key, None)
+        return partitions
+
+    def _splice(self, scenario_type, key, tables, replaced):
+        """Previous rows of a partition without replaced Pokemon, plus the new rows."""
+        raw_path = self.partition_paths(scenario_type, key)[0]
+        parts = []
+        if raw_path.exists():
+            previous = pq.read_table(raw_path, schema=DATASET_SCHEMA)
+            a = previous.column('pokemon_a_id').to_numpy()
+            b = previous.column('pokemon_b_id').to_numpy()
+            kept = ~(np.isin(a, list(replaced)) | np.isin(b, list(replaced)))
+            parts.append(previous.filter(pa.array(kept)))
+        parts.extend(tables)
+        if not parts:
+            return DATASET_SCHEMA.empty_table()
+
+        # (attacker, defender) ID order as in a full build; rows of a matchup keep their order
+        merged = pa.concat_tables(parts)
+        order = np.lexsort((merged.column('pokemon_b_id').to_numpy(), merged.column('pokemon_a_id').to_numpy()))
+        return merged.take(order)
+
+    def write_scenario(self, scenario_type, shards, plan: Optional[RebuildPlan] = None):
+        """
+        Write the partitions of a scenario.
+
+        Without a plan every partition is rewritten and leftovers of the
+        previous build are removed. With a plan, only the partitions
+        holding changed or removed Pokemon are rewritten: their previous
+        rows for those Pokemon are replaced by the regenerated ones.
+
+        Args:
+            scenario_type: Scenario name
+            shards: Iterator of (attacker Pokemon ID, batches) from iter_shards
+            plan: Incremental rebuild plan (None = full rebuild)
+
+        Raises:
+            ValueError: If a plan is given while writing a feature matrix
+                (the matrix and its scalers cover every row)
+        """
+        if plan is not None and self.matrix is not None:
+            raise ValueError("A feature matrix can only be written by a full rebuild")
+        start = time.perf_counter()
+        self._generated = 0
+
+        if plan is None:
+            partitions = self._write_full(scenario_type, shards)
+        else:
+            partitions = self._write_incremental(scenario_type, shards, plan)
+
+        stats = {key: sum(counts[key] for counts in partitions.values()) for key in PARTITION_STATS}
+        stats['generated'] = generated = self._generated
+        stats['seconds'] = time.perf_counter() - start
+        self.stats[scenario_type] = stats
+        self.partitions[scenario_type] = partitions
+
+        rows = stats['train'] + stats['test']
+        print(f"\n Generated {generated:,} samples ({rows:,} in the scenario)")
+        print(f" Throughput: {generated / max(stats['seconds'], 1e-9):,.0f} rows/s ({stats['seconds']:.1f}s)")
+        print(f" Raw dataset: {self._raw_dir(scenario_type)}")
+
+    def drop_scenario(self, scenario_type):
+        """Remove the files of a scenario not part of this build."""
+        self.obsolete += self._scenario_files(scenario_type)
+
+    def close(self, success=True):
+        """Publish (or discard) the written files."""
+        if success:
+            for path in self.obsolete:
+                path.unlink(missing_ok=True)
+            for temp_path, path in self._pending:
+                os.replace(temp_path, path)
+            # Scenario partitions left without files
+            for directory in {path.parent for path in self.obsolete}:
+                if directory.parent in (self.train_path, self.test_path) and not any(directory.iterdir()):
+                    directory.rmdir()
+        else:
+            for temp_path, _ in self._pending:
+                temp_path.unlink(missing_ok=True)
+            for directory in reversed(self._created_dirs):
+                if directory.exists() and not any(directory.iterdir()):
+                    directory.rmdir()
+        self._pending = []
+        self.obsolete = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(success=exc_type is None)
@@ -0,0 +1,169 @@
+"""Readers of the processed train/test datasets.
+
+The v2 builder writes each split as a hive-partitioned Parquet dataset:
+
+    processed/train.parquet/scenario_type=<scenario>/<i>-<j>.parquet
+
+Selecting a scenario is pushed down to pyarrow as a filter on the
+partition key, so only the files of that scenario are opened, and the
+columns can be projected to the ones the model uses. v1 datasets (single
+file, no scenario_type column) are read as before.
+
+iter_split_batches() reads a split in bounded batches of rows, for
+training on datasets that do not fit in memory.
+"""
+
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from machine_learning.config import FeatureEngineeringConfig
+
+
+def dataset_columns(path) -> List[str]:
+    """Column names of a Parquet file or dataset directory (schema only, no row is read)."""
+    return pq.ParquetDataset(path).schema.names
+
+
+def model_columns(path, config: Optional[FeatureEngineeringConfig] = None) -> List[str]:
+    """
+    Columns used by PokemonFeatureEngineer.fit_transform.
+
+    Args:
+        path: Parquet file or dataset directory
+        config: Feature configuration (default: FeatureEngineeringConfig())
+
+    Returns:
+        Dataset columns without the ID/name columns and scenario_type
+    """
+    config = config or FeatureEngineeringConfig()
+    dropped = set(config.id_features) | {'scenario_type'}
+    return [name for name in dataset_columns(path) if name not in dropped]
+
+
+def read_split(path, scenario_type: str = "all", columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    Read a processed split, optionally restricted to one scenario.
+
+    Args:
+        path: train.parquet or test.parquet (file or dataset directory)
+        scenario_type: Scenario to keep; "all" keeps everything
+        columns: Columns to read (None = all)
+
+    Returns:
+        DataFrame of the selected rows and columns
+
+    Raises:
+        KeyError: If a scenario is requested and the dataset has no scenario_type column
+    """
+    filters = None
+    if scenario_type != "all":
+        if 'scenario_type' not in dataset_columns(path):
+            raise KeyError(f"No scenario_type column in {path}")
+        filters = [('scenario_type', '==', scenario_type)]
+    return pd.read_parquet(path, columns=list(columns) if columns is not None else None, filters=filters)
+
+
+def iter_split_batches(path, scenario_type: str = "all", columns: Optional[Sequence[str]] = None,
+                       batch_rows: int = 262_144) -> Iterator[pd.DataFrame]:
+    """
+    Read a processed split as DataFrames of at most batch_rows rows.
+
+    Small files are merged into full batches; the split is never loaded whole.
+
+    Args:
+        path: train.parquet or test.parquet (file or dataset directory)
+        scenario_type: Scenario to keep; "all" keeps everything
+        columns: Columns to read (None = all)
+        batch_rows: Maximum rows per DataFrame
+
+    Yields:
+        DataFrames of the selected rows and columns, in dataset order
+
+    Raises:
+        KeyError: If a scenario is requested and the dataset has no scenario_type column
+    """
+    # Files keep their scenario_type column (dictionary-encoded): same type for the partition key
+    dataset = ds.dataset(path, format="parquet", partitioning=ds.HivePartitioning.discover(infer_dictionary=True))
+    expression = None
+    if scenario_type != "all":
+        if 'scenario_type' not in dataset.schema.names:
+            raise KeyError(f"No scenario_type column in {path}")
+        expression = ds.field('scenario_type') == scenario_type
+
+    pending, pending_rows = [], 0
+    for batch in dataset.to_batches(columns=list(columns) if columns is not None else None,
+                                    filter=expression, batch_size=batch_rows):
+        while batch.num_rows:
+            taken = batch.slice(0, batch_rows - pending_rows)
+            pending.append(taken)
+            pending_rows += taken.num_rows
+            batch = batch.slice(taken.num_rows)
+            if pending_rows == batch_rows:
+                yield pa.Table.from_batches(pending).to_pandas()
+                pending, pending_rows = [], 0
+    if pending_rows:
+        yield pa.Table.from_batches(pending).to_pandas()
+
+
+def load_splits(processed_dir, scenario_type: str = "all", columns: Optional[Sequence[str]] = None,
+                verbose: bool = True) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Load the train and test splits of a scenario.
+
+    Falls back to the full dataset (with a warning) when the dataset has no
+    scenario_type column or when the scenario leaves a split empty.
+
+    Args:
+        processed_dir: Directory of train.parquet and test.parquet
+        scenario_type: Scenario to keep; "all" keeps everything
+        columns: Columns to read (None = all)
+        verbose: Print the filtering summary
+
+    Returns:
+        Tuple (df_train, df_test)
+    """
+    train_path = Path(processed_dir) / "train.parquet"
+    test_path = Path(processed_dir) / "test.parquet"
+
+    if scenario_type != "all":
+        try:
+            df_train = read_split(train_path, scenario_type, columns)
+            df_test = read_split(test_path, scenario_type, columns)
+        except KeyError:
+            if verbose:
+                print(f"[WARN] scenario_type filtering skipped: column missing (requested '{scenario_type}').")
+        else:
+            if not df_train.empty and not df_test.empty:
+                if verbose:
+                    print(f"Filtering scenario_type='{scenario_type}': "
+                          f"train {len(df_train):,} rows, test {len(df_test):,} rows (other scenarios not read)")
+                return df_train, df_test
+            if verbose:
+                print(f"[WARN] scenario_type='{scenario_type}' produced empty split; fallback to full dataset.")
+
+    return read_split(train_path, columns=columns), read_split(test_path, columns=columns)
+
+
+def scenario_labels(processed_dir, scenario_type: str = "all", split: str = "test") -> Optional[pd.Series]:
+    """
+    scenario_type of each row load_splits() returns for a split, in the same order.
+
+    Only the partition column is read (same filtering and fallback as load_splits).
+
+    Args:
+        processed_dir: Directory of train.parquet and test.parquet
+        scenario_type: Scenario passed to load_splits
+        split: 'train' or 'test'
+
+    Returns:
+        Series of scenario labels, None if the dataset has no scenario_type column
+    """
+    if 'scenario_type' not in dataset_columns(Path(processed_dir) / f"{split}.parquet"):
+        return None
+    df_train, df_test = load_splits(processed_dir, scenario_type, columns=['scenario_type'], verbose=False)
+    return (df_train if split == 'train' else df_test)['scenario_type']
@@ -1,53 +1,257 @@
-"""Model evaluation functions for Pokemon battle prediction."""
+"""Model evaluation functions for Pokemon battle prediction.
 
-from typing import Any, Dict, List, Tuple
+evaluate_model() predicts each split once, in chunks of rows, and derives
+every metric from the positive-class probabilities: predictions are
+proba > 0.5 (what predict() returns for XGBoost and RandomForest), the
+confusion counts are accumulated chunk by chunk and only the test
+probabilities are kept (for the ROC-AUC). Test metrics can be broken
+down by groups of rows, e.g. per scenario_type and per type matchup.
+"""
 
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
 import pandas as pd
-from sklearn.metrics import (
-    accuracy_score,
-    classification_report,
-    confusion_matrix,
-    f1_score,
-    precision_score,
-    recall_score,
-    roc_auc_score,
-)
+import scipy.sparse as sp
+from scipy.stats import rankdata
+from sklearn.metrics import classification_report, roc_auc_score
+
+# Rows predicted at once: bounds the copy XGBoost and RandomForest make of the features
+EVALUATION_CHUNK_ROWS = 65_536
+
+# Groups printed per breakdown (lowest accuracy first)
+BREAKDOWN_PRINT_ROWS = 10
+
+
+def _row_chunks(X, chunk_rows: int) -> Iterator[Tuple[int, int, Any]]:
+    """(start, stop, rows) of a DataFrame, array or CSR matrix, chunk_rows rows at a time."""
+    for start in range(0, X.shape[0], chunk_rows):
+        stop = min(start + chunk_rows, X.shape[0])
+        yield start, stop, X.iloc[start:stop] if isinstance(X, pd.DataFrame) else X[start:stop]
+
+
+def confusion_counts(y_true, y_pred, codes: Optional[np.ndarray] = None, n_groups: int = 1) -> np.ndarray:
+    """
+    Binary confusion counts, per group of rows.
+
+    Args:
+        y_true: True labels (0/1)
+        y_pred: Predicted labels (0/1)
+        codes: Group of each row, in [0, n_groups) (None: a single group)
+        n_groups: Number of groups
+
+    Returns:
+        int64 array (n_groups, 2, 2) indexed [group, true label, predicted label]
+    """
+    flat = 2 * np.asarray(y_true, dtype=np.int64) + np.asarray(y_pred, dtype=np.int64)
+    if codes is not None:
+        flat = flat + 4 * np.asarray(codes, dtype=np.int64)
+    return np.bincount(flat, minlength=4 * n_groups).reshape(n_groups, 2, 2)
+
+
+def scores_from_counts(counts: np.ndarray) -> Dict[str, float]:
+    """
+    Accuracy, precision, recall and F1 of confusion counts [true label, predicted label].
+
+    Undefined ratios are 0.0, like sklearn's zero_division default.
+    """
+    (tn, fp), (fn, tp) = counts.tolist()
+    samples = tn + fp + fn + tp
+    return {
+        'accuracy': (tn + tp) / samples if samples else 0.0,
+        'precision': tp / (tp + fp) if tp + fp else 0.0,
+        'recall': tp / (tp + fn) if tp + fn else 0.0,
+        'f1': 2 * tp / (2 * tp + fp + fn) if tp else 0.0,
+    }
+
+
+def type_matchups(X, feature_columns: Sequence[str], first: str = 'a_type_1', second: str = 'b_type_1',
+                  chunk_rows: int = EVALUATION_CHUNK_ROWS) -> Optional[pd.Categorical]:
+    """
+    Type matchup of each row ("<first type> vs <second type>"), read from the one-hot columns.
+
+    Rows whose type has no one-hot column (value unseen in train) get the type "unknown".
+
+    Args:
+        X: Engineered features (DataFrame, array or CSR matrix)
+        feature_columns: Columns of X
+        first: Categorical feature of the first type
+        second: Categorical feature of the second type
+        chunk_rows: Rows decoded at once
+
+    Returns:
+        Categorical of len(X) labels, None if X has no one-hot column for first or second
+    """
+    types, positions = [], []
+    for feature in (first, second):
+        prefix = f"{feature}_"
+        columns = [i for i, name in enumerate(feature_columns) if name.startswith(prefix)]
+        if not columns:
+            return None
+        types.append([feature_columns[i][len(prefix):] for i in columns] + ['unknown'])
+        positions.append(columns)
+
+    codes = np.empty(X.shape[0], dtype=np.int64)
+    for start, stop, rows in _row_chunks(X, chunk_rows):
+        code = np.zeros(stop - start, dtype=np.int64)
+        for values, columns in zip(types, positions):
+            if sp.issparse(rows):
+                block = rows[:, columns].toarray()
+            elif isinstance(rows, pd.DataFrame):
+                block = rows.iloc[:, columns].to_numpy()
+            else:
+                block = np.asarray(rows)[:, columns]
+            index = block.argmax(axis=1)
+            index[block.max(axis=1) <= 0] = len(values) - 1
+            code = code * len(values) + index
+        codes[start:stop] = code
+    categories = [f"{a} vs {b}" for a in types[0] for b in types[1]]
+    return pd.Categorical.from_codes(codes, categories)
+
+
+def _group_codes(groups: Optional[Mapping[str, Any]], n_rows: int) -> Dict[str, pd.Categorical]:
+    """Groups as Categoricals of n_rows labels (missing labels: code -1, left out)."""
+    categoricals = {}
+    for name, labels in (groups or {}).items():
+        if labels is None:
+            continue
+        labels = labels if isinstance(labels, pd.Categorical) else pd.Categorical(np.asarray(labels))
+        if len(labels) != n_rows:
+            raise ValueError(f"Group '{name}' has {len(labels)} labels for {n_rows} test rows")
+        categoricals[name] = labels
+    return categoricals
+
+
+def _rank_roc_auc(y_true: np.ndarray, proba: np.ndarray) -> Optional[float]:
+    """ROC-AUC as the Mann-Whitney statistic (ties averaged, as roc_auc_score); None with a single class."""
+    positives = int(y_true.sum())
+    negatives = len(y_true) - positives
+    if not positives or not negatives:
+        return None
+    ranks = rankdata(proba)
+    return float((ranks[y_true == 1].sum() - positives * (positives + 1) / 2) / (positives * negatives))
+
+
+def _breakdown(groups: Dict[str, pd.Categorical], counts: Dict[str, np.ndarray],
+               y_test: np.ndarray, y_test_proba: np.ndarray) -> Dict[str, Dict[str, Dict]]:
+    """Test metrics of every non-empty group, JSON-serializable."""
+    breakdown = {}
+    for name, labels in groups.items():
+        # Rows sorted by group once: each group is a slice (missing labels, code -1, come first)
+        codes = np.asarray(labels.codes)
+        order = np.argsort(codes, kind='stable')
+        ends = np.searchsorted(codes[order], np.arange(len(labels.categories)), side='right')
+        breakdown[name] = {}
+        for code, label in enumerate(labels.categories):
+            samples = int(counts[name][code].sum())
+            if not samples:
+                continue
+            rows = order[ends[code] - samples:ends[code]]
+            breakdown[name][str(label)] = {
+                'samples': samples,
+                **scores_from_counts(counts[name][code]),
+                'roc_auc': _rank_roc_auc(y_test[rows], y_test_proba[rows]),
+            }
+    return breakdown
 
 
 def evaluate_model(model: Any, X_train: pd.DataFrame, X_test: pd.DataFrame,
                    y_train: pd.Series, y_test: pd.Series,
                    model_name: str = "Model",
-                   verbose: bool = True) -> Dict[str, float]:
-    """Evaluate model and return performance metrics."""
+                   verbose: bool = True,
+                   groups: Optional[Mapping[str, Any]] = None,
+                   chunk_rows: int = EVALUATION_CHUNK_ROWS) -> Dict[str, float]:
+    """
+    Evaluate model and return performance metrics.
+
+    Each split is predicted once (predict_proba, chunk_rows rows at a
+    time); the train probabilities are dropped after each chunk.
+
+    Args:
+        model: Fitted classifier with predict_proba
+        X_train: Training features (DataFrame, array or CSR matrix)
+        X_test: Test features
+        y_train: Training labels
+        y_test: Test labels
+        model_name: Name reported in the metrics
+        verbose: Print the report
+        groups: Labels of the test rows by breakdown name (e.g.
+            {'scenario_type': ..., 'matchup': type_matchups(...)}); None values are skipped
+        chunk_rows: Rows predicted at once
+
+    Returns:
+        Metrics dict; with groups, 'breakdown' holds the test metrics per group
+
+    Raises:
+        ValueError: If a group does not have one label per test row
+    """
+    groups = _group_codes(groups, X_test.shape[0])
+    y_train, y_test = np.asarray(y_train), np.asarray(y_test)
+
+    train_counts = np.zeros((1, 2, 2), dtype=np.int64)
+    for start, stop, rows in _row_chunks(X_train, chunk_rows):
+        y_pred = model.predict_proba(rows)[:, 1] > 0.5
+        train_counts += confusion_counts(y_train[start:stop], y_pred)
+
+    y_test_proba = None
+    test_counts = np.zeros((1, 2, 2), dtype=np.int64)
+    group_counts = {name: np.zeros((len(labels.categories) + 1, 2, 2), dtype=np.int64)
+                    for name, labels in groups.items()}
+    for start, stop, rows in _row_chunks(X_test, chunk_rows):
+        proba = model.predict_proba(rows)[:, 1]
+        if y_test_proba is None:
+            y_test_proba = np.empty(len(y_test), dtype=proba.dtype)
+        y_test_proba[start:stop] = proba
+        y_true, y_pred = y_test[start:stop], proba > 0.5
+        test_counts += confusion_counts(y_true, y_pred)
+        for name, labels in groups.items():
+            # Missing labels (code -1) go to the last, unreported group
+            codes = np.asarray(labels.codes[start:stop], dtype=np.int64) % len(group_counts[name])
+            group_counts[name] += confusion_counts(y_true, y_pred, codes, len(group_counts[name]))
+    if y_test_proba is None:
+        y_test_proba = np.zeros(0)
+
+    breakdown = _breakdown(groups, group_counts, y_test, y_test_proba) if groups else None
+    return _report(model_name, train_counts[0], test_counts[0], y_test, y_test_proba,
+                   breakdown=breakdown, verbose=verbose)
+
+
+def evaluate_predictions(y_train, y_train_pred, y_test, y_test_pred, y_test_proba,
+                         model_name: str = "Model",
+                         verbose: bool = True) -> Dict[str, float]:
+    """Performance metrics of evaluate_model() from precomputed predictions (e.g. predicted by batches)."""
+    return _report(model_name, confusion_counts(y_train, y_train_pred)[0], confusion_counts(y_test, y_test_pred)[0],
+                   np.asarray(y_test), np.asarray(y_test_proba), y_test_pred=y_test_pred, verbose=verbose)
+
+
+def _report(model_name: str, train_counts: np.ndarray, test_counts: np.ndarray,
+            y_test: np.ndarray, y_test_proba: np.ndarray, y_test_pred=None,
+            breakdown: Optional[Dict] = None, verbose: bool = True) -> Dict[str, float]:
+    """Metrics dict of the confusion counts and test probabilities, printed if verbose."""
     if verbose:
         print("\n" + "=" * 80)
         print(f"MODEL EVALUATION - {model_name}")
         print("=" * 80)
 
-    # Predictions
-    y_train_pred = model.predict(X_train)
-    y_test_pred = model.predict(X_test)
-
-    # Probabilities for ROC-AUC
-    _ = model.predict_proba(X_train)[:, 1] # Train proba not used
-    y_test_proba = model.predict_proba(X_test)[:, 1]
-
     # Calculate metrics
+    test_scores = scores_from_counts(test_counts)
     metrics = {
         'model_name': model_name,
-        'train_accuracy': accuracy_score(y_train, y_train_pred),
-        'test_accuracy': accuracy_score(y_test, y_test_pred),
-        'test_precision': precision_score(y_test, y_test_pred),
-        'test_recall': recall_score(y_test, y_test_pred),
-        'test_f1': f1_score(y_test, y_test_pred),
-        'test_roc_auc': roc_auc_score(y_test, y_test_proba),
-        'train_samples': len(y_train),
-        'test_samples': len(y_test),
+        'train_accuracy': scores_from_counts(train_counts)['accuracy'],
+        'test_accuracy': test_scores['accuracy'],
+        'test_precision': test_scores['precision'],
+        'test_recall': test_scores['recall'],
+        'test_f1': test_scores['f1'],
+        'test_roc_auc': float(roc_auc_score(y_test, y_test_proba)),
+        'train_samples': int(train_counts.sum()),
+        'test_samples': int(test_counts.sum()),
     }
 
     # Overfitting check
     overfitting = metrics['train_accuracy'] - metrics['test_accuracy']
     metrics['overfitting'] = overfitting
+    if breakdown is not None:
+        metrics['breakdown'] = breakdown
 
     if verbose:
         print("\nPERFORMANCE METRICS")
@@ -64,20 +268,38 @@ def evaluate_model(model: Any, X_train: pd.DataFrame, X_test: pd.DataFrame,
         print("\n" + "-" * 80)
         print("CLASSIFICATION REPORT (Test Set)")
         print("-" * 80)
+        y_test_pred = y_test_proba > 0.5 if y_test_pred is None else y_test_pred
         print(classification_report(y_test, y_test_pred, target_names=['B wins', 'A wins']))
 
         # Confusion matrix
         print("Confusion Matrix:")
-        cm = confusion_matrix(y_test, y_test_pred)
+        cm = test_counts
         print(cm)
         print(f"\nTrue Negatives: {cm[0, 0]}")
         print(f"False Positives: {cm[0, 1]}")
         print(f"False Negatives: {cm[1, 0]}")
         print(f"True Positives: {cm[1, 1]}")
 
+        for name, group_metrics in (breakdown or {}).items():
+            print_breakdown(name, group_metrics)
+
     return metrics
 
 
+def print_breakdown(name: str, group_metrics: Dict[str, Dict], max_rows: int = BREAKDOWN_PRINT_ROWS):
+    """Print the test metrics of the groups of a breakdown, lowest accuracy first."""
+    print("\n" + "-" * 80)
+    print(f"BREAKDOWN BY {name.upper()} (Test Set, lowest accuracy first)")
+    print("-" * 80)
+    print(f"{'group':32s} {'samples':>9s} {'accuracy':>9s} {'f1':>7s} {'roc_auc':>8s}")
+    ranked = sorted(group_metrics.items(), key=lambda item: item[1]['accuracy'])
+    for label, m in ranked[:max_rows]:
+        roc_auc = f"{m['roc_auc']:.4f}" if m['roc_auc'] is not None else "n/a"
+        print(f"{label:32s} {m['samples']:9,d} {m['accuracy']:9.4f} {m['f1']:7.4f} {roc_auc:>8s}")
+    if len(ranked) > max_rows:
+        print(f"... {len(ranked) - max_rows} more groups")
+
+
 def analyze_feature_importance(model: Any, feature_columns: List[str],
                                top_n: int = 20,
                                verbose: bool = True) -> pd.DataFrame:
@@ -113,8 +335,17 @@ def analyze_feature_importance(model: Any, feature_columns: List[str],
 def compare_models(X_train: pd.DataFrame, X_test: pd.DataFrame,
                    y_train: pd.Series, y_test: pd.Series,
                    models_to_compare: List[str] = None,
-                   verbose: bool = True) -> Tuple[Any, str, Dict]:
-    """Train and compare multiple models, returning the best performing one based on test accuracy."""
+                   verbose: bool = True,
+                   parallel: bool = False,
+                   groups: Optional[Mapping[str, Any]] = None) -> Tuple[Any, str, Dict]:
+    """
+    Train and compare multiple models, returning the best performing one based on test accuracy.
+
+    With parallel=True the models are trained concurrently in a process
+    pool sharing the feature matrices (see machine_learning.parallel);
+    the models and metrics are those of the sequential comparison.
+    groups is passed to evaluate_model() (test metrics breakdown).
+    """
     # Import here to avoid circular dependency
     from machine_learning.run_machine_learning import train_model
 
@@ -129,19 +360,27 @@ def compare_models(X_train: pd.DataFrame, X_test: pd.DataFrame,
 
     results = []
     trained_models = {}
+    candidates = {}
+    if parallel:
+        from machine_learning.parallel import train_candidates
+        candidates = train_candidates(X_train, X_test, y_train, y_test, models_to_compare,
+                                      groups=groups, verbose=verbose)
 
     for model_type in models_to_compare:
-        if verbose:
-            print(f"\n{'─' * 80}")
-            print(f"Training {model_type}...")
-
-        # Train model
-        model = train_model(X_train, y_train, model_type=model_type, verbose=False)
+        if model_type in candidates:
+            model, metrics = candidates[model_type]
+        else:
+            if verbose:
+                print(f"\n{'─' * 80}")
+                print(f"Training {model_type}...")
+
+            # Train model
+            model = train_model(X_train, y_train, model_type=model_type, verbose=False)
+
+            # Evaluate model
+            metrics = evaluate_model(model, X_train, X_test, y_train, y_test,
+                                     model_name=model_type, verbose=False, groups=groups)
         trained_models[model_type] = model
-
-        # Evaluate model
-        metrics = evaluate_model(model, X_train, X_test, y_train, y_test,
-                                 model_name=model_type, verbose=False)
         results.append(metrics)
 
         if verbose:
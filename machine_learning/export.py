@@ -3,10 +3,11 @@
 import json
 import pickle
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import joblib
 import pandas as pd
+import scipy.sparse as sp
 
 from machine_learning.config import RANDOM_SEED
 from machine_learning.constants import MODELS_DIR
@@ -14,8 +15,14 @@ from machine_learning.constants import MODELS_DIR
 
 def export_model(model: Any, scalers: Dict, feature_columns: List[str],
                  metrics: Dict, *, hyperparams: Optional[Dict] = None,
-                 version: str = "v1", verbose: bool = True):
-    """Export trained model, scalers, and metadata to disk."""
+                 version: str = "v1", categorical_encoding: Optional[Dict] = None,
+                 verbose: bool = True):
+    """Export trained model, scalers, and metadata to disk.
+
+    categorical_encoding (CategoricalEncoder.to_dict()) is stored in the
+    metadata as plain data: the API encodes types without importing
+    machine_learning.
+    """
     if verbose:
         print("\n" + "=" * 80)
         print("MODEL EXPORT")
@@ -57,6 +64,8 @@ def export_model(model: Any, scalers: Dict, feature_columns: List[str],
         'metrics': metrics,
         'random_seed': RANDOM_SEED,
     }
+    if categorical_encoding is not None:
+        metadata['categorical_encoding'] = categorical_encoding
 
     metadata_path = MODELS_DIR / f"battle_winner_metadata_{version}.pkl"
     with open(metadata_path, 'wb') as f:
@@ -78,17 +87,56 @@ def export_model(model: Any, scalers: Dict, feature_columns: List[str],
     return str(model_path) # Return path for MLflow logging
 
 
+def load_model_artifacts(version: str = "v1") -> Tuple[Any, Dict, Dict]:
+    """
+    Model, scalers and metadata written by export_model() (same loading as the API).
+
+    Args:
+        version: Suffix of the exported artifacts
+
+    Returns:
+        Tuple (model, scalers, metadata)
+
+    Raises:
+        FileNotFoundError: If the model was not exported
+    """
+    model_path = MODELS_DIR / f"battle_winner_model_{version}.pkl"
+    if not model_path.exists():
+        raise FileNotFoundError(f"Model file not found: {model_path}")
+
+    # RandomForest models are joblib-compressed, the others pickled
+    try:
+        model = joblib.load(model_path)
+    except Exception:
+        with open(model_path, 'rb') as f:
+            model = pickle.load(f)
+    with open(MODELS_DIR / f"battle_winner_scalers_{version}.pkl", 'rb') as f:
+        scalers = pickle.load(f)
+    with open(MODELS_DIR / f"battle_winner_metadata_{version}.pkl", 'rb') as f:
+        metadata = pickle.load(f)
+    return model, scalers, metadata
+
+
 def export_features(X_train: pd.DataFrame, X_test: pd.DataFrame,
                     y_train: pd.Series, y_test: pd.Series,
                     features_dir, verbose: bool = True):
-    """Export feature-engineered datasets to Parquet format for reproducibility."""
+    """
+    Export feature-engineered datasets to Parquet format for reproducibility.
+
+    Sparse feature matrices (fit_transform(sparse=True)) are saved as
+    X_train.npz / X_test.npz (scipy.sparse.save_npz) instead.
+    """
     if verbose:
         print("\nExporting feature-engineered datasets...")
 
     features_dir.mkdir(parents=True, exist_ok=True)
 
-    X_train.to_parquet(features_dir / "X_train.parquet", index=False, engine='pyarrow')
-    X_test.to_parquet(features_dir / "X_test.parquet", index=False, engine='pyarrow')
+    if sp.issparse(X_train):
+        sp.save_npz(features_dir / "X_train.npz", X_train)
+        sp.save_npz(features_dir / "X_test.npz", X_test)
+    else:
+        X_train.to_parquet(features_dir / "X_train.parquet", index=False, engine='pyarrow')
+        X_test.to_parquet(features_dir / "X_test.parquet", index=False, engine='pyarrow')
     y_train.to_frame('winner').to_parquet(features_dir / "y_train.parquet", index=False, engine='pyarrow')
     y_test.to_frame('winner').to_parquet(features_dir / "y_test.parquet", index=False, engine='pyarrow')
 
@@ -0,0 +1,171 @@
+"""Out-of-core XGBoost training from the processed Parquet datasets.
+
+For splits that do not fit in memory (e.g. the exhaustive
+all_combinations scenario), the rows are read in batches
+(datasets.iter_split_batches) and never loaded whole:
+
+1. a first pass over train fits the categorical encoder and the scalers
+   (PokemonFeatureEngineer.partial_fit)
+2. XGBoost reads the engineered batches through a DataIter and builds an
+   ExtMemQuantileDMatrix, whose quantized pages are cached on disk
+3. train and test are predicted batch by batch for the evaluation
+
+Peak memory depends on the batch size, not on the number of rows. The
+model, scalers and feature columns are those of the in-memory pipeline,
+so export_model() and the API use them unchanged.
+"""
+
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import xgboost as xgb
+
+from machine_learning.config import XGBOOST_PARAMS, FeatureEngineeringConfig
+from machine_learning.datasets import iter_split_batches, model_columns
+from machine_learning.evaluation import evaluate_predictions
+from machine_learning.features import PokemonFeatureEngineer
+
+# Rows per batch: bounds the memory of a batch and of its engineered features
+DEFAULT_BATCH_ROWS = 262_144
+
+
+class FeatureBatchIter(xgb.DataIter):
+    """
+    XGBoost data iterator over the engineered batches of a processed split.
+
+    Args:
+        path: train.parquet or test.parquet
+        engineer: Fitted feature engineer
+        scenario_type: Scenario to keep; "all" keeps everything
+        batch_rows: Rows per batch
+        cache_prefix: Path prefix of the external memory pages (None for an in-memory QuantileDMatrix)
+    """
+
+    def __init__(self, path, engineer: PokemonFeatureEngineer, scenario_type: str = "all",
+                 batch_rows: int = DEFAULT_BATCH_ROWS, cache_prefix: Optional[str] = None):
+        self.path = path
+        self.engineer = engineer
+        self.scenario_type = scenario_type
+        self.batch_rows = batch_rows
+        self.columns = model_columns(path, engineer.config)
+        self._batches = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data) -> bool:
+        """Pass the next batch to XGBoost; False once the split is exhausted."""
+        if self._batches is None:
+            self._batches = iter_split_batches(self.path, self.scenario_type, self.columns, self.batch_rows)
+        df = next(self._batches, None)
+        if df is None:
+            return False
+        X = self.engineer.transform(df.drop(columns=['winner']))
+        input_data(data=X.to_numpy(dtype=np.float32), label=df['winner'].to_numpy(),
+                   feature_names=self.engineer.feature_columns)
+        return True
+
+    def reset(self):
+        """Restart from the first batch (XGBoost reads the split several times)."""
+        self._batches = None
+
+
+def fit_feature_engineer(path, scenario_type: str = "all", batch_rows: int = DEFAULT_BATCH_ROWS,
+                         config: Optional[FeatureEngineeringConfig] = None) -> PokemonFeatureEngineer:
+    """
+    Fit the encoder and scalers on the train split, one batch at a time.
+
+    Raises:
+        ValueError: If the split has no rows
+    """
+    engineer = PokemonFeatureEngineer(config)
+    for df in iter_split_batches(path, scenario_type, model_columns(path, engineer.config), batch_rows):
+        engineer.partial_fit(df)
+    if not engineer.feature_columns:
+        raise ValueError(f"No train rows in {path} (scenario_type='{scenario_type}')")
+    return engineer
+
+
+def train_external_memory(processed_dir, scenario_type: str = "all", params: Optional[Dict] = None,
+                          batch_rows: int = DEFAULT_BATCH_ROWS, cache_dir=None,
+                          config: Optional[FeatureEngineeringConfig] = None,
+                          verbose: bool = True) -> Tuple[xgb.XGBClassifier, PokemonFeatureEngineer]:
+    """
+    Train XGBoost on a processed train split that does not fit in memory.
+
+    Args:
+        processed_dir: Directory of train.parquet and test.parquet
+        scenario_type: Scenario to keep; "all" keeps everything
+        params: XGBClassifier parameters (default: XGBOOST_PARAMS)
+        batch_rows: Rows per batch
+        cache_dir: Parent directory of the temporary page cache (default: system temp)
+        config: Feature configuration (default: FeatureEngineeringConfig())
+        verbose: Print progress
+
+    Returns:
+        Tuple (model, engineer): fitted XGBClassifier and feature engineer
+    """
+    train_path = Path(processed_dir) / "train.parquet"
+
+    if verbose:
+        print("\n" + "=" * 80)
+        print("EXTERNAL MEMORY TRAINING (XGBOOST)")
+        print("=" * 80)
+        print(f"\n[1] Fitting encoder and scalers by batches of {batch_rows:,} rows...")
+    engineer = fit_feature_engineer(train_path, scenario_type, batch_rows, config)
+    if verbose:
+        print(f"   {len(engineer.feature_columns)} features")
+
+    model = xgb.XGBClassifier(**(params or XGBOOST_PARAMS))
+    with tempfile.TemporaryDirectory(prefix="xgb_cache_", dir=cache_dir) as cache:
+        if verbose:
+            print(f"\n[2] Building the external memory matrix (pages in {cache})...")
+        batches = FeatureBatchIter(train_path, engineer, scenario_type, batch_rows,
+                                   cache_prefix=os.path.join(cache, "train"))
+        dtrain = xgb.ExtMemQuantileDMatrix(batches, max_bin=model.max_bin)
+
+        if verbose:
+            print(f"   {dtrain.num_row():,} rows")
+            print(f"\n[3] Training {model.get_num_boosting_rounds()} rounds...")
+        booster = xgb.train(model.get_xgb_params(), dtrain, num_boost_round=model.get_num_boosting_rounds())
+        del dtrain
+
+    # Same estimator class as the in-memory pipeline (export_model, API)
+    model.load_model(bytearray(booster.save_raw(raw_format="json")))
+
+    if verbose:
+        print("[OK] Training complete")
+
+    return model, engineer
+
+
+def predict_split(model, engineer: PokemonFeatureEngineer, path, scenario_type: str = "all",
+                  batch_rows: int = DEFAULT_BATCH_ROWS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Labels and positive-class probabilities of a split, predicted batch by batch.
+
+    Returns:
+        Tuple (y, proba)
+    """
+    labels, probas = [], []
+    for df in iter_split_batches(path, scenario_type, model_columns(path, engineer.config), batch_rows):
+        labels.append(df['winner'].to_numpy(dtype=np.uint8))
+        probas.append(model.predict_proba(engineer.transform(df.drop(columns=['winner'])))[:, 1].astype(np.float32))
+    if not labels:
+        return np.zeros(0, dtype=np.uint8), np.zeros(0, dtype=np.float32)
+    return np.concatenate(labels), np.concatenate(probas)
+
+
+def evaluate_external_memory(model, engineer: PokemonFeatureEngineer, processed_dir,
+                             scenario_type: str = "all", batch_rows: int = DEFAULT_BATCH_ROWS,
+                             model_name: str = "xgboost", verbose: bool = True) -> Dict[str, float]:
+    """evaluate_model() on the processed splits, predicted batch by batch."""
+    processed_dir = Path(processed_dir)
+    y_train, proba_train = predict_split(model, engineer, processed_dir / "train.parquet",
+                                         scenario_type, batch_rows)
+    y_test, proba_test = predict_split(model, engineer, processed_dir / "test.parquet",
+                                       scenario_type, batch_rows)
+    return evaluate_predictions(y_train, (proba_train > 0.5).astype(np.uint8),
+                                y_test, (proba_test > 0.5).astype(np.uint8), proba_test,
+                                model_name=model_name, verbose=verbose)
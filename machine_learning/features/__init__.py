@@ -1,5 +1,9 @@
 """Feature engineering module for Pokemon ML pipeline."""
 
-from machine_learning.features.engineering import PokemonFeatureEngineer
+from machine_learning.features.cache import cached_fit_transform, feature_cache_key
+from machine_learning.features.encoding import CategoricalEncoder
+from machine_learning.features.engineering import PokemonFeatureEngineer, csr_by_rows, sparse_model_params
+from machine_learning.features.matrix import FeatureMatrixWriter, load_feature_matrix
 
-__all__ = ['PokemonFeatureEngineer']
+__all__ = ['CategoricalEncoder', 'PokemonFeatureEngineer', 'FeatureMatrixWriter', 'load_feature_matrix',
+           'sparse_model_params', 'csr_by_rows', 'cached_fit_transform', 'feature_cache_key']
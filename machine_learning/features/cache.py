@@ -0,0 +1,196 @@
+"""Content-addressed cache of engineered feature matrices.
+
+The output of PokemonFeatureEngineer.fit_transform only depends on the
+processed Parquet files, the scenario filter and the
+FeatureEngineeringConfig. It is cached under a key computed from those
+inputs:
+
+    <cache_dir>/<key>/    X_train.npy, X_test.npy, y_train.npy, y_test.npy,
+                          scalers.pkl, metadata.json
+
+(the FeatureMatrixWriter layout, read back memory-mapped with
+load_feature_matrix). A changed Parquet file or config, or a new
+FEATURE_CACHE_VERSION, gives a new key: entries are never invalidated in
+place, and old ones can be deleted at any time.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+from dataclasses import asdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from machine_learning.config import FeatureEngineeringConfig
+from machine_learning.features.encoding import CategoricalEncoder
+from machine_learning.features.engineering import PokemonFeatureEngineer, csr_by_rows
+from machine_learning.features.matrix import FINALIZE_CHUNK_ROWS, SPLITS, load_feature_matrix
+
+# Bump when PokemonFeatureEngineer changes the features it produces
+FEATURE_CACHE_VERSION = 1
+
+HASH_CHUNK_BYTES = 1 << 20
+
+
+def _split_files(path: Path, scenario_type: str) -> List[Path]:
+    """Parquet files read for a split (only the scenario partition when there is one)."""
+    if path.is_file():
+        return [path]
+    partition = path / f"scenario_type={scenario_type}"
+    root = partition if scenario_type != "all" and partition.is_dir() else path
+    return sorted(root.rglob("*.parquet"))
+
+
+def feature_cache_key(processed_dir, scenario_type: str = "all",
+                      config: Optional[FeatureEngineeringConfig] = None) -> str:
+    """
+    Cache key of the engineered features of a processed dataset.
+
+    SHA-256 of the content of the Parquet files read for the scenario,
+    of the scenario and of the serialized config.
+
+    Args:
+        processed_dir: Directory of train.parquet and test.parquet
+        scenario_type: Scenario to keep; "all" keeps everything
+        config: Feature configuration (default: FeatureEngineeringConfig())
+
+    Returns:
+        Hexadecimal key
+    """
+    processed_dir = Path(processed_dir)
+    config = config or FeatureEngineeringConfig()
+    digest = hashlib.sha256(json.dumps({
+        'version': FEATURE_CACHE_VERSION,
+        'scenario_type': scenario_type,
+        'config': asdict(config),
+    }, sort_keys=True).encode())
+    for split in SPLITS:
+        for path in _split_files(processed_dir / f"{split}.parquet", scenario_type):
+            digest.update(f"\0{path.relative_to(processed_dir).as_posix()}\0{path.stat().st_size}\0".encode())
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+                    digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+def load_cached_features(cache_dir, key: str) -> Optional[Tuple]:
+    """
+    Cached features of a key (memory-mapped).
+
+    Returns:
+        Tuple (X_train, X_test, y_train, y_test, scalers, feature_columns, encoder),
+        or None if the key is not cached
+    """
+    directory = Path(cache_dir) / key
+    if not (directory / "metadata.json").exists():
+        return None
+    X_train, X_test, y_train, y_test, scalers, feature_columns, metadata = load_feature_matrix(directory)
+    encoder = CategoricalEncoder.from_dict(metadata['categorical_encoding'])
+    return X_train, X_test, y_train, y_test, scalers, feature_columns, encoder
+
+
+def store_cached_features(cache_dir, key: str, X_train: pd.DataFrame, X_test: pd.DataFrame,
+                          y_train: pd.Series, y_test: pd.Series, scalers: Dict,
+                          feature_columns: List[str], encoder: CategoricalEncoder) -> Tuple:
+    """
+    Cache fit_transform output under a key.
+
+    The entry is written to a temporary directory and renamed when
+    complete: an interrupted run leaves no partial entry, and concurrent
+    runs keep the first entry published.
+
+    Returns:
+        load_cached_features() of the stored entry
+    """
+    cache_dir = Path(cache_dir)
+    directory = cache_dir / key
+    temp_dir = cache_dir / f".{key}.{os.getpid()}.tmp"
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    temp_dir.mkdir(parents=True)
+    try:
+        for split, X, y in (('train', X_train, y_train), ('test', X_test, y_test)):
+            # float32 written by blocks of rows: no full copy of the matrix
+            target = np.lib.format.open_memmap(temp_dir / f"X_{split}.npy", mode='w+', dtype=np.float32,
+                                               shape=(len(X), len(feature_columns)))
+            for start in range(0, len(X), FINALIZE_CHUNK_ROWS):
+                target[start:start + FINALIZE_CHUNK_ROWS] = X.iloc[start:start + FINALIZE_CHUNK_ROWS].to_numpy(
+                    dtype=np.float32)
+            target.flush()
+            del target
+            np.save(temp_dir / f"y_{split}.npy", y.to_numpy(dtype=np.uint8))
+
+        with open(temp_dir / "scalers.pkl", "wb") as f:
+            pickle.dump(scalers, f)
+        with open(temp_dir / "metadata.json", "w", encoding="utf-8") as f:
+            json.dump({
+                'feature_columns': feature_columns,
+                'categorical_encoding': encoder.to_dict(),
+                'rows': {'train': len(X_train), 'test': len(X_test)},
+                'key': key,
+            }, f, indent=2)
+
+        try:
+            os.replace(temp_dir, directory)
+        except OSError:
+            # Published meanwhile by another run (same key, same content)
+            if not (directory / "metadata.json").exists():
+                raise
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return load_cached_features(cache_dir, key)
+
+
+def cached_fit_transform(load: Callable[[], Tuple[pd.DataFrame, pd.DataFrame]], processed_dir,
+                         scenario_type: str = "all", cache_dir=None,
+                         config: Optional[FeatureEngineeringConfig] = None,
+                         sparse: bool = False, verbose: bool = True) -> Tuple:
+    """
+    PokemonFeatureEngineer.fit_transform of a processed dataset, through the cache.
+
+    On a cache hit the Parquet files are not read (load is not called) and
+    the cached matrices are memory-mapped. On a miss the features are
+    computed, stored, and returned memory-mapped from the new entry, so
+    both runs train on the same float32 values.
+
+    Args:
+        load: Returns (df_train, df_test); only called on a cache miss
+        processed_dir: Directory of train.parquet and test.parquet (cache key)
+        scenario_type: Scenario filter applied by load (cache key)
+        cache_dir: Cache root (None: no cache, plain fit_transform)
+        config: Feature configuration (default: FeatureEngineeringConfig())
+        sparse: Return X_train and X_test as CSR matrices (see fit_transform(sparse=True))
+        verbose: Print progress
+
+    Returns:
+        Tuple (X_train, X_test, y_train, y_test, scalers, feature_columns, encoder)
+    """
+    engineer = PokemonFeatureEngineer(config)
+    if cache_dir is None:
+        df_train, df_test = load()
+        features = engineer.fit_transform(df_train, df_test, verbose=verbose, sparse=sparse)
+        return (*features, engineer.encoder)
+
+    key = feature_cache_key(processed_dir, scenario_type, engineer.config)
+    cached = load_cached_features(cache_dir, key)
+    if cached is not None:
+        if verbose:
+            print(f"\n[OK] Engineered features loaded from cache: {Path(cache_dir) / key}")
+    else:
+        df_train, df_test = load()
+        features = engineer.fit_transform(df_train, df_test, verbose=verbose)
+        del df_train, df_test
+        cached = store_cached_features(cache_dir, key, *features, engineer.encoder)
+        del features
+        if verbose:
+            print(f"\n[OK] Engineered features cached: {Path(cache_dir) / key}")
+
+    if sparse:
+        X_train, X_test, *rest = cached
+        return (csr_by_rows(X_train), csr_by_rows(X_test), *rest)
+    return cached
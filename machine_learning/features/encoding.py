@@ -0,0 +1,140 @@
+"""One-hot encoding of the categorical features over a declared vocabulary."""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+class CategoricalEncoder:
+    """
+    One-hot encoder with a declared vocabulary, shared by training and inference.
+
+    fit() keeps, per feature, the vocabulary values seen in train (the
+    columns pd.get_dummies + align produced); transform() writes the
+    one-hot values into a single preallocated block by integer index.
+    Values not kept by fit (or missing) encode as all zeros.
+
+    Columns are "<feature>_<value>", per feature in order, values sorted.
+
+    Args:
+        features: Categorical columns to encode
+        vocabulary: Possible values of every feature
+    """
+
+    def __init__(self, features: Sequence[str], vocabulary: Sequence[str]):
+        self.features = list(features)
+        self.vocabulary = sorted(set(vocabulary))
+        self.values: Optional[Dict[str, List[str]]] = None  # Kept values per feature, set by fit
+        self.columns: List[str] = []
+        self._slots = {}
+
+    def codes(self, values: pd.Series) -> np.ndarray:
+        """Vocabulary position of each value (-1 if missing or unknown)."""
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Map the categories once, then the integer codes
+            lookup = pd.Index(self.vocabulary).get_indexer(values.cat.categories)
+            return np.append(lookup, -1)[values.cat.codes.to_numpy()]
+        return pd.Index(self.vocabulary).get_indexer(values)
+
+    def fit(self, X: pd.DataFrame) -> 'CategoricalEncoder':
+        """
+        Keep the vocabulary values present in X (features absent from X get no column).
+
+        Raises:
+            ValueError: If X holds values outside the vocabulary
+        """
+        self.values = None
+        return self.partial_fit(X)
+
+    def partial_fit(self, X: pd.DataFrame) -> 'CategoricalEncoder':
+        """
+        fit() over several batches: keeps the values present in X or in the previous batches.
+
+        Raises:
+            ValueError: If X holds values outside the vocabulary
+        """
+        previous = self.values or {}
+        values = {}
+        for feature in self.features:
+            if feature not in X.columns:
+                if feature in previous:
+                    values[feature] = previous[feature]
+                continue
+            codes = self.codes(X[feature])
+            unknown = (codes < 0) & X[feature].notna().to_numpy()
+            if unknown.any():
+                names = sorted(map(str, X[feature][unknown].unique()))
+                raise ValueError(f"Values of {feature} outside the vocabulary: {names}")
+            seen = np.bincount(codes[codes >= 0], minlength=len(self.vocabulary)) > 0
+            seen |= np.isin(self.vocabulary, previous.get(feature, []))
+            values[feature] = [value for value, kept in zip(self.vocabulary, seen) if kept]
+        return self._set_values(values)
+
+    def _set_values(self, values: Dict[str, List[str]]) -> 'CategoricalEncoder':
+        self.values = values
+        self.columns = []
+        self._slots = {}
+        for feature, kept in values.items():
+            # Vocabulary position -> block column (-1: no column); last entry for code -1
+            slots = np.full(len(self.vocabulary) + 1, -1, dtype=np.int64)
+            positions = pd.Index(self.vocabulary).get_indexer(kept)
+            slots[positions] = len(self.columns) + np.arange(len(kept))
+            self._slots[feature] = slots
+            self.columns += [f"{feature}_{value}" for value in kept]
+        return self
+
+    def transform(self, X: pd.DataFrame, dtype=np.uint8) -> np.ndarray:
+        """
+        One-hot block of X, shape (len(X), len(columns)).
+
+        Raises:
+            ValueError: If the encoder is not fitted
+        """
+        columns = self.block_columns(X)
+        known = columns >= 0
+        block = np.zeros((len(X), len(self.columns)), dtype=dtype)
+        block[np.nonzero(known)[0], columns[known]] = 1
+        return block
+
+    def block_columns(self, X: pd.DataFrame) -> np.ndarray:
+        """
+        Block column of the 1 of each row and feature, shape (len(X), len(features)).
+
+        -1 where the feature encodes as all zeros. Lets callers place the
+        one-hot values themselves (e.g. in a sparse matrix).
+
+        Raises:
+            ValueError: If the encoder is not fitted
+        """
+        if self.values is None:
+            raise ValueError("Encoder not fitted. Call fit() first.")
+        columns = np.full((len(X), len(self._slots)), -1, dtype=np.int64)
+        for position, (feature, slots) in enumerate(self._slots.items()):
+            if feature in X.columns:
+                columns[:, position] = slots[self.codes(X[feature])]
+        return columns
+
+    def transform_frame(self, X: pd.DataFrame, dtype=np.uint8) -> pd.DataFrame:
+        """transform() as a DataFrame with the index of X."""
+        return pd.DataFrame(self.transform(X, dtype), index=X.index, columns=self.columns)
+
+    def to_dict(self) -> Dict:
+        """Fitted state as plain data (stored in the model metadata)."""
+        return {'features': self.features, 'vocabulary': self.vocabulary, 'values': self.values}
+
+    @classmethod
+    def from_dict(cls, state: Dict) -> 'CategoricalEncoder':
+        """Encoder saved by to_dict()."""
+        return cls(state['features'], state['vocabulary'])._set_values(state['values'])
+
+    @classmethod
+    def from_columns(cls, features: Sequence[str], vocabulary: Sequence[str],
+                     feature_columns: Sequence[str]) -> 'CategoricalEncoder':
+        """Encoder producing the one-hot columns present in feature_columns (models exported without it)."""
+        encoder = cls(features, vocabulary)
+        present = set(feature_columns)
+        return encoder._set_values({
+            feature: [value for value in encoder.vocabulary if f"{feature}_{value}" in present]
+            for feature in encoder.features
+        })
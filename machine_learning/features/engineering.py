@@ -1,10 +1,13 @@
 """Feature engineering for Pokemon battle prediction."""
 
-from typing import Tuple, Dict, List
+from typing import Tuple, Dict, List, Union
+import numpy as np
 import pandas as pd
+import scipy.sparse as sp
 from sklearn.preprocessing import StandardScaler
 
 from machine_learning.config import FeatureEngineeringConfig
+from machine_learning.features.encoding import CategoricalEncoder
 
 
 class PokemonFeatureEngineer:
@@ -15,15 +18,25 @@ class PokemonFeatureEngineer:
         self.config = config or FeatureEngineeringConfig()
         self.scaler = StandardScaler()
         self.scaler_derived = StandardScaler()
+        self.encoder = CategoricalEncoder(self.config.categorical_features, self.config.type_vocabulary)
         self.feature_columns = []
 
     def fit_transform(
         self,
         df_train: pd.DataFrame,
         df_test: pd.DataFrame,
-        verbose: bool = True
-    ) -> Tuple[pd.DataFrame, pd.DataFrame, pd.Series, pd.Series, Dict, List[str]]:
-        """Fit scalers and transform train/test data."""
+        verbose: bool = True,
+        sparse: bool = False
+    ) -> Tuple[Union[pd.DataFrame, sp.csr_matrix], Union[pd.DataFrame, sp.csr_matrix],
+               pd.Series, pd.Series, Dict, List[str]]:
+        """
+        Fit scalers and transform train/test data.
+
+        With sparse=True, X_train and X_test are float32 CSR matrices (same
+        columns and values as the DataFrames): the one-hot block is never
+        materialized densely. Train XGBoost on them with
+        sparse_model_params(X) so dense inference rows give the same predictions.
+        """
         if verbose:
             print("\n" + "=" * 80)
             print("FEATURE ENGINEERING PIPELINE")
@@ -36,8 +49,8 @@ class PokemonFeatureEngineer:
         X_train = df_train.drop(columns=['winner']).copy()
         X_test = df_test.drop(columns=['winner']).copy()
 
-        # One-hot encode categorical features
-        X_train, X_test = self._encode_categorical(X_train, X_test, verbose)
+        # One-hot encode categorical features (sparse: stacked once the numeric block is done)
+        X_train, X_test = self._encode_categorical(X_train, X_test, verbose, sparse)
 
         # Remove categorical columns and IDs
         X_train, X_test = self._drop_unnecessary_columns(X_train, X_test, verbose)
@@ -51,7 +64,10 @@ class PokemonFeatureEngineer:
         # Normalize derived features
         X_train, X_test = self._normalize_derived_features(X_train, X_test, verbose)
 
-        self.feature_columns = X_train.columns.tolist()
+        if sparse:
+            X_train, X_test = self._stack_sparse(X_train, X_test, df_train, df_test, verbose)
+        else:
+            self.feature_columns = X_train.columns.tolist()
 
         if verbose:
             print(f"\n[OK] Final feature count: {len(self.feature_columns)}")
@@ -63,13 +79,52 @@ class PokemonFeatureEngineer:
 
         return X_train, X_test, y_train, y_test, scalers, self.feature_columns
 
+    @classmethod
+    def from_artifacts(cls, scalers: Dict, feature_columns: List[str], categorical_encoding: Dict = None,
+                       config: FeatureEngineeringConfig = None) -> 'PokemonFeatureEngineer':
+        """
+        Fitted engineer of an exported model (export_model scalers and metadata).
+
+        Models exported without categorical_encoding get the encoder of their one-hot columns.
+        """
+        engineer = cls(config)
+        engineer.scaler = scalers['standard_scaler']
+        engineer.scaler_derived = scalers['standard_scaler_new_features']
+        if categorical_encoding is not None:
+            engineer.encoder = CategoricalEncoder.from_dict(categorical_encoding)
+        else:
+            engineer.encoder = CategoricalEncoder.from_columns(
+                engineer.config.categorical_features, engineer.config.type_vocabulary, feature_columns
+            )
+        engineer.feature_columns = list(feature_columns)
+        return engineer
+
+    def partial_fit(self, df: pd.DataFrame) -> 'PokemonFeatureEngineer':
+        """
+        Fit the encoder and scalers on one batch of train rows (out-of-core training).
+
+        After partial_fit() on every train batch, transform() of a batch gives
+        its rows of fit_transform() on the concatenated batches.
+        """
+        self.encoder.partial_fit(df)
+
+        X = self._drop_unnecessary_columns_inference(df.drop(columns=['winner']), verbose=False)
+        features_to_scale = [f for f in self.config.numerical_features_to_scale if f in X.columns]
+        self.scaler.partial_fit(X[features_to_scale])
+
+        derived = self._create_derived_features_inference(pd.DataFrame(index=df.index), df, verbose=False)
+        self.scaler_derived.partial_fit(derived[self.config.derived_features])
+
+        self.feature_columns = X.columns.tolist() + self.encoder.columns + self.config.derived_features
+        return self
+
     def transform(
         self,
         df: pd.DataFrame,
         verbose: bool = False
     ) -> pd.DataFrame:
         """Transform new data using fitted scalers (for inference)."""
-        if not hasattr(self.scaler, 'mean_'):
+        if not hasattr(self.scaler, 'mean_') or self.encoder.values is None:
             raise ValueError("Scalers not fitted. Call fit_transform() first during training.")
 
         X = df.copy()
@@ -98,24 +153,21 @@ class PokemonFeatureEngineer:
         self,
         X_train: pd.DataFrame,
         X_test: pd.DataFrame,
-        verbose: bool
+        verbose: bool,
+        sparse: bool = False
     ) -> Tuple[pd.DataFrame, pd.DataFrame]:
-        """One-hot encode categorical features."""
+        """One-hot encode categorical features (columns: vocabulary values seen in train)."""
         if verbose:
             print("\n[1] One-hot encoding categorical features...")
 
-        for feature in self.config.categorical_features:
-            if feature in X_train.columns:
-                train_dummies = pd.get_dummies(X_train[feature], prefix=feature, drop_first=False)
-                test_dummies = pd.get_dummies(X_test[feature], prefix=feature, drop_first=False)
-
-                # Align columns
-                train_dummies, test_dummies = train_dummies.align(
-                    test_dummies, join='left', axis=1, fill_value=0
-                )
+        self.encoder.fit(X_train)
+        if sparse:
+            if verbose:
+                print(f"   {len(self.encoder.columns)} one-hot columns kept sparse")
+            return X_train, X_test
 
-                X_train = pd.concat([X_train, train_dummies], axis=1)
-                X_test = pd.concat([X_test, test_dummies], axis=1)
+        X_train = pd.concat([X_train, self.encoder.transform_frame(X_train)], axis=1)
+        X_test = pd.concat([X_test, self.encoder.transform_frame(X_test)], axis=1)
 
         if verbose:
             print(f"   After encoding: {X_train.shape[1]} columns")
@@ -246,17 +298,69 @@ class PokemonFeatureEngineer:
 
         return X_train, X_test
 
+    def _stack_sparse(
+        self,
+        X_train: pd.DataFrame,
+        X_test: pd.DataFrame,
+        df_train: pd.DataFrame,
+        df_test: pd.DataFrame,
+        verbose: bool,
+        chunk_rows: int = 65536
+    ) -> Tuple[sp.csr_matrix, sp.csr_matrix]:
+        """Stack numeric, one-hot and derived blocks as float32 CSR (dense path column order), by row chunks."""
+        derived = self.config.derived_features
+        numeric = [col for col in X_train.columns if col not in derived]
+        self.feature_columns = numeric + self.encoder.columns + derived
+
+        X_train, X_test = (
+            sp.vstack([self._to_csr(X.iloc[start:start + chunk_rows], df.iloc[start:start + chunk_rows],
+                                    numeric, derived)
+                       for start in range(0, max(len(X), 1), chunk_rows)], format='csr')
+            for X, df in ((X_train, df_train), (X_test, df_test))
+        )
+
+        if verbose:
+            density = X_train.nnz / max(X_train.shape[0] * X_train.shape[1], 1)
+            print(f"\n[5] Sparse matrix: {X_train.shape[1]} columns, density {density:.1%}")
+
+        return X_train, X_test
+
+    def _to_csr(
+        self,
+        X: pd.DataFrame,
+        df: pd.DataFrame,
+        numeric: List[str],
+        derived: List[str]
+    ) -> sp.csr_matrix:
+        """CSR of one split, built row-wise from its candidate entries (zeros are not stored)."""
+        onehot = self.encoder.block_columns(df)
+        width = len(numeric) + onehot.shape[1] + len(derived)
+        index_dtype = np.int32 if len(X) * width < np.iinfo(np.int32).max else np.int64
+
+        # Per row: every numeric value, the 1 of each categorical feature, every derived value
+        values = np.empty((len(X), width), dtype=np.float32)
+        columns = np.empty((len(X), width), dtype=index_dtype)
+        first, last = len(numeric), len(numeric) + onehot.shape[1]
+        values[:, :first] = X[numeric].to_numpy(dtype=np.float32)
+        columns[:, :first] = np.arange(first)
+        values[:, first:last] = onehot >= 0
+        columns[:, first:last] = first + onehot
+        values[:, last:] = X[derived].to_numpy(dtype=np.float32)
+        columns[:, last:] = first + len(self.encoder.columns) + np.arange(len(derived))
+
+        stored = values != 0
+        indptr = np.zeros(len(X) + 1, dtype=index_dtype)
+        np.cumsum(stored.sum(axis=1), out=indptr[1:])
+        # Row-major selection keeps the column indices of each row sorted
+        return sp.csr_matrix((values[stored], columns[stored], indptr), shape=(len(X), len(self.feature_columns)))
+
     # ========================================================================
     # PRIVATE METHODS - INFERENCE (TRANSFORM)
     # ========================================================================
 
     def _encode_categorical_inference(self, X: pd.DataFrame, verbose: bool) -> pd.DataFrame:
-        """One-hot encode categorical features for inference."""
-        for feature in self.config.categorical_features:
-            if feature in X.columns:
-                dummies = pd.get_dummies(X[feature], prefix=feature, drop_first=False)
-                X = pd.concat([X, dummies], axis=1)
-        return X
+        """One-hot encode categorical features for inference (same columns as training)."""
+        return pd.concat([X, self.encoder.transform_frame(X)], axis=1)
 
     def _drop_unnecessary_columns_inference(self, X: pd.DataFrame, verbose: bool) -> pd.DataFrame:
         """Remove unnecessary columns for inference."""
@@ -304,3 +408,22 @@ class PokemonFeatureEngineer:
         """Normalize derived features for inference using fitted scaler."""
         X[self.config.derived_features] = self.scaler_derived.transform(X[self.config.derived_features])
         return X
+
+
+def sparse_model_params(X) -> Dict:
+    """
+    XGBoost parameters for training on X ({} unless X is a sparse matrix).
+
+    XGBoost treats the entries a CSR matrix does not store as missing
+    values. missing=0.0 makes the stored model treat the zeros of dense
+    inference rows (API, DataFrames) the same way, so both give the
+    predictions of the sparse evaluation.
+    """
+    return {'missing': 0.0} if sp.issparse(X) else {}
+
+
+def csr_by_rows(X: pd.DataFrame, chunk_rows: int = 100_000) -> sp.csr_matrix:
+    """CSR copy of a dense (e.g. memory-mapped) float32 matrix, converted by blocks of rows."""
+    blocks = [sp.csr_matrix(X.iloc[start:start + chunk_rows].to_numpy(dtype=np.float32))
+              for start in range(0, len(X), chunk_rows)]
+    return sp.vstack(blocks or [sp.csr_matrix(X.shape, dtype=np.float32)], format='csr')
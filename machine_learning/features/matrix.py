@@ -0,0 +1,255 @@
+"""Feature matrix written straight from generated battle rows.
+
+Builds the features of PokemonFeatureEngineer.fit_transform (one-hot
+types, scaled numerical columns, scaled derived features) from
+DATASET_SCHEMA Arrow batches while the dataset is generated, instead of
+re-reading and encoding the processed Parquet files:
+
+- one-hot slots are set from the dictionary codes of the type columns
+- scaler statistics are accumulated on train rows (StandardScaler.partial_fit)
+- rows are appended unscaled to temporary float32 files, then scaled in a
+  single pass over a memory map when the build completes
+
+Output directory:
+    X_train.npy, X_test.npy    float32 feature matrices
+    y_train.npy, y_test.npy    uint8 labels
+    scalers.pkl                {'standard_scaler', 'standard_scaler_new_features'}
+    metadata.json              feature columns, categorical encoding, scenarios, row counts
+"""
+
+import json
+import os
+import pickle
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from sklearn.preprocessing import StandardScaler
+
+from machine_learning.battle_engine import DATASET_SCHEMA
+from machine_learning.config import FeatureEngineeringConfig
+from machine_learning.features.encoding import CategoricalEncoder
+
+SPLITS = ('train', 'test')
+
+# Rows scaled per step of the final pass
+FINALIZE_CHUNK_ROWS = 100_000
+
+
+def _derived_features(table: pa.Table) -> Dict[str, np.ndarray]:
+    """Derived features (PokemonFeatureEngineer._create_derived_features) of a batch."""
+    def col(name):
+        return table.column(name).to_numpy().astype(np.float64)
+
+    effective_power_a = col('a_move_power') * col('a_move_stab') * col('a_move_type_mult')
+    effective_power_b = col('b_move_power') * col('b_move_stab') * col('b_move_type_mult')
+    return {
+        'stat_ratio': col('a_total_stats') / (col('b_total_stats') + 1),
+        'type_advantage_diff': col('a_move_type_mult') - col('b_move_type_mult'),
+        'effective_power_a': effective_power_a,
+        'effective_power_b': effective_power_b,
+        'effective_power_diff': effective_power_a - effective_power_b,
+        'priority_advantage': col('a_move_priority') - col('b_move_priority'),
+    }
+
+
+class FeatureMatrixWriter:
+    """
+    Stream generated train/test rows into the final feature matrix.
+
+    Columns are in PokemonFeatureEngineer.fit_transform order: numerical
+    dataset columns, one-hot columns per categorical feature (values seen
+    in train, sorted), then derived features. The matrices, labels and
+    fitted scalers are published when the writer is closed successfully.
+
+    Args:
+        output_dir: Directory of the matrix files
+        categories: Possible values of each categorical feature (one-hot slots)
+        config: Feature configuration (default: FeatureEngineeringConfig())
+    """
+
+    def __init__(self, output_dir, categories: Dict[str, Sequence[str]],
+                 config: Optional[FeatureEngineeringConfig] = None):
+        self.output_dir = Path(output_dir)
+        self.config = config or FeatureEngineeringConfig()
+
+        dropped = set(self.config.categorical_features) | set(self.config.id_features) | {'scenario_type', 'winner'}
+        self.numerical = [name for name in DATASET_SCHEMA.names if name not in dropped]
+        self.scaled = [name for name in self.config.numerical_features_to_scale if name in self.numerical]
+
+        # One-hot slots: value -> column, per categorical feature
+        self.slots = {}
+        self.onehot = []
+        self.vocabulary = sorted(set().union(*(categories[feature] for feature in self.config.categorical_features)))
+        offset = len(self.numerical)
+        for feature in self.config.categorical_features:
+            values = sorted(categories[feature])
+            self.slots[feature] = {value: offset + i for i, value in enumerate(values)}
+            self.onehot += [f"{feature}_{value}" for value in values]
+            offset += len(values)
+        self.derived = list(self.config.derived_features)
+        self.columns = self.numerical + self.onehot + self.derived
+
+        self.scaler = StandardScaler()
+        self.scaler_derived = StandardScaler()
+        self.feature_columns = None  # Final columns, set when the matrix is published
+        self.observed = np.zeros(len(self.columns), dtype=np.int64)  # Train rows per one-hot slot
+        self.rows = dict.fromkeys(SPLITS, 0)
+        self.scenarios = set()
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._files = {}
+        for split in SPLITS:
+            self._files[split] = (
+                open(self._temp_path(f"X_{split}.raw"), "wb"),
+                open(self._temp_path(f"y_{split}.raw"), "wb"),
+            )
+
+    def _temp_path(self, name: str) -> Path:
+        # Hidden name: never mistaken for a published file
+        return self.output_dir / f".{name}.tmp"
+
+    def add(self, split: str, table: pa.Table):
+        """
+        Append the features of a batch of rows.
+
+        Args:
+            split: 'train' or 'test' (scalers are fitted on train rows only)
+            table: Rows in DATASET_SCHEMA
+        """
+        n = table.num_rows
+        if n == 0:
+            return
+        block = np.zeros((n, len(self.columns)), dtype=np.float32)
+        for j, name in enumerate(self.numerical):
+            block[:, j] = table.column(name).to_numpy()
+
+        # One-hot slots set by dictionary code (batches may carry their own dictionary)
+        rows = np.arange(n)
+        for feature, slots in self.slots.items():
+            start = 0
+            for chunk in table.column(feature).chunks:
+                lookup = np.array([slots.get(value, -1) for value in chunk.dictionary.to_pylist()], dtype=np.int64)
+                columns = lookup[chunk.indices.to_numpy()]
+                known = columns >= 0
+                block[rows[start:start + len(chunk)][known], columns[known]] = 1.0
+                start += len(chunk)
+
+        derived = _derived_features(table)
+        block[:, len(self.columns) - len(self.derived):] = np.column_stack([derived[name] for name in self.derived])
+
+        if split == 'train':
+            self.scaler.partial_fit(pd.DataFrame(block[:, self._positions(self.scaled)], columns=self.scaled))
+            self.scaler_derived.partial_fit(pd.DataFrame(derived, columns=self.derived))
+            self.observed += np.count_nonzero(block, axis=0)
+
+        features_file, labels_file = self._files[split]
+        features_file.write(block.tobytes())
+        labels_file.write(table.column('winner').to_numpy().astype(np.uint8).tobytes())
+        self.rows[split] += n
+        self.scenarios.update(table.column('scenario_type').unique().to_pylist())
+
+    def _positions(self, names: List[str]) -> List[int]:
+        return [self.columns.index(name) for name in names]
+
+    def _finalize(self):
+        """Scale the temporary matrices into the published .npy files."""
+        if self.rows['train'] == 0:
+            raise ValueError("No train rows: cannot fit the feature scalers")
+
+        # Drop one-hot columns of values never seen in train (as get_dummies + align)
+        onehot = set(self.onehot)
+        kept = [j for j, name in enumerate(self.columns) if name not in onehot or self.observed[j] > 0]
+        self.feature_columns = feature_columns = [self.columns[j] for j in kept]
+        scaled = [feature_columns.index(name) for name in self.scaled]
+        derived = [feature_columns.index(name) for name in self.derived]
+
+        published = []
+        for split in SPLITS:
+            n = self.rows[split]
+            source = np.memmap(self._temp_path(f"X_{split}.raw"), dtype=np.float32, mode='r',
+                               shape=(n, len(self.columns))) if n else np.zeros((0, len(self.columns)), np.float32)
+            target_path = self._temp_path(f"X_{split}.npy")
+            target = np.lib.format.open_memmap(target_path, mode='w+', dtype=np.float32,
+                                               shape=(n, len(feature_columns)))
+            for start in range(0, n, FINALIZE_CHUNK_ROWS):
+                chunk = source[start:start + FINALIZE_CHUNK_ROWS][:, kept]
+                chunk[:, scaled] = (chunk[:, scaled] - self.scaler.mean_) / self.scaler.scale_
+                chunk[:, derived] = (chunk[:, derived] - self.scaler_derived.mean_) / self.scaler_derived.scale_
+                target[start:start + len(chunk)] = chunk
+            target.flush()
+            del source, target
+            published.append((target_path, self.output_dir / f"X_{split}.npy"))
+
+            labels_path = self._temp_path(f"y_{split}.npy")
+            with open(labels_path, "wb") as f:
+                np.save(f, np.fromfile(self._temp_path(f"y_{split}.raw"), dtype=np.uint8))
+            published.append((labels_path, self.output_dir / f"y_{split}.npy"))
+
+        scalers_path = self._temp_path("scalers.pkl")
+        with open(scalers_path, "wb") as f:
+            pickle.dump({'standard_scaler': self.scaler, 'standard_scaler_new_features': self.scaler_derived}, f)
+        published.append((scalers_path, self.output_dir / "scalers.pkl"))
+
+        metadata_path = self._temp_path("metadata.json")
+        with open(metadata_path, "w", encoding="utf-8") as f:
+            json.dump({
+                'feature_columns': feature_columns,
+                'categorical_encoding': CategoricalEncoder.from_columns(
+                    self.config.categorical_features, self.vocabulary, feature_columns
+                ).to_dict(),
+                'scenarios': sorted(self.scenarios),
+                'rows': self.rows,
+            }, f, indent=2)
+        published.append((metadata_path, self.output_dir / "metadata.json"))
+
+        for temp_path, path in published:
+            os.replace(temp_path, path)
+
+    def close(self, success=True):
+        """Publish the matrices, labels and scalers (or discard them)."""
+        for features_file, labels_file in self._files.values():
+            features_file.close()
+            labels_file.close()
+        try:
+            if success:
+                self._finalize()
+        finally:
+            for temp_path in self.output_dir.glob(".*.tmp"):
+                temp_path.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(success=exc_type is None)
+
+
+def load_feature_matrix(directory, mmap_mode: Optional[str] = 'r') -> Tuple:
+    """
+    Load a feature matrix written by FeatureMatrixWriter.
+
+    Args:
+        directory: Directory of the matrix files
+        mmap_mode: np.load memory-map mode (None = read into memory)
+
+    Returns:
+        Tuple (X_train, X_test, y_train, y_test, scalers, feature_columns, metadata),
+        same as PokemonFeatureEngineer.fit_transform plus the metadata
+
+    Raises:
+        FileNotFoundError: If the matrix was not generated
+    """
+    directory = Path(directory)
+    with open(directory / "metadata.json", "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+    with open(directory / "scalers.pkl", "rb") as f:
+        scalers = pickle.load(f)
+
+    feature_columns = metadata['feature_columns']
+    X = {split: pd.DataFrame(np.load(directory / f"X_{split}.npy", mmap_mode=mmap_mode), columns=feature_columns)
+         for split in SPLITS}
+    y = {split: pd.Series(np.load(directory / f"y_{split}.npy"), name='winner') for split in SPLITS}
+    return X['train'], X['test'], y['train'], y['test'], scalers, feature_columns, metadata
@@ -0,0 +1,215 @@
+"""Parallel training of candidate models under a shared CPU and memory budget.
+
+compare_models(parallel=True) trains its candidates concurrently in a
+process pool instead of one after the other:
+
+- the core budget (SAFE_N_JOBS, from get_safe_n_jobs) is split between
+  the workers: each candidate trains with n_jobs = cores // workers
+- the number of workers is capped by get_available_memory_gb(): each
+  worker is budgeted TRAINING_MEMORY_FACTOR times the training matrix
+- the feature matrices are not pickled to the workers: they are shared
+  as .npy files opened memory-mapped by every worker (the feature cache
+  files themselves when the matrices come from the cache, written once
+  otherwise), so the operating system keeps a single copy in the page
+  cache
+
+Workers are spawned, not forked: a fork of a process that already ran
+OpenMP (XGBoost) can deadlock, so scripts using parallel=True need an
+`if __name__ == "__main__":` guard. Each candidate uses the parameters of the
+sequential comparison except n_jobs, so the models are the same.
+"""
+
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from machine_learning.config import SAFE_N_JOBS
+from machine_learning.features.matrix import FINALIZE_CHUNK_ROWS
+from machine_learning.platform_config import get_available_memory_gb
+
+# Memory budgeted per worker, in multiples of the training matrix
+# (train_model's train/validation split copy, XGBoost quantized matrix)
+TRAINING_MEMORY_FACTOR = 2.0
+
+# Share of get_available_memory_gb() given to the workers
+MEMORY_FRACTION = 0.5
+
+
+def resolve_n_jobs(n_jobs: int) -> int:
+    """Number of cores of a joblib-style n_jobs (-1: all cores, -2: all but one...)."""
+    if n_jobs > 0:
+        return n_jobs
+    return max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+
+
+def matrix_nbytes(X) -> int:
+    """Bytes of a feature matrix (DataFrame, array or CSR matrix)."""
+    if sp.issparse(X):
+        return X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+    if hasattr(X, 'memory_usage'):
+        return int(X.memory_usage(index=False, deep=False).sum())
+    return X.nbytes
+
+
+def plan_workers(n_models: int, n_jobs: int = SAFE_N_JOBS, memory_gb: Optional[float] = None,
+                 model_memory_gb: float = 0.0,
+                 memory_fraction: float = MEMORY_FRACTION) -> Tuple[int, int]:
+    """
+    Workers and threads per worker for training models concurrently.
+
+    Args:
+        n_models: Candidate models
+        n_jobs: Core budget (joblib convention, default SAFE_N_JOBS)
+        memory_gb: Machine memory (default: get_available_memory_gb())
+        model_memory_gb: Memory needed by one training
+        memory_fraction: Share of memory_gb given to the workers
+
+    Returns:
+        Tuple (workers, n_jobs per worker)
+    """
+    cores = resolve_n_jobs(n_jobs)
+    workers = min(n_models, cores)
+    if model_memory_gb > 0:
+        memory_gb = get_available_memory_gb() if memory_gb is None else memory_gb
+        workers = min(workers, int(memory_gb * memory_fraction // model_memory_gb))
+    workers = max(1, workers)
+    return workers, max(1, cores // workers)
+
+
+def _memmap_path(array: np.ndarray) -> Optional[str]:
+    """.npy file an array is memory-mapped from, if the array is the whole file."""
+    base = array
+    while base is not None and not isinstance(base, np.memmap):
+        base = base.base
+    if (base is None or base.filename is None or not str(base.filename).endswith(".npy")
+            or base.shape != array.shape or base.dtype != array.dtype or not array.flags.c_contiguous
+            or base.__array_interface__['data'][0] != array.__array_interface__['data'][0]):
+        return None
+    return str(base.filename)
+
+
+def _save(directory: Path, name: str, array: np.ndarray) -> str:
+    """Write an array to <directory>/<name>.npy and return the path."""
+    path = directory / f"{name}.npy"
+    np.save(path, array)
+    return str(path)
+
+
+def share_arrays(directory, **arrays) -> Dict[str, Dict]:
+    """
+    Make feature matrices and labels openable by other processes.
+
+    Memory-mapped matrices (feature cache) are shared as their own .npy
+    file; other matrices are written to directory once, as float32 by
+    blocks of rows (the dtype XGBoost and RandomForest train on).
+
+    Args:
+        directory: Directory of the written arrays
+        **arrays: DataFrames, arrays, CSR matrices or Series by name
+
+    Returns:
+        Description of each array for open_shared()
+    """
+    directory = Path(directory)
+    shared = {}
+    for name, X in arrays.items():
+        if sp.issparse(X):
+            X = X.tocsr()
+            shared[name] = {
+                'kind': 'csr', 'shape': list(X.shape),
+                'paths': {part: _save(directory, f"{name}_{part}", getattr(X, part))
+                          for part in ('data', 'indices', 'indptr')},
+            }
+        elif isinstance(X, pd.Series):
+            shared[name] = {'kind': 'series', 'name': X.name, 'path': _save(directory, name, X.to_numpy())}
+        else:
+            columns = list(X.columns) if isinstance(X, pd.DataFrame) else None
+            path = None
+            if columns is None:
+                path = _memmap_path(np.asarray(X))
+            elif X.dtypes.nunique() == 1:
+                path = _memmap_path(X.to_numpy())
+            if path is None:
+                path = str(directory / f"{name}.npy")
+                target = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=X.shape)
+                for start in range(0, X.shape[0], FINALIZE_CHUNK_ROWS):
+                    rows = X.iloc[start:start + FINALIZE_CHUNK_ROWS] if columns is not None else \
+                        X[start:start + FINALIZE_CHUNK_ROWS]
+                    target[start:start + FINALIZE_CHUNK_ROWS] = np.asarray(rows, dtype=np.float32)
+                target.flush()
+                del target
+            shared[name] = {'kind': 'dense', 'columns': columns, 'path': path}
+    return shared
+
+
+def open_shared(spec: Dict):
+    """Array described by share_arrays(), memory-mapped read-only."""
+    if spec['kind'] == 'csr':
+        parts = {part: np.load(path, mmap_mode='r') for part, path in spec['paths'].items()}
+        return sp.csr_matrix((parts['data'], parts['indices'], parts['indptr']), shape=tuple(spec['shape']),
+                             copy=False)
+    if spec['kind'] == 'series':
+        return pd.Series(np.load(spec['path'], mmap_mode='r'), name=spec['name'])
+    X = np.load(spec['path'], mmap_mode='r')
+    return X if spec['columns'] is None else pd.DataFrame(X, columns=spec['columns'], copy=False)
+
+
+def _train_candidate(model_type: str, shared: Dict[str, Dict], n_jobs: int,
+                     groups: Optional[Dict] = None) -> Tuple[Any, Dict]:
+    """Worker: train and evaluate one candidate on the shared matrices."""
+    # Imported here like in compare_models (run_machine_learning imports evaluation)
+    from machine_learning.evaluation import evaluate_model
+    from machine_learning.run_machine_learning import DEFAULT_RF_PARAMS, DEFAULT_XGBOOST_PARAMS, train_model
+
+    data = {name: open_shared(spec) for name, spec in shared.items()}
+    params = DEFAULT_XGBOOST_PARAMS if model_type == 'xgboost' else DEFAULT_RF_PARAMS
+    model = train_model(data['X_train'], data['y_train'], model_type=model_type,
+                        hyperparams={**params, 'n_jobs': n_jobs}, verbose=False)
+    metrics = evaluate_model(model, data['X_train'], data['X_test'], data['y_train'], data['y_test'],
+                             model_name=model_type, verbose=False, groups=groups)
+    # Same model as the sequential comparison, with its default n_jobs
+    model.set_params(n_jobs=params['n_jobs'])
+    return model, metrics
+
+
+def train_candidates(X_train, X_test, y_train, y_test, models_to_compare: List[str],
+                     n_jobs: int = SAFE_N_JOBS, memory_gb: Optional[float] = None,
+                     shared_dir=None, groups: Optional[Dict] = None,
+                     verbose: bool = True) -> Dict[str, Tuple[Any, Dict]]:
+    """
+    Train and evaluate candidate models concurrently.
+
+    Args:
+        X_train: Training features (DataFrame or CSR matrix)
+        X_test: Test features
+        y_train: Training labels
+        y_test: Test labels
+        models_to_compare: Model types ('xgboost', 'random_forest')
+        n_jobs: Core budget split between the workers (default SAFE_N_JOBS)
+        memory_gb: Machine memory (default: get_available_memory_gb())
+        shared_dir: Parent directory of the shared arrays (default: system temporary directory)
+        groups: Test row labels of the evaluate_model() breakdown (pickled to the workers)
+        verbose: Print the schedule
+
+    Returns:
+        Dict model type -> (trained model, evaluate_model metrics)
+    """
+    model_memory_gb = TRAINING_MEMORY_FACTOR * matrix_nbytes(X_train) / 1024 ** 3
+    workers, threads = plan_workers(len(models_to_compare), n_jobs, memory_gb, model_memory_gb)
+    if verbose:
+        print(f"\nParallel comparison: {workers} worker(s) x {threads} thread(s) "
+              f"(~{model_memory_gb:.2f} GB per training)")
+
+    with tempfile.TemporaryDirectory(prefix="compare_", dir=shared_dir) as directory:
+        shared = share_arrays(directory, X_train=X_train, X_test=X_test, y_train=y_train, y_test=y_test)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as pool:
+            futures = {model_type: pool.submit(_train_candidate, model_type, shared, threads, groups)
+                       for model_type in models_to_compare}
+            return {model_type: future.result() for model_type, future in futures.items()}
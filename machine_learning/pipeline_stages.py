@@ -0,0 +1,273 @@
+"""Checkpointed stages of the ML pipeline.
+
+run_machine_learning.main() runs the dataset, features, comparison and
+model stages through PipelineStages. The dataset stage runs the dataset
+builder script (run_dataset_preparation). With --resume, a stage is skipped
+when its checkpoint was recorded with the same config and its files
+still have the recorded checksum (see machine_learning.checkpoints);
+otherwise it runs and records its checkpoint. Trained models are
+checkpointed against the features they were trained on.
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from machine_learning.checkpoints import PipelineCheckpoints
+from machine_learning.constants import PROJECT_ROOT, get_processed_dir
+from machine_learning.evaluation import compare_models
+from machine_learning.features import cached_fit_transform
+
+MODELS_TO_COMPARE = ['xgboost', 'random_forest']
+
+
+def run_dataset_preparation(dataset_version: str = 'v1', scenario_type: str = 'all',
+                            num_random_samples: int = 5, max_combinations: int = 20,
+                            feature_matrix: bool = False, processed_dir=None, verbose: bool = True) -> bool:
+    """
+    Run dataset preparation script to generate train/test datasets from DB.
+
+    Args:
+        dataset_version: 'v1' (original) or 'v2' (multi-scenarios)
+        scenario_type: For v2 - 'best_move', 'random_move', 'all_combinations', or 'all'
+        num_random_samples: For v2 random_move - number of samples per matchup
+        max_combinations: For v2 all_combinations - max combinations per matchup
+        feature_matrix: For v2 - also write the final feature matrix (MATRIX_DIR)
+        processed_dir: Directory of the generated train/test datasets
+            (default: processed directory of dataset_version)
+        verbose: Print detailed output
+
+    Validation: C12 (dataset quality checks)
+    """
+    processed_dir = Path(processed_dir or get_processed_dir(dataset_version))
+    if verbose:
+        print("\n" + "=" * 80)
+        print("STEP 1: DATASET PREPARATION")
+        print("=" * 80)
+        print(f"\nGenerating Pokemon battle datasets (version: {dataset_version})...")
+        if dataset_version == 'v2':
+            print(f"Scenario type: {scenario_type}")
+
+    try:
+        # Select script based on version
+        if dataset_version == 'v2':
+            script_name = "build_battle_winner_dataset_v2.py"
+            cmd = [
+                sys.executable,
+                str(PROJECT_ROOT / "machine_learning" / script_name),
+                "--scenario-type", scenario_type,
+                "--num-random-samples", str(num_random_samples),
+                "--max-combinations", str(max_combinations)
+            ]
+            if feature_matrix:
+                cmd.append("--feature-matrix")
+        else:
+            script_name = "build_battle_winner_dataset.py"
+            cmd = [
+                sys.executable,
+                str(PROJECT_ROOT / "machine_learning" / script_name)
+            ]
+
+        # Run dataset generation
+        result = subprocess.run(
+            cmd,
+            check=True,
+            capture_output=True,
+            text=True,
+            env={**os.environ, "POSTGRES_HOST": os.getenv("POSTGRES_HOST", "localhost")}
+        )
+
+        if verbose:
+            print(result.stdout)
+
+        # Validate output files
+        train_path = processed_dir / "train.parquet"
+        test_path = processed_dir / "test.parquet"
+
+        if not train_path.exists():
+            raise FileNotFoundError(f"Train dataset not created: {train_path}")
+        if not test_path.exists():
+            raise FileNotFoundError(f"Test dataset not created: {test_path}")
+
+        # Validate dataset quality
+        df_train = pd.read_parquet(train_path)
+        df_test = pd.read_parquet(test_path)
+
+        if verbose:
+            print("\n[OK] Dataset validation:")
+            print(f"   Train samples: {len(df_train):,}")
+            print(f"   Test samples: {len(df_test):,}")
+            print(f"   Total features: {df_train.shape[1]}")
+
+            # Check for scenario_type column (v2)
+            if 'scenario_type' in df_train.columns:
+                print(f"\n   [OK] Multi-scenario dataset (v2) detected:")
+                scenario_counts = df_train['scenario_type'].value_counts()
+                for scenario, count in scenario_counts.items():
+                    print(f"      {scenario}: {count:,} samples")
+
+            # Check class balance
+            train_balance = df_train['winner'].value_counts(normalize=True)
+            print(f"\n   Class balance (train):")
+            print(f"     Winner A: {train_balance.get(1, 0)*100:.1f}%")
+            print(f"     Winner B: {train_balance.get(0, 0)*100:.1f}%")
+
+            # Check for nulls
+            null_count = df_train.isnull().sum().sum()
+            if null_count > 0:
+                print(f"\n   [WARN] Warning: {null_count} null values detected")
+            else:
+                print(f"\n   [OK] No null values")
+
+        return True
+
+    except subprocess.CalledProcessError as e:
+        print(f"\n[ERROR] Dataset preparation failed:")
+        print(e.stderr)
+        return False
+
+
+class PipelineStages:
+    """
+    Stages of run_machine_learning.main() and their checkpoints.
+
+    Args:
+        args: Parsed run_machine_learning command line
+        processed_dir: Directory of train.parquet and test.parquet
+        matrix_dir: Directory of the feature matrix (--feature-matrix)
+        checkpoint_dir: Directory of the stage and boosting checkpoints
+        tuning_dir: Directory of the hyperparameter search trials
+        verbose: Print progress
+    """
+
+    def __init__(self, args, processed_dir, matrix_dir, checkpoint_dir, tuning_dir, verbose: bool = True):
+        self.args = args
+        self.processed_dir = Path(processed_dir)
+        self.matrix_dir = Path(matrix_dir)
+        self.checkpoints = PipelineCheckpoints(checkpoint_dir, resume=args.resume, verbose=verbose)
+        self.boosting_checkpoint = Path(checkpoint_dir) / "boosting.ubj"
+        self.tuning_dir = tuning_dir
+        self.verbose = verbose
+
+    def dataset(self) -> bool:
+        """
+        Generate the dataset (run_dataset_preparation) unless its checkpoint is valid.
+
+        Returns:
+            False if the generation failed
+        """
+        args = self.args
+        config = {
+            'dataset_version': args.dataset_version,
+            'scenario_type': args.scenario_type,
+            'num_random_samples': args.num_random_samples,
+            'max_combinations': args.max_combinations,
+            'feature_matrix': args.feature_matrix,
+        }
+        if self.checkpoints.completed('dataset', config):
+            return True
+        if not run_dataset_preparation(**config, processed_dir=self.processed_dir, verbose=self.verbose):
+            return False
+        artifacts = [self.processed_dir] + ([self.matrix_dir] if args.feature_matrix else [])
+        self.checkpoints.record('dataset', artifacts, config)
+        return True
+
+    def features(self, load: Callable, features_id: str, cache_dir: Optional[Path] = None) -> Tuple:
+        """
+        Feature engineering, reused from the cache when the dataset and config are unchanged.
+
+        A cache entry whose files no longer match its checkpoint is
+        computed again.
+
+        Args:
+            load: Returns (df_train, df_test) on a cache miss
+            features_id: feature_cache_key() of the dataset
+            cache_dir: Feature cache directory (None: no cache)
+
+        Returns:
+            Tuple (X_train, X_test, y_train, y_test, scalers, feature_columns, encoder)
+        """
+        config = {'scenario_type': self.args.scenario_type, 'key': features_id}
+        done = cache_dir is not None and self.checkpoints.completed('features', config)
+        if 'features' in self.checkpoints.corrupted:
+            # Damaged cache entry: computed again
+            shutil.rmtree(Path(cache_dir) / features_id, ignore_errors=True)
+        features = cached_fit_transform(load, self.processed_dir, self.args.scenario_type, cache_dir=cache_dir,
+                                        sparse=self.args.sparse, verbose=self.verbose)
+        if cache_dir is not None and not done:
+            self.checkpoints.record('features', [Path(cache_dir) / features_id], config)
+        return features
+
+    def comparison(self, data: Tuple, features_id: str, groups: Optional[Dict] = None) -> Tuple[Any, str, List]:
+        """
+        Compare MODELS_TO_COMPARE, resumed from the comparison checkpoint.
+
+        Args:
+            data: (X_train, X_test, y_train, y_test)
+            features_id: Key of the features the models are trained on
+            groups: Test metric breakdowns (see compare_models)
+
+        Returns:
+            best_model, best_model_name, all_metrics
+        """
+        config = {'features': features_id, 'sparse': self.args.sparse, 'models': MODELS_TO_COMPARE}
+        return self.checkpoints.run_stage('comparison', config, lambda: compare_models(
+            *data, models_to_compare=MODELS_TO_COMPARE, verbose=self.verbose,
+            parallel=self.args.parallel_compare, groups=groups
+        ))
+
+    def model(self, X_train, y_train, features_id: str, model_type: str) -> Tuple[Any, Dict]:
+        """
+        Train one model (searched with --tune-hyperparams), resumed from the model checkpoint.
+
+        An interrupted fit continues from the boosting checkpoint, an
+        interrupted search from its completed trials.
+
+        Args:
+            X_train: Training features
+            y_train: Training target
+            features_id: Key of the features the model is trained on
+            model_type: 'xgboost' or 'random_forest'
+
+        Returns:
+            model, hyperparams
+        """
+        # Imported here like in compare_models (run_machine_learning imports pipeline_stages)
+        from machine_learning.run_machine_learning import (
+            DEFAULT_RF_PARAMS,
+            DEFAULT_XGBOOST_PARAMS,
+            train_model,
+            tune_hyperparameters,
+        )
+        args = self.args
+        config = {
+            'features': features_id,
+            'sparse': args.sparse,
+            'model': model_type,
+            'tune_hyperparams': args.tune_hyperparams,
+            'search_method': args.search_method if args.tune_hyperparams else None,
+            'grid_type': args.grid_type if args.tune_hyperparams else None,
+        }
+
+        def fit() -> Dict:
+            if args.tune_hyperparams:
+                model, hyperparams = tune_hyperparameters(
+                    X_train, y_train, model_type=model_type, verbose=self.verbose,
+                    search_method=args.search_method, grid_type=args.grid_type,
+                    checkpoint_dir=self.tuning_dir, resume=args.resume,
+                    refit_checkpoint=self.boosting_checkpoint, checkpoint_rounds=args.checkpoint_rounds
+                )
+            else:
+                model = train_model(X_train, y_train, model_type=model_type, verbose=self.verbose,
+                                    checkpoint_path=self.boosting_checkpoint,
+                                    checkpoint_rounds=args.checkpoint_rounds, resume=args.resume)
+                hyperparams = DEFAULT_XGBOOST_PARAMS if model_type == 'xgboost' else DEFAULT_RF_PARAMS
+            return {'model': model, 'hyperparams': hyperparams}
+
+        state = self.checkpoints.run_stage('model', config, fit)
+        return state['model'], state['hyperparams']
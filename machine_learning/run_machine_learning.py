@@ -1,11 +1,13 @@
 #!/usr/bin/env python3
-"""Unified ML pipeline for Pokemon battle prediction."""
+"""
+Unified ML pipeline for Pokemon battle prediction.
 
-import argparse
 Output (v2):
     - data/ml/battle_winner_v2/raw/matchups_*.parquet
-    - data/ml/battle_winner_v2/processed/train.parquet (with scenario_type column)
-    - data/ml/battle_winner_v2/processed/test.parquet (with scenario_type column)
+    - data/ml/battle_winner_v2/processed/train.parquet (partitioned by scenario_type)
+    - data/ml/battle_winner_v2/processed/test.parquet (partitioned by scenario_type)
+    - data/ml/battle_winner_v2/matrix/ (feature matrix, with --feature-matrix)
+    - data/ml/battle_winner_v2/checkpoints/ (completed stages, resumed with --resume)
     - models/battle_winner_model_v2.pkl
 
 Validation:
@@ -14,17 +16,15 @@ Validation:
 """
 
 import argparse
-import os
-import subprocess
 import sys
 from datetime import datetime
+from pathlib import Path
 from typing import Any, Dict, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 import xgboost as xgb
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import GridSearchCV
 
 # MLflow integration (C13 - MLOps)
 try:
@@ -38,8 +38,9 @@ except ImportError:
 from machine_learning.config import (
     XGBOOST_PARAMS,
     XGBOOST_PARAM_GRID_FAST,
+    XGBOOST_PARAM_GRID_EXTENDED,
     RANDOM_SEED,
-    SAFE_GRIDSEARCH_N_JOBS,
+    SAFE_N_JOBS,
 )
 from machine_learning.constants import (
     PROJECT_ROOT,
@@ -48,14 +49,38 @@ from machine_learning.constants import (
     get_raw_dir,
     get_processed_dir,
     get_features_dir,
+    get_matrix_dir,
+    get_feature_cache_dir,
+    get_tuning_dir,
+    get_checkpoint_dir,
+)
+from machine_learning.datasets import load_splits, model_columns, scenario_labels
+from machine_learning.config import FeatureEngineeringConfig
+from machine_learning.features import (
+    CategoricalEncoder,
+    csr_by_rows,
+    feature_cache_key,
+    load_feature_matrix,
+    sparse_model_params,
 )
-from machine_learning.features import PokemonFeatureEngineer
 from machine_learning.evaluation import (
     evaluate_model,
     analyze_feature_importance,
-    compare_models,
+    type_matchups,
 )
 from machine_learning.export import export_model, export_features
+from machine_learning.external_memory import (
+    DEFAULT_BATCH_ROWS,
+    evaluate_external_memory,
+    train_external_memory,
+)
+from machine_learning.checkpoints import (
+    DEFAULT_CHECKPOINT_ROUNDS,
+    artifacts_checksum,
+    fit_with_checkpoints,
+)
+from machine_learning.pipeline_stages import PipelineStages
+from machine_learning.tuning import quantized_grid_search, successive_halving_search
 
 # Add project root to path
 sys.path.insert(0, str(PROJECT_ROOT))
@@ -65,6 +90,10 @@ DATA_DIR = None
 RAW_DIR = None
 PROCESSED_DIR = None
 FEATURES_DIR = None
+MATRIX_DIR = None
+FEATURE_CACHE_DIR = None
+TUNING_DIR = None
+CHECKPOINT_DIR = None
 
 # Backward compatibility aliases (using new config system)
 DEFAULT_XGBOOST_PARAMS = XGBOOST_PARAMS
@@ -82,146 +111,66 @@ DEFAULT_RF_PARAMS = {
 
 
 # Dataset preparation
-def run_dataset_preparation(dataset_version: str = 'v1', scenario_type: str = 'all',
-                            num_random_samples: int = 5, max_combinations: int = 20,
-                            verbose: bool = True) -> bool:
-    """
-    Run dataset preparation script to generate train/test datasets from DB.
+# Note: run_dataset_preparation() is now in machine_learning.pipeline_stages
+#       (dataset stage of PipelineStages)
 
-    Args:
-        dataset_version: 'v1' (original) or 'v2' (multi-scenarios)
-        scenario_type: For v2 - 'best_move', 'random_move', 'all_combinations', or 'all'
-        num_random_samples: For v2 random_move - number of samples per matchup
-        max_combinations: For v2 all_combinations - max combinations per matchup
-        verbose: Print detailed output
 
-    Validation: C12 (dataset quality checks)
+def load_matrix_features(matrix_dir, scenario_type: str = "all", sparse: bool = False,
+                         verbose: bool = True):
     """
-    if verbose:
-        print("\n" + "=" * 80)
-        print("STEP 1: DATASET PREPARATION")
-        print("=" * 80)
-        print(f"\nGenerating Pokemon battle datasets (version: {dataset_version})...")
-        if dataset_version == 'v2':
-            print(f"Scenario type: {scenario_type}")
+    Load the feature matrix written by the dataset builder (--feature-matrix).
 
-    try:
-        # Select script based on version
-        if dataset_version == 'v2':
-            script_name = "build_battle_winner_dataset_v2.py"
-            cmd = [
-                sys.executable,
-                str(PROJECT_ROOT / "machine_learning" / script_name),
-                "--scenario-type", scenario_type,
-                "--num-random-samples", str(num_random_samples),
-                "--max-combinations", str(max_combinations)
-            ]
-        else:
-            script_name = "build_battle_winner_dataset.py"
-            cmd = [
-                sys.executable,
-                str(PROJECT_ROOT / "machine_learning" / script_name)
-            ]
-
-        # Run dataset generation
-        result = subprocess.run(
-            cmd,
-            check=True,
-            capture_output=True,
-            text=True,
-            env={**os.environ, "POSTGRES_HOST": os.getenv("POSTGRES_HOST", "localhost")}
-        )
+    Replaces reading train/test.parquet and PokemonFeatureEngineer.fit_transform:
+    the matrix is already encoded and scaled, and is memory-mapped.
 
-        if verbose:
-            print(result.stdout)
-
-        # Validate output files
-        train_path = PROCESSED_DIR / "train.parquet"
-        test_path = PROCESSED_DIR / "test.parquet"
+    Args:
+        matrix_dir: Directory of the matrix files
+        scenario_type: Requested scenario ("all" accepts any matrix)
+        sparse: Return X_train and X_test as CSR matrices (see fit_transform(sparse=True))
+        verbose: Print the matrix shape
 
-        if not train_path.exists():
-            raise FileNotFoundError(f"Train dataset not created: {train_path}")
-        if not test_path.exists():
-            raise FileNotFoundError(f"Test dataset not created: {test_path}")
+    Returns:
+        Tuple (X_train, X_test, y_train, y_test, scalers, feature_columns)
 
-        # Validate dataset quality
-        df_train = pd.read_parquet(train_path)
-        df_test = pd.read_parquet(test_path)
+    Raises:
+        FileNotFoundError: If the matrix was not generated
+        ValueError: If the matrix holds other scenarios than the requested one
+    """
+    X_train, X_test, y_train, y_test, scalers, feature_columns, metadata = load_feature_matrix(matrix_dir)
 
-        if verbose:
-            print("\n[OK] Dataset validation:")
-            print(f"   Train samples: {len(df_train):,}")
-            print(f"   Test samples: {len(df_test):,}")
-            print(f"   Total features: {df_train.shape[1]}")
-
-            # Check for scenario_type column (v2)
-            if 'scenario_type' in df_train.columns:
-                print(f"\n   [OK] Multi-scenario dataset (v2) detected:")
-                scenario_counts = df_train['scenario_type'].value_counts()
-                for scenario, count in scenario_counts.items():
-                    print(f"      {scenario}: {count:,} samples")
-
-            # Check class balance
-            train_balance = df_train['winner'].value_counts(normalize=True)
-            print(f"\n   Class balance (train):")
-            print(f"     Winner A: {train_balance.get(1, 0)*100:.1f}%")
-            print(f"     Winner B: {train_balance.get(0, 0)*100:.1f}%")
-
-            # Check for nulls
-            null_count = df_train.isnull().sum().sum()
-            if null_count > 0:
-                print(f"\n   [WARN] Warning: {null_count} null values detected")
-            else:
-                print(f"\n   [OK] No null values")
+    # Scalers were fitted on the generated scenarios: rows cannot be filtered afterwards
+    if scenario_type != "all" and metadata['scenarios'] != [scenario_type]:
+        raise ValueError(
+            f"Feature matrix holds scenarios {metadata['scenarios']}, not '{scenario_type}'. "
+            f"Regenerate it with --mode=dataset --scenario-type={scenario_type} --feature-matrix."
+        )
 
-        return True
+    if sparse:
+        X_train, X_test = csr_by_rows(X_train), csr_by_rows(X_test)
 
-    except subprocess.CalledProcessError as e:
-        print(f"\n[ERROR] Dataset preparation failed:")
-        print(e.stderr)
-        return False
+    if verbose:
+        print(f"\n[OK] Feature matrix loaded from {matrix_dir}")
+        print(f"   Train: {X_train.shape}, Test: {X_test.shape} (scenarios: {', '.join(metadata['scenarios'])})")
+    return X_train, X_test, y_train, y_test, scalers, feature_columns
 
 
-def filter_by_scenario(df_train: pd.DataFrame, df_test: pd.DataFrame, scenario_type: str, verbose: bool = True):
+def filter_by_scenario(processed_dir, scenario_type: str, verbose: bool = True):
     """
-    Optionally filter datasets by scenario_type column if present.
+    Load the train/test datasets, optionally restricted to one scenario.
+
+    The scenario filter and the model columns are pushed down to the
+    Parquet reader: with the hive-partitioned v2 layout
+    (scenario_type=<scenario>/), only the files of the requested scenario
+    are read. Falls back to the full dataset when the scenario_type column
+    is missing or the scenario leaves a split empty.
     Args:
-        df_train: training dataframe
-        df_test: test dataframe
+        processed_dir: directory of train.parquet and test.parquet
         scenario_type: scenario to keep; "all" keeps everything
     Returns:
-        df_train_filtered, df_test_filtered
+        df_train, df_test
     """
-    if scenario_type == "all":
-        return df_train, df_test
-
-    try:
-        if "scenario_type" not in df_train.columns:
-            if verbose:
-                print(f"[WARN] scenario_type filtering skipped: column missing (requested '{scenario_type}').")
-            return df_train, df_test
-
-        before_train = len(df_train)
-        before_test = len(df_test)
-
-        df_train_filtered = df_train[df_train["scenario_type"] == scenario_type]
-        df_test_filtered = df_test[df_test["scenario_type"] == scenario_type]
-
-        if df_train_filtered.empty or df_test_filtered.empty:
-            if verbose:
-                print(f"[WARN] scenario_type='{scenario_type}' produced empty split; fallback to full dataset.")
-            return df_train, df_test
-
-        if verbose:
-            print(
-                f"Filtering scenario_type='{scenario_type}': "
-                f"train {before_train}->{len(df_train_filtered)}, test {before_test}->{len(df_test_filtered)}"
-            )
-        return df_train_filtered, df_test_filtered
-
-    except Exception as e:
-        print(f"\n[ERROR] Error during scenario filtering: {e}")
-        return df_train, df_test
+    columns = model_columns(Path(processed_dir) / "train.parquet")
+    return load_splits(processed_dir, scenario_type, columns=columns, verbose=verbose)
 
 
 # Feature engineering (refactored)
@@ -235,18 +184,25 @@ def filter_by_scenario(df_train: pd.DataFrame, df_test: pd.DataFrame, scenario_t
 def train_model(X_train: pd.DataFrame, y_train: pd.Series,
                 model_type: str = 'xgboost',
                 hyperparams: Optional[Dict] = None,
-                verbose: bool = True) -> Any:
+                verbose: bool = True,
+                checkpoint_path=None,
+                checkpoint_rounds: int = DEFAULT_CHECKPOINT_ROUNDS,
+                resume: bool = False) -> Any:
     """
     Train a classification model.
 
     Validation: C12 (training pipeline tests)
 
     Args:
-        X_train: Training features
+        X_train: Training features (DataFrame or sparse matrix)
         y_train: Training target
         model_type: 'xgboost' or 'random_forest'
         hyperparams: Custom hyperparameters (optional)
         verbose: Print training progress
+        checkpoint_path: XGBoost booster file saved every checkpoint_rounds rounds
+            (None: no boosting checkpoint)
+        checkpoint_rounds: Rounds between two boosting checkpoints
+        resume: Continue from the boosting checkpoint of an interrupted fit
 
     Returns:
         Trained model
@@ -260,7 +216,7 @@ def train_model(X_train: pd.DataFrame, y_train: pd.Series,
         params = hyperparams or DEFAULT_XGBOOST_PARAMS
         if verbose:
             print(f"\nHyperparameters: {params}")
-        model = xgb.XGBClassifier(**params)
+        model = xgb.XGBClassifier(**params, **sparse_model_params(X_train))
 
     elif model_type == 'random_forest':
         params = hyperparams or DEFAULT_RF_PARAMS
@@ -282,11 +238,12 @@ def train_model(X_train: pd.DataFrame, y_train: pd.Series,
             X_train, y_train, test_size=0.2, random_state=RANDOM_SEED, stratify=y_train
         )
 
-        # Fit with early stopping
-        model.fit(
-            X_tr, y_tr,
-            eval_set=[(X_tr, y_tr), (X_val, y_val)],
-            verbose=False
+        # Fit with early stopping (booster checkpointed every checkpoint_rounds rounds)
+        fit_with_checkpoints(
+            model, X_tr, y_tr, checkpoint_path,
+            every=checkpoint_rounds, resume=resume,
+            fit_params={'eval_set': [(X_tr, y_tr), (X_val, y_val)], 'verbose': False},
+            verbose=verbose
         )
 
         if verbose:
@@ -305,9 +262,18 @@ def train_model(X_train: pd.DataFrame, y_train: pd.Series,
 
 def tune_hyperparameters(X_train: pd.DataFrame, y_train: pd.Series,
                          model_type: str = 'xgboost',
-                         verbose: bool = True) -> Tuple[Any, Dict]:
+                         verbose: bool = True,
+                         search_method: str = 'grid',
+                         grid_type: str = 'fast',
+                         checkpoint_dir=None,
+                         resume: bool = False,
+                         refit_checkpoint=None,
+                         checkpoint_rounds: int = DEFAULT_CHECKPOINT_ROUNDS) -> Tuple[Any, Dict]:
     """
-    Hyperparameter tuning with GridSearchCV.
+    Hyperparameter tuning by exhaustive grid search or successive halving.
+
+    Both searches train on quantized folds (see machine_learning.tuning)
+    and checkpoint every completed trial.
 
     Validation: C12 (model selection tests)
 
@@ -316,6 +282,14 @@ def tune_hyperparameters(X_train: pd.DataFrame, y_train: pd.Series,
         y_train: Training target
         model_type: 'xgboost' or 'random_forest'
         verbose: Print tuning progress
+        search_method: 'grid' (exhaustive, GridSearchCV results) or 'halving'
+            (successive halving)
+        grid_type: 'fast' or 'extended' - which parameter grid to search
+        checkpoint_dir: Directory of the trials checkpoint (None: no checkpoint)
+        resume: Reuse the completed trials and the refit booster of an
+            interrupted search (False: start over)
+        refit_checkpoint: Booster file of the refit, saved every checkpoint_rounds rounds
+        checkpoint_rounds: Rounds between two refit checkpoints
 
     Returns:
         best_model, best_params
@@ -325,11 +299,11 @@ def tune_hyperparameters(X_train: pd.DataFrame, y_train: pd.Series,
         print("HYPERPARAMETER TUNING")
         print("=" * 80)
         print(f"\nModel: {model_type}")
-        print("Method: GridSearchCV with 3-fold CV")
+        print("Method: " + ("successive halving" if search_method == 'halving' else "grid search")
+              + " with 3-fold CV")
 
     if model_type == 'xgboost':
-        base_model = xgb.XGBClassifier(random_state=RANDOM_SEED, n_jobs=SAFE_GRIDSEARCH_N_JOBS)
-        param_grid = XGBOOST_PARAM_GRID
+        param_grid = XGBOOST_PARAM_GRID_EXTENDED if grid_type == 'extended' else XGBOOST_PARAM_GRID
     else:
         raise ValueError("Hyperparameter tuning only implemented for XGBoost")
 
@@ -342,31 +316,83 @@ def tune_hyperparameters(X_train: pd.DataFrame, y_train: pd.Series,
         print(f"\nTotal combinations: {total_combinations}")
         print("This may take a while...\n")
 
-    # Configure GridSearchCV with optimization
-    from sklearn.model_selection import StratifiedKFold
-    cv = StratifiedKFold(n_splits=3, shuffle=True, random_state=RANDOM_SEED)
-
-    grid_search = GridSearchCV(
-        estimator=base_model,
-        param_grid=param_grid,
-        cv=cv,
-        scoring='roc_auc',      # Better metric for imbalanced data
-        n_jobs=SAFE_GRIDSEARCH_N_JOBS,  # Auto-adjusted per platform (Windows/Linux)
-        verbose=2 if verbose else 0,
-        refit=True,             # Refit best model on full training set
-        return_train_score=False  # Don't compute train scores (faster)
+    search = successive_halving_search if search_method == 'halving' else quantized_grid_search
+    checkpoint = None if checkpoint_dir is None else Path(checkpoint_dir) / f"{search_method}_{grid_type}.json"
+    best_model, best_params, best_score = search(
+        X_train, y_train, param_grid,
+        base_params={'random_state': RANDOM_SEED, 'n_jobs': SAFE_N_JOBS},
+        checkpoint_path=checkpoint, resume=resume,
+        refit_checkpoint=refit_checkpoint, checkpoint_rounds=checkpoint_rounds,
+        verbose=verbose
     )
 
-    # Fit with evaluation set for monitoring (no early stopping in GridSearchCV directly)
-    grid_search.fit(X_train, y_train)
-
     if verbose:
         print(f"\n[OK] Best parameters found:")
-        for param, value in grid_search.best_params_.items():
+        for param, value in best_params.items():
             print(f"   {param}: {value}")
-        print(f"\n[OK] Best CV accuracy: {grid_search.best_score_:.4f}")
+        print(f"\n[OK] Best CV ROC-AUC: {best_score:.4f}")
+
+    return best_model, best_params
+
+
+def run_external_memory_training(processed_dir, scenario_type: str = "all",
+                                 batch_rows: int = DEFAULT_BATCH_ROWS, version: str = 'v1',
+                                 tracker=None, verbose: bool = True) -> Dict[str, float]:
+    """
+    Train, evaluate and export XGBoost without loading the datasets in memory.
+
+    Steps 2-4 of the pipeline, batch by batch (see machine_learning.external_memory).
 
-    return grid_search.best_estimator_, grid_search.best_params_
+    Args:
+        processed_dir: Directory of train.parquet and test.parquet
+        scenario_type: Scenario to keep; "all" keeps everything
+        batch_rows: Rows per batch
+        version: Suffix for exported artifacts
+        tracker: MLflow tracker (optional)
+        verbose: Print progress
+
+    Returns:
+        Evaluation metrics
+    """
+    model, feature_engineer = train_external_memory(
+        processed_dir, scenario_type, params=DEFAULT_XGBOOST_PARAMS, batch_rows=batch_rows, verbose=verbose
+    )
+    metrics = evaluate_external_memory(model, feature_engineer, processed_dir, scenario_type,
+                                       batch_rows=batch_rows, model_name='xgboost', verbose=verbose)
+    feature_columns = feature_engineer.feature_columns
+    scalers = {
+        'standard_scaler': feature_engineer.scaler,
+        'standard_scaler_new_features': feature_engineer.scaler_derived
+    }
+
+    if tracker:
+        tracker.log_dataset_info({
+            "train_samples": metrics['train_samples'],
+            "test_samples": metrics['test_samples'],
+            "num_features": len(feature_columns)
+        })
+        tracker.log_params(DEFAULT_XGBOOST_PARAMS)
+        tracker.log_metrics({name: value for name, value in metrics.items()
+                             if name not in ('model_name', 'train_samples', 'test_samples')})
+
+    analyze_feature_importance(model, feature_columns, verbose=verbose)
+
+    model_path = export_model(
+        model,
+        scalers,
+        feature_columns,
+        metrics,
+        hyperparams=DEFAULT_XGBOOST_PARAMS,
+        version=version,
+        categorical_encoding=feature_engineer.encoder.to_dict(),
+        verbose=verbose)
+
+    if tracker and model_path:
+        tracker.log_model(model, artifact_path=f"model_{version}",
+                          model_type='xgboost', scalers=scalers,
+                          metadata={'feature_columns': feature_columns})
+
+    return metrics
 
 
 # Model evaluation
@@ -375,7 +401,8 @@ def tune_hyperparameters(X_train: pd.DataFrame, y_train: pd.Series,
 
 
 # Model comparison
-# Note: compare_models() is now imported from machine_learning.evaluation
+# Note: compare_models() is now run by PipelineStages.comparison()
+#       (machine_learning.pipeline_stages)
 
 
 # Model export
@@ -405,6 +432,22 @@ Examples:
 
   # Skip feature export
   python machine_learning/run_machine_learning.py --mode=all --skip-export-features
+
+  # Extended grid by successive halving (resumable after an interruption)
+  python machine_learning/run_machine_learning.py --mode=train --tune-hyperparams --grid-type=extended \\
+      --search-method=halving
+
+  # Sparse one-hot features (less memory for the extended grid)
+  python machine_learning/run_machine_learning.py --mode=all --tune-hyperparams --sparse
+
+  # Datasets larger than memory (XGBoost trained from Parquet batches)
+  python machine_learning/run_machine_learning.py --mode=train --dataset-version=v2 --external-memory
+
+  # Train the compared models concurrently
+  python machine_learning/run_machine_learning.py --mode=compare --parallel-compare
+
+  # Restart an interrupted run: completed stages, trials and boosting rounds are reused
+  python machine_learning/run_machine_learning.py --mode=all --dataset-version=v2 --tune-hyperparams --resume
         """
     )
 
@@ -451,6 +494,14 @@ Examples:
         default='fast',
         help='GridSearch parameter grid: fast (for CI) or extended (for notebooks) (default: fast)'
     )
+    parser.add_argument(
+        '--search-method',
+        type=str,
+        choices=['grid', 'halving'],
+        default='grid',
+        help='With --tune-hyperparams: exhaustive grid search or successive halving '
+             '(early-stopped configurations) (default: grid)'
+    )
     parser.add_argument(
         '--num-random-samples',
         type=int,
@@ -470,6 +521,52 @@ Examples:
         default='xgboost',
         help='Model to train (default: xgboost)'
     )
+    parser.add_argument(
+        '--feature-matrix',
+        action='store_true',
+        help='For v2 datasets: generate and train on the encoded feature matrix '
+             '(skips reading and encoding the Parquet datasets)'
+    )
+    parser.add_argument(
+        '--sparse',
+        action='store_true',
+        help='Keep the one-hot columns as a sparse CSR matrix for training and evaluation (less memory)'
+    )
+    parser.add_argument(
+        '--no-feature-cache',
+        action='store_true',
+        help='Recompute the feature engineering instead of reusing the cached matrices'
+    )
+    parser.add_argument(
+        '--external-memory',
+        action='store_true',
+        help='Train XGBoost from Parquet batches without loading the datasets in memory '
+             '(modes train/evaluate, no tuning)'
+    )
+    parser.add_argument(
+        '--batch-rows',
+        type=int,
+        default=DEFAULT_BATCH_ROWS,
+        help=f'With --external-memory: rows per batch (default: {DEFAULT_BATCH_ROWS})'
+    )
+    parser.add_argument(
+        '--parallel-compare',
+        action='store_true',
+        help='Modes compare/all: train the candidate models concurrently, splitting the cores '
+             'and memory between them (same models as the sequential comparison)'
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Skip the stages completed by an interrupted run (dataset, features, search trials, '
+             'model) after validating their checksums, and continue boosting from the last checkpoint'
+    )
+    parser.add_argument(
+        '--checkpoint-rounds',
+        type=int,
+        default=DEFAULT_CHECKPOINT_ROUNDS,
+        help=f'Boosting rounds between two XGBoost checkpoints (default: {DEFAULT_CHECKPOINT_ROUNDS})'
+    )
     parser.add_argument(
         '--quiet',
         action='store_true',
@@ -480,11 +577,27 @@ Examples:
     verbose = not args.quiet
 
     # Set global paths based on dataset version (using helper functions from constants.py)
-    global DATA_DIR, RAW_DIR, PROCESSED_DIR, FEATURES_DIR
+    global DATA_DIR, RAW_DIR, PROCESSED_DIR, FEATURES_DIR, MATRIX_DIR, FEATURE_CACHE_DIR, TUNING_DIR, CHECKPOINT_DIR
     DATA_DIR = get_data_dir(args.dataset_version)
     RAW_DIR = get_raw_dir(args.dataset_version)
     PROCESSED_DIR = get_processed_dir(args.dataset_version)
     FEATURES_DIR = get_features_dir(args.dataset_version)
+    MATRIX_DIR = get_matrix_dir(args.dataset_version)
+    FEATURE_CACHE_DIR = get_feature_cache_dir(args.dataset_version)
+    TUNING_DIR = get_tuning_dir(args.dataset_version)
+    CHECKPOINT_DIR = get_checkpoint_dir(args.dataset_version)
+
+    if args.feature_matrix and args.dataset_version != 'v2':
+        parser.error("--feature-matrix requires --dataset-version=v2")
+    if args.external_memory and (args.mode not in ('train', 'evaluate') or args.model != 'xgboost'
+                                 or args.tune_hyperparams or args.feature_matrix or args.sparse):
+        parser.error("--external-memory only trains XGBoost with fixed hyperparameters "
+                     "(--mode=train or evaluate, without --tune-hyperparams, --feature-matrix or --sparse)")
+    if args.checkpoint_rounds < 1:
+        parser.error("--checkpoint-rounds must be at least 1")
+
+    # Completed stages of previous runs (reused with --resume)
+    stages = PipelineStages(args, PROCESSED_DIR, MATRIX_DIR, CHECKPOINT_DIR, TUNING_DIR, verbose=verbose)
 
     # Initialize MLflow tracker (C13 - MLOps)
     tracker = None
@@ -511,6 +624,9 @@ Examples:
         print(f"Scenario: {args.scenario_type}")
         if args.tune_hyperparams:
             print(f"GridSearch Type: {args.grid_type}")
+            print(f"Search Method: {args.search_method}")
+        if args.resume:
+            print(f"Resume: {CHECKPOINT_DIR}")
 
     try:
         # Start MLflow run
@@ -526,71 +642,88 @@ Examples:
                 'scenario_type': args.scenario_type,
                 'random_seed': RANDOM_SEED,
                 'tune_hyperparams': args.tune_hyperparams,
+                'search_method': args.search_method if args.tune_hyperparams else 'none',
                 'model_type': args.model,
+                'sparse_features': args.sparse,
             })
 
         # STEP 1: Dataset preparation
         if args.mode in ['all', 'dataset']:
-            success = run_dataset_preparation(
-                dataset_version=args.dataset_version,
-                scenario_type=args.scenario_type,
-                num_random_samples=args.num_random_samples,
-                max_combinations=args.max_combinations,
-                verbose=verbose
-            )
-            if not success:
+            if not stages.dataset():
                 sys.exit(1)
 
             if args.mode == 'dataset':
+                stages.checkpoints.clear()
                 print("\n[OK] Dataset preparation complete!")
                 return
 
+        # STEP 2-4 by batches: the datasets are never loaded in memory
+        if args.external_memory:
+            metrics = run_external_memory_training(
+                PROCESSED_DIR, args.scenario_type, batch_rows=args.batch_rows,
+                version=args.version, tracker=tracker, verbose=verbose
+            )
+            if verbose:
+                print("\n[OK] External memory training complete!")
+                print(f"[OK] Test Accuracy: {metrics['test_accuracy']*100:.2f}%")
+                print(f"[OK] Test ROC-AUC: {metrics['test_roc_auc']:.4f}")
+                print(f"\n[PATH] Model artifacts: {MODELS_DIR}")
+            return
+
         # Load datasets
         if verbose:
             print("\nLoading datasets...")
 
-        train_path = PROCESSED_DIR / "train.parquet"
-        test_path = PROCESSED_DIR / "test.parquet"
-
-        if not train_path.exists() or not test_path.exists():
-            print(f"\n[ERROR] Datasets not found. Run with --mode=dataset first.")
-            sys.exit(1)
+        if args.feature_matrix:
+            # STEP 2 already done by the dataset builder
+            X_train, X_test, y_train, y_test, scalers, feature_columns = load_matrix_features(
+                MATRIX_DIR, args.scenario_type, sparse=args.sparse, verbose=verbose
+            )
+            feature_config = FeatureEngineeringConfig()
+            encoder = CategoricalEncoder.from_columns(
+                feature_config.categorical_features, feature_config.type_vocabulary, feature_columns
+            )
+            features_id = artifacts_checksum([MATRIX_DIR])
+        else:
+            train_path = PROCESSED_DIR / "train.parquet"
+            test_path = PROCESSED_DIR / "test.parquet"
 
-        df_train = pd.read_parquet(train_path)
-        df_test = pd.read_parquet(test_path)
+            if not train_path.exists() or not test_path.exists():
+                print(f"\n[ERROR] Datasets not found. Run with --mode=dataset first.")
+                sys.exit(1)
 
-        # Optional scenario filtering
-        df_train, df_test = filter_by_scenario(df_train, df_test, args.scenario_type, verbose=verbose)
+            # STEP 2: Feature engineering, reused from the cache when the dataset and config are unchanged
+            # (optional scenario filtering: only the requested partitions are read)
+            features_id = feature_cache_key(PROCESSED_DIR, args.scenario_type)
+            X_train, X_test, y_train, y_test, scalers, feature_columns, encoder = stages.features(
+                lambda: filter_by_scenario(PROCESSED_DIR, args.scenario_type, verbose=verbose),
+                features_id, cache_dir=None if args.no_feature_cache else FEATURE_CACHE_DIR
+            )
 
-        # STEP 2: Feature engineering (using refactored class)
-        feature_engineer = PokemonFeatureEngineer()
-        X_train, X_test, y_train, y_test, scalers, feature_columns = feature_engineer.fit_transform(
-            df_train, df_test, verbose=verbose
-        )
+        # Test metrics broken down per scenario (not recorded in the feature matrix) and type matchup
+        evaluation_groups = {
+            'scenario_type': None if args.feature_matrix else scenario_labels(PROCESSED_DIR, args.scenario_type),
+            'matchup': type_matchups(X_test, feature_columns),
+        }
 
         # Log dataset info to MLflow
         if tracker:
             tracker.log_dataset_info({
-                "train_samples": len(X_train),
-                "test_samples": len(X_test),
+                "train_samples": X_train.shape[0],
+                "test_samples": X_test.shape[0],
                 "num_features": len(feature_columns)
             })
 
+        data = (X_train, X_test, y_train, y_test)
+
         # STEP 3 & 4: Train and evaluate (single model)
         if args.mode == 'train' or args.mode == 'evaluate':
-            # Optional: Hyperparameter tuning
-            if args.tune_hyperparams:
-                model, best_params = tune_hyperparameters(X_train, y_train,
-                                                          model_type=args.model,
-                                                          verbose=verbose)
-                hyperparams = best_params
-            else:
-                model = train_model(X_train, y_train, model_type=args.model, verbose=verbose)
-                hyperparams = DEFAULT_XGBOOST_PARAMS if args.model == 'xgboost' else DEFAULT_RF_PARAMS
+            # Optional: Hyperparameter tuning (--tune-hyperparams)
+            model, hyperparams = stages.model(X_train, y_train, features_id, args.model)
 
             # Evaluate
             metrics = evaluate_model(model, X_train, X_test, y_train, y_test,
-                                     model_name=args.model, verbose=verbose)
+                                     model_name=args.model, verbose=verbose, groups=evaluation_groups)
 
             # Log to MLflow
             if tracker:
@@ -603,6 +736,8 @@ Examples:
                     'test_f1': metrics['test_f1'],
                     'test_roc_auc': metrics['test_roc_auc'],
                     'overfitting': metrics['overfitting'],
+                    **{f"test_accuracy_{scenario}": m['accuracy']
+                       for scenario, m in metrics.get('breakdown', {}).get('scenario_type', {}).items()},
                 })
 
             # Feature importance
@@ -616,6 +751,7 @@ Examples:
                 metrics,
                 hyperparams=hyperparams,
                 version=args.version,
+                categorical_encoding=encoder.to_dict(),
                 verbose=verbose)
 
             # Log model to MLflow
@@ -629,11 +765,7 @@ Examples:
 
         # STEP 5: Compare multiple models
         elif args.mode == 'compare':
-            best_model, best_model_name, all_metrics = compare_models(
-                X_train, X_test, y_train, y_test,
-                models_to_compare=['xgboost', 'random_forest'],
-                verbose=verbose
-            )
+            best_model, best_model_name, all_metrics = stages.comparison(data, features_id, evaluation_groups)
 
             # Feature importance for best model
             analyze_feature_importance(best_model, feature_columns, verbose=verbose)
@@ -647,6 +779,7 @@ Examples:
                 best_metrics,
                 hyperparams=None,
                 version=args.version,
+                categorical_encoding=encoder.to_dict(),
                 verbose=verbose)
 
             # Log to MLflow
@@ -678,22 +811,17 @@ Examples:
         # STEP 6: Complete pipeline
         elif args.mode == 'all':
             # Compare models
-            best_model, best_model_name, all_metrics = compare_models(
-                X_train, X_test, y_train, y_test,
-                models_to_compare=['xgboost', 'random_forest'],
-                verbose=verbose
-            )
+            best_model, best_model_name, all_metrics = stages.comparison(data, features_id, evaluation_groups)
 
             # Optional: Hyperparameter tuning on best model
             if args.tune_hyperparams and best_model_name == 'xgboost':
                 if verbose:
                     print("\n[ML] Running hyperparameter tuning on best model...")
-                best_model, best_params = tune_hyperparameters(X_train, y_train,
-                                                               model_type='xgboost',
-                                                               verbose=verbose)
+                best_model, best_params = stages.model(X_train, y_train, features_id, 'xgboost')
                 # Re-evaluate
                 metrics = evaluate_model(best_model, X_train, X_test, y_train, y_test,
-                                         model_name='xgboost_tuned', verbose=verbose)
+                                         model_name='xgboost_tuned', verbose=verbose,
+                                         groups=evaluation_groups)
                 hyperparams = best_params
             else:
                 metrics = next(m for m in all_metrics if m['model_name'] == best_model_name)
@@ -710,6 +838,7 @@ Examples:
                 metrics,
                 hyperparams=hyperparams,
                 version=args.version,
+                categorical_encoding=encoder.to_dict(),
                 verbose=verbose)
 
             # Log to MLflow
@@ -724,6 +853,8 @@ Examples:
                     'test_f1': metrics['test_f1'],
                     'test_roc_auc': metrics['test_roc_auc'],
                     'overfitting': metrics['overfitting'],
+                    **{f"test_accuracy_{scenario}": m['accuracy']
+                       for scenario, m in metrics.get('breakdown', {}).get('scenario_type', {}).items()},
                 })
                 if model_path:
                     tracker.log_model(best_model, artifact_path=f"model_{args.version}",
@@ -748,6 +879,9 @@ Examples:
             if not args.skip_export_features:
                 export_features(X_train, X_test, y_train, y_test, FEATURES_DIR, verbose=verbose)
 
+        # Pipeline complete: the next run starts over
+        stages.checkpoints.clear()
+
         # Final summary
         if verbose:
             print("\n" + "=" * 80)
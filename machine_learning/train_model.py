@@ -5,9 +5,7 @@ import argparse
 import sys
 from datetime import datetime
 
-import pandas as pd
 import xgboost as xgb
-from sklearn.model_selection import GridSearchCV, StratifiedKFold
 
 # MLflow Model Registry
 try:
@@ -23,17 +21,21 @@ from machine_learning.config import (
     XGBOOST_PARAM_GRID_FAST,
     XGBOOST_PARAM_GRID_EXTENDED,
     RANDOM_SEED,
-    SAFE_GRIDSEARCH_N_JOBS,
+    SAFE_N_JOBS,
 )
 from machine_learning.constants import (
     PROJECT_ROOT,
     get_data_dir,
     get_processed_dir,
     get_features_dir,
+    get_feature_cache_dir,
+    get_tuning_dir,
 )
-from machine_learning.features import PokemonFeatureEngineer
-from machine_learning.evaluation import evaluate_model
+from machine_learning.datasets import dataset_columns, load_splits, model_columns, read_split, scenario_labels
+from machine_learning.features import cached_fit_transform, sparse_model_params
+from machine_learning.evaluation import evaluate_model, type_matchups
 from machine_learning.export import export_model, export_features
+from machine_learning.tuning import quantized_grid_search, successive_halving_search
 
 # Add project root to path
 sys.path.insert(0, str(PROJECT_ROOT))
@@ -42,16 +44,22 @@ sys.path.insert(0, str(PROJECT_ROOT))
 DATA_DIR = None
 PROCESSED_DIR = None
 FEATURES_DIR = None
+FEATURE_CACHE_DIR = None
+TUNING_DIR = None
 
 # Note: RANDOM_SEED, XGBOOST_PARAMS, XGBOOST_PARAM_GRID_FAST/EXTENDED, MODELS_DIR
 # and PROJECT_ROOT are now imported from config.py and constants.py
 
 
-def load_datasets(dataset_version='v1'):
+def load_datasets(dataset_version='v1', scenario_type: str = "all"):
     """Load train and test datasets from parquet files.
 
+    Only the columns used by the model are read. With a scenario filter,
+    only the scenario_type=<scenario> partitions of the v2 datasets are read.
+
     Args:
         dataset_version: 'v1' for original datasets, 'v2' for multi-scenario datasets
+        scenario_type: scenario to keep; "all" keeps everything
     """
     print(f"Loading datasets (version: {dataset_version})...")
 
@@ -70,62 +78,28 @@ def load_datasets(dataset_version='v1'):
     if not test_path.exists():
         raise FileNotFoundError(f"Test dataset not found: {test_path}")
 
-    df_train = pd.read_parquet(train_path)
-    df_test = pd.read_parquet(test_path)
-
-    print(f"  Train: {len(df_train):,} samples")
-    print(f"  Test: {len(df_test):,} samples")
-
     # Check for scenario_type column
-    if 'scenario_type' in df_train.columns:
+    if 'scenario_type' in dataset_columns(train_path):
         print(f"  [OK] Multi-scenario dataset detected")
-        scenario_counts = df_train['scenario_type'].value_counts()
+        scenario_counts = read_split(train_path, columns=['scenario_type'])['scenario_type'].value_counts()
         for scenario, count in scenario_counts.items():
             print(f"     {scenario}: {count:,} samples")
     else:
         print(f"  [INFO] Single scenario dataset (v1 format)")
 
-    return df_train, df_test
-
-
-def filter_by_scenario(df_train, df_test, scenario_type: str):
-    """
-    Optionally filter datasets by scenario_type column if present.
-
-    Args:
-        df_train: training dataframe
-        df_test: test dataframe
-        scenario_type: scenario to keep; "all" keeps everything
-    """
-    if scenario_type == "all":
-        return df_train, df_test
-
-    if "scenario_type" not in df_train.columns:
-        print(f"[WARN] scenario_type filtering skipped: column missing (requested '{scenario_type}').")
-        return df_train, df_test
-
-    before_train = len(df_train)
-    before_test = len(df_test)
-
-    df_train_filtered = df_train[df_train["scenario_type"] == scenario_type]
-    df_test_filtered = df_test[df_test["scenario_type"] == scenario_type]
+    df_train, df_test = load_splits(PROCESSED_DIR, scenario_type, columns=model_columns(train_path))
 
-    if df_train_filtered.empty or df_test_filtered.empty:
-        print(f"[WARN] scenario_type='{scenario_type}' produced empty split; fallback to full dataset.")
-        return df_train, df_test
-
-    print(
-        f"[OK] Filtering scenario_type='{scenario_type}': "
-        f"train {before_train:,}->{len(df_train_filtered):,}, test {before_test:,}->{len(df_test_filtered):,}"
-    )
+    print(f"  Train: {len(df_train):,} samples")
+    print(f"  Test: {len(df_test):,} samples")
 
-    # Show class balance after filtering
-    train_balance = df_train_filtered['winner'].mean()
-    test_balance = df_test_filtered['winner'].mean()
-    print(f"   Class balance - Train: A={train_balance*100:.1f}% / B={100-train_balance*100:.1f}%")
-    print(f"   Class balance - Test:  A={test_balance*100:.1f}% / B={100-test_balance*100:.1f}%")
+    if scenario_type != "all":
+        # Show class balance after filtering
+        train_balance = df_train['winner'].mean()
+        test_balance = df_test['winner'].mean()
+        print(f"   Class balance - Train: A={train_balance*100:.1f}% / B={100-train_balance*100:.1f}%")
+        print(f"   Class balance - Test:  A={test_balance*100:.1f}% / B={100-test_balance*100:.1f}%")
 
-    return df_train_filtered, df_test_filtered
+    return df_train, df_test
 
 
 # ================================================================
@@ -135,15 +109,18 @@ def filter_by_scenario(df_train, df_test, scenario_type: str):
 # ================================================================
 
 
-def train_xgboost(X_train, y_train, use_gridsearch: bool = False, grid_type: str = 'fast'):
+def train_xgboost(X_train, y_train, use_gridsearch: bool = False, grid_type: str = 'fast',
+                  search_method: str = 'grid', checkpoint_dir=None):
     """
-    Train XGBoost classifier with optional GridSearchCV.
+    Train XGBoost classifier with optional grid search.
 
     Args:
-        X_train: Training features
+        X_train: Training features (DataFrame or sparse matrix)
         y_train: Training labels
-        use_gridsearch: Whether to use GridSearchCV for hyperparameter tuning
+        use_gridsearch: Whether to search the hyperparameter grid
         grid_type: 'fast' or 'extended' - which parameter grid to use
+        search_method: 'grid' (exhaustive) or 'halving' (successive halving)
+        checkpoint_dir: Directory of the resumable trials checkpoint (None: no resume)
 
     Returns:
         (model, best_params): Trained model and best parameters found
@@ -155,35 +132,25 @@ def train_xgboost(X_train, y_train, use_gridsearch: bool = False, grid_type: str
             num_combinations = (len(param_grid['n_estimators']) * len(param_grid['max_depth']) *
                                 len(param_grid['learning_rate']) * len(param_grid['subsample']) *
                                 len(param_grid['colsample_bytree']))
-            print(f"\n[ML] Training XGBoost with GridSearchCV (EXTENDED grid: {num_combinations} combinations)...")
+            print(f"\n[ML] Training XGBoost with grid search (EXTENDED grid: {num_combinations} combinations)...")
         else:
             param_grid = XGBOOST_PARAM_GRID_FAST
             num_combinations = (len(param_grid['n_estimators']) * len(param_grid['max_depth']) *
                                 len(param_grid['learning_rate']))
-            print(f"\n[ML] Training XGBoost with GridSearchCV (FAST grid: {num_combinations} combinations)...")
-
-        cv = StratifiedKFold(n_splits=3, shuffle=True, random_state=RANDOM_SEED)
-        base_model = xgb.XGBClassifier(
-            random_state=RANDOM_SEED,
-            n_jobs=SAFE_GRIDSEARCH_N_JOBS,  # Auto-adjusted per platform
-            eval_metric='logloss',
-            tree_method='hist',          # CPU-optimized
-            predictor='cpu_predictor'    # Explicit CPU
-        )
-        grid = GridSearchCV(
-            estimator=base_model,
-            param_grid=param_grid,
-            scoring="roc_auc",
-            cv=cv,
-            n_jobs=SAFE_GRIDSEARCH_N_JOBS,  # Auto-adjusted per platform (Windows/Linux)
-            verbose=1,
-            return_train_score=False,    # Don't compute train scores (faster)
+            print(f"\n[ML] Training XGBoost with grid search (FAST grid: {num_combinations} combinations)...")
+
+        # Folds quantized once per max_bin, configurations trained by xgb.train (machine_learning.tuning)
+        search = successive_halving_search if search_method == 'halving' else quantized_grid_search
+        if search_method == 'halving':
+            print("  [ML] Successive halving instead of the exhaustive search")
+        best_model, best_params, best_score = search(
+            X_train, y_train, param_grid,
+            base_params={'random_state': RANDOM_SEED, 'n_jobs': SAFE_N_JOBS, 'eval_metric': 'logloss'},
+            checkpoint_path=(None if checkpoint_dir is None
+                             else f"{checkpoint_dir}/{search_method}_{grid_type}.json"),
         )
-        grid.fit(X_train, y_train)
-        print(f"  [OK] Best params: {grid.best_params_}")
-        print(f"  [OK] Best CV ROC-AUC: {grid.best_score_:.4f}")
-        best_model = grid.best_estimator_
-        best_params = grid.best_params_
+        print(f"  [OK] Best params: {best_params}")
+        print(f"  [OK] Best CV ROC-AUC: {best_score:.4f}")
     else:
         print("\n[ML] Training XGBoost model (fixed params)...")
         print(f"  Hyperparameters: {XGBOOST_PARAMS}")
@@ -194,7 +161,7 @@ def train_xgboost(X_train, y_train, use_gridsearch: bool = False, grid_type: str
             X_train, y_train, test_size=0.2, random_state=RANDOM_SEED, stratify=y_train
         )
 
-        best_model = xgb.XGBClassifier(**XGBOOST_PARAMS)
+        best_model = xgb.XGBClassifier(**XGBOOST_PARAMS, **sparse_model_params(X_train))
         best_model.fit(
             X_tr, y_tr,
             eval_set=[(X_tr, y_tr), (X_val, y_val)],
@@ -227,7 +194,7 @@ def main():
     parser.add_argument(
         '--use-gridsearch',
         action='store_true',
-        help='Enable small GridSearchCV to tune XGBoost hyperparameters'
+        help='Enable the grid search of XGBoost hyperparameters (3-fold CV)'
     )
     parser.add_argument(
         '--version',
@@ -251,6 +218,22 @@ def main():
         default='fast',
         help="GridSearch parameter grid: fast (for CI) or extended (for notebooks)"
     )
+    parser.add_argument(
+        '--search-method',
+        choices=['grid', 'halving'],
+        default='grid',
+        help="With --use-gridsearch: exhaustive grid or successive halving (both resumable)"
+    )
+    parser.add_argument(
+        '--sparse',
+        action='store_true',
+        help="Keep the one-hot columns as a sparse CSR matrix for training and evaluation (less memory)"
+    )
+    parser.add_argument(
+        '--no-feature-cache',
+        action='store_true',
+        help="Recompute the feature engineering instead of reusing the cached matrices"
+    )
     parser.add_argument(
         '--no-mlflow',
         action='store_true',
@@ -259,10 +242,12 @@ def main():
     args = parser.parse_args()
 
     # Set global paths based on dataset version (using helper functions from constants.py)
-    global DATA_DIR, PROCESSED_DIR, FEATURES_DIR
+    global DATA_DIR, PROCESSED_DIR, FEATURES_DIR, FEATURE_CACHE_DIR, TUNING_DIR
     DATA_DIR = get_data_dir(args.dataset_version)
     PROCESSED_DIR = get_processed_dir(args.dataset_version)
     FEATURES_DIR = get_features_dir(args.dataset_version)
+    FEATURE_CACHE_DIR = get_feature_cache_dir(args.dataset_version)
+    TUNING_DIR = get_tuning_dir(args.dataset_version)
 
     print("=" * 70)
     print("BATTLE WINNER PREDICTION MODEL - TRAINING")
@@ -275,26 +260,31 @@ def main():
     print(f"GridSearch: {'enabled' if args.use_gridsearch else 'disabled'}")
     if args.use_gridsearch:
         print(f"Grid Type: {args.grid_type}")
+        print(f"Search Method: {args.search_method}")
+    print(f"Sparse features: {'enabled' if args.sparse else 'disabled'}")
 
     try:
-        # Load data
-        df_train, df_test = load_datasets(dataset_version=args.dataset_version)
-
-        # Optional scenario filtering
-        df_train, df_test = filter_by_scenario(df_train, df_test, args.scenario_type)
-
-        # Feature engineering (using refactored class)
-        feature_engineer = PokemonFeatureEngineer()
-        X_train, X_test, y_train, y_test, scalers, feature_columns = feature_engineer.fit_transform(
-            df_train, df_test
+        # Load data (optional scenario filtering pushed down to the Parquet reader) and engineer
+        # features, reused from the cache when the dataset and config are unchanged
+        X_train, X_test, y_train, y_test, scalers, feature_columns, encoder = cached_fit_transform(
+            lambda: load_datasets(dataset_version=args.dataset_version, scenario_type=args.scenario_type),
+            PROCESSED_DIR, args.scenario_type,
+            cache_dir=None if args.no_feature_cache else FEATURE_CACHE_DIR,
+            sparse=args.sparse
         )
 
         # Train model
         model, best_params = train_xgboost(
-            X_train, y_train, use_gridsearch=args.use_gridsearch, grid_type=args.grid_type)
+            X_train, y_train, use_gridsearch=args.use_gridsearch, grid_type=args.grid_type,
+            search_method=args.search_method, checkpoint_dir=TUNING_DIR)
 
-        # Evaluate
-        metrics = evaluate_model(model, X_train, X_test, y_train, y_test, model_name="XGBoost", verbose=True)
+        # Evaluate, with the test metrics per scenario and type matchup
+        groups = {
+            'scenario_type': scenario_labels(PROCESSED_DIR, args.scenario_type),
+            'matchup': type_matchups(X_test, feature_columns),
+        }
+        metrics = evaluate_model(model, X_train, X_test, y_train, y_test, model_name="XGBoost", verbose=True,
+                                 groups=groups)
 
         # Export model artifacts
         model_path = export_model(
@@ -304,6 +294,7 @@ def main():
             metrics,
             hyperparams=best_params,
             version=args.version,
+            categorical_encoding=encoder.to_dict(),
             verbose=True,
         )
 
@@ -320,11 +311,13 @@ def main():
                     'scenario_type': args.scenario_type or 'all',
                     'use_gridsearch': args.use_gridsearch,
                     'grid_type': args.grid_type if args.use_gridsearch else 'none',
+                    'search_method': args.search_method if args.use_gridsearch else 'none',
                     **(best_params if best_params else {})
                 })
 
-                # Log metrics
-                tracker.log_metrics(metrics)
+                # Log metrics (scalars only: not the model name and breakdown)
+                tracker.log_metrics({name: value for name, value in metrics.items()
+                                     if isinstance(value, (int, float))})
 
                 # Log model with scalers and metadata
                 tracker.log_model(model, artifact_path=f"model_{args.version}",
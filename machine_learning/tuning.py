@@ -0,0 +1,427 @@
+"""Hyperparameter searches for XGBoost on quantized folds.
+
+Both searches take the GridSearchCV grids and folds
+(StratifiedKFold(3, shuffle=True, RANDOM_SEED)) but train with xgb.train
+on prebuilt QuantileDMatrix folds: each fold is quantized once per
+max_bin and shared by every configuration, instead of once per fit.
+n_estimators is not trained separately: the validation ROC-AUC is
+recorded after every round, which scores every n_estimators value of
+the grid from a single fit.
+
+- quantized_grid_search: exhaustive, every configuration up to
+  max(n_estimators)
+- successive_halving_search: boosting rounds are the budget
+
+  1. every configuration of the grid (all parameters but n_estimators)
+     is trained for a few rounds on each fold
+  2. only the best 1/eta of them, by mean validation ROC-AUC, are trained
+     again with eta times more rounds, until max(n_estimators); this
+     halving runs separately for each learning_rate (slower rates would
+     always lose after a few rounds)
+
+Each completed trial is written to a JSON checkpoint (with the checksum
+of its trials), so an interrupted search resumes where it stopped; the
+refit of the best model checkpoints its booster every N rounds
+(machine_learning.checkpoints). The best parameters have the
+GridSearchCV best_params_ keys, and the best model is refit on the full
+training set like refit=True.
+"""
+import hashlib
+import itertools
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import xgboost as xgb
+from sklearn.model_selection import StratifiedKFold
+
+from machine_learning.checkpoints import DEFAULT_CHECKPOINT_ROUNDS, fit_with_checkpoints, update_data_digest
+from machine_learning.config import RANDOM_SEED, SAFE_N_JOBS
+from machine_learning.features import sparse_model_params
+
+# Budget parameter: the configurations are all the other grid parameters
+ROUNDS_PARAM = 'n_estimators'
+
+# Bump when the searches change the scores they record
+TUNING_CHECKPOINT_VERSION = 1
+
+# XGBoost default number of histogram bins
+DEFAULT_MAX_BIN = 256
+
+
+def halving_rungs(n_configs: int, max_rounds: int, eta: int = 3,
+                  min_rounds: int = 25) -> List[Tuple[int, int]]:
+    """
+    Schedule of a successive-halving search.
+
+    The number of rungs is the largest s such that eta**s configurations
+    exist and the first rung still trains min_rounds rounds.
+
+    Args:
+        n_configs: Configurations of the first rung
+        max_rounds: Rounds of the last rung
+        eta: Reduction factor between rungs
+        min_rounds: Minimum rounds of the first rung
+
+    Returns:
+        List of (configurations, rounds) per rung
+    """
+    s = 0
+    while eta ** (s + 1) <= n_configs and max_rounds / eta ** (s + 1) >= min_rounds:
+        s += 1
+    return [(max(1, n_configs // eta ** k), int(round(max_rounds / eta ** (s - k)))) for k in range(s + 1)]
+
+
+def grid_configurations(param_grid: Dict[str, List]) -> List[Dict]:
+    """Every combination of the grid parameters except n_estimators, in grid order."""
+    names = [name for name in param_grid if name != ROUNDS_PARAM]
+    return [dict(zip(names, values)) for values in itertools.product(*(param_grid[name] for name in names))]
+
+
+def learning_rate_brackets(configurations: List[Dict]) -> List[List[int]]:
+    """
+    Indices of the configurations grouped by learning_rate, in grid order.
+
+    A lower learning rate needs more rounds: after a few rounds it always
+    ranks behind, whatever its final score. Each learning rate is
+    therefore halved separately, and only the finalists of the brackets,
+    trained to the full budget, are compared.
+    """
+    brackets = {}
+    for index, configuration in enumerate(configurations):
+        brackets.setdefault(configuration.get('learning_rate'), []).append(index)
+    return list(brackets.values())
+
+
+def _rows(X, index):
+    """Rows of a DataFrame, array or CSR matrix."""
+    return X.iloc[index] if hasattr(X, 'iloc') else X[index]
+
+
+def fold_matrices(X, y, n_splits: int = 3, max_bin: int = DEFAULT_MAX_BIN,
+                  missing: float = np.nan) -> List[Tuple[xgb.QuantileDMatrix, xgb.QuantileDMatrix]]:
+    """
+    Quantized (train, validation) matrices of the GridSearchCV folds.
+
+    The validation matrix uses the cuts of its train matrix (ref=), as
+    XGBoost requires for evaluation.
+
+    Args:
+        X: Training features (DataFrame or CSR matrix)
+        y: Training labels
+        n_splits: Number of stratified folds
+        max_bin: Histogram bins per feature
+        missing: Value treated as missing (0.0 for sparse matrices)
+
+    Returns:
+        List of (dtrain, dvalid) per fold
+    """
+    y = np.asarray(y)
+    cv = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=RANDOM_SEED)
+    folds = []
+    for train_index, valid_index in cv.split(np.zeros(len(y)), y):
+        dtrain = xgb.QuantileDMatrix(_rows(X, train_index), y[train_index], max_bin=max_bin, missing=missing)
+        dvalid = xgb.QuantileDMatrix(_rows(X, valid_index), y[valid_index], ref=dtrain, max_bin=max_bin,
+                                     missing=missing)
+        folds.append((dtrain, dvalid))
+    return folds
+
+
+def train_trial(params: Dict, folds: List[Tuple[xgb.QuantileDMatrix, xgb.QuantileDMatrix]],
+                rounds: int) -> List[float]:
+    """
+    Train one configuration on every fold.
+
+    Args:
+        params: Native XGBoost parameters (XGBClassifier.get_xgb_params())
+        folds: Quantized folds (fold_matrices)
+        rounds: Boosting rounds
+
+    Returns:
+        Mean validation ROC-AUC over the folds after each round
+    """
+    params = {**params, 'eval_metric': 'auc'}
+    scores = []
+    for dtrain, dvalid in folds:
+        history = {}
+        xgb.train(params, dtrain, num_boost_round=rounds, evals=[(dvalid, 'valid')],
+                  evals_result=history, verbose_eval=False)
+        scores.append(history['valid']['auc'])
+    return np.mean(scores, axis=0).tolist()
+
+
+def search_fingerprint(X, y, param_grid: Dict[str, List], base_params: Dict, method: str,
+                       n_splits: int) -> str:
+    """SHA-256 of the training data and search settings: a checkpoint is only resumed by the same search."""
+    digest = hashlib.sha256(json.dumps({
+        'version': TUNING_CHECKPOINT_VERSION,
+        'param_grid': param_grid,
+        'base_params': {k: v for k, v in base_params.items() if k != 'n_jobs'},
+        'method': method,
+        'n_splits': n_splits,
+        'seed': RANDOM_SEED,
+        'shape': list(X.shape),
+    }, sort_keys=True, default=str).encode())
+    update_data_digest(digest, X, y)
+    return digest.hexdigest()
+
+
+def trials_checksum(trials: Dict[str, List[float]]) -> str:
+    """SHA-256 of the completed trials, stored with them to detect a damaged checkpoint."""
+    return hashlib.sha256(json.dumps(trials, sort_keys=True).encode()).hexdigest()
+
+
+def _load_checkpoint(path: Optional[Path], fingerprint: str, verbose: bool) -> Dict[str, List[float]]:
+    """Completed trials of a checkpoint ({} if missing, damaged or from another search)."""
+    if path is None or not path.exists():
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = {}
+    if state.get('fingerprint') != fingerprint:
+        if verbose:
+            print(f"   [WARNING] {path} belongs to another search (data or grid changed): starting over")
+        return {}
+    if state.get('checksum') != trials_checksum(state['trials']):
+        if verbose:
+            print(f"   [WARNING] {path} does not match its checksum: starting over")
+        return {}
+    if verbose:
+        print(f"   Resuming from {path}: {len(state['trials'])} trials already completed")
+    return state['trials']
+
+
+def _save_checkpoint(path: Optional[Path], fingerprint: str, trials: Dict[str, List[float]]) -> None:
+    """Write the completed trials atomically (an interruption keeps the previous checkpoint)."""
+    if path is None:
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(temp, "w", encoding="utf-8") as f:
+        json.dump({'fingerprint': fingerprint, 'trials': trials, 'checksum': trials_checksum(trials)}, f)
+    os.replace(temp, path)
+
+
+class QuantizedFolds:
+    """
+    Quantized folds of a training set, built once per max_bin.
+
+    Every configuration of a search trains on the same folds: the
+    histogram cuts only depend on the data and on max_bin, so each fold is
+    quantized once per max_bin value instead of once per fit.
+
+    Args:
+        X: Training features (DataFrame or CSR matrix)
+        y: Training labels
+        n_splits: Number of stratified folds
+        missing: Value treated as missing (0.0 for sparse matrices)
+        verbose: Print progress
+    """
+
+    def __init__(self, X, y, n_splits: int = 3, missing: float = np.nan, verbose: bool = False):
+        self.X = X
+        self.y = y
+        self.n_splits = n_splits
+        self.missing = missing
+        self.verbose = verbose
+        self._folds = {}
+
+    def get(self, max_bin: int) -> List[Tuple[xgb.QuantileDMatrix, xgb.QuantileDMatrix]]:
+        """Folds quantized with max_bin bins (built on first use)."""
+        if max_bin not in self._folds:
+            if self.verbose:
+                print(f"\n   Quantizing {self.n_splits} folds (max_bin={max_bin})...")
+            self._folds[max_bin] = fold_matrices(self.X, self.y, self.n_splits, max_bin, self.missing)
+        return self._folds[max_bin]
+
+    def release(self, max_bin: Optional[int] = None) -> None:
+        """Free the folds of a max_bin (all of them by default)."""
+        if max_bin is None:
+            self._folds.clear()
+        else:
+            self._folds.pop(max_bin, None)
+
+
+def _search_setup(X, param_grid: Dict[str, List], base_params: Optional[Dict]) -> Tuple[Dict, List[Dict], List[int]]:
+    """Fixed parameters, configurations and n_estimators values of a search."""
+    base_params = {'random_state': RANDOM_SEED, 'n_jobs': SAFE_N_JOBS,
+                   **(base_params or {}), **sparse_model_params(X)}
+    if any(method != 'hist' for method in param_grid.get('tree_method', ['hist'])):
+        raise ValueError("The search trains on QuantileDMatrix folds: tree_method must be 'hist'")
+    base_params['tree_method'] = 'hist'
+    rounds_grid = sorted(param_grid.get(ROUNDS_PARAM, [xgb.XGBClassifier(**base_params).get_num_boosting_rounds()]))
+    return base_params, grid_configurations(param_grid), rounds_grid
+
+
+def _run_trial(trials: Dict[str, List[float]], key: str, params: Dict, folds: QuantizedFolds, rounds: int,
+               checkpoint_path: Optional[Path], fingerprint: str) -> List[float]:
+    """Scores of a trial: from the checkpoint, or trained on the folds of its max_bin and checkpointed."""
+    if key not in trials:
+        model = xgb.XGBClassifier(**params)
+        trials[key] = train_trial(model.get_xgb_params(), folds.get(model.max_bin or DEFAULT_MAX_BIN), rounds)
+        _save_checkpoint(checkpoint_path, fingerprint, trials)
+    return trials[key]
+
+
+def _refit_best(X, y, param_grid: Dict[str, List], base_params: Dict, configurations: List[Dict],
+                finalists: List[Tuple[str, int]], trials: Dict[str, List[float]], rounds_grid: List[int],
+                fingerprint: str, refit_checkpoint, checkpoint_rounds: int, resume: bool,
+                verbose: bool) -> Tuple[xgb.XGBClassifier, Dict, float]:
+    """
+    Best finalist at any n_estimators value of the grid, refit on the full training set.
+
+    Ties keep the finalists order, then the fewest rounds.
+    """
+    best_score, _, _, best_index, best_rounds = max(
+        (trials[key][n - 1], -position, -n, index, n)
+        for position, (key, index) in enumerate(finalists)
+        for n in rounds_grid
+    )
+
+    params = {ROUNDS_PARAM: best_rounds, **configurations[best_index]}
+    best_params = {name: params[name] for name in param_grid}
+    if verbose:
+        print(f"\n   Refitting the best configuration on {X.shape[0]:,} rows...")
+    best_model = xgb.XGBClassifier(**{**base_params, **params})
+    fit_with_checkpoints(best_model, X, y, refit_checkpoint, every=checkpoint_rounds, resume=resume,
+                         data_fingerprint=fingerprint, verbose=verbose)
+
+    return best_model, best_params, float(best_score)
+
+
+def quantized_grid_search(X, y, param_grid: Dict[str, List], base_params: Optional[Dict] = None,
+                          n_splits: int = 3, checkpoint_path=None, resume: bool = True,
+                          refit_checkpoint=None, checkpoint_rounds: int = DEFAULT_CHECKPOINT_ROUNDS,
+                          verbose: bool = True) -> Tuple[xgb.XGBClassifier, Dict, float]:
+    """
+    Exhaustive search of an XGBoost parameter grid on quantized folds.
+
+    Same configurations, folds and ROC-AUC scoring as GridSearchCV, but
+    each fold is quantized once per max_bin and every configuration is
+    trained by xgb.train on the shared QuantileDMatrix. A configuration is
+    trained once up to max(n_estimators): the validation AUC of every
+    round scores all the n_estimators values of the grid.
+
+    Args:
+        X: Training features (DataFrame or CSR matrix)
+        y: Training labels
+        param_grid: GridSearchCV grid (may include max_bin)
+        base_params: Fixed XGBClassifier parameters (default: RANDOM_SEED, SAFE_N_JOBS)
+        n_splits: Number of stratified folds
+        checkpoint_path: JSON file of the completed trials (None: no resume)
+        resume: Reuse the trials of checkpoint_path and the booster of
+            refit_checkpoint (False: start over and overwrite them)
+        refit_checkpoint: Booster file saved every checkpoint_rounds rounds
+            during the refit (None: no boosting checkpoint)
+        checkpoint_rounds: Rounds between two refit checkpoints
+        verbose: Print progress
+
+    Returns:
+        Tuple (best_model, best_params, best_score): model refit on the full
+        training set, parameters with the param_grid keys, mean CV ROC-AUC
+
+    Raises:
+        ValueError: If the grid has a tree_method other than 'hist'
+    """
+    base_params, configurations, rounds_grid = _search_setup(X, param_grid, base_params)
+    checkpoint_path = Path(checkpoint_path) if checkpoint_path is not None else None
+    if verbose:
+        print(f"\nQuantized grid search: {len(configurations)} configurations x {rounds_grid[-1]} rounds, "
+              f"{n_splits}-fold CV")
+
+    fingerprint = search_fingerprint(X, y, param_grid, base_params, 'grid', n_splits)
+    trials = _load_checkpoint(checkpoint_path, fingerprint, verbose) if resume else {}
+    folds = QuantizedFolds(X, y, n_splits, base_params.get('missing', np.nan), verbose)
+
+    # One max_bin at a time: only its folds are kept in memory
+    def max_bin(index):
+        return configurations[index].get('max_bin', base_params.get('max_bin')) or DEFAULT_MAX_BIN
+
+    order = sorted(range(len(configurations)), key=max_bin)
+    for position, index in enumerate(order):
+        if position and max_bin(index) != max_bin(order[position - 1]):
+            folds.release()
+        scores = _run_trial(trials, f"grid:{index}", {**base_params, **configurations[index]}, folds,
+                            rounds_grid[-1], checkpoint_path, fingerprint)
+        if verbose:
+            print(f"   [{position + 1}/{len(configurations)}] {configurations[index]}: "
+                  f"CV ROC-AUC {max(scores[n - 1] for n in rounds_grid):.4f}")
+    folds.release()
+
+    finalists = [(f"grid:{index}", index) for index in range(len(configurations))]
+    return _refit_best(X, y, param_grid, base_params, configurations, finalists, trials, rounds_grid,
+                       fingerprint, refit_checkpoint, checkpoint_rounds, resume, verbose)
+
+
+def successive_halving_search(X, y, param_grid: Dict[str, List], base_params: Optional[Dict] = None,
+                              eta: int = 3, min_rounds: int = 25, n_splits: int = 3,
+                              checkpoint_path=None, resume: bool = True,
+                              refit_checkpoint=None, checkpoint_rounds: int = DEFAULT_CHECKPOINT_ROUNDS,
+                              verbose: bool = True) -> Tuple[xgb.XGBClassifier, Dict, float]:
+    """
+    Successive-halving search of an XGBoost parameter grid.
+
+    Args:
+        X: Training features (DataFrame or CSR matrix)
+        y: Training labels
+        param_grid: GridSearchCV grid; n_estimators is the rounds budget
+        base_params: Fixed XGBClassifier parameters (default: RANDOM_SEED, SAFE_N_JOBS)
+        eta: Reduction factor: 1/eta of the configurations survive each rung
+        min_rounds: Minimum rounds of the first rung
+        n_splits: Number of stratified folds
+        checkpoint_path: JSON file of the completed trials (None: no resume)
+        resume: Reuse the trials of checkpoint_path and the booster of
+            refit_checkpoint (False: start over and overwrite them)
+        refit_checkpoint: Booster file saved every checkpoint_rounds rounds
+            during the refit (None: no boosting checkpoint)
+        checkpoint_rounds: Rounds between two refit checkpoints
+        verbose: Print progress
+
+    Returns:
+        Tuple (best_model, best_params, best_score): model refit on the full
+        training set, parameters with the param_grid keys, mean CV ROC-AUC
+
+    Raises:
+        ValueError: If the grid has a tree_method other than 'hist'
+    """
+    base_params, configurations, rounds_grid = _search_setup(X, param_grid, base_params)
+    brackets = learning_rate_brackets(configurations)
+    checkpoint_path = Path(checkpoint_path) if checkpoint_path is not None else None
+
+    if verbose:
+        print(f"\nSuccessive halving: {len(configurations)} configurations x {len(rounds_grid)} "
+              f"n_estimators values, eta={eta}, {n_splits}-fold CV")
+        for bracket in brackets:
+            rungs = halving_rungs(len(bracket), rounds_grid[-1], eta, min_rounds)
+            print(f"   learning_rate={configurations[bracket[0]].get('learning_rate', 'default')}: "
+                  + ", ".join(f"{n_configs} x {rounds} rounds" for n_configs, rounds in rungs))
+
+    fingerprint = search_fingerprint(X, y, param_grid, base_params, f'halving:{eta}:{min_rounds}', n_splits)
+    trials = _load_checkpoint(checkpoint_path, fingerprint, verbose) if resume else {}
+    folds = QuantizedFolds(X, y, n_splits, base_params.get('missing', np.nan), verbose)
+
+    finalists = []
+    for bracket in brackets:
+        rungs = halving_rungs(len(bracket), rounds_grid[-1], eta, min_rounds)
+        survivors = list(bracket)
+        for k, (n_configs, rounds) in enumerate(rungs):
+            survivors = survivors[:n_configs]
+            for index in survivors:
+                _run_trial(trials, f"{k}:{index}", {**base_params, **configurations[index]}, folds, rounds,
+                           checkpoint_path, fingerprint)
+
+            # Best first; ties keep the grid order
+            survivors.sort(key=lambda index: -trials[f"{k}:{index}"][-1])
+        finalists += [(f"{len(rungs) - 1}:{index}", index) for index in survivors]
+        if verbose:
+            best = trials[finalists[-len(survivors)][0]][-1]
+            print(f"   learning_rate={configurations[bracket[0]].get('learning_rate', 'default')} done: "
+                  f"best CV ROC-AUC {best:.4f} after {rounds_grid[-1]} rounds")
+    folds.release()
+
+    return _refit_best(X, y, param_grid, base_params, configurations, finalists, trials, rounds_grid,
+                       fingerprint, refit_checkpoint, checkpoint_rounds, resume, verbose)
@@ -0,0 +1,101 @@
+"""
+Tests for the Gunicorn Configuration
+====================================
+
+Validation:
+- CPU limit parsing for cgroup v2 and v1
+- Default worker count follows the container CPU quota
+- API_WORKERS overrides the default
+"""
+
+import importlib.util
+import io
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+GUNICORN_CONF = PROJECT_ROOT / "docker" / "gunicorn_conf.py"
+
+
+def load_conf():
+    """Import docker/gunicorn_conf.py as gunicorn does (plain module file)."""
+    spec = importlib.util.spec_from_file_location("gunicorn_conf", GUNICORN_CONF)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def fake_cgroup_files(monkeypatch, conf, files):
+    """Serve the given cgroup file contents, raise OSError for the others."""
+    def fake_open(path, *args, **kwargs):
+        if path not in files:
+            raise FileNotFoundError(path)
+        return io.StringIO(files[path])
+
+    monkeypatch.setattr(conf, "open", fake_open, raising=False)
+
+
+@pytest.fixture
+def conf(monkeypatch):
+    """Fresh configuration module with API_WORKERS unset."""
+    monkeypatch.delenv("API_WORKERS", raising=False)
+    return load_conf()
+
+
+class TestCgroupCpuLimit:
+    """Tests for get_cgroup_cpu_limit()."""
+
+    def test_cgroup_v2_quota(self, conf, monkeypatch):
+        fake_cgroup_files(monkeypatch, conf, {"/sys/fs/cgroup/cpu.max": "150000 100000\n"})
+        assert conf.get_cgroup_cpu_limit() == 1.5
+
+    def test_cgroup_v2_unlimited(self, conf, monkeypatch):
+        fake_cgroup_files(monkeypatch, conf, {"/sys/fs/cgroup/cpu.max": "max 100000\n"})
+        assert conf.get_cgroup_cpu_limit() is None
+
+    def test_cgroup_v1_quota(self, conf, monkeypatch):
+        fake_cgroup_files(monkeypatch, conf, {
+            "/sys/fs/cgroup/cpu/cpu.cfs_quota_us": "200000\n",
+            "/sys/fs/cgroup/cpu/cpu.cfs_period_us": "100000\n",
+        })
+        assert conf.get_cgroup_cpu_limit() == 2.0
+
+    def test_cgroup_v1_unlimited(self, conf, monkeypatch):
+        fake_cgroup_files(monkeypatch, conf, {
+            "/sys/fs/cgroup/cpu/cpu.cfs_quota_us": "-1\n",
+            "/sys/fs/cgroup/cpu/cpu.cfs_period_us": "100000\n",
+        })
+        assert conf.get_cgroup_cpu_limit() is None
+
+
+class TestWorkerCount:
+    """Tests for the number of workers."""
+
+    def test_quota_caps_visible_cpus(self, conf, monkeypatch):
+        monkeypatch.setattr(conf.os, "sched_getaffinity", lambda pid: set(range(16)), raising=False)
+        monkeypatch.setattr(conf, "get_cgroup_cpu_limit", lambda: 2.5)
+        assert conf.default_worker_count() == 3
+
+    def test_no_quota_uses_visible_cpus(self, conf, monkeypatch):
+        monkeypatch.setattr(conf.os, "sched_getaffinity", lambda pid: {0, 1}, raising=False)
+        monkeypatch.setattr(conf, "get_cgroup_cpu_limit", lambda: None)
+        assert conf.default_worker_count() == 2
+
+    def test_at_least_one_worker(self, conf, monkeypatch):
+        monkeypatch.setattr(conf.os, "sched_getaffinity", lambda pid: {0}, raising=False)
+        monkeypatch.setattr(conf, "get_cgroup_cpu_limit", lambda: 0.25)
+        assert conf.default_worker_count() == 1
+
+    def test_api_workers_override(self, monkeypatch):
+        monkeypatch.setenv("API_WORKERS", "5")
+        assert load_conf().workers == 5
+
+
+def test_model_is_preloaded_before_fork(conf):
+    """The application is imported in the master so workers share it."""
+    assert conf.preload_app is True
+    assert conf.worker_class == "uvicorn.workers.UvicornWorker"
@@ -0,0 +1,161 @@
+"""
+Tests for API key caching and rate limiting
+===========================================
+
+Validation:
+- Hashed API keys are computed once and refreshed by reload_api_keys()
+- Token buckets allow bursts, refill over time and report Retry-After
+- Throttled requests get 429 and are counted per client
+"""
+
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from api_pokemon.middleware import rate_limit, security
+from api_pokemon.middleware.rate_limit import RateLimiter, rate_limit_by_api_key
+from api_pokemon.monitoring.metrics import api_client_throttled_total
+
+KEY_A = "key-a"
+KEY_B = "key-b"
+
+
+@pytest.fixture
+def api_keys(monkeypatch):
+    """Configure two valid keys in production mode."""
+    monkeypatch.setenv("API_KEYS", f"{KEY_A},{KEY_B}")
+    monkeypatch.setenv("DEV_MODE", "false")
+    security.reload_api_keys()
+    yield
+    monkeypatch.undo()
+    security._valid_key_hashes = None
+
+
+@pytest.fixture
+def client(api_keys, monkeypatch):
+    """App with one protected route allowing 2 requests per minute per key."""
+    monkeypatch.setattr(rate_limit, "rate_limiter", RateLimiter(requests=2, period=60))
+
+    app = FastAPI()
+
+    @app.get("/protected", dependencies=[Depends(rate_limit_by_api_key)])
+    def protected():
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+# ============================================================
+# TESTS: API key cache
+# ============================================================
+
+class TestApiKeyCache:
+    """Tests for the cached hashed key set."""
+
+    def test_keys_are_hashed_once(self, api_keys, monkeypatch):
+        """verify_api_key does not rehash the configured keys per request."""
+        calls = []
+        monkeypatch.setattr(security, "get_api_keys", lambda: calls.append(1) or set())
+
+        for _ in range(3):
+            assert security.verify_api_key(KEY_A) == KEY_A
+
+        assert calls == []
+
+    def test_reload_picks_up_new_keys(self, api_keys, monkeypatch):
+        """A rotated key is only accepted after an explicit reload."""
+        monkeypatch.setenv("API_KEYS", "rotated-key")
+
+        with pytest.raises(HTTPException) as exc:
+            security.verify_api_key("rotated-key")
+        assert exc.value.status_code == 403
+
+        assert security.reload_api_keys() == 1
+        assert security.verify_api_key("rotated-key") == "rotated-key"
+
+    def test_dev_mode_bypass(self, monkeypatch):
+        """DEV mode without API_KEYS accepts requests without a key."""
+        monkeypatch.delenv("API_KEYS", raising=False)
+        monkeypatch.setenv("DEV_MODE", "true")
+        security.reload_api_keys()
+        try:
+            assert security.verify_api_key(None) == security.DEV_MODE_BYPASS
+        finally:
+            security._valid_key_hashes = None
+
+
+# ============================================================
+# TESTS: Token bucket
+# ============================================================
+
+class TestRateLimiter:
+    """Tests for the in-memory token-bucket limiter."""
+
+    def test_burst_then_throttle(self):
+        limiter = RateLimiter(requests=3, period=30)
+
+        assert [limiter.check("c", now=0.0)[0] for _ in range(3)] == [True, True, True]
+        allowed, retry_after = limiter.check("c", now=0.0)
+
+        assert allowed is False
+        assert retry_after == pytest.approx(10.0)
+
+    def test_tokens_refill_over_time(self):
+        limiter = RateLimiter(requests=2, period=10)
+        limiter.check("c", now=0.0)
+        limiter.check("c", now=0.0)
+
+        assert limiter.check("c", now=1.0)[0] is False
+        assert limiter.check("c", now=5.0)[0] is True
+
+    def test_clients_are_independent(self):
+        limiter = RateLimiter(requests=1, period=60)
+
+        assert limiter.check("a", now=0.0)[0] is True
+        assert limiter.check("a", now=0.0)[0] is False
+        assert limiter.check("b", now=0.0)[0] is True
+
+    def test_disabled_limiter_allows_everything(self):
+        limiter = RateLimiter(requests=0, period=60)
+
+        assert all(limiter.check("c", now=0.0)[0] for _ in range(1000))
+
+    def test_idle_buckets_are_pruned(self):
+        limiter = RateLimiter(requests=1, period=1, max_clients=2)
+        limiter.check("a", now=0.0)
+        limiter.check("b", now=0.0)
+
+        limiter.check("c", now=10.0)
+
+        assert set(limiter._buckets) == {"c"}
+
+
+# ============================================================
+# TESTS: FastAPI dependency
+# ============================================================
+
+class TestRateLimitDependency:
+    """Tests for rate_limit_by_api_key on a route."""
+
+    def test_noisy_key_gets_429_with_retry_after(self, client):
+        headers = {"X-API-Key": KEY_A}
+        label = security.hash_api_key(KEY_A)[:12]
+        throttled_before = api_client_throttled_total.labels(client=label)._value.get()
+
+        assert client.get("/protected", headers=headers).status_code == 200
+        assert client.get("/protected", headers=headers).status_code == 200
+        response = client.get("/protected", headers=headers)
+
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+        assert api_client_throttled_total.labels(client=label)._value.get() == throttled_before + 1
+
+    def test_other_keys_are_not_affected(self, client):
+        for _ in range(3):
+            client.get("/protected", headers={"X-API-Key": KEY_A})
+
+        assert client.get("/protected", headers={"X-API-Key": KEY_B}).status_code == 200
+
+    def test_invalid_key_is_rejected_before_limiting(self, client):
+        assert client.get("/protected", headers={"X-API-Key": "wrong"}).status_code == 403
+        assert client.get("/protected").status_code == 401
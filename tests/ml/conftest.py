@@ -0,0 +1,95 @@
+"""
+Shared fixtures for the machine learning tests
+==============================================
+
+battle_data: small synthetic roster (Pokemon, moves, type chart) in the
+format of the dataset builder inputs.
+feature_config: feature configuration whose type vocabulary is the
+synthetic type names.
+"""
+
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from machine_learning import build_battle_winner_dataset_v2 as builder
+from machine_learning.config import FeatureEngineeringConfig
+
+N_POKEMON = 14
+N_TYPES = 6
+
+
+# ============================================================
+# Synthetic data
+# ============================================================
+
+@pytest.fixture(scope="module")
+def battle_data():
+    """Small random roster covering damage types, dual types, NaN fields."""
+    rng = np.random.RandomState(0)
+    type_names = {t: f"type_{t}" for t in range(1, N_TYPES + 1)}
+
+    pokemon = []
+    for pid in range(1, N_POKEMON + 1):
+        type_1 = int(rng.randint(1, N_TYPES + 1))
+        type_2 = float(rng.randint(1, N_TYPES + 1)) if pid % 3 else np.nan
+        pokemon.append({
+            'pokemon_id': pid,
+            'pokemon_name': f"Pokemon{pid}",
+            'hp': int(rng.randint(20, 150)),
+            'attack': int(rng.randint(20, 150)),
+            'defense': int(rng.randint(20, 150)),
+            'sp_attack': int(rng.randint(20, 150)),
+            'sp_defense': int(rng.randint(20, 150)),
+            # Few distinct speeds to exercise ties
+            'speed': int(rng.choice([50, 80, 100])),
+            'type_1_id': type_1,
+            'type_1_name': type_names[type_1],
+            'type_2_id': type_2,
+            'type_2_name': type_names[int(type_2)] if pd.notna(type_2) else None,
+        })
+    pokemon_df = pd.DataFrame(pokemon)
+
+    damage_types = sorted(builder.ALLOWED_DAMAGE_TYPES) + ["statut", None]
+    moves = []
+    move_id = 0
+    for pid in range(1, N_POKEMON + 1):
+        if pid == 5:
+            continue  # Pokemon without any move
+        for _ in range(int(rng.randint(1, 8))):
+            move_id += 1
+            move_type = int(rng.randint(1, N_TYPES + 1))
+            moves.append({
+                'pokemon_id': pid,
+                'move_id': move_id,
+                'move_name': "Bluff" if move_id % 17 == 0 else f"Move{move_id}",
+                'move_type_id': move_type,
+                'move_type_name': type_names[move_type],
+                'move_category': rng.choice(['physique', 'spécial']),
+                'move_power': int(rng.choice([0, 40, 60, 80, 90, 120])),
+                'move_accuracy': float(rng.choice([np.nan, 70, 85, 100])),
+                'damage_type': damage_types[rng.randint(len(damage_types))],
+                'priority': int(rng.choice([-1, 0, 0, 0, 1, 2])),
+            })
+    # Pokemon 7 only has non-offensive moves
+    for m in moves:
+        if m['pokemon_id'] == 7:
+            m['damage_type'] = "statut"
+    pokemon_moves_df = pd.DataFrame(moves)
+
+    type_eff = defaultdict(lambda: 1.0)
+    for attacking in range(1, N_TYPES + 1):
+        for defending in range(1, N_TYPES + 1):
+            multiplier = rng.choice([0.0, 0.5, 1.0, 1.0, 2.0])
+            if multiplier != 1.0:
+                type_eff[(float(attacking), float(defending))] = float(multiplier)
+
+    return pokemon_df, pokemon_moves_df, type_eff
+
+
+@pytest.fixture(scope="session")
+def feature_config():
+    """Feature configuration for the synthetic type names."""
+    return FeatureEngineeringConfig(type_vocabulary=[f"type_{t}" for t in range(1, N_TYPES + 1)] + ["none"])
@@ -0,0 +1,454 @@
+"""
+Battle Engine Parity Tests
+==========================
+
+The vectorised BattleEngine must produce exactly the rows and labels of
+the scalar reference implementation (one battle at a time with
+get_best_move / get_move_score_and_info / simulate_battle).
+
+Validation:
+- Best move selection, STAB, type multipliers, move order and winner
+- Same random draws as the historical np.random.choice loops
+- Pokemon without valid moves are skipped
+- Sharded generation is identical for any number of workers and batch sizes
+- Streaming Parquet output (raw, train, test) with an explicit schema
+- Incremental rebuilds give the same files as a full build
+- Compact column types, names in a side table, same features once encoded
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from machine_learning import build_battle_winner_dataset_v2 as builder
+from machine_learning.features import PokemonFeatureEngineer
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from machine_learning.battle_engine import (
+    DATASET_SCHEMA,
+    POKEMON_NAMES_SCHEMA,
+    BattleEngine,
+    iter_batches,
+    iter_shard_batches,
+    iter_shards,
+)
+from machine_learning.dataset_manifest import build_manifest, plan_rebuild
+from machine_learning.dataset_writer import DatasetWriter
+
+
+@pytest.fixture(scope="module")
+def engine(battle_data):
+    """Engine built from the synthetic roster (battle_data in conftest)."""
+    return BattleEngine(*battle_data)
+
+
+# ============================================================
+# Reference loops (historical iterrows implementation)
+# ============================================================
+
+def reference_best_move(pokemon_df, pokemon_moves_df, type_eff):
+    samples = []
+    for _, pokemon_a in pokemon_df.iterrows():
+        for _, pokemon_b in pokemon_df.iterrows():
+            if pokemon_a['pokemon_id'] == pokemon_b['pokemon_id']:
+                continue
+            move_a = builder.get_best_move(pokemon_a['pokemon_id'], pokemon_moves_df, pokemon_a, pokemon_b, type_eff)
+            move_b = builder.get_best_move(pokemon_b['pokemon_id'], pokemon_moves_df, pokemon_b, pokemon_a, type_eff)
+            if move_a is None or move_b is None:
+                continue
+            winner = builder.simulate_battle(pokemon_a, pokemon_b, move_a, move_b, type_eff)
+            samples.append(builder.build_sample_dict(pokemon_a, pokemon_b, move_a, move_b, winner, "best_move"))
+    return pd.DataFrame(samples)
+
+
+def reference_random_move(pokemon_df, pokemon_moves_df, type_eff, num_samples):
+    samples = []
+    np.random.seed(builder.RANDOM_SEED)
+    for _, pokemon_a in pokemon_df.iterrows():
+        for _, pokemon_b in pokemon_df.iterrows():
+            if pokemon_a['pokemon_id'] == pokemon_b['pokemon_id']:
+                continue
+            move_a = builder.get_best_move(pokemon_a['pokemon_id'], pokemon_moves_df, pokemon_a, pokemon_b, type_eff)
+            if move_a is None:
+                continue
+            valid_moves_b = builder.get_all_valid_moves(pokemon_b['pokemon_id'], pokemon_moves_df, pokemon_b)
+            if not valid_moves_b:
+                continue
+            for _ in range(num_samples):
+                random_move = np.random.choice(valid_moves_b)
+                move_b = builder.get_move_score_and_info(random_move, pokemon_b, pokemon_a, type_eff)
+                winner = builder.simulate_battle(pokemon_a, pokemon_b, move_a, move_b, type_eff)
+                samples.append(builder.build_sample_dict(pokemon_a, pokemon_b, move_a, move_b, winner, "random_move"))
+    return pd.DataFrame(samples)
+
+
+def reference_all_combinations(pokemon_df, pokemon_moves_df, type_eff, max_combinations):
+    samples = []
+    for _, pokemon_a in pokemon_df.iterrows():
+        for _, pokemon_b in pokemon_df.iterrows():
+            if pokemon_a['pokemon_id'] == pokemon_b['pokemon_id']:
+                continue
+            valid_moves_a = builder.get_all_valid_moves(pokemon_a['pokemon_id'], pokemon_moves_df, pokemon_a)
+            valid_moves_b = builder.get_all_valid_moves(pokemon_b['pokemon_id'], pokemon_moves_df, pokemon_b)
+            if not valid_moves_a or not valid_moves_b:
+                continue
+            combinations = [(ma, mb) for ma in valid_moves_a for mb in valid_moves_b]
+            if len(combinations) > max_combinations:
+                idx = np.random.choice(len(combinations), size=max_combinations, replace=False)
+                combinations = [
+                    (valid_moves_a[i // len(valid_moves_b)], valid_moves_b[i % len(valid_moves_b)])
+                    for i in idx
+                ]
+            for move_a_raw, move_b_raw in combinations:
+                move_a = builder.get_move_score_and_info(move_a_raw, pokemon_a, pokemon_b, type_eff)
+                move_b = builder.get_move_score_and_info(move_b_raw, pokemon_b, pokemon_a, type_eff)
+                winner = builder.simulate_battle(pokemon_a, pokemon_b, move_a, move_b, type_eff)
+                samples.append(builder.build_sample_dict(pokemon_a, pokemon_b, move_a, move_b, winner, "all_combinations"))
+    return pd.DataFrame(samples)
+
+
+def decoded(frame: pd.DataFrame) -> pd.DataFrame:
+    """Categorical columns as plain strings (dictionaries may differ between builds)."""
+    return frame.astype({
+        col: object for col, dtype in frame.dtypes.items() if isinstance(dtype, pd.CategoricalDtype)
+    })
+
+
+def assert_same_rows(actual: pd.DataFrame, expected: pd.DataFrame):
+    assert len(expected) > 0
+    assert list(actual.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(
+        decoded(actual).reset_index(drop=True), expected.reset_index(drop=True),
+        check_dtype=False, check_exact=True
+    )
+
+
+# ============================================================
+# TESTS: Parity
+# ============================================================
+
+class TestScenarioParity:
+    """Vectorised scenarios match the reference loops row for row."""
+
+    def test_best_move(self, battle_data, engine):
+        expected = reference_best_move(*battle_data)
+        actual = builder.generate_best_move_scenario(engine)
+
+        assert_same_rows(actual, expected)
+
+    def test_random_move(self, battle_data, engine):
+        expected = reference_random_move(*battle_data, num_samples=3)
+        rng = np.random.RandomState(builder.RANDOM_SEED)
+        battles, _ = engine.random_move_battles(3, rng=rng)
+
+        assert_same_rows(engine.build_frame(battles, "random_move"), expected)
+
+    def test_all_combinations(self, battle_data, engine):
+        np.random.seed(7)
+        expected = reference_all_combinations(*battle_data, max_combinations=6)
+        battles, _ = engine.all_combination_battles(6, rng=np.random.RandomState(7))
+
+        assert_same_rows(engine.build_frame(battles, "all_combinations"), expected)
+
+    def test_all_combinations_without_limit(self, battle_data, engine):
+        expected = reference_all_combinations(*battle_data, max_combinations=10_000)
+        actual = builder.generate_all_combinations_scenario(engine, max_combinations_per_matchup=10_000)
+
+        assert_same_rows(actual, expected)
+
+    def test_all_combinations_exhaustive(self, battle_data, engine):
+        expected = reference_all_combinations(*battle_data, max_combinations=10_000)
+        actual = builder.generate_all_combinations_scenario(engine, max_combinations_per_matchup=None)
+
+        assert_same_rows(actual, expected)
+
+
+def concat_batches(batches) -> pd.DataFrame:
+    tables = [table for table, _ in batches]
+    return pa.concat_tables(tables or [DATASET_SCHEMA.empty_table()]).to_pandas()
+
+
+def shard_frame(engine, scenario_type, attacker, seed, **options) -> pd.DataFrame:
+    return concat_batches(iter_shard_batches(engine, scenario_type, attacker, seed, **options))
+
+
+class TestSharding:
+    """Tests for per-attacker shards with their own random generators."""
+
+    @pytest.mark.parametrize("scenario_type, options", [
+        ("random_move", {"num_samples": 4}),
+        ("all_combinations", {"max_per_matchup": 5}),
+        ("all_combinations", {"max_per_matchup": None}),
+    ])
+    def test_output_does_not_depend_on_worker_count(self, engine, scenario_type, options):
+        serial = concat_batches(iter_batches(engine, scenario_type, 42, workers=1, **options))
+        parallel = concat_batches(iter_batches(engine, scenario_type, 42, workers=3, **options))
+
+        pd.testing.assert_frame_equal(serial, parallel)
+
+    @pytest.mark.parametrize("scenario_type, options", [
+        ("random_move", {"num_samples": 4}),
+        ("all_combinations", {"max_per_matchup": 5}),
+    ])
+    def test_output_does_not_depend_on_batch_size(self, engine, scenario_type, options):
+        whole = concat_batches(iter_batches(engine, scenario_type, 42, batch_size=100_000, **options))
+        batches = list(iter_batches(engine, scenario_type, 42, batch_size=7, **options))
+
+        assert max(table.num_rows for table, _ in batches) <= 7
+        pd.testing.assert_frame_equal(whole, concat_batches(batches))
+
+    def test_exhaustive_batches_are_bounded(self, engine):
+        options = {"max_per_matchup": None}
+        whole = concat_batches(iter_batches(engine, "all_combinations", 42, **options))
+        batches = list(iter_batches(engine, "all_combinations", 42, batch_size=12, **options))
+
+        for table, _ in batches:
+            # Only a single matchup larger than the batch size may exceed it
+            matchups = table.select(['pokemon_a_id', 'pokemon_b_id']).to_pandas().drop_duplicates()
+            assert table.num_rows <= 12 or len(matchups) == 1
+        pd.testing.assert_frame_equal(whole, concat_batches(batches))
+
+    def test_batches_follow_explicit_schema(self, engine):
+        for table, _ in iter_batches(engine, "best_move", 42, batch_size=10):
+            assert table.schema.equals(DATASET_SCHEMA)
+
+    def test_shard_is_reproducible_in_any_order(self, engine):
+        first = shard_frame(engine, "random_move", 3, seed=42, num_samples=4)
+        shard_frame(engine, "random_move", 0, seed=42, num_samples=4)
+        again = shard_frame(engine, "random_move", 3, seed=42, num_samples=4)
+
+        pd.testing.assert_frame_equal(first, again)
+
+    def test_global_random_state_is_not_used(self, engine):
+        np.random.seed(0)
+        first = shard_frame(engine, "all_combinations", 1, seed=42, max_per_matchup=3)
+        np.random.seed(1)
+        second = shard_frame(engine, "all_combinations", 1, seed=42, max_per_matchup=3)
+
+        pd.testing.assert_frame_equal(first, second)
+
+    def test_seed_changes_draws(self, engine):
+        first = shard_frame(engine, "random_move", 0, seed=1, num_samples=20)
+        second = shard_frame(engine, "random_move", 0, seed=2, num_samples=20)
+
+        assert len(first) > 0
+        assert not first['b_move_name'].equals(second['b_move_name'])
+
+
+def matchups(table: pa.Table) -> set:
+    """(A ID, B ID) of the rows of a table, whatever their scenario."""
+    return set(zip(*(table.column(name).to_pylist() for name in ('pokemon_a_id', 'pokemon_b_id'))))
+
+
+class TestDatasetWriter:
+    """Tests for streaming the scenarios to Parquet partitions."""
+
+    def test_streams_raw_train_and_test(self, engine, tmp_path):
+        raw_dir, processed_dir = tmp_path / "raw", tmp_path / "processed"
+
+        with DatasetWriter(raw_dir, processed_dir, test_size=0.25) as writer:
+            for scenario in ("best_move", "random_move"):
+                writer.write_scenario(
+                    scenario, iter_shards(engine, scenario, 42, batch_size=20, num_samples=3)
+                )
+
+        raw_best = pq.read_table(raw_dir / "matchups_best_move.parquet")
+        raw_random = pq.read_table(raw_dir / "matchups_random_move.parquet")
+        train = pq.read_table(processed_dir / "train.parquet")
+        test = pq.read_table(processed_dir / "test.parquet")
+
+        assert train.schema.equals(DATASET_SCHEMA)
+        assert train.num_rows + test.num_rows == raw_best.num_rows + raw_random.num_rows
+        # The split is drawn per matchup, the same in every scenario
+        assert not matchups(train) & matchups(test)
+        test_matchups = len(matchups(test))
+        assert test_matchups / (len(matchups(train)) + test_matchups) == pytest.approx(0.25, abs=0.05)
+        assert set(train.column('scenario_type').to_pylist()) == {"best_move", "random_move"}
+        assert writer.stats['random_move']['train'] + writer.stats['random_move']['test'] == raw_random.num_rows
+        assert writer.stats['best_move']['matchups'] == raw_best.num_rows
+        assert not list(tmp_path.rglob("*.tmp"))
+
+    def test_matchups_stay_on_one_side(self, engine, tmp_path):
+        with DatasetWriter(tmp_path / "raw", tmp_path / "processed", row_group_rows=50) as writer:
+            writer.write_scenario("all_combinations", iter_shards(engine, "all_combinations", 42, max_per_matchup=6))
+
+        train = pq.read_table(tmp_path / "processed" / "train.parquet")
+        test = pq.read_table(tmp_path / "processed" / "test.parquet")
+
+        assert not matchups(train) & matchups(test)
+        # Shuffled within row groups: not in (A, B) order
+        a = train.column('pokemon_a_id').to_numpy()
+        assert np.any(a[1:] < a[:-1])
+
+    def test_failure_leaves_no_partial_files(self, engine, tmp_path):
+        def failing_shards():
+            yield from iter_shards(engine, "best_move", 42, batch_size=10)
+            raise RuntimeError("generation failed")
+
+        with pytest.raises(RuntimeError):
+            with DatasetWriter(tmp_path / "raw", tmp_path / "processed") as writer:
+                writer.write_scenario("best_move", failing_shards())
+
+        assert not list(tmp_path.rglob("*.parquet"))
+        assert not list(tmp_path.rglob("*.tmp"))
+
+    def test_peak_rss_is_reported(self):
+        main_rss, workers_rss = builder.get_peak_rss_mb()
+
+        assert main_rss > 0
+        assert workers_rss >= 0
+
+
+BUILD_OPTIONS = {"batch_size": 25, "num_samples": 3, "max_per_matchup": 4}
+SCENARIOS = ("best_move", "random_move", "all_combinations")
+
+
+def build_dataset(engine, root, previous=None, scenarios=SCENARIOS):
+    """Build the dataset under root like main(), returning the manifest and writer."""
+    manifest = build_manifest(engine, {"seed": 42, "level": 50, "test_size": 0.2})
+    # Small blocks and row groups: several partitions, several row groups each
+    with DatasetWriter(root / "raw", root / "processed", block_size=4, row_group_rows=30) as writer:
+        builder.write_scenarios(writer, engine, manifest, scenarios, BUILD_OPTIONS, previous)
+    return manifest, writer
+
+
+def read_dataset(root) -> dict:
+    paths = [root / "processed" / "train.parquet", root / "processed" / "test.parquet"]
+    paths += sorted((root / "raw").glob("matchups_*.parquet"))
+    return {path.relative_to(root): decoded(pq.read_table(path).to_pandas()) for path in paths}
+
+
+def modified_data(battle_data):
+    """Stats of Pokemon 2 and the moveset of Pokemon 9 fixed; Pokemon 14 removed."""
+    pokemon_df, pokemon_moves_df, type_eff = battle_data
+    pokemon_df = pokemon_df.copy()
+    pokemon_df.loc[pokemon_df['pokemon_id'] == 2, 'attack'] += 40
+    pokemon_df = pokemon_df[pokemon_df['pokemon_id'] != 14]
+    pokemon_moves_df = pokemon_moves_df.copy()
+    pokemon_moves_df.loc[pokemon_moves_df['pokemon_id'] == 9, 'move_power'] = 95
+    return pokemon_df, pokemon_moves_df, type_eff
+
+
+class TestIncrementalRebuild:
+    """Tests for manifest-driven incremental rebuilds."""
+
+    def test_content_hashes_detect_changes(self, battle_data, engine):
+        changed = BattleEngine(*modified_data(battle_data))
+        before, after = engine.content_hashes(), changed.content_hashes()
+
+        assert {pid for pid in after if after[pid] != before[pid]} == {2, 9}
+        assert set(before) - set(after) == {14}
+        assert changed.type_chart_hash() == engine.type_chart_hash()
+
+    def test_incremental_matches_full_build(self, battle_data, engine, tmp_path):
+        changed = BattleEngine(*modified_data(battle_data))
+        previous, _ = build_dataset(engine, tmp_path / "incremental")
+
+        _, writer = build_dataset(changed, tmp_path / "incremental", previous=previous)
+        build_dataset(changed, tmp_path / "full")
+
+        incremental = read_dataset(tmp_path / "incremental")
+        full = read_dataset(tmp_path / "full")
+        assert incremental.keys() == full.keys()
+        for name, frame in full.items():
+            pd.testing.assert_frame_equal(incremental[name], frame, obj=str(name))
+
+        # Only matchups involving Pokemon 2 or 9 were generated
+        for scenario in SCENARIOS:
+            total = writer.stats[scenario]['train'] + writer.stats[scenario]['test']
+            assert 0 < writer.stats[scenario]['generated'] < total / 2
+        assert len(writer.partitions['best_move']) == 16
+
+    def test_unchanged_data_generates_nothing(self, engine, tmp_path):
+        previous, _ = build_dataset(engine, tmp_path)
+        before = read_dataset(tmp_path)
+
+        manifest, writer = build_dataset(engine, tmp_path, previous=previous)
+
+        assert all(stats['generated'] == 0 for stats in writer.stats.values())
+        assert manifest['scenarios'] == previous['scenarios']
+        for name, frame in read_dataset(tmp_path).items():
+            pd.testing.assert_frame_equal(frame, before[name])
+
+    def test_changed_settings_force_full_rebuild(self, engine):
+        manifest = build_manifest(engine, {"seed": 42, "level": 50, "test_size": 0.2})
+        manifest['scenarios']['best_move'] = {'options': {}, 'partitions': {}}
+
+        other_seed = build_manifest(engine, {"seed": 7, "level": 50, "test_size": 0.2})
+        other_chart = dict(manifest, type_chart="other")
+
+        assert plan_rebuild(manifest, manifest, "best_move", {}) is not None
+        assert plan_rebuild(manifest, other_seed, "best_move", {}) is None
+        assert plan_rebuild(other_chart, manifest, "best_move", {}) is None
+        assert plan_rebuild(manifest, manifest, "random_move", {"num_samples": 3}) is None
+        assert plan_rebuild(None, manifest, "best_move", {}) is None
+
+    def test_unlisted_scenarios_are_removed(self, engine, tmp_path):
+        previous, _ = build_dataset(engine, tmp_path)
+
+        build_dataset(engine, tmp_path, previous=previous, scenarios=("best_move",))
+
+        train = pq.read_table(tmp_path / "processed" / "train.parquet")
+        assert set(train.column('scenario_type').to_pylist()) == {"best_move"}
+        assert not list((tmp_path / "raw" / "matchups_random_move.parquet").glob("*.parquet"))
+
+
+class TestCompactSchema:
+    """Tests for the compact dataset column types."""
+
+    def test_narrow_types_without_names(self, engine):
+        frame = builder.generate_best_move_scenario(engine)
+
+        assert 'pokemon_a_name' not in frame.columns
+        assert frame['a_hp'].dtype == np.int16
+        assert frame['a_move_power'].dtype == np.float32
+        assert frame['winner'].dtype == np.uint8
+        for col in ('scenario_type', 'a_type_1', 'b_type_2', 'a_move_name', 'b_move_type'):
+            assert isinstance(frame[col].dtype, pd.CategoricalDtype), col
+
+    def test_names_table(self, battle_data, engine):
+        names = engine.names_table()
+
+        assert names.schema.equals(POKEMON_NAMES_SCHEMA)
+        expected = battle_data[0].set_index('pokemon_id')['pokemon_name'].to_dict()
+        assert dict(zip(names.column('pokemon_id').to_pylist(), names.column('pokemon_name').to_pylist())) == expected
+
+    def test_features_match_plain_columns(self, engine, feature_config):
+        frame = builder.generate_all_combinations_scenario(engine, max_combinations_per_matchup=None)
+        train, test = frame.iloc[::2], frame.iloc[1::2]
+        # Same rows with the historical types: strings, int64 and float64
+        plain = decoded(frame).astype({
+            col: np.int64 if pd.api.types.is_integer_dtype(dtype) else np.float64
+            for col, dtype in frame.dtypes.items() if pd.api.types.is_numeric_dtype(dtype)
+        })
+
+        compact_features = PokemonFeatureEngineer(feature_config).fit_transform(train, test, verbose=False)
+        plain_features = PokemonFeatureEngineer(feature_config).fit_transform(
+            plain.iloc[::2], plain.iloc[1::2], verbose=False
+        )
+
+        assert compact_features[5] == plain_features[5]
+        for compact, expected in zip(compact_features[:2], plain_features[:2]):
+            pd.testing.assert_frame_equal(compact, expected, check_dtype=False, rtol=1e-5)
+
+
+class TestEncoding:
+    """Tests for the array encoding."""
+
+    def test_pokemon_without_valid_moves_never_fight(self, battle_data, engine):
+        battles, _ = engine.best_move_battles()
+        ids = set(engine.pokemon_ids[battles.a]) | set(engine.pokemon_ids[battles.b])
+
+        assert 5 not in ids
+        assert 7 not in ids
+
+    def test_excluded_and_non_offensive_moves_are_dropped(self, engine):
+        assert "Bluff" not in set(engine.move_names)
+        assert engine.move_counts[6] == 0
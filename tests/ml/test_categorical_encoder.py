@@ -0,0 +1,119 @@
+"""
+Categorical Encoder Tests
+=========================
+
+Validation:
+- Same one-hot columns and values as pd.get_dummies + align
+- Plain string and categorical columns encode alike
+- Values outside the vocabulary are refused at fit, zero at inference
+- The fitted state round-trips through plain data
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from machine_learning import build_battle_winner_dataset_v2 as builder
+from machine_learning.battle_engine import BattleEngine
+from machine_learning.config import FeatureEngineeringConfig
+from machine_learning.features import CategoricalEncoder, PokemonFeatureEngineer
+
+FEATURES = ['a_type_1', 'a_type_2']
+VOCABULARY = ['Eau', 'Feu', 'Plante', 'Électrik', 'none']
+
+
+@pytest.fixture
+def frames():
+    train = pd.DataFrame({'a_type_1': ['Feu', 'Eau', 'Feu', 'Électrik'], 'a_type_2': ['none', 'none', 'Eau', 'none']})
+    test = pd.DataFrame({'a_type_1': ['Plante', 'Eau'], 'a_type_2': ['Feu', 'none']}, index=[10, 11])
+    return train, test
+
+
+@pytest.fixture(scope="module")
+def engine_rows(battle_data):
+    """Generated best_move rows (categorical columns), split in two."""
+    frame = builder.generate_best_move_scenario(BattleEngine(*battle_data))
+    return frame.iloc[::2], frame.iloc[1::2]
+
+
+def get_dummies(train, test):
+    """Reference encoding: get_dummies per feature aligned on the train columns."""
+    encoded = []
+    for feature in FEATURES:
+        train_dummies = pd.get_dummies(train[feature], prefix=feature)
+        test_dummies = pd.get_dummies(test[feature], prefix=feature)
+        encoded.append(train_dummies.align(test_dummies, join='left', axis=1, fill_value=0))
+    return [pd.concat([pair[i] for pair in encoded], axis=1) for i in (0, 1)]
+
+
+class TestCategoricalEncoder:
+    """Tests for CategoricalEncoder."""
+
+    def test_matches_get_dummies(self, frames):
+        train, test = frames
+        encoder = CategoricalEncoder(FEATURES, VOCABULARY).fit(train)
+        expected_train, expected_test = get_dummies(train, test)
+
+        assert encoder.columns == list(expected_train.columns)
+        for X, expected in ((train, expected_train), (test, expected_test)):
+            block = encoder.transform(X)
+            assert block.dtype == np.uint8
+            np.testing.assert_array_equal(block, expected.to_numpy(dtype=np.uint8))
+
+    def test_categorical_columns_encode_like_strings(self, frames):
+        train, test = frames
+        encoder = CategoricalEncoder(FEATURES, VOCABULARY).fit(train)
+        # Unused and unordered categories, missing value
+        categorical = test.astype({'a_type_1': pd.CategoricalDtype(['Plante', 'Vol', 'Eau'])})
+        categorical.loc[11, 'a_type_2'] = None
+
+        expected = encoder.transform(test.assign(a_type_2=['Feu', None]))
+        np.testing.assert_array_equal(encoder.transform(categorical), expected)
+
+    def test_values_outside_the_vocabulary(self, frames):
+        train, test = frames
+
+        with pytest.raises(ValueError, match="Vol"):
+            CategoricalEncoder(FEATURES, VOCABULARY).fit(train.assign(a_type_2=['Vol', 'none', 'none', 'none']))
+
+        encoder = CategoricalEncoder(FEATURES, VOCABULARY).fit(train)
+        assert encoder.transform(test.assign(a_type_1='Vol'))[:, :3].sum() == 0
+
+    def test_state_round_trip(self, frames):
+        train, test = frames
+        encoder = CategoricalEncoder(FEATURES, VOCABULARY).fit(train)
+
+        restored = CategoricalEncoder.from_dict(encoder.to_dict())
+        from_columns = CategoricalEncoder.from_columns(FEATURES, VOCABULARY, ['a_hp'] + encoder.columns)
+
+        for other in (restored, from_columns):
+            assert other.columns == encoder.columns
+            np.testing.assert_array_equal(other.transform(test), encoder.transform(test))
+
+    def test_unfitted_encoder_refuses_to_transform(self, frames):
+        with pytest.raises(ValueError):
+            CategoricalEncoder(FEATURES, VOCABULARY).transform(frames[0])
+
+    def test_engineer_inference_uses_training_columns(self, engine_rows, feature_config):
+        train, test = engine_rows
+        engineer = PokemonFeatureEngineer(feature_config)
+        _, X_test, _, _, _, feature_columns = engineer.fit_transform(train, test, verbose=False)
+
+        # One row at a time: every one-hot column is still produced
+        X_row = engineer.transform(test.drop(columns=['winner']).iloc[[0]])
+
+        assert list(X_row.columns) == feature_columns
+        np.testing.assert_allclose(X_row.to_numpy(dtype=float), X_test.iloc[[0]].to_numpy(dtype=float))
+
+
+def test_default_vocabulary_has_the_18_types():
+    vocabulary = FeatureEngineeringConfig().type_vocabulary
+
+    assert len(set(vocabulary)) == 19
+    assert 'none' in vocabulary
@@ -0,0 +1,176 @@
+"""
+Pipeline Checkpoint Tests
+=========================
+
+Validation:
+- A recorded stage is only resumed with the same config and unchanged files
+- Stage states round trip through their checkpoint and are computed once
+- An interrupted XGBoost fit resumes from its last boosting checkpoint
+  and gives the uninterrupted model
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+import xgboost as xgb
+from sklearn.datasets import make_classification
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from machine_learning.checkpoints import (
+    PipelineCheckpoints,
+    artifacts_checksum,
+    fit_with_checkpoints,
+)
+
+CONFIG = {'scenario_type': 'all', 'key': 'abc'}
+
+
+@pytest.fixture
+def artifact(tmp_path):
+    directory = tmp_path / "features"
+    directory.mkdir()
+    (directory / "X_train.npy").write_bytes(b"train")
+    (directory / "metadata.json").write_text("{}")
+    return directory
+
+
+@pytest.fixture(scope="module")
+def data():
+    X, y = make_classification(n_samples=400, n_features=6, random_state=0)
+    return X.astype(np.float32), y
+
+
+class Interrupt(xgb.callback.TrainingCallback):
+    """Stop a fit with KeyboardInterrupt after a number of rounds."""
+
+    def __init__(self, rounds):
+        super().__init__()
+        self.rounds = rounds
+
+    def after_iteration(self, model, epoch, evals_log):
+        if model.num_boosted_rounds() == self.rounds:
+            raise KeyboardInterrupt
+        return False
+
+
+class TestArtifactsChecksum:
+    """Tests for artifacts_checksum."""
+
+    def test_follows_file_content(self, artifact):
+        checksum = artifacts_checksum([artifact])
+
+        (artifact / "X_train.npy").write_bytes(b"trains")
+
+        assert artifacts_checksum([artifact]) != checksum
+
+    def test_ignores_hidden_temporary_files(self, artifact):
+        checksum = artifacts_checksum([artifact])
+
+        (artifact / ".X_train.npy.123.tmp").write_bytes(b"partial")
+
+        assert artifacts_checksum([artifact]) == checksum
+
+    def test_missing_path(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            artifacts_checksum([tmp_path / "missing"])
+
+
+class TestPipelineCheckpoints:
+    """Tests for PipelineCheckpoints."""
+
+    def test_resume_skips_recorded_stage(self, artifact, tmp_path):
+        PipelineCheckpoints(tmp_path / "checkpoints", verbose=False).record('features', [artifact], CONFIG)
+
+        resumed = PipelineCheckpoints(tmp_path / "checkpoints", resume=True, verbose=False)
+
+        assert resumed.completed('features', dict(CONFIG))
+        assert not resumed.completed('features', {**CONFIG, 'key': 'other'})
+        assert not resumed.completed('dataset', CONFIG)
+        assert not PipelineCheckpoints(tmp_path / "checkpoints", verbose=False).completed('features', CONFIG)
+
+    def test_changed_artifact_runs_again(self, artifact, tmp_path):
+        PipelineCheckpoints(tmp_path / "checkpoints", verbose=False).record('features', [artifact], CONFIG)
+        (artifact / "X_train.npy").write_bytes(b"damaged")
+
+        resumed = PipelineCheckpoints(tmp_path / "checkpoints", resume=True, verbose=False)
+
+        assert not resumed.completed('features', CONFIG)
+        assert resumed.corrupted == {'features'}
+
+    def test_state_round_trip(self, tmp_path):
+        PipelineCheckpoints(tmp_path, verbose=False).save_state('model', {'hyperparams': {'max_depth': 4}}, CONFIG)
+
+        checkpoints = PipelineCheckpoints(tmp_path, resume=True, verbose=False)
+
+        assert checkpoints.load_state('model', CONFIG) == {'hyperparams': {'max_depth': 4}}
+        assert json.loads((tmp_path / "pipeline.json").read_text())['stages']['model']['config'] == CONFIG
+
+        checkpoints.clear()
+        assert PipelineCheckpoints(tmp_path, resume=True, verbose=False).load_state('model', CONFIG) is None
+        assert not list(tmp_path.iterdir())
+
+    def test_run_stage_computes_once(self, tmp_path):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return {'accuracy': 0.9}
+
+        first = PipelineCheckpoints(tmp_path, verbose=False).run_stage('comparison', CONFIG, compute)
+        resumed = PipelineCheckpoints(tmp_path, resume=True, verbose=False).run_stage('comparison', CONFIG, compute)
+
+        assert first == resumed == {'accuracy': 0.9}
+        assert len(calls) == 1
+
+
+class TestBoostingCheckpoint:
+    """Tests for fit_with_checkpoints."""
+
+    def test_interrupted_fit_resumes(self, data, tmp_path):
+        X, y = data
+        params = {'n_estimators': 30, 'max_depth': 3, 'n_jobs': 1}
+        checkpoint = tmp_path / "boosting.ubj"
+        expected = xgb.XGBClassifier(**params).fit(X, y)
+
+        with pytest.raises(KeyboardInterrupt):
+            fit_with_checkpoints(xgb.XGBClassifier(**params, callbacks=[Interrupt(17)]), X, y, checkpoint, every=5)
+        assert xgb.Booster(model_file=str(checkpoint)).num_boosted_rounds() == 15
+
+        model = fit_with_checkpoints(xgb.XGBClassifier(**params), X, y, checkpoint, every=5,
+                                     fit_params={'eval_set': [(X, y)], 'verbose': False})
+
+        # Only the remaining rounds are trained
+        assert len(model.evals_result()['validation_0']['logloss']) == 15
+        assert model.n_estimators == 30
+        assert model.get_booster().num_boosted_rounds() == 30
+        assert not checkpoint.exists()
+        np.testing.assert_allclose(model.predict_proba(X), expected.predict_proba(X), atol=1e-6)
+
+    def test_other_parameters_start_over(self, data, tmp_path):
+        X, y = data
+        checkpoint = tmp_path / "boosting.ubj"
+        with pytest.raises(KeyboardInterrupt):
+            fit_with_checkpoints(xgb.XGBClassifier(n_estimators=20, max_depth=3, callbacks=[Interrupt(12)]),
+                                 X, y, checkpoint, every=5)
+
+        model = fit_with_checkpoints(xgb.XGBClassifier(n_estimators=20, max_depth=4), X, y, checkpoint, every=5,
+                                     fit_params={'eval_set': [(X, y)], 'verbose': False})
+
+        assert len(model.evals_result()['validation_0']['logloss']) == 20
+
+    def test_no_resume_starts_over(self, data, tmp_path):
+        X, y = data
+        checkpoint = tmp_path / "boosting.ubj"
+        with pytest.raises(KeyboardInterrupt):
+            fit_with_checkpoints(xgb.XGBClassifier(n_estimators=20, callbacks=[Interrupt(12)]), X, y, checkpoint,
+                                 every=5)
+
+        model = fit_with_checkpoints(xgb.XGBClassifier(n_estimators=20), X, y, checkpoint, every=5, resume=False,
+                                     fit_params={'eval_set': [(X, y)], 'verbose': False})
+
+        assert len(model.evals_result()['validation_0']['logloss']) == 20
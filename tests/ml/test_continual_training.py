@@ -0,0 +1,182 @@
+"""
+Continual Training Tests
+========================
+
+Validation:
+- Captured rows are labelled with the winner of the dataset simulator
+- Rows captured without move categories are skipped
+- The warm start appends trees without modifying the production model
+- Raw and compacted captures are read, hidden temporary files are not
+- The candidate is exported only when its quality holds
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from machine_learning import build_battle_winner_dataset_v2 as builder
+from machine_learning import export
+from machine_learning.continual_training import (
+    label_production_rows,
+    quality_holds,
+    read_production_rows,
+    refresh_model,
+    warm_start,
+)
+from machine_learning.features import PokemonFeatureEngineer
+
+
+@pytest.fixture(scope="module")
+def battles(battle_data):
+    """Best-move battles of the synthetic roster with their move categories."""
+    pokemon_df, pokemon_moves_df, type_eff = battle_data
+    samples, categories = [], []
+    for _, pokemon_a in pokemon_df.iterrows():
+        for _, pokemon_b in pokemon_df.iterrows():
+            if pokemon_a['pokemon_id'] == pokemon_b['pokemon_id']:
+                continue
+            move_a = builder.get_best_move(pokemon_a['pokemon_id'], pokemon_moves_df, pokemon_a, pokemon_b, type_eff)
+            move_b = builder.get_best_move(pokemon_b['pokemon_id'], pokemon_moves_df, pokemon_b, pokemon_a, type_eff)
+            if move_a is None or move_b is None:
+                continue
+            winner = builder.simulate_battle(pokemon_a, pokemon_b, move_a, move_b, type_eff)
+            samples.append(builder.build_sample_dict(pokemon_a, pokemon_b, move_a, move_b, winner, "best_move"))
+            categories.append({'a_move_category': move_a['move_category'],
+                               'b_move_category': move_b['move_category']})
+    return pd.DataFrame(samples), pd.DataFrame(categories)
+
+
+@pytest.fixture(scope="module")
+def production(battles, feature_config):
+    """Production model fitted on half of the battles, and the other half as captured by the API."""
+    df, categories = battles
+    train, test = df.iloc[::2].reset_index(drop=True), df.iloc[1::2].reset_index(drop=True)
+    engineer = PokemonFeatureEngineer(feature_config)
+    X_train, X_test, y_train, y_test, scalers, feature_columns = engineer.fit_transform(train, test, verbose=False)
+    model = xgb.XGBClassifier(n_estimators=10, max_depth=3, random_state=0, n_jobs=1)
+    model.fit(X_train, y_train)
+    captured = pd.concat([X_test, categories.iloc[1::2].reset_index(drop=True)], axis=1)
+    return {'model': model, 'engineer': engineer, 'scalers': scalers, 'feature_columns': feature_columns,
+            'train': train, 'test': test, 'captured': captured, 'y_captured': y_test}
+
+
+class TestLabelling:
+    """Tests for label_production_rows."""
+
+    def test_labels_are_simulated_winners(self, production, feature_config):
+        labels = label_production_rows(production['captured'], production['scalers'],
+                                       production['feature_columns'], feature_config)
+
+        assert len(labels) == len(production['captured'])
+        np.testing.assert_array_equal(labels.to_numpy(), production['y_captured'].to_numpy())
+
+    def test_rows_without_categories_are_skipped(self, production, feature_config):
+        captured = production['captured'].copy()
+        captured.loc[:4, 'a_move_category'] = None
+        older = captured.drop(columns=['b_move_category'])
+
+        labels = label_production_rows(captured, production['scalers'], production['feature_columns'], feature_config)
+
+        assert list(labels.index) == list(captured.index[5:])
+        assert label_production_rows(older, production['scalers'], production['feature_columns'],
+                                     feature_config).empty
+
+
+class TestWarmStart:
+    """Tests for warm_start."""
+
+    def test_appends_rounds_and_keeps_production(self, production):
+        model = production['model']
+        X = production['captured'][production['feature_columns']]
+        before = model.predict_proba(X)
+
+        candidate = warm_start(model, X, production['y_captured'], rounds=5)
+
+        assert candidate.get_booster().num_boosted_rounds() == 15
+        assert candidate.n_estimators == 15
+        assert model.get_booster().num_boosted_rounds() == 10
+        np.testing.assert_array_equal(model.predict_proba(X), before)
+
+    def test_rejects_other_models_and_rounds(self, production):
+        from sklearn.dummy import DummyClassifier
+        X, y = production['captured'][production['feature_columns']], production['y_captured']
+
+        with pytest.raises(ValueError):
+            warm_start(DummyClassifier().fit(X, y), X, y)
+        with pytest.raises(ValueError):
+            warm_start(production['model'], X, y, rounds=0)
+
+
+def test_read_production_rows(tmp_path):
+    pd.DataFrame({'a_hp': [0.1], 'a_move_category': ['physique']}).to_parquet(tmp_path / "batch_1.parquet")
+    compacted = tmp_path / "compacted" / "date=2026-10-18"
+    compacted.mkdir(parents=True)
+    pd.DataFrame({'a_hp': [0.2, 0.3]}).to_parquet(compacted / "part-0.parquet")
+    pd.DataFrame({'a_hp': [9.9]}).to_parquet(compacted / ".part-1.parquet.tmp.parquet")
+
+    rows = read_production_rows(tmp_path)
+
+    assert sorted(rows['a_hp']) == [0.1, 0.2, 0.3]
+    assert rows['a_move_category'].isna().sum() == 2
+    assert read_production_rows(tmp_path / "missing").empty
+
+
+def test_quality_holds():
+    production = {'test_accuracy': 0.90, 'test_roc_auc': 0.95}
+
+    assert quality_holds(production, {'test_accuracy': 0.899, 'test_roc_auc': 0.96}, max_degradation=0.002)
+    assert not quality_holds(production, {'test_accuracy': 0.95, 'test_roc_auc': 0.94}, max_degradation=0.002)
+
+
+class TestRefreshModel:
+    """Tests for refresh_model."""
+
+    @pytest.fixture
+    def setup(self, production, tmp_path, monkeypatch):
+        monkeypatch.setattr(export, "MODELS_DIR", tmp_path / "models")
+        export.export_model(production['model'], production['scalers'], production['feature_columns'],
+                            {'test_accuracy': 0.0}, version="prod",
+                            categorical_encoding=production['engineer'].encoder.to_dict(), verbose=False)
+        processed = tmp_path / "processed"
+        processed.mkdir()
+        production['train'].to_parquet(processed / "train.parquet")
+        production['test'].to_parquet(processed / "test.parquet")
+        drift = tmp_path / "drift_data"
+        drift.mkdir()
+        production['captured'].to_parquet(drift / "batch_1.parquet")
+        return processed, drift, tmp_path / "models"
+
+    def test_candidate_is_exported(self, setup, production):
+        processed, drift, models = setup
+
+        result = refresh_model(processed, version="prod", output_version="refresh", drift_dir=drift,
+                               rounds=3, replay_rows=50, max_degradation=1.0, verbose=False)
+
+        assert result['exported']
+        assert result['labelled_rows'] == len(production['captured'])
+        model, _, metadata = export.load_model_artifacts("refresh")
+        assert model.get_booster().num_boosted_rounds() == 13
+        assert metadata['hyperparameters']['warm_start_from'] == "prod"
+        assert metadata['feature_columns'] == production['feature_columns']
+
+    def test_degraded_candidate_is_not_exported(self, setup):
+        processed, drift, models = setup
+
+        result = refresh_model(processed, version="prod", output_version="refresh", drift_dir=drift,
+                               rounds=3, replay_rows=0, max_degradation=-1.0, verbose=False)
+
+        assert not result['exported']
+        assert not (models / "battle_winner_model_refresh.pkl").exists()
+
+    def test_no_labelled_rows(self, setup, tmp_path):
+        processed, _, _ = setup
+
+        with pytest.raises(ValueError):
+            refresh_model(processed, version="prod", drift_dir=tmp_path / "empty", verbose=False)
@@ -52,13 +52,13 @@ def test_dataset_exists():
 
 def test_dataset_structure(train_dataset, test_dataset):
     """Test that datasets have expected structure."""
-    # Expected columns (38 raw features)
+    # Expected columns (36 raw features, names in pokemon_names.parquet)
     expected_cols = {
         # Pokemon A
-        'pokemon_a_id', 'pokemon_a_name', 'a_hp', 'a_attack', 'a_defense',
+        'pokemon_a_id', 'a_hp', 'a_attack', 'a_defense',
         'a_sp_attack', 'a_sp_defense', 'a_speed', 'a_type_1', 'a_type_2',
         # Pokemon B
-        'pokemon_b_id', 'pokemon_b_name', 'b_hp', 'b_attack', 'b_defense',
+        'pokemon_b_id', 'b_hp', 'b_attack', 'b_defense',
         'b_sp_attack', 'b_sp_defense', 'b_speed', 'b_type_1', 'b_type_2',
         # Move A
         'a_move_name', 'a_move_power', 'a_move_type', 'a_move_priority',
@@ -103,14 +103,16 @@ def test_dataset_types(train_dataset):
     for col in numeric_cols:
         assert pd.api.types.is_numeric_dtype(train_dataset[col]), f"{col} should be numeric"
  
-    # Categorical features
+    # Categorical features (dictionary-encoded in v2 datasets)
     categorical_cols = [
         'a_type_1', 'a_type_2', 'b_type_1', 'b_type_2',
         'a_move_type', 'b_move_type', 'scenario_type'
     ]
  
     for col in categorical_cols:
-        assert train_dataset[col].dtype == 'object', f"{col} should be object/string"
+        dtype = train_dataset[col].dtype
+        assert dtype == 'object' or isinstance(dtype, pd.CategoricalDtype), \
+            f"{col} should be categorical or object/string"
 
 
 def test_no_missing_values(train_dataset, test_dataset):
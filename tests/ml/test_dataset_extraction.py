@@ -0,0 +1,128 @@
+"""
+Dataset Extraction Tests
+========================
+
+Validation:
+- COPY CSV output is parsed into typed, dictionary-encoded Arrow tables
+  (NULL vs empty string, quoting, accents)
+- Engines built from Arrow tables match engines built from DataFrames
+- Parquet snapshots round-trip, so the builder can run without PostgreSQL
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from machine_learning import build_battle_winner_dataset_v2 as builder
+from machine_learning.battle_engine import BattleEngine
+
+
+class FakeCopyCursor:
+    """Cursor whose COPY ... TO STDOUT writes a fixed PostgreSQL CSV output."""
+
+    def __init__(self, csv_text):
+        self.csv_text = csv_text
+        self.statements = []
+
+    def copy_expert(self, sql, file):
+        self.statements.append(sql)
+        file.write(self.csv_text.encode("utf-8"))
+
+
+def to_tables(battle_data):
+    """Synthetic roster as extracted Arrow tables."""
+    pokemon_df, pokemon_moves_df, type_eff = battle_data
+    type_chart = pd.DataFrame(
+        [(int(a), int(d), m) for (a, d), m in type_eff.items()],
+        columns=['attacking_type_id', 'defending_type_id', 'multiplier'],
+    )
+    frames = {"pokemon": pokemon_df, "pokemon_moves": pokemon_moves_df, "type_effectiveness": type_chart}
+    return {
+        name: pa.Table.from_pandas(frame, schema=builder.EXTRACT_SCHEMAS[name], preserve_index=False)
+        for name, frame in frames.items()
+    }
+
+
+# ============================================================
+# TESTS: COPY parsing
+# ============================================================
+
+class TestCopyToArrow:
+    """Tests for parsing COPY CSV output."""
+
+    def test_moves_are_typed_and_dictionary_encoded(self):
+        cursor = FakeCopyCursor(
+            "pokemon_id,move_id,move_name,move_type_id,move_type_name,move_category,"
+            "move_power,move_accuracy,damage_type,priority\n"
+            '1,10,"Coup d\'Boule, Fort",3,Normal,physique,70,,offensif,0\n'
+            "1,11,Éclair,4,Électrik,spécial,40,100,,1\n"
+        )
+
+        table = builder.copy_to_arrow(
+            cursor, builder.POKEMON_MOVES_QUERY, builder.EXTRACT_SCHEMAS["pokemon_moves"]
+        )
+
+        assert table.schema.equals(builder.EXTRACT_SCHEMAS["pokemon_moves"])
+        assert table.column('move_name').to_pylist() == ["Coup d'Boule, Fort", "Éclair"]
+        assert table.column('move_accuracy').to_pylist() == [None, 100]
+        assert table.column('damage_type').to_pylist() == ["offensif", None]
+        assert pa.types.is_dictionary(table.schema.field('move_type_name').type)
+        assert cursor.statements[0].startswith("COPY (")
+        assert "TO STDOUT" in cursor.statements[0]
+
+    def test_quoted_empty_string_is_not_null(self):
+        cursor = FakeCopyCursor('attacking_type_id,defending_type_id,multiplier\n1,2,0.50\n3,4,2.00\n')
+        table = builder.copy_to_arrow(
+            cursor, builder.TYPE_EFFECTIVENESS_QUERY, builder.EXTRACT_SCHEMAS["type_effectiveness"]
+        )
+        assert table.column('multiplier').to_pylist() == [0.5, 2.0]
+
+        cursor = FakeCopyCursor('pokemon_id,pokemon_name,hp,attack,defense,sp_attack,sp_defense,speed,'
+                                'type_1_id,type_1_name,type_2_id,type_2_name\n'
+                                '1,"",45,49,49,65,65,45,12,Plante,,\n')
+        pokemon = builder.copy_to_arrow(cursor, builder.POKEMON_QUERY, builder.EXTRACT_SCHEMAS["pokemon"])
+
+        assert pokemon.column('pokemon_name').to_pylist() == [""]
+        assert pokemon.column('type_2_id').to_pylist() == [None]
+        assert pokemon.column('type_2_name').to_pylist() == [None]
+
+
+# ============================================================
+# TESTS: Engine inputs and snapshots
+# ============================================================
+
+class TestEngineInputs:
+    """Tests for building the engine from extracted tables."""
+
+    def test_engine_matches_dataframe_inputs(self, battle_data):
+        expected = BattleEngine(*battle_data)
+        engine = BattleEngine(*builder.engine_inputs(to_tables(battle_data)))
+
+        assert engine.content_hashes() == expected.content_hashes()
+        assert engine.type_chart_hash() == expected.type_chart_hash()
+        pd.testing.assert_frame_equal(
+            builder.generate_all_combinations_scenario(engine, max_combinations_per_matchup=None),
+            builder.generate_all_combinations_scenario(expected, max_combinations_per_matchup=None),
+        )
+
+    def test_snapshot_round_trip(self, battle_data, tmp_path):
+        tables = to_tables(battle_data)
+
+        builder.save_snapshot(tables, tmp_path)
+        loaded = builder.load_snapshot(tmp_path)
+
+        for name, table in tables.items():
+            assert loaded[name].equals(table)
+
+    def test_missing_snapshot_table(self, battle_data, tmp_path):
+        builder.save_snapshot(to_tables(battle_data), tmp_path)
+        (tmp_path / "pokemon_moves.parquet").unlink()
+
+        with pytest.raises(FileNotFoundError):
+            builder.load_snapshot(tmp_path)
@@ -0,0 +1,110 @@
+"""
+Model Evaluation Tests
+======================
+
+Validation:
+- The single chunked probability pass gives the metrics of predict()/predict_proba()
+- Test metrics are broken down per group of rows
+- Type matchups are decoded from the one-hot columns (dense and sparse)
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse as sp
+import xgboost as xgb
+from sklearn.datasets import make_classification
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score, roc_auc_score
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from machine_learning.evaluation import evaluate_model, type_matchups
+
+
+@pytest.fixture(scope="module")
+def splits():
+    X, y = make_classification(n_samples=600, n_features=6, random_state=0)
+    X = pd.DataFrame(X.astype(np.float32), columns=[f"f{i}" for i in range(6)])
+    return X.iloc[:400], X.iloc[400:].reset_index(drop=True), pd.Series(y[:400]), pd.Series(y[400:])
+
+
+@pytest.fixture(scope="module", params=['xgboost', 'random_forest'])
+def model(request, splits):
+    X_train, _, y_train, _ = splits
+    if request.param == 'xgboost':
+        return xgb.XGBClassifier(n_estimators=20, max_depth=3, n_jobs=1).fit(X_train, y_train)
+    return RandomForestClassifier(n_estimators=20, random_state=0).fit(X_train, y_train)
+
+
+class TestEvaluateModel:
+    """Tests for evaluate_model."""
+
+    def test_same_metrics_as_predict(self, model, splits):
+        X_train, X_test, y_train, y_test = splits
+
+        metrics = evaluate_model(model, X_train, X_test, y_train, y_test, verbose=False, chunk_rows=64)
+
+        y_pred = model.predict(X_test)
+        assert metrics['train_accuracy'] == accuracy_score(y_train, model.predict(X_train))
+        assert metrics['test_accuracy'] == accuracy_score(y_test, y_pred)
+        assert metrics['test_precision'] == pytest.approx(precision_score(y_test, y_pred))
+        assert metrics['test_recall'] == pytest.approx(recall_score(y_test, y_pred))
+        assert metrics['test_f1'] == pytest.approx(f1_score(y_test, y_pred))
+        assert metrics['test_roc_auc'] == pytest.approx(roc_auc_score(y_test, model.predict_proba(X_test)[:, 1]))
+        assert 'breakdown' not in metrics
+
+    def test_breakdown_per_group(self, model, splits):
+        X_train, X_test, y_train, y_test = splits
+        scenarios = np.where(np.arange(len(X_test)) % 3 == 0, 'best_move', 'random_move').astype(object)
+        scenarios[:5] = None
+
+        metrics = evaluate_model(model, X_train, X_test, y_train, y_test, verbose=False, chunk_rows=64,
+                                 groups={'scenario_type': scenarios, 'matchup': None})
+
+        breakdown = metrics['breakdown']
+        assert list(breakdown) == ['scenario_type']
+        for scenario, group in breakdown['scenario_type'].items():
+            rows = scenarios == scenario
+            y_pred = model.predict(X_test[rows])
+            assert group['samples'] == rows.sum()
+            assert group['accuracy'] == pytest.approx(accuracy_score(y_test[rows], y_pred))
+            assert group['f1'] == pytest.approx(f1_score(y_test[rows], y_pred))
+            assert group['roc_auc'] == pytest.approx(
+                roc_auc_score(y_test[rows], model.predict_proba(X_test[rows])[:, 1]))
+
+    def test_group_of_a_single_class_has_no_roc_auc(self, model, splits):
+        X_train, X_test, y_train, y_test = splits
+
+        metrics = evaluate_model(model, X_train, X_test, y_train, y_test, verbose=False,
+                                 groups={'winner': y_test.map({0: 'B', 1: 'A'})})
+
+        assert {group['roc_auc'] for group in metrics['breakdown']['winner'].values()} == {None}
+
+    def test_groups_need_one_label_per_test_row(self, model, splits):
+        X_train, X_test, y_train, y_test = splits
+
+        with pytest.raises(ValueError):
+            evaluate_model(model, X_train, X_test, y_train, y_test, verbose=False, groups={'scenario_type': ['a']})
+
+
+class TestTypeMatchups:
+    """Tests for type_matchups."""
+
+    COLUMNS = ['hp', 'a_type_1_Eau', 'a_type_1_Feu', 'b_type_1_Feu', 'b_type_1_Plante']
+
+    def test_decodes_dense_and_sparse_one_hot(self):
+        X = pd.DataFrame([[0.5, 1, 0, 0, 1],
+                          [-1.0, 0, 1, 1, 0],
+                          [0.0, 0, 0, 1, 0]], columns=self.COLUMNS, dtype=np.float32)
+
+        expected = ['Eau vs Plante', 'Feu vs Feu', 'unknown vs Feu']
+        assert type_matchups(X, self.COLUMNS, chunk_rows=2).astype(str).tolist() == expected
+        assert type_matchups(sp.csr_matrix(X.to_numpy()), self.COLUMNS).astype(str).tolist() == expected
+
+    def test_no_type_columns(self):
+        assert type_matchups(np.zeros((2, 1)), ['hp']) is None
@@ -0,0 +1,110 @@
+"""
+External Memory Training Tests
+==============================
+
+Validation:
+- Processed splits are read in bounded batches
+- partial_fit over batches gives the fit_transform features
+- XGBoost trained from the batch iterator predicts like the in-memory model
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from machine_learning.battle_engine import BattleEngine, iter_shards
+from machine_learning.dataset_writer import DatasetWriter
+from machine_learning.datasets import iter_split_batches, load_splits, model_columns, read_split
+from machine_learning.external_memory import (
+    evaluate_external_memory,
+    fit_feature_engineer,
+    train_external_memory,
+)
+from machine_learning.features import CategoricalEncoder, PokemonFeatureEngineer
+
+PARAMS = {'n_estimators': 10, 'max_depth': 4, 'learning_rate': 0.3, 'tree_method': 'hist', 'random_state': 42}
+
+
+@pytest.fixture(scope="module")
+def processed(battle_data, tmp_path_factory):
+    root = tmp_path_factory.mktemp("external_memory")
+    engine = BattleEngine(*battle_data)
+    with DatasetWriter(root / "raw", root / "processed") as writer:
+        for scenario in ("best_move", "random_move"):
+            writer.write_scenario(scenario, iter_shards(engine, scenario, 42, num_samples=3))
+        writer.drop_scenario("all_combinations")
+    return root / "processed"
+
+
+def in_memory(processed, feature_config):
+    """Splits and fit_transform output of the in-memory pipeline."""
+    df_train, df_test = load_splits(processed, columns=model_columns(processed / "train.parquet"), verbose=False)
+    return PokemonFeatureEngineer(feature_config).fit_transform(df_train, df_test, verbose=False)
+
+
+class TestBatches:
+    """Tests for iter_split_batches."""
+
+    def test_batches_cover_the_split(self, processed):
+        path = processed / "train.parquet"
+        batches = list(iter_split_batches(path, "random_move", batch_rows=100))
+
+        expected = read_split(path, "random_move")
+        assert [len(batch) for batch in batches[:-1]] == [100] * (len(batches) - 1)
+        assert 0 < len(batches[-1]) <= 100
+        assert sum(len(batch) for batch in batches) == len(expected)
+        assert sum(int(batch['winner'].sum()) for batch in batches) == int(expected['winner'].sum())
+
+    def test_partial_fit_matches_fit_transform(self, processed, feature_config):
+        X_train, _, _, _, scalers, feature_columns = in_memory(processed, feature_config)
+
+        engineer = fit_feature_engineer(processed / "train.parquet", batch_rows=150, config=feature_config)
+        X_batches = pd.concat([
+            engineer.transform(df.drop(columns=['winner']))
+            for df in iter_split_batches(processed / "train.parquet", batch_rows=150)
+        ])
+
+        assert engineer.feature_columns == feature_columns
+        np.testing.assert_allclose(engineer.scaler.mean_, scalers['standard_scaler'].mean_)
+        np.testing.assert_allclose(X_batches.to_numpy(dtype=float), X_train.to_numpy(dtype=float), atol=1e-9)
+
+    def test_encoder_partial_fit_keeps_every_batch(self):
+        encoder = CategoricalEncoder(['a_type_1'], ['Eau', 'Feu', 'Plante'])
+        encoder.partial_fit(pd.DataFrame({'a_type_1': ['Feu']})).partial_fit(pd.DataFrame({'a_type_1': ['Eau']}))
+
+        assert encoder.columns == ['a_type_1_Eau', 'a_type_1_Feu']
+        assert encoder.fit(pd.DataFrame({'a_type_1': ['Eau']})).columns == ['a_type_1_Eau']
+
+
+class TestExternalMemoryTraining:
+    """Tests for train_external_memory."""
+
+    def test_predicts_like_the_in_memory_model(self, processed, feature_config, tmp_path):
+        X_train, X_test, y_train, _, _, _ = in_memory(processed, feature_config)
+        reference = xgb.XGBClassifier(**PARAMS).fit(X_train, y_train)
+
+        model, engineer = train_external_memory(processed, params=PARAMS, batch_rows=200, cache_dir=tmp_path,
+                                                config=feature_config, verbose=False)
+
+        assert isinstance(model, xgb.XGBClassifier)
+        assert not list(tmp_path.iterdir())
+        np.testing.assert_allclose(model.predict_proba(X_test), reference.predict_proba(X_test), atol=1e-5)
+
+        metrics = evaluate_external_memory(model, engineer, processed, batch_rows=200, verbose=False)
+        assert metrics['train_samples'] == len(X_train)
+        assert metrics['test_samples'] == len(X_test)
+
+    def test_scenario_filter(self, processed, feature_config):
+        model, engineer = train_external_memory(processed, "best_move", params=PARAMS, config=feature_config,
+                                                verbose=False)
+
+        metrics = evaluate_external_memory(model, engineer, processed, "best_move", verbose=False)
+
+        assert metrics['train_samples'] == len(read_split(processed / "train.parquet", "best_move"))
@@ -0,0 +1,116 @@
+"""
+Feature Cache Tests
+===================
+
+Validation:
+- A second run reuses the cached matrices without reading the Parquet files
+- The cached features are the fit_transform features
+- The key follows the Parquet content, the scenario and the config
+"""
+
+import sys
+from dataclasses import replace
+from pathlib import Path
+
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from machine_learning.battle_engine import BattleEngine, iter_shards
+from machine_learning.dataset_writer import DatasetWriter
+from machine_learning.datasets import load_splits, model_columns
+from machine_learning.features import PokemonFeatureEngineer, cached_fit_transform, feature_cache_key
+
+
+@pytest.fixture
+def processed(battle_data, tmp_path):
+    engine = BattleEngine(*battle_data)
+    with DatasetWriter(tmp_path / "raw", tmp_path / "processed") as writer:
+        for scenario in ("best_move", "random_move"):
+            writer.write_scenario(scenario, iter_shards(engine, scenario, 42, num_samples=2))
+        writer.drop_scenario("all_combinations")
+    return tmp_path / "processed"
+
+
+def loader(processed, scenario_type="all", calls=None):
+    def load():
+        if calls is not None:
+            calls.append(scenario_type)
+        return load_splits(processed, scenario_type, columns=model_columns(processed / "train.parquet"),
+                           verbose=False)
+    return load
+
+
+class TestFeatureCache:
+    """Tests for cached_fit_transform."""
+
+    def test_second_run_uses_the_cache(self, processed, feature_config, tmp_path):
+        calls = []
+        first = cached_fit_transform(loader(processed, calls=calls), processed, cache_dir=tmp_path / "cache",
+                                     config=feature_config, verbose=False)
+        second = cached_fit_transform(loader(processed, calls=calls), processed, cache_dir=tmp_path / "cache",
+                                      config=feature_config, verbose=False)
+
+        assert calls == ["all"]
+        assert second[5] == first[5]
+        assert second[6].columns == first[6].columns
+        for a, b in zip(first[:4], second[:4]):
+            np.testing.assert_array_equal(a.to_numpy(), b.to_numpy())
+        assert not second[0].to_numpy().flags.writeable  # Memory-mapped read-only
+
+    def test_cached_features_match_fit_transform(self, processed, feature_config, tmp_path):
+        df_train, df_test = loader(processed)()
+        expected = PokemonFeatureEngineer(feature_config).fit_transform(df_train, df_test, verbose=False)
+
+        cached = cached_fit_transform(loader(processed), processed, cache_dir=tmp_path / "cache",
+                                      config=feature_config, verbose=False)
+
+        assert cached[5] == expected[5]
+        np.testing.assert_allclose(cached[0].to_numpy(), expected[0].to_numpy(dtype=np.float64), rtol=1e-6, atol=1e-6)
+        np.testing.assert_array_equal(cached[3], expected[3])
+        np.testing.assert_allclose(cached[4]['standard_scaler'].mean_, expected[4]['standard_scaler'].mean_)
+
+    def test_sparse_output(self, processed, feature_config, tmp_path):
+        dense = cached_fit_transform(loader(processed), processed, cache_dir=tmp_path / "cache",
+                                     config=feature_config, verbose=False)
+        sparse = cached_fit_transform(loader(processed), processed, cache_dir=tmp_path / "cache",
+                                      config=feature_config, sparse=True, verbose=False)
+
+        assert sp.isspmatrix_csr(sparse[0])
+        np.testing.assert_array_equal(sparse[0].toarray(), dense[0].to_numpy())
+
+    def test_no_cache_dir_writes_nothing(self, processed, feature_config, tmp_path):
+        features = cached_fit_transform(loader(processed), processed, config=feature_config, verbose=False)
+
+        assert len(features) == 7
+        assert not (tmp_path / "cache").exists()
+
+
+class TestCacheKey:
+    """Tests for feature_cache_key."""
+
+    def test_key_follows_parquet_content(self, processed, feature_config):
+        key = feature_cache_key(processed, config=feature_config)
+        assert feature_cache_key(processed, config=feature_config) == key
+
+        path = next((processed / "test.parquet").rglob("*.parquet"))
+        path.write_bytes(path.read_bytes() + b"\0")
+
+        assert feature_cache_key(processed, config=feature_config) != key
+
+    def test_key_follows_config_and_scenario(self, processed, feature_config):
+        key = feature_cache_key(processed, config=feature_config)
+
+        assert feature_cache_key(processed, config=replace(feature_config, derived_features=['stat_ratio'])) != key
+        assert feature_cache_key(processed, "best_move", config=feature_config) != key
+
+    def test_scenario_key_ignores_other_partitions(self, processed, feature_config):
+        key = feature_cache_key(processed, "best_move", config=feature_config)
+
+        path = next((processed / "train.parquet" / "scenario_type=random_move").iterdir())
+        path.write_bytes(path.read_bytes() + b"\0")
+
+        assert feature_cache_key(processed, "best_move", config=feature_config) == key
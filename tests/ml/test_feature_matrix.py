@@ -0,0 +1,169 @@
+"""
+Feature Matrix Tests
+====================
+
+Validation:
+- The streamed matrix matches PokemonFeatureEngineer.fit_transform
+  (columns, one-hot slots, scaled and derived features, scalers)
+- DatasetWriter feeds the matrix with its train and test rows
+- Files are only published by a successful full build
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from machine_learning import build_battle_winner_dataset_v2 as builder
+from machine_learning.battle_engine import BattleEngine, iter_shards
+from machine_learning.dataset_manifest import RebuildPlan
+from machine_learning.dataset_writer import DatasetWriter
+from machine_learning.features import (
+    CategoricalEncoder,
+    FeatureMatrixWriter,
+    PokemonFeatureEngineer,
+    load_feature_matrix,
+)
+
+
+@pytest.fixture(scope="module")
+def engine(battle_data):
+    return BattleEngine(*battle_data)
+
+
+@pytest.fixture(scope="module")
+def rows(engine):
+    """All combinations of the synthetic roster, split 75/25 in random order."""
+    battles, _ = engine.all_combination_battles(None)
+    table = engine.build_table(battles, "all_combinations")
+    order = np.random.RandomState(0).permutation(table.num_rows)
+    half = table.num_rows * 3 // 4
+    return table.take(order[:half]), table.take(order[half:])
+
+
+def write_matrix(engine, config, directory, train, test, batch_rows=50):
+    with FeatureMatrixWriter(directory, builder.matrix_categories(engine, config), config) as matrix:
+        for split, table in (('train', train), ('test', test)):
+            for batch in table.to_batches(batch_rows):
+                matrix.add(split, pa.Table.from_batches([batch]))
+    return matrix
+
+
+def matrix_onehot(config):
+    """Every possible one-hot column name."""
+    return {f"{feature}_{value}" for feature in config.categorical_features for value in config.type_vocabulary}
+
+
+# ============================================================
+# TESTS: Feature parity
+# ============================================================
+
+class TestFeatureParity:
+    """The streamed matrix is the fit_transform output."""
+
+    def test_matches_feature_engineer(self, engine, feature_config, rows, tmp_path):
+        train, test = rows
+        write_matrix(engine, feature_config, tmp_path, train, test)
+        expected = PokemonFeatureEngineer(feature_config).fit_transform(train.to_pandas(), test.to_pandas(), verbose=False)
+
+        X_train, X_test, y_train, y_test, scalers, feature_columns, metadata = load_feature_matrix(tmp_path)
+
+        assert feature_columns == expected[5]
+        assert X_train.dtypes.eq(np.float32).all()
+        for actual, reference in ((X_train, expected[0]), (X_test, expected[1])):
+            np.testing.assert_allclose(actual.to_numpy(), reference.to_numpy(dtype=np.float64), rtol=1e-5, atol=1e-5)
+        np.testing.assert_array_equal(y_train, expected[2])
+        np.testing.assert_array_equal(y_test, expected[3])
+        for name, scaler in scalers.items():
+            np.testing.assert_allclose(scaler.mean_, expected[4][name].mean_)
+            np.testing.assert_allclose(scaler.scale_, expected[4][name].scale_)
+            assert list(scaler.feature_names_in_) == list(expected[4][name].feature_names_in_)
+        assert metadata['rows'] == {'train': train.num_rows, 'test': test.num_rows}
+        assert metadata['scenarios'] == ["all_combinations"]
+        assert CategoricalEncoder.from_dict(metadata['categorical_encoding']).columns == [
+            name for name in feature_columns if name in matrix_onehot(feature_config)
+        ]
+
+    def test_types_missing_from_train_get_no_column(self, engine, feature_config, rows, tmp_path):
+        train, test = rows
+        categories = builder.matrix_categories(engine, feature_config)
+        categories['a_type_1'] = categories['a_type_1'] + ["unused_type"]
+
+        with FeatureMatrixWriter(tmp_path, categories, feature_config) as matrix:
+            matrix.add('train', train)
+            matrix.add('test', test)
+
+        assert "a_type_1_unused_type" in matrix.columns
+        assert "a_type_1_unused_type" not in matrix.feature_columns
+
+    def test_types_outside_the_vocabulary_are_refused(self, engine):
+        with pytest.raises(ValueError):
+            builder.matrix_categories(engine)
+
+
+# ============================================================
+# TESTS: Dataset builder integration
+# ============================================================
+
+class TestDatasetWriterMatrix:
+    """Tests for writing the matrix along with the Parquet dataset."""
+
+    def test_matrix_holds_the_split_rows(self, engine, feature_config, tmp_path):
+        matrix = FeatureMatrixWriter(tmp_path / "matrix", builder.matrix_categories(engine, feature_config), feature_config)
+        with matrix, DatasetWriter(tmp_path / "raw", tmp_path / "processed", matrix=matrix) as writer:
+            for scenario in ("best_move", "random_move"):
+                writer.write_scenario(scenario, iter_shards(engine, scenario, 42, num_samples=3))
+
+        X_train, X_test, y_train, y_test, _, _, metadata = load_feature_matrix(tmp_path / "matrix")
+
+        train = pd.read_parquet(tmp_path / "processed" / "train.parquet")
+        assert len(X_train) == len(train)
+        assert len(X_test) == sum(stats['test'] for stats in writer.stats.values())
+        assert int(y_train.sum()) == int(train['winner'].sum())
+        assert metadata['scenarios'] == ["best_move", "random_move"]
+        assert not list(tmp_path.rglob("*.tmp"))
+
+    def test_incremental_rebuild_is_refused(self, engine, feature_config, tmp_path):
+        plan = RebuildPlan(changed={2}, removed=set(), partitions={})
+        categories = builder.matrix_categories(engine, feature_config)
+
+        with pytest.raises(ValueError):
+            with FeatureMatrixWriter(tmp_path / "matrix", categories, feature_config) as matrix:
+                writer = DatasetWriter(tmp_path / "raw", tmp_path / "processed", matrix=matrix)
+                writer.write_scenario("best_move", iter([]), plan)
+
+        assert not list((tmp_path / "matrix").iterdir())
+
+    def test_pipeline_refuses_other_scenarios(self, engine, feature_config, rows, tmp_path):
+        from machine_learning.run_machine_learning import load_matrix_features
+        write_matrix(engine, feature_config, tmp_path, *rows)
+
+        X_train, _, y_train, _, _, feature_columns = load_matrix_features(tmp_path, "all_combinations", verbose=False)
+
+        assert X_train.shape == (len(y_train), len(feature_columns))
+        with pytest.raises(ValueError):
+            load_matrix_features(tmp_path, "best_move", verbose=False)
+
+    def test_pipeline_loads_sparse_matrix(self, engine, feature_config, rows, tmp_path):
+        from machine_learning.run_machine_learning import load_matrix_features
+        write_matrix(engine, feature_config, tmp_path, *rows)
+
+        dense = load_matrix_features(tmp_path, verbose=False)
+        sparse = load_matrix_features(tmp_path, sparse=True, verbose=False)
+
+        for X_sparse, X_dense in ((sparse[0], dense[0]), (sparse[1], dense[1])):
+            np.testing.assert_array_equal(X_sparse.toarray(), X_dense.to_numpy())
+
+    def test_failure_publishes_nothing(self, engine, feature_config, rows, tmp_path):
+        with pytest.raises(RuntimeError):
+            with FeatureMatrixWriter(tmp_path, builder.matrix_categories(engine, feature_config), feature_config) as matrix:
+                matrix.add('train', rows[0])
+                raise RuntimeError("generation failed")
+
+        assert not list(tmp_path.iterdir())
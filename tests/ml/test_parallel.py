@@ -0,0 +1,88 @@
+"""
+Parallel Model Comparison Tests
+===============================
+
+Validation:
+- The core budget is split between the workers, capped by memory
+- Memory-mapped matrices are shared as their own file, others written once
+- The parallel comparison trains the models of the sequential comparison
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse as sp
+from sklearn.datasets import make_classification
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from machine_learning.evaluation import compare_models
+from machine_learning.parallel import open_shared, plan_workers, share_arrays
+
+
+@pytest.fixture(scope="module")
+def splits():
+    X, y = make_classification(n_samples=500, n_features=8, random_state=0)
+    X = pd.DataFrame(X.astype(np.float32), columns=[f"f{i}" for i in range(8)])
+    y = pd.Series(y, name='winner')
+    return X.iloc[:400], X.iloc[400:].reset_index(drop=True), y.iloc[:400], y.iloc[400:].reset_index(drop=True)
+
+
+class TestPlanWorkers:
+    """Tests for plan_workers."""
+
+    def test_cores_are_split(self):
+        assert plan_workers(2, n_jobs=8) == (2, 4)
+        assert plan_workers(3, n_jobs=8) == (3, 2)
+        assert plan_workers(2, n_jobs=1) == (1, 1)
+
+    def test_memory_caps_the_workers(self):
+        assert plan_workers(4, n_jobs=8, memory_gb=8, model_memory_gb=1.5) == (2, 4)
+        assert plan_workers(4, n_jobs=8, memory_gb=2, model_memory_gb=3) == (1, 8)
+
+
+class TestSharedArrays:
+    """Tests for share_arrays and open_shared."""
+
+    def test_memory_mapped_frame_is_not_copied(self, tmp_path):
+        np.save(tmp_path / "X.npy", np.arange(12, dtype=np.float32).reshape(4, 3))
+        X = pd.DataFrame(np.load(tmp_path / "X.npy", mmap_mode='r'), columns=['a', 'b', 'c'])
+
+        shared = share_arrays(tmp_path / "shared", X_train=X)
+
+        assert shared['X_train']['path'] == str(tmp_path / "X.npy")
+        pd.testing.assert_frame_equal(open_shared(shared['X_train']), X)
+
+    def test_in_memory_arrays_are_written(self, tmp_path):
+        X = pd.DataFrame({'a': np.array([1, 0, 1], dtype=np.uint8), 'b': [0.5, 1.5, 2.5]})
+        csr = sp.csr_matrix(np.array([[0, 1.0], [2.0, 0]], dtype=np.float32))
+        y = pd.Series([1, 0, 1], name='winner')
+
+        shared = share_arrays(tmp_path, X_train=X, X_test=csr, y_train=y)
+
+        opened = open_shared(shared['X_train'])
+        assert opened.dtypes.tolist() == [np.float32, np.float32]
+        np.testing.assert_array_equal(opened.to_numpy(), X.to_numpy(dtype=np.float32))
+        np.testing.assert_array_equal(open_shared(shared['X_test']).toarray(), csr.toarray())
+        assert open_shared(shared['y_train']).name == 'winner'
+        np.testing.assert_array_equal(open_shared(shared['y_train']), y)
+
+
+class TestParallelComparison:
+    """Tests for compare_models(parallel=True)."""
+
+    def test_same_models_as_sequential(self, splits):
+        sequential = compare_models(*splits, verbose=False)
+        parallel = compare_models(*splits, verbose=False, parallel=True)
+
+        assert parallel[1] == sequential[1]
+        assert [m['model_name'] for m in parallel[2]] == ['xgboost', 'random_forest']
+        for expected, metrics in zip(sequential[2], parallel[2]):
+            assert metrics['test_accuracy'] == expected['test_accuracy']
+            assert metrics['test_roc_auc'] == pytest.approx(expected['test_roc_auc'])
+        np.testing.assert_allclose(parallel[0].predict_proba(splits[1]), sequential[0].predict_proba(splits[1]))
+        assert parallel[0].get_params()['n_jobs'] == sequential[0].get_params()['n_jobs']
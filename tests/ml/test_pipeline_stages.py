@@ -0,0 +1,75 @@
+"""
+Pipeline Stage Tests
+====================
+
+Validation:
+- A trained model is reused with --resume instead of being fitted again
+- The model checkpoint is keyed on the features and the model settings
+- A failed dataset generation records no checkpoint
+"""
+
+import sys
+from argparse import Namespace
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from machine_learning import pipeline_stages, run_machine_learning
+from machine_learning.pipeline_stages import PipelineStages
+
+
+def make_args(**overrides) -> Namespace:
+    """Command line of run_machine_learning with the settings the stages read."""
+    args = {
+        'resume': False, 'sparse': False, 'tune_hyperparams': False, 'search_method': 'grid',
+        'grid_type': 'fast', 'checkpoint_rounds': 5, 'parallel_compare': False,
+        'dataset_version': 'v2', 'scenario_type': 'all', 'num_random_samples': 5,
+        'max_combinations': 20, 'feature_matrix': False,
+    }
+    return Namespace(**{**args, **overrides})
+
+
+def make_stages(tmp_path, **overrides) -> PipelineStages:
+    return PipelineStages(make_args(**overrides), tmp_path / "processed", tmp_path / "matrix",
+                          tmp_path / "checkpoints", tmp_path / "tuning", verbose=False)
+
+
+@pytest.fixture
+def data():
+    rng = np.random.RandomState(0)
+    X = pd.DataFrame(rng.rand(200, 4), columns=[f"f{i}" for i in range(4)])
+    return X, pd.Series((X['f0'] > 0.5).astype(int))
+
+
+class TestModelStage:
+    """Tests for PipelineStages.model."""
+
+    def test_resume_reuses_the_model(self, data, tmp_path, monkeypatch):
+        X, y = data
+        model, hyperparams = make_stages(tmp_path).model(X, y, "abc", 'xgboost')
+
+        def fail(*args, **kwargs):
+            raise AssertionError("the model was fitted again")
+        monkeypatch.setattr(run_machine_learning, "train_model", fail)
+        resumed, resumed_params = make_stages(tmp_path, resume=True).model(X, y, "abc", 'xgboost')
+
+        assert resumed_params == hyperparams == run_machine_learning.DEFAULT_XGBOOST_PARAMS
+        np.testing.assert_array_equal(resumed.predict_proba(X), model.predict_proba(X))
+        with pytest.raises(AssertionError):
+            make_stages(tmp_path, resume=True).model(X, y, "other", 'xgboost')
+
+
+def test_failed_dataset_is_not_recorded(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(pipeline_stages, "run_dataset_preparation",
+                        lambda **kwargs: calls.append(kwargs) or False)
+
+    assert not make_stages(tmp_path, resume=True).dataset()
+    assert calls[0]['processed_dir'] == tmp_path / "processed"
+    assert calls[0]['scenario_type'] == 'all'
+    assert not (tmp_path / "checkpoints" / "pipeline.json").exists()
@@ -0,0 +1,126 @@
+"""
+Scenario Partition Tests
+========================
+
+Validation:
+- Processed splits are hive-partitioned by scenario_type
+- A scenario filter only opens the files of that scenario
+- Flat files of older builds are replaced by the partitioned layout
+- Scenario labels follow the rows of load_splits
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from machine_learning import build_battle_winner_dataset_v2 as builder
+from machine_learning.battle_engine import BattleEngine, iter_shards
+from machine_learning.dataset_writer import DatasetWriter
+from machine_learning.datasets import load_splits, model_columns, read_split, scenario_labels
+
+SCENARIOS = ("best_move", "random_move")
+
+
+def write_dataset(engine, root, scenarios=SCENARIOS):
+    with DatasetWriter(root / "raw", root / "processed") as writer:
+        for scenario in scenarios:
+            writer.write_scenario(scenario, iter_shards(engine, scenario, 42, num_samples=2))
+        for scenario in set(builder.SCENARIO_STREAMS) - set(scenarios):
+            writer.drop_scenario(scenario)
+
+
+@pytest.fixture(scope="module")
+def dataset(battle_data, tmp_path_factory):
+    root = tmp_path_factory.mktemp("partitions")
+    write_dataset(BattleEngine(*battle_data), root)
+    return root
+
+
+# ============================================================
+# TESTS: Layout
+# ============================================================
+
+class TestLayout:
+    """Tests for the scenario_type=<scenario>/ directories."""
+
+    def test_splits_are_partitioned_by_scenario(self, dataset):
+        for split in ("train", "test"):
+            directory = dataset / "processed" / f"{split}.parquet"
+            assert sorted(path.name for path in directory.iterdir()) == [f"scenario_type={s}" for s in SCENARIOS]
+
+    def test_flat_files_of_older_builds_are_replaced(self, battle_data, tmp_path):
+        train_dir = tmp_path / "processed" / "train.parquet"
+        train_dir.mkdir(parents=True)
+        (train_dir / "best_move-000-000.parquet").write_bytes(b"stale")
+
+        write_dataset(BattleEngine(*battle_data), tmp_path, scenarios=("best_move",))
+
+        assert [path.name for path in train_dir.iterdir()] == ["scenario_type=best_move"]
+
+    def test_dropped_scenario_leaves_no_directory(self, battle_data, tmp_path):
+        engine = BattleEngine(*battle_data)
+        write_dataset(engine, tmp_path)
+        write_dataset(engine, tmp_path, scenarios=("best_move",))
+
+        assert not (tmp_path / "processed" / "test.parquet" / "scenario_type=random_move").exists()
+        assert set(pd.read_parquet(tmp_path / "processed" / "train.parquet")['scenario_type']) == {"best_move"}
+
+
+# ============================================================
+# TESTS: Readers
+# ============================================================
+
+class TestReaders:
+    """Tests for scenario filters and column projection."""
+
+    def test_filter_matches_pandas_filtering(self, dataset):
+        path = dataset / "processed" / "train.parquet"
+        full = pd.read_parquet(path)
+
+        filtered = read_split(path, "random_move")
+
+        expected = full[full['scenario_type'] == "random_move"]
+        assert len(filtered) == len(expected) > 0
+        assert filtered['winner'].sum() == expected['winner'].sum()
+
+    def test_other_scenarios_are_not_opened(self, dataset, tmp_path):
+        processed = tmp_path / "processed"
+        for split in ("train", "test"):
+            for scenario in SCENARIOS:
+                source = dataset / "processed" / f"{split}.parquet" / f"scenario_type={scenario}"
+                target = processed / f"{split}.parquet" / f"scenario_type={scenario}"
+                target.mkdir(parents=True)
+                for path in source.iterdir():
+                    # Unreadable files for the scenario that is not requested
+                    (target / path.name).write_bytes(path.read_bytes() if scenario == "best_move" else b"corrupt")
+
+        df_train, df_test = load_splits(processed, "best_move", verbose=False)
+
+        assert len(df_train) and len(df_test)
+
+    def test_model_columns_are_projected(self, dataset):
+        columns = model_columns(dataset / "processed" / "train.parquet")
+
+        df_train, _ = load_splits(dataset / "processed", "best_move", columns=columns, verbose=False)
+
+        assert list(df_train.columns) == columns
+        assert 'winner' in columns
+        assert not {'scenario_type', 'a_move_name', 'b_move_name'} & set(columns)
+
+    def test_missing_scenario_falls_back_to_full_dataset(self, dataset):
+        df_train, _ = load_splits(dataset / "processed", "all_combinations", verbose=False)
+
+        assert set(df_train['scenario_type']) == set(SCENARIOS)
+
+    def test_scenario_labels_follow_the_loaded_rows(self, dataset):
+        _, df_test = load_splits(dataset / "processed", verbose=False)
+
+        labels = scenario_labels(dataset / "processed")
+
+        assert labels.astype(str).tolist() == df_test['scenario_type'].astype(str).tolist()
+        assert set(scenario_labels(dataset / "processed", "random_move").astype(str)) == {"random_move"}
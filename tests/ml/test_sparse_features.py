@@ -0,0 +1,84 @@
+"""
+Sparse Feature Tests
+====================
+
+Validation:
+- fit_transform(sparse=True) holds the values and columns of the dense path
+- XGBoost trained on the CSR matrix predicts the same on dense inference rows
+- Sparse matrices are exported as .npz
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse as sp
+import xgboost as xgb
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from machine_learning import build_battle_winner_dataset_v2 as builder
+from machine_learning.battle_engine import BattleEngine
+from machine_learning.export import export_features
+from machine_learning.features import PokemonFeatureEngineer, sparse_model_params
+
+
+@pytest.fixture(scope="module")
+def engine_rows(battle_data):
+    """Generated random_move rows, split in two."""
+    frame = builder.generate_random_move_scenario(BattleEngine(*battle_data), num_samples=3)
+    return frame.iloc[::2], frame.iloc[1::2]
+
+
+@pytest.fixture(scope="module")
+def features(engine_rows, feature_config):
+    """Dense and sparse fit_transform outputs, and the sparse engineer."""
+    train, test = engine_rows
+    dense = PokemonFeatureEngineer(feature_config).fit_transform(train, test, verbose=False)
+    engineer = PokemonFeatureEngineer(feature_config)
+    sparse = engineer.fit_transform(train, test, verbose=False, sparse=True)
+    return dense, sparse, engineer
+
+
+class TestSparseFeatures:
+    """Tests for fit_transform(sparse=True)."""
+
+    def test_matches_dense_features(self, features):
+        dense, sparse, _ = features
+
+        assert sparse[5] == dense[5]
+        for X_sparse, X_dense in ((sparse[0], dense[0]), (sparse[1], dense[1])):
+            assert sp.isspmatrix_csr(X_sparse) and X_sparse.dtype == np.float32
+            assert X_sparse.has_sorted_indices
+            assert not (X_sparse.data == 0).any()
+            np.testing.assert_allclose(X_sparse.toarray(), X_dense.to_numpy(dtype=np.float64), rtol=1e-6, atol=1e-6)
+        for name in dense[4]:
+            np.testing.assert_allclose(sparse[4][name].mean_, dense[4][name].mean_)
+
+    def test_sparse_model_predicts_the_same_on_dense_rows(self, engine_rows, features):
+        _, (X_train, X_test, y_train, _, _, feature_columns), engineer = features
+        model = xgb.XGBClassifier(n_estimators=20, max_depth=4, random_state=42, **sparse_model_params(X_train))
+        model.fit(X_train, y_train)
+
+        # Dense rows as the inference code builds them
+        X_rows = engineer.transform(engine_rows[1].drop(columns=['winner']))
+
+        assert list(X_rows.columns) == feature_columns
+        np.testing.assert_allclose(model.predict_proba(X_rows), model.predict_proba(X_test), atol=1e-6)
+
+    def test_dense_input_keeps_default_params(self, features):
+        assert sparse_model_params(features[0][0]) == {}
+
+    def test_export_writes_npz(self, features, tmp_path):
+        X_train, X_test, y_train, y_test = features[1][:4]
+
+        export_features(X_train, X_test, y_train, y_test, tmp_path, verbose=False)
+
+        assert sorted(path.name for path in tmp_path.iterdir()) == [
+            "X_test.npz", "X_train.npz", "y_test.parquet", "y_train.parquet"
+        ]
+        assert (sp.load_npz(tmp_path / "X_train.npz") != X_train).nnz == 0
+        assert pd.read_parquet(tmp_path / "y_train.parquet")['winner'].tolist() == y_train.tolist()
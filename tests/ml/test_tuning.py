@@ -0,0 +1,210 @@
+"""
+Hyperparameter Search Tests
+===========================
+
+Validation:
+- The rung schedule follows the grid size and the rounds budget,
+  separately for each learning rate
+- Trials are scored like GridSearchCV (same folds, ROC-AUC)
+- The best parameters have the GridSearchCV keys and values of the grid
+- The quantized grid search finds the GridSearchCV best parameters,
+  quantizing each fold once per max_bin
+- An interrupted search resumes from its checkpoint, unless it is damaged
+  or resume=False
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+import scipy.sparse as sp
+import xgboost as xgb
+from sklearn.datasets import make_classification
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import GridSearchCV, StratifiedKFold
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from machine_learning import tuning
+from machine_learning.config import RANDOM_SEED, XGBOOST_PARAM_GRID_EXTENDED, XGBOOST_PARAM_GRID_FAST
+from machine_learning.tuning import (
+    fold_matrices,
+    grid_configurations,
+    halving_rungs,
+    learning_rate_brackets,
+    quantized_grid_search,
+    successive_halving_search,
+)
+
+GRID = {
+    'n_estimators': [10, 30],
+    'max_depth': [2, 4, 6],
+    'learning_rate': [0.1, 0.3],
+    'tree_method': ['hist'],
+}
+
+
+@pytest.fixture(scope="module")
+def data():
+    X, y = make_classification(n_samples=600, n_features=8, n_informative=4, random_state=0)
+    return X.astype(np.float32), y
+
+
+def search(data, **kwargs):
+    return successive_halving_search(*data, GRID, base_params={'n_jobs': 1}, min_rounds=5, verbose=False, **kwargs)
+
+
+class TestSchedule:
+    """Tests for halving_rungs."""
+
+    def test_repo_grids(self):
+        extended = learning_rate_brackets(grid_configurations(XGBOOST_PARAM_GRID_EXTENDED))
+        fast = learning_rate_brackets(grid_configurations(XGBOOST_PARAM_GRID_FAST))
+
+        assert [len(bracket) for bracket in extended] == [27, 27, 27]
+        assert halving_rungs(27, 300) == [(27, 33), (9, 100), (3, 300)]
+        assert [len(bracket) for bracket in fast] == [3, 3]
+        assert halving_rungs(3, 200) == [(3, 67), (1, 200)]
+
+    def test_brackets_group_learning_rates(self):
+        configurations = grid_configurations(GRID)
+
+        brackets = learning_rate_brackets(configurations)
+
+        assert [{configurations[i]['learning_rate'] for i in bracket} for bracket in brackets] == [{0.1}, {0.3}]
+        assert sorted(i for bracket in brackets for i in bracket) == list(range(len(configurations)))
+
+    def test_single_configuration_is_trained_once(self):
+        assert halving_rungs(1, 100) == [(1, 100)]
+
+
+class TestSearch:
+    """Tests for successive_halving_search."""
+
+    def test_trial_scores_match_classifier_auc(self, data):
+        X, y = data
+        params = {'n_estimators': 10, 'max_depth': 4, 'learning_rate': 0.3, 'tree_method': 'hist',
+                  'random_state': RANDOM_SEED, 'n_jobs': 1}
+
+        scores = tuning.train_trial(xgb.XGBClassifier(**params).get_xgb_params(), fold_matrices(X, y), 10)
+
+        cv = StratifiedKFold(n_splits=3, shuffle=True, random_state=RANDOM_SEED)
+        expected = np.mean([
+            roc_auc_score(y[valid], xgb.XGBClassifier(**params).fit(X[train], y[train]).predict_proba(X[valid])[:, 1])
+            for train, valid in cv.split(X, y)
+        ])
+        assert len(scores) == 10
+        assert scores[-1] == pytest.approx(expected, abs=1e-6)
+
+    def test_best_params_come_from_the_grid(self, data):
+        model, best_params, best_score = search(data)
+
+        assert list(best_params) == list(GRID)
+        assert all(best_params[name] in values for name, values in GRID.items())
+        assert 0.5 < best_score <= 1.0
+        assert model.n_estimators == best_params['n_estimators']
+        assert model.max_depth == best_params['max_depth']
+        assert model.predict_proba(data[0]).shape == (len(data[1]), 2)
+
+    def test_folds_are_quantized_once(self, data, monkeypatch):
+        calls = []
+        build = tuning.fold_matrices
+        monkeypatch.setattr(tuning, 'fold_matrices', lambda *args: calls.append(1) or build(*args))
+
+        search(data)
+
+        assert calls == [1]
+
+    def test_sparse_input(self, data):
+        X, y = data
+        X = np.where(np.abs(X) < 0.5, 0, X).astype(np.float32)
+
+        model, best_params, _ = successive_halving_search(sp.csr_matrix(X), y, GRID, base_params={'n_jobs': 1},
+                                                          min_rounds=5, verbose=False)
+
+        assert model.missing == 0.0
+        assert model.get_num_boosting_rounds() == best_params['n_estimators']
+
+
+class TestQuantizedGridSearch:
+    """Tests for quantized_grid_search."""
+
+    def test_matches_gridsearchcv(self, data):
+        X, y = data
+        grid = {**GRID, 'max_bin': [16, 256]}
+        reference = GridSearchCV(
+            xgb.XGBClassifier(random_state=RANDOM_SEED, n_jobs=1, tree_method='hist'), grid, scoring='roc_auc',
+            cv=StratifiedKFold(n_splits=3, shuffle=True, random_state=RANDOM_SEED),
+        ).fit(X, y)
+
+        model, best_params, best_score = quantized_grid_search(X, y, grid, base_params={'n_jobs': 1}, verbose=False)
+
+        assert best_params == reference.best_params_
+        assert best_score == pytest.approx(reference.best_score_, abs=1e-6)
+        np.testing.assert_allclose(model.predict_proba(X), reference.best_estimator_.predict_proba(X), atol=1e-6)
+
+    def test_folds_are_quantized_once_per_max_bin(self, data, monkeypatch):
+        calls = []
+        build = tuning.fold_matrices
+        monkeypatch.setattr(tuning, 'fold_matrices', lambda *args: calls.append(args[3]) or build(*args))
+
+        quantized_grid_search(*data, {**GRID, 'max_bin': [256, 16]}, base_params={'n_jobs': 1}, verbose=False)
+
+        assert calls == [16, 256]
+
+
+class TestResume:
+    """Tests for the checkpoint of completed trials."""
+
+    def test_interrupted_search_resumes(self, data, tmp_path, monkeypatch):
+        expected = search(data)[1:]
+        checkpoint = tmp_path / "halving.json"
+        train_trial = tuning.train_trial
+        calls = []
+
+        def interrupted(*args):
+            if len(calls) == 4:
+                raise KeyboardInterrupt
+            calls.append(1)
+            return train_trial(*args)
+
+        monkeypatch.setattr(tuning, 'train_trial', interrupted)
+        with pytest.raises(KeyboardInterrupt):
+            search(data, checkpoint_path=checkpoint)
+
+        monkeypatch.setattr(tuning, 'train_trial', lambda *args: calls.append(1) or train_trial(*args))
+        resumed = search(data, checkpoint_path=checkpoint)[1:]
+
+        # Per learning rate: 3 configurations, then the best one with more rounds
+        assert len(calls) == 8
+        assert resumed == expected
+
+    def test_other_data_starts_over(self, data, tmp_path, monkeypatch):
+        checkpoint = tmp_path / "halving.json"
+        search(data, checkpoint_path=checkpoint)
+
+        calls = []
+        train_trial = tuning.train_trial
+        monkeypatch.setattr(tuning, 'train_trial', lambda *args: calls.append(1) or train_trial(*args))
+        X, y = data
+        search((X[::-1].copy(), y[::-1].copy()), checkpoint_path=checkpoint)
+
+        assert len(calls) == 8
+
+    def test_damaged_checkpoint_starts_over(self, data, tmp_path, monkeypatch):
+        checkpoint = tmp_path / "halving.json"
+        search(data, checkpoint_path=checkpoint)
+        state = json.loads(checkpoint.read_text())
+        state['trials']['0:0'][-1] = 1.0
+        checkpoint.write_text(json.dumps(state))
+
+        calls = []
+        train_trial = tuning.train_trial
+        monkeypatch.setattr(tuning, 'train_trial', lambda *args: calls.append(1) or train_trial(*args))
+        search(data, checkpoint_path=checkpoint)
+        search(data, checkpoint_path=checkpoint, resume=False)
+
+        assert len(calls) == 16
@@ -0,0 +1,255 @@
+"""
+Tests for Production Data Compaction
+====================================
+
+Validation:
+- Raw files are merged into date-partitioned Parquet parts
+- Row counts are preserved and originals are removed
+- Interrupted compactions are completed or rolled back
+- Retention deletes old raw files and partitions
+- Workers flushing in the same second write distinct raw files
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from api_pokemon.monitoring import drift_detection
+from api_pokemon.monitoring.compaction import (
+    COMPACTED_DIRNAME,
+    JOURNAL_SUFFIX,
+    LOCK_FILENAME,
+    apply_retention,
+    compact_drift_data,
+    recover_interrupted_compactions,
+)
+from api_pokemon.monitoring.drift_detection import DriftDetector
+
+
+def write_raw_file(drift_dir: Path, stamp: str, n_rows: int = 100, offset: int = 0) -> Path:
+    """Write a raw production file as DriftDetector would."""
+    path = drift_dir / f"production_data_{stamp}.parquet"
+    pd.DataFrame({
+        'a_hp': range(offset, offset + n_rows),
+        'a_type_1_Feu': [1] * n_rows,
+    }).to_parquet(path, index=False)
+    return path
+
+
+@pytest.fixture
+def drift_dir(tmp_path):
+    """Temporary drift_data directory."""
+    path = tmp_path / "drift_data"
+    path.mkdir()
+    return path
+
+
+class TestCompaction:
+    """Tests for compact_drift_data()."""
+
+    def test_merges_files_by_date(self, drift_dir):
+        """Files of the same day end up in one part with all their rows."""
+        write_raw_file(drift_dir, "20260110_100000", offset=0)
+        write_raw_file(drift_dir, "20260110_100500", offset=100)
+        write_raw_file(drift_dir, "20260111_090000", offset=200)
+
+        summary = compact_drift_data(drift_dir, min_age_seconds=0)
+
+        assert summary['files'] == 3
+        assert summary['rows'] == 300
+        assert not list(drift_dir.glob("production_data_*.parquet"))
+
+        day_10 = list((drift_dir / COMPACTED_DIRNAME / "date=2026-01-10").glob("*.parquet"))
+        assert len(day_10) == 1
+        table = pq.read_table(day_10[0])
+        assert table.num_rows == 200
+        assert sorted(table.column('a_hp').to_pylist()) == list(range(200))
+        assert pq.ParquetFile(day_10[0]).metadata.row_group(0).column(0).compression == 'ZSTD'
+
+    def test_repeated_runs_keep_one_part_per_date(self, drift_dir):
+        """A second run merges the existing part with the new files instead of adding one."""
+        write_raw_file(drift_dir, "20260110_100000", offset=0)
+        compact_drift_data(drift_dir, min_age_seconds=0)
+        write_raw_file(drift_dir, "20260110_110000", offset=100)
+
+        summary = compact_drift_data(drift_dir, min_age_seconds=0)
+
+        assert summary['files'] == 1
+        assert summary['rows'] == 100
+        assert summary['partitions'][0]['parts'] == 1
+        partition = drift_dir / COMPACTED_DIRNAME / "date=2026-01-10"
+        parts = list(partition.glob("*.parquet"))
+        assert len(parts) == 1
+        assert pq.read_table(parts[0]).column('a_hp').to_pylist() == list(range(200))
+        assert not list(partition.glob(f"*{JOURNAL_SUFFIX}"))
+
+    def test_partitioned_dataset_is_readable(self, drift_dir):
+        """The compacted directory reads back as a hive-partitioned dataset."""
+        write_raw_file(drift_dir, "20260110_100000")
+        write_raw_file(drift_dir, "20260111_100000")
+
+        compact_drift_data(drift_dir, min_age_seconds=0)
+
+        df = pd.read_parquet(drift_dir / COMPACTED_DIRNAME)
+        assert len(df) == 200
+        assert set(df['date'].astype(str)) == {'2026-01-10', '2026-01-11'}
+
+    def test_schema_differences_are_promoted(self, drift_dir):
+        """Files with different feature sets are merged with null-filled columns."""
+        write_raw_file(drift_dir, "20260110_100000")
+        pd.DataFrame({'a_hp': [1, 2], 'new_feature': [0.5, 0.7]}).to_parquet(
+            drift_dir / "production_data_20260110_110000.parquet", index=False
+        )
+
+        summary = compact_drift_data(drift_dir, min_age_seconds=0)
+
+        assert summary['rows'] == 102
+        assert not summary['errors']
+
+    def test_recent_files_are_skipped(self, drift_dir):
+        """Files that may still be written are left untouched."""
+        write_raw_file(drift_dir, "20260110_100000")
+
+        summary = compact_drift_data(drift_dir, min_age_seconds=3600)
+
+        assert summary['files'] == 0
+        assert len(list(drift_dir.glob("production_data_*.parquet"))) == 1
+
+    def test_unreadable_file_is_kept(self, drift_dir):
+        """A corrupt raw file is skipped, not deleted."""
+        write_raw_file(drift_dir, "20260110_100000")
+        corrupt = drift_dir / "production_data_20260110_100100.parquet"
+        corrupt.write_bytes(b"not a parquet file")
+
+        summary = compact_drift_data(drift_dir, min_age_seconds=0)
+
+        assert summary['rows'] == 100
+        assert corrupt.exists()
+
+    def test_concurrent_run_is_skipped(self, drift_dir):
+        """A held lock makes a second run return immediately."""
+        write_raw_file(drift_dir, "20260110_100000")
+        (drift_dir / LOCK_FILENAME).write_text("12345")
+
+        summary = compact_drift_data(drift_dir, min_age_seconds=0)
+
+        assert summary['skipped'] is True
+        assert len(list(drift_dir.glob("production_data_*.parquet"))) == 1
+
+    def test_stale_lock_is_reclaimed(self, drift_dir):
+        """An abandoned lock does not block compaction forever."""
+        write_raw_file(drift_dir, "20260110_100000")
+        lock = drift_dir / LOCK_FILENAME
+        lock.write_text("12345")
+        old = time.time() - 7200
+        os.utime(lock, (old, old))
+
+        summary = compact_drift_data(drift_dir, min_age_seconds=0)
+
+        assert summary['files'] == 1
+        assert not lock.exists()
+
+
+class TestRecovery:
+    """Tests for crash recovery through the journal."""
+
+    def _write_journal(self, drift_dir, output_exists: bool):
+        source = write_raw_file(drift_dir, "20260110_100000")
+        partition = drift_dir / COMPACTED_DIRNAME / "date=2026-01-10"
+        partition.mkdir(parents=True)
+        output = partition / "part-x.parquet"
+        temp_output = partition / ".part-x.parquet.tmp"
+        target = output if output_exists else temp_output
+        pd.read_parquet(source).to_parquet(target, index=False)
+        (partition / ("part-x.parquet" + JOURNAL_SUFFIX)).write_text(json.dumps({
+            'output': str(output),
+            'temp_output': str(temp_output),
+            'sources': [str(source)],
+        }))
+        return source, output, temp_output
+
+    def test_completed_rename_deletes_sources(self, drift_dir):
+        """If the merged file was renamed, the leftover sources are deleted."""
+        source, output, _ = self._write_journal(drift_dir, output_exists=True)
+
+        assert recover_interrupted_compactions(drift_dir) == 1
+        assert output.exists()
+        assert not source.exists()
+
+    def test_missing_output_rolls_back(self, drift_dir):
+        """If the rename did not happen, sources are kept and the temp file removed."""
+        source, output, temp_output = self._write_journal(drift_dir, output_exists=False)
+
+        assert recover_interrupted_compactions(drift_dir) == 1
+        assert source.exists()
+        assert not output.exists()
+        assert not temp_output.exists()
+
+
+class TestRetention:
+    """Tests for apply_retention()."""
+
+    def test_deletes_old_files_and_partitions(self, drift_dir):
+        """Data older than the retention window is removed."""
+        write_raw_file(drift_dir, "20260101_100000")
+        recent = write_raw_file(drift_dir, "20260119_100000")
+        old_partition = drift_dir / COMPACTED_DIRNAME / "date=2026-01-02"
+        new_partition = drift_dir / COMPACTED_DIRNAME / "date=2026-01-18"
+        old_partition.mkdir(parents=True)
+        new_partition.mkdir(parents=True)
+
+        deleted = apply_retention(drift_dir, retention_days=7, now=datetime(2026, 1, 20))
+
+        assert deleted == 2
+        assert recent.exists()
+        assert not old_partition.exists()
+        assert new_partition.exists()
+
+
+class TestDetectorFlush:
+    """Tests for the raw files written by DriftDetector.save_production_data()."""
+
+    @pytest.fixture
+    def detectors(self, drift_dir, monkeypatch):
+        """Two detectors (one per gunicorn worker) whose clocks read the same second."""
+        class FrozenDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return cls(2026, 1, 10, 10, 0, 0)
+
+        monkeypatch.setattr(drift_detection, "datetime", FrozenDatetime)
+        workers = []
+        for _ in range(2):
+            monkeypatch.setattr(DriftDetector, "_instance", None)
+            detector = DriftDetector(enabled=True, load_mode="lazy")
+            detector.drift_data_dir = drift_dir
+            workers.append(detector)
+        yield workers
+        # Restore the module-level singleton for other tests
+        DriftDetector._instance = drift_detection.drift_detector
+
+    def test_same_second_flushes_keep_all_rows(self, drift_dir, detectors):
+        """Both buffers are kept and compacted into the day's partition."""
+        for offset, detector in zip((0, 100), detectors):
+            detector.production_buffer = [{'a_hp': offset + i} for i in range(100)]
+            detector.save_production_data()
+
+        raw_files = list(drift_dir.glob("production_data_20260110_100000_*.parquet"))
+        assert len(raw_files) == 2
+        assert not list(drift_dir.glob(".*.tmp"))
+
+        summary = compact_drift_data(drift_dir, min_age_seconds=0)
+
+        assert summary['files'] == 2
+        df = pd.read_parquet(drift_dir / COMPACTED_DIRNAME / "date=2026-01-10")
+        assert sorted(df['a_hp']) == list(range(200))
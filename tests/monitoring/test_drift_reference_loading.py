@@ -0,0 +1,111 @@
+"""
+Tests for DriftDetector Reference Data Loading
+===============================================
+
+The drift detector must not read X_train.parquet at import time.
+Reference data is loaded in a background thread or lazily on first use,
+and the loading state is reported through get_drift_status().
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from api_pokemon.monitoring import drift_detection
+from api_pokemon.monitoring.drift_detection import (
+    REFERENCE_STATUS_DISABLED,
+    REFERENCE_STATUS_LOADED,
+    REFERENCE_STATUS_NOT_LOADED,
+    REFERENCE_STATUS_UNAVAILABLE,
+    DriftDetector,
+)
+
+
+@pytest.fixture
+def fresh_detector_factory(monkeypatch):
+    """Build new DriftDetector instances, bypassing the module singleton."""
+    def factory(**kwargs):
+        monkeypatch.setattr(DriftDetector, "_instance", None)
+        return DriftDetector(**kwargs)
+
+    yield factory
+    # Restore the module-level singleton for other tests
+    DriftDetector._instance = drift_detection.drift_detector
+
+
+@pytest.fixture
+def reference_file(tmp_path, monkeypatch):
+    """Create a small X_train.parquet in a temporary working directory."""
+    datasets_dir = tmp_path / "data" / "datasets"
+    datasets_dir.mkdir(parents=True)
+    pd.DataFrame({"a_hp": range(50), "b_hp": range(50)}).to_parquet(
+        datasets_dir / "X_train.parquet", index=False
+    )
+    monkeypatch.chdir(tmp_path)
+    return datasets_dir / "X_train.parquet"
+
+
+class TestReferenceLoading:
+    """Tests for deferred reference data loading."""
+
+    def test_init_does_not_load_reference_data(self, fresh_detector_factory, reference_file):
+        """Constructing the detector must not read the parquet file."""
+        detector = fresh_detector_factory(enabled=True, load_mode="background")
+
+        status = detector.get_drift_status()
+        assert status["reference_data_status"] == REFERENCE_STATUS_NOT_LOADED
+        assert status["reference_data_loaded"] is False
+
+    def test_background_loading(self, fresh_detector_factory, reference_file):
+        """Background mode loads reference data in a separate thread."""
+        detector = fresh_detector_factory(enabled=True, load_mode="background")
+
+        thread = detector.start_background_loading()
+        assert thread is not None
+        thread.join(timeout=10)
+
+        status = detector.get_drift_status()
+        assert status["reference_data_status"] == REFERENCE_STATUS_LOADED
+        assert status["reference_data_loaded"] is True
+        assert len(detector.reference_data) == 50
+
+    def test_lazy_loading_on_first_access(self, fresh_detector_factory, reference_file):
+        """Lazy mode loads reference data on first access only."""
+        detector = fresh_detector_factory(enabled=True, load_mode="lazy")
+
+        assert detector.start_background_loading() is None
+        assert detector.get_drift_status()["reference_data_status"] == REFERENCE_STATUS_NOT_LOADED
+
+        assert detector.reference_data is not None
+        assert detector.get_drift_status()["reference_data_status"] == REFERENCE_STATUS_LOADED
+
+    def test_missing_reference_file(self, fresh_detector_factory, tmp_path, monkeypatch):
+        """A missing file is reported as unavailable, not as an error."""
+        monkeypatch.chdir(tmp_path)
+        detector = fresh_detector_factory(enabled=True, load_mode="lazy")
+
+        assert detector.reference_data is None
+        assert detector.get_drift_status()["reference_data_status"] == REFERENCE_STATUS_UNAVAILABLE
+
+
+class TestDisabledDetector:
+    """Tests for DRIFT_DETECTION_ENABLED=false."""
+
+    def test_disabled_skips_loading_and_collection(self, fresh_detector_factory, reference_file, tmp_path):
+        """A disabled detector neither loads reference data nor buffers predictions."""
+        detector = fresh_detector_factory(enabled=False, load_mode="background")
+        detector.drift_data_dir = tmp_path / "drift_data"
+
+        assert detector.start_background_loading() is None
+        detector.add_prediction({"a_hp": 1}, prediction=1, probability=0.9)
+
+        status = detector.get_drift_status()
+        assert status["enabled"] is False
+        assert status["reference_data_status"] == REFERENCE_STATUS_DISABLED
+        assert status["buffer_size"] == 0
+        assert not detector.drift_data_dir.exists()
@@ -0,0 +1,108 @@
+"""
+Tests for Prometheus Multiprocess Mode
+======================================
+
+Several API workers write to a shared PROMETHEUS_MULTIPROC_DIR and
+/metrics must expose values aggregated over all of them.
+
+Each worker is simulated by a separate Python process, since
+prometheus_client selects its value storage at import time.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from api_pokemon.monitoring.multiprocess import prepare_multiprocess_dir
+
+WORKER_SCRIPT = """
+from api_pokemon.monitoring.metrics import track_prediction, track_request, update_system_metrics
+track_prediction(model_version="v2", duration=0.01, confidence=0.9, win_prob=0.9)
+track_request(method="POST", endpoint="/predict/best-move", status=200, duration=0.02)
+update_system_metrics()
+"""
+
+SCRAPE_SCRIPT = """
+from api_pokemon.monitoring.metrics import get_registry
+from prometheus_client import generate_latest
+print(generate_latest(get_registry()).decode())
+"""
+
+
+def run_python(script: str, multiproc_dir: Path) -> str:
+    """Run a snippet in a fresh interpreter with multiprocess mode enabled."""
+    env = {
+        **os.environ,
+        "PROMETHEUS_MULTIPROC_DIR": str(multiproc_dir),
+        "PYTHONPATH": str(PROJECT_ROOT),
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        env=env, capture_output=True, text=True, check=True, cwd=PROJECT_ROOT,
+    )
+    return result.stdout
+
+
+@pytest.fixture
+def multiproc_dir(tmp_path, monkeypatch):
+    """Shared metrics directory prepared as the launcher would."""
+    path = tmp_path / "prometheus_multiproc"
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(path))
+    prepare_multiprocess_dir()
+    return path
+
+
+class TestMultiprocessMetrics:
+    """Tests for metrics aggregation across worker processes."""
+
+    def test_counters_are_aggregated_across_workers(self, multiproc_dir):
+        """A scrape sees the sum of the counters of all workers."""
+        for _ in range(3):
+            run_python(WORKER_SCRIPT, multiproc_dir)
+
+        output = run_python(SCRAPE_SCRIPT, multiproc_dir)
+
+        assert 'model_predictions_total{model_version="v2"} 3.0' in output
+        assert 'model_prediction_duration_seconds_count{model_version="v2"} 3.0' in output
+        assert 'api_requests_total{endpoint="/predict/best-move",method="POST",status="200"} 3.0' in output
+
+    def test_system_gauges_are_not_duplicated_per_worker(self, multiproc_dir):
+        """Host-wide gauges expose a single series, without a pid label."""
+        run_python(WORKER_SCRIPT, multiproc_dir)
+        run_python(WORKER_SCRIPT, multiproc_dir)
+
+        output = run_python(SCRAPE_SCRIPT, multiproc_dir)
+        memory_lines = [
+            line for line in output.splitlines()
+            if line.startswith("system_memory_available_bytes")
+        ]
+
+        assert len(memory_lines) <= 1
+        assert all("pid=" not in line for line in memory_lines)
+
+    def test_prepare_cleans_previous_run(self, multiproc_dir):
+        """Files left by a previous run are removed at startup."""
+        run_python(WORKER_SCRIPT, multiproc_dir)
+        assert list(multiproc_dir.glob("*.db"))
+
+        prepare_multiprocess_dir()
+
+        assert multiproc_dir.exists()
+        assert not list(multiproc_dir.glob("*.db"))
+
+
+def test_single_process_mode_uses_default_registry(monkeypatch):
+    """Without PROMETHEUS_MULTIPROC_DIR the default registry is served."""
+    from prometheus_client import REGISTRY
+    from api_pokemon.monitoring.metrics import get_registry
+
+    monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR", raising=False)
+
+    assert get_registry() is REGISTRY
+    assert prepare_multiprocess_dir() is None